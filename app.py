@@ -1,22 +1,31 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, make_response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, make_response, g, Response, stream_with_context, send_file
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import date, datetime, timedelta
 from collections import defaultdict
 from functools import wraps
 import csv
+import gzip
 import json, os
 import calendar
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.enums import TA_CENTER
 import uuid
-import portalocker
 from audit_repository import AuditRepo
+from audit_writer import EscritorAuditoria
+from document_store import ConflitoVersao, DocumentStore
+from hierarchy_index import HierarchyIndex, resolver_caminho
+from escala_engine import MotorEscala, gerar_escala_otima
+from escala_incremental import ReprogramadorEscala, aplicar_diff
+from escala_lote import MOTORES as MOTORES_LOTE, gerar_lote
+import estatisticas
+from pdf_export import CachePDF
+from jobs import FilaDeJobs
+from sincronizacao import HistoricoVersoes, etag_versao
+from eventos import CanalEventos
+from assets import Assets, CACHE_IMUTAVEL
+from compressao import CompressaoRespostas
+import threading
+import time
+from types import SimpleNamespace
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
@@ -30,6 +39,91 @@ if os.environ.get('FLASK_ENV') == 'production' and not os.environ.get('SECRET_KE
 PERSISTENCE = 'postgres'
 USE_POSTGRES = True  # Forçado - sistema não usa mais JSON
 
+# ========== DOCUMENT STORE (JSON particionado por comum) ==========
+
+DATA_PATH = os.environ.get('DATA_PATH', 'data/db.json')
+STORE_DIR = os.environ.get('STORE_DIR', 'data/store')
+
+_store = DocumentStore(base_dir=STORE_DIR, legacy_path=DATA_PATH)
+_pdf_cache = CachePDF(os.path.join(STORE_DIR, 'pdf'))
+
+def load_db():
+    """Monta o documento completo a partir das partições"""
+    return _store.load()
+
+def save_db(db):
+    """
+    Persiste o documento completo (grava só o que esta requisição alterou);
+    ConflitoVersao se outra requisição gravou a mesma partição depois do load_db
+    """
+    _store.save(db)
+
+def save_comum(comum_id, comum_data, db=None):
+    """
+    Persiste apenas a partição de uma comum (lock por comum) e retorna a versão gravada.
+    Com o `db` de onde a comum foi lida, levanta ConflitoVersao se ela foi
+    gravada por outra requisição depois do load_db.
+    """
+    versao_esperada = db.versoes_comuns.get(comum_id, 0) if getattr(db, 'digests', None) is not None else None
+    versao = _store.save_comum(comum_id, comum_data, versao_esperada=versao_esperada)
+    if versao_esperada is not None:
+        db.registrar_gravacao(comum_id, comum_data, versao)
+    return versao
+
+# Índice da hierarquia compartilhado pelas threads do worker (ver _indice_hierarquia)
+_indice_cache = {}
+_indice_lock = threading.Lock()
+
+def atualizar_estatisticas_comum(comum_id, versao, alteracoes):
+    """
+    Repassa ao cache de estatísticas as vagas alteradas (campo, antes, depois) de um
+    save_comum com o db do load: `versao` (a gravada) sucede diretamente a versão lida
+    """
+    estatisticas.registrar_alteracoes(comum_id, versao - 1, versao, alteracoes)
+
+# Canal SSE por comum (eventos.py); criado no primeiro uso, quando o .env já foi carregado
+_canal_eventos_instancia = None
+_canal_eventos_lock = threading.Lock()
+
+def _limite_conexoes_sse():
+    """
+    Cada stream /eventos prende uma thread do gthread por até SSE_DURACAO_MAXIMA.
+    O limite por processo é o número de threads (GUNICORN_THREADS, o mesmo valor
+    passado ao gunicorn) menos SSE_THREADS_LIVRES (no mínimo 1, padrão metade),
+    que ficam sempre para as requisições comuns. SSE_MAX_CONEXOES só pode baixar o limite.
+    """
+    threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+    livres = max(1, int(os.environ.get('SSE_THREADS_LIVRES', str(max(1, threads // 2)))))
+    limite = max(0, threads - livres)
+    if os.environ.get('SSE_MAX_CONEXOES'):
+        limite = min(limite, int(os.environ['SSE_MAX_CONEXOES']))
+    return limite
+
+def _canal_eventos():
+    global _canal_eventos_instancia
+    with _canal_eventos_lock:
+        if _canal_eventos_instancia is None:
+            try:
+                from database import DATABASE_URL
+            except Exception:
+                DATABASE_URL = None
+            _canal_eventos_instancia = CanalEventos(
+                dsn=DATABASE_URL,
+                max_conexoes=_limite_conexoes_sse(),
+            )
+        return _canal_eventos_instancia
+
+def notificar_comum(comum_id, versao, tipo, acao, **dados):
+    """Avisa as conexões SSE da comum sobre a alteração gravada como `versao` (a retornada por save_comum)"""
+    try:
+        _canal_eventos().publicar(comum_id, {"tipo": tipo, "acao": acao, "versao": versao, **dados})
+    except Exception as e:
+        print(f"⚠️ [EVENTOS] Falha ao publicar {tipo}/{acao} da comum {comum_id}: {e}")
+
+def registrar_log_comum(comum_data, entrada):
+    """Log operacional da comum, gravado na própria partição (sem tocar o índice global)"""
+    comum_data.setdefault('logs', []).append(entrada)
+
 # ========== HELPERS PARA MODO POSTGRESQL-ONLY ==========
 
 def use_postgres():
@@ -69,10 +163,188 @@ def get_repository(repo_name):
         return repo_class()
     return None
 
-# ========== AUDIT (mantém compatibilidade com SQLite) ==========
+# ========== COMPRESSÃO DAS RESPOSTAS E CACHE DE static/ (ver compressao.py) ==========
+# Registrado antes da unidade de trabalho: o Flask roda os after_request em ordem
+# inversa, então a compressão é a última etapa (depois do commit).
+
+_compressao = CompressaoRespostas(
+    tamanho_minimo=int(os.environ.get('COMPRESS_MIN_BYTES', '1024')),
+    nivel_gzip=int(os.environ.get('COMPRESS_LEVEL', '6')),
+    ativo=os.environ.get('COMPRESS_ENABLED', '1') == '1',
+)
+# Imagens de static/ não têm hash no nome: cache por STATIC_MAX_AGE, revalidado pelo ETag
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', str(7 * 24 * 3600)))
+
+@app.after_request
+def comprimir_resposta(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+    return _compressao.processar(response, request.headers.get('Accept-Encoding', ''),
+                                 request.method, request.endpoint or 'sem_rota')
+
+# ========== UNIDADE DE TRABALHO (uma sessão de banco por requisição) ==========
+
+@app.before_request
+def abrir_unidade_de_trabalho():
+    """Todos os repositories da requisição compartilham a mesma sessão (aberta sob demanda)"""
+    from database import iniciar_unidade_de_trabalho
+    g.unidade_de_trabalho_token = iniciar_unidade_de_trabalho()
+
+@app.after_request
+def confirmar_unidade_de_trabalho(response):
+    """Commit único antes de enviar a resposta; respostas 5xx desfazem a unidade"""
+    if 'unidade_de_trabalho_token' not in g:
+        return response
+    from database import unidade_de_trabalho_atual
+    unidade = unidade_de_trabalho_atual()
+    if unidade is None:
+        return response
+    if response.status_code >= 500:
+        unidade.rollback()
+        return response
+    try:
+        unidade.commit()
+    except Exception as e:
+        unidade.rollback()
+        print(f"❌ [DB] Falha no commit da requisição {request.method} {request.path}: {e}")
+        return jsonify({"error": "Erro ao salvar alterações"}), 500
+    return response
+
+@app.errorhandler(ConflitoVersao)
+def conflito_de_versao(e):
+    """Outra requisição gravou a mesma partição depois do load: nada desta é confirmado"""
+    from database import unidade_de_trabalho_atual
+    unidade = unidade_de_trabalho_atual()
+    if unidade is not None:
+        unidade.rollback()
+    print(f"⚠️ [STORE] Conflito em {request.method} {request.path}: {e}")
+    return jsonify({"error": "Os dados foram alterados por outra pessoa. Recarregue a página e tente novamente."}), 409
+
+@app.teardown_request
+def fechar_unidade_de_trabalho(exc):
+    """Fecha a sessão da requisição (rollback se a requisição terminou com exceção)"""
+    token = g.pop('unidade_de_trabalho_token', None)
+    if token is not None:
+        from database import finalizar_unidade_de_trabalho
+        try:
+            finalizar_unidade_de_trabalho(token, commit=exc is None)
+        except Exception as e:
+            print(f"❌ [DB] Falha ao finalizar unidade de trabalho: {e}")
+    # Só depois do commit: antes dele um load_user concorrente ainda leria a linha antiga
+    for user_id in g.pop('identidades_invalidadas', ()):
+        invalidar_identidade(user_id)
+
+# ========== AUDIT (SQLite: filtros, busca e paginação no banco) ==========
+
+_audit_repo_instancia = None
 
 def _audit_repo():
-    return AuditRepo(db_path=os.environ.get('SQLITE_PATH', 'data/rodizio.db'))
+    global _audit_repo_instancia
+    if _audit_repo_instancia is None:
+        # Um arquivo SQLite por mês; 0 desliga a retenção/arquivamento
+        repo = AuditRepo(db_path=os.environ.get('SQLITE_PATH', 'data/rodizio.db'),
+                         particoes_dir=os.environ.get('AUDIT_DIR') or None,
+                         meses_retencao=int(os.environ.get('AUDIT_RETENCAO_MESES', '24')),
+                         meses_quentes=int(os.environ.get('AUDIT_MESES_QUENTES', '12')))
+        # Na primeira vez, os logs que estavam na partição JSON passam para as partições
+        repo.ensure_schema(logs_legados=_store.load_logs_auditoria)
+        _audit_repo_instancia = repo
+    return _audit_repo_instancia
+
+# Partições mensais de logs_auditoria no PostgreSQL (schema_v2_normalized.sql): os
+# próximos meses são criados com antecedência, os anteriores aos últimos
+# AUDIT_MESES_QUENTES viram .csv.gz (ao lado dos arquivos .db.gz do SQLite) e saem do
+# banco, e os que passaram de AUDIT_RETENCAO_MESES são removidos. Roda na thread de
+# escrita da auditoria, no máximo a cada 6 h por processo.
+INTERVALO_PARTICOES_PG = 6 * 3600
+_particoes_pg_ultima = 0.0
+
+def _arquivar_particoes_postgres(session, meses_quentes, destino):
+    """
+    Exporta cada partição fria para <destino>/pg_logs_auditoria_AAAA_MM.csv.gz e só
+    depois a desanexa e remove (commit por partição). Um processo por vez (advisory lock).
+    """
+    from sqlalchemy import text
+    if not session.execute(text("SELECT pg_try_advisory_lock(hashtext('arquivar_logs_auditoria'))")).scalar():
+        return []
+    arquivos = []
+    try:
+        frias = [r[0] for r in session.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'logs_auditoria' AND c.relname ~ '^logs_auditoria_[0-9]{4}_[0-9]{2}$'
+              AND to_date(substr(c.relname, 16), 'YYYY_MM') < date_trunc('month', NOW()) - make_interval(months => :n)
+            ORDER BY c.relname
+        """), {"n": meses_quentes})]
+        os.makedirs(destino, exist_ok=True)
+        for nome in frias:
+            arquivo = os.path.join(destino, f"pg_{nome}.csv.gz")
+            n = 1
+            while os.path.exists(arquivo):
+                arquivo = os.path.join(destino, f"pg_{nome}.{n}.csv.gz")
+                n += 1
+            cursor = session.connection().connection.cursor()
+            try:
+                with gzip.open(arquivo + '.tmp', 'wb') as gz:
+                    cursor.copy_expert(f'COPY "{nome}" TO STDOUT WITH CSV HEADER', gz)
+            except Exception:
+                os.remove(arquivo + '.tmp')
+                raise
+            os.replace(arquivo + '.tmp', arquivo)
+            session.execute(text(f'ALTER TABLE logs_auditoria DETACH PARTITION "{nome}"'))
+            session.execute(text(f'DROP TABLE "{nome}"'))
+            session.commit()
+            arquivos.append(arquivo)
+    finally:
+        session.rollback()
+        session.execute(text("SELECT pg_advisory_unlock(hashtext('arquivar_logs_auditoria'))"))
+        session.commit()
+    return arquivos
+
+def _manter_particoes_postgres():
+    global _particoes_pg_ultima
+    agora = time.monotonic()
+    if _particoes_pg_ultima and agora - _particoes_pg_ultima < INTERVALO_PARTICOES_PG:
+        return
+    _particoes_pg_ultima = agora
+    try:
+        from database import get_db_session
+        from sqlalchemy import text
+        meses_quentes = int(os.environ.get('AUDIT_MESES_QUENTES', '12'))
+        meses_retencao = int(os.environ.get('AUDIT_RETENCAO_MESES', '24'))
+        arquivadas, removidas = [], []
+        with get_db_session() as session:
+            session.execute(text("SELECT criar_particoes_logs(2)")).fetchall()
+        if meses_quentes:  # 0 desliga o arquivamento, como no SQLite
+            with get_db_session() as session:
+                arquivadas = _arquivar_particoes_postgres(session, meses_quentes, _audit_repo().particoes_dir)
+        if meses_retencao:  # 0 desliga a retenção, como no SQLite
+            with get_db_session() as session:
+                removidas = [r[0] for r in session.execute(
+                    text("SELECT remover_particoes_logs(:n)"), {"n": meses_retencao})]
+        if arquivadas:
+            print(f"🗄️ [AUDIT] Partições do PostgreSQL arquivadas: {arquivadas}")
+        if removidas:
+            print(f"🗄️ [AUDIT] Partições do PostgreSQL removidas pela retenção: {removidas}")
+    except Exception as e:
+        print(f"⚠️ [AUDIT] Falha na manutenção das partições do PostgreSQL: {e}")
+
+def _gravar_lote_auditoria(logs):
+    gravados = _audit_repo().insert_logs(logs)
+    _manter_particoes_postgres()
+    return gravados
+
+# Logs saem da requisição por uma fila em memória e são gravados em lote (audit_writer.py)
+_escritor_auditoria = EscritorAuditoria(
+    gravar_lote=_gravar_lote_auditoria,
+    intervalo_ms=int(os.environ.get('AUDIT_FLUSH_MS', '200')),
+    tamanho_lote=int(os.environ.get('AUDIT_BATCH', '200')),
+    capacidade=int(os.environ.get('AUDIT_QUEUE_MAX', '10000')),
+    politica=os.environ.get('AUDIT_QUEUE_POLICY', 'descartar_antigos'),
+)
 
 def _audit_scope(user):
     if getattr(user, 'is_master', False):
@@ -114,6 +386,13 @@ def format_datetime_br(datetime_string):
     except:
         return datetime_string
 
+# ========== BUNDLES DO FRONTEND (CSS/JS do SPA; ver assets.py) ==========
+# O template referencia {{ asset('app.js') }} → /assets/app.<hash>.js. Os bundles são
+# gerados no build da imagem; com ASSETS_RECOMPILAR=1 (padrão) são refeitos quando
+# uma fonte em frontend/ fica mais nova que o manifest.
+_assets = Assets(recompilar=os.environ.get('ASSETS_RECOMPILAR', '1') == '1')
+app.jinja_env.globals['asset'] = _assets.url
+
 class User(UserMixin):
     def __init__(self, id, nome, tipo='organista', nivel='comum', contexto_id=None, is_admin=False):
         self.id = id
@@ -139,79 +418,86 @@ class User(UserMixin):
 
 # Decorator para proteger endpoints de escrita
 def require_edit_permission(f):
-    """Decorator que bloqueia visualizadores de endpoints de escrita"""
+    """
+    Decorator que bloqueia visualizadores de endpoints de escrita.
+    Vai abaixo de @login_required; se ficar acima, o anônimo segue para o
+    login_required (redirect) em vez de quebrar no AnonymousUserMixin.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if current_user.is_visualizador:
+        if current_user.is_authenticated and current_user.is_visualizador:
             return jsonify({"error": "Visualizadores não têm permissão para editar."}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+# ========== CACHE DE IDENTIDADE (user_loader) ==========
+# load_user roda em toda requisição autenticada: a identidade fica em memória por
+# USER_CACHE_TTL segundos. Edições/remoções invalidam a entrada neste processo ao
+# fim da requisição, depois do commit (invalidar_identidade_apos_commit); nos demais
+# workers o TTL limita quanto tempo a identidade antiga sobrevive.
+
+IDENTIDADE_TTL = float(os.environ.get('USER_CACHE_TTL', '30'))
+IDENTIDADE_MAX = 10000
+
+_identidades = {}  # user_id -> (expira_em, User ou None)
+_identidades_lock = threading.Lock()
+# Incrementada a cada invalidação: uma leitura que começou antes não grava no cache
+_identidades_geracao = 0
+
+def invalidar_identidade(user_id=None):
+    """Remove a identidade do cache (todas, se user_id for None)"""
+    global _identidades_geracao
+    with _identidades_lock:
+        _identidades_geracao += 1
+        if user_id is None:
+            _identidades.clear()
+        else:
+            _identidades.pop(user_id, None)
+
+def invalidar_identidade_apos_commit(user_id):
+    """Agenda a invalidação para o fim da requisição (depois do commit da unidade de trabalho)"""
+    g.setdefault('identidades_invalidadas', set()).add(user_id)
+
+def _buscar_identidade(user_id):
+    usuario_repo = get_repository('usuario')
+    if not usuario_repo:
+        return None
+    identidade = usuario_repo.get_identidade(user_id)
+    if not identidade:
+        return None
+    if identidade['origem'] == 'organista':
+        return User(identidade['id'], identidade['nome'], 'organista', 'comum', identidade['contexto_id'], False)
+    return User(
+        identidade['id'],
+        identidade['nome'],
+        identidade['tipo'],
+        identidade.get('nivel') or 'sistema',
+        identidade.get('contexto_id'),
+        identidade['tipo'] in ['master', 'admin_regional', 'encarregado_sub_regional', 'encarregado_comum']
+    )
+
 @login_manager.user_loader
 def load_user(user_id):
-    # POSTGRESQL: Usar repository
-    usuario_repo = get_repository('usuario')
-    organista_repo = get_repository('organista')
-    
-    # Tentar buscar como usuário do sistema
-    usuario = usuario_repo.get_by_id(user_id) if usuario_repo else None
-    if usuario:
-        print(f"🔐 [LOAD_USER] Usuário do sistema (PostgreSQL): {user_id} (tipo: {usuario['tipo']})")
-        return User(
-            usuario['id'],
-            usuario['nome'],
-            usuario['tipo'],
-            usuario.get('nivel', 'sistema'),
-            usuario.get('contexto_id'),
-            usuario.get('tipo') in ['master', 'admin_regional', 'encarregado_sub_regional', 'encarregado_comum']
-        )
-    
-    # Tentar buscar como organista
-    organista = organista_repo.get_by_id(user_id) if organista_repo else None
-    if organista:
-        print(f"🎹 [LOAD_USER] Organista (PostgreSQL): {user_id} - is_admin será FALSE")
-        user_obj = User(
-            organista['id'],
-            organista['nome'],
-            'organista',
-            'comum',
-            organista.get('comum_id'),
-            False
-        )
-        print(f"   Verificação: is_admin={user_obj.is_admin}, tipo={user_obj.tipo}")
-        return user_obj
-    
-    print(f"❌ [LOAD_USER] Usuário não encontrado no PostgreSQL: {user_id}")
-    return None
+    agora = time.monotonic()
+    entrada = _identidades.get(user_id)
+    if entrada and entrada[0] > agora:
+        return entrada[1]
+
+    # Ausência também fica em cache (sessão de usuário removido não consulta o banco a cada requisição)
+    geracao = _identidades_geracao
+    user = _buscar_identidade(user_id)
+    with _identidades_lock:
+        if geracao != _identidades_geracao:
+            return user  # houve invalidação durante a leitura: o resultado pode ser anterior a ela
+        if len(_identidades) >= IDENTIDADE_MAX:
+            _identidades.clear()
+        _identidades[user_id] = (agora + IDENTIDADE_TTL, user)
+    return user
 
 # ========== FUNÇÃO DE AUDITORIA (HELPERS) ==========
 def _has_audit_access(user):
     return getattr(user, 'is_master', False) or getattr(user, 'is_admin_regional', False) or getattr(user, 'is_encarregado_sub', False)
 
-def _filter_logs_by_scope(logs, user):
-    if getattr(user, 'is_master', False):
-        return logs
-    # Admin Regional: apenas logs da sua regional
-    if getattr(user, 'is_admin_regional', False):
-        rid = user.contexto_id
-        return [l for l in logs if isinstance(l.get('contexto', {}), dict) and l['contexto'].get('regional_id') == rid]
-    # Encarregado Sub-Regional: apenas logs da sua sub
-    if getattr(user, 'is_encarregado_sub', False):
-        sid = user.contexto_id
-        return [l for l in logs if isinstance(l.get('contexto', {}), dict) and l['contexto'].get('sub_regional_id') == sid]
-    return []
-
-def _periodo_threshold(periodo):
-    # Retorna ISO string threshold
-    now = datetime.utcnow()
-    if periodo == '24h':
-        return (now - timedelta(days=1)).isoformat()
-    if periodo == '7d':
-        return (now - timedelta(days=7)).isoformat()
-    if periodo == '30d':
-        return (now - timedelta(days=30)).isoformat()
-    return None  # all
-
 # ========== FUNÇÃO DE AUDITORIA ==========
 
 def registrar_log_auditoria(
@@ -246,8 +532,6 @@ def registrar_log_auditoria(
     - usuario_tipo: Tipo do usuário (opcional)
     """
     try:
-        db = load_db()
-        
         # Obter dados do usuário
         if usuario_id is None:
             usuario_id = current_user.id if current_user.is_authenticated else "anonimo"
@@ -284,26 +568,9 @@ def registrar_log_auditoria(
             pass
         log_entry.setdefault('timestamp', datetime.utcnow().isoformat())
 
-        # Persistir em SQLite se configurado
-        if PERSISTENCE == 'sqlite':
-            try:
-                _audit_repo().insert_log(log_entry)
-            except Exception as e:
-                print(f"[AUDIT][SQLITE] erro ao inserir log: {e}")
-        
-        # Inicializar lista de logs se não existir
-        if "logs_auditoria" not in db:
-            db["logs_auditoria"] = []
-        
-        # Adicionar log
-        db["logs_auditoria"].append(log_entry)
-        
-        # Manter apenas últimos 10.000 registros
-        if len(db["logs_auditoria"]) > 10000:
-            db["logs_auditoria"] = db["logs_auditoria"][-10000:]
-        
-        # Salvar
-        save_db(db)
+        # Enfileira; a gravação na tabela de auditoria (SQLite) é feita em lote
+        if not _escritor_auditoria.registrar(log_entry):
+            print(f"⚠️ [AUDIT] Fila cheia, log descartado: {acao}")
         
     except Exception as e:
         # Não quebrar a aplicação se log falhar
@@ -329,8 +596,57 @@ def get_comum(db, regional_id, sub_regional_id, comum_id):
         return None
     return sub_regional.get('comuns', {}).get(comum_id)
 
+def _indice_hierarquia(db):
+    """Índice da hierarquia, reconstruído apenas quando a versão do documento muda"""
+    versao = getattr(db, 'versao', None)
+    if versao is None:
+        # Documento montado fora do store: índice descartável
+        return HierarchyIndex(db)
+    with _indice_lock:
+        if _indice_cache.get('versao') == versao:
+            return _indice_cache['indice']
+    indice = HierarchyIndex(db)
+    with _indice_lock:
+        _indice_cache['versao'] = versao
+        _indice_cache['indice'] = indice
+    return indice
+
+def _comum_result(db, caminho):
+    """Monta o dict {comum, regional_id, sub_regional_id, comum_id} a partir de um caminho do índice"""
+    if not caminho:
+        return None
+    resolvido = resolver_caminho(db, caminho)
+    if not resolvido:
+        return None
+    return {
+        'comum': resolvido[2],
+        'regional_id': caminho[0],
+        'sub_regional_id': caminho[1],
+        'comum_id': caminho[2]
+    }
+
+def _comum_listagem(db, caminho):
+    """Entrada no formato de list_all_comuns para um caminho do índice"""
+    resolvido = resolver_caminho(db, caminho)
+    if not resolvido:
+        return None
+    regional, sub_regional, comum = resolvido
+    return {
+        'regional_id': caminho[0],
+        'regional_nome': regional.get('nome'),
+        'sub_regional_id': caminho[1],
+        'sub_regional_nome': sub_regional.get('nome'),
+        'comum_id': caminho[2],
+        'comum_nome': comum.get('nome'),
+        'comum': comum
+    }
+
 def find_comum_by_id(db, comum_id):
-    """Busca uma comum por ID em toda a hierarquia"""
+    """Busca uma comum por ID (chave ou ID interno) via índice da hierarquia"""
+    result = _comum_result(db, _indice_hierarquia(db).comum(comum_id))
+    if result:
+        return result
+    # Comum pode ter sido criada/movida nesta mesma requisição: varredura completa
     for regional_id, regional in db.get('regionais', {}).items():
         for sub_regional_id, sub_regional in regional.get('sub_regionais', {}).items():
             for cid, comum in sub_regional.get('comuns', {}).items():
@@ -346,14 +662,26 @@ def find_comum_by_id(db, comum_id):
 
 def find_organista_in_all_comuns(db, organista_id):
     """Busca uma organista em todas as comuns"""
+    comum_result = _comum_result(db, _indice_hierarquia(db).organista(organista_id))
+    if comum_result:
+        organista = next((o for o in comum_result['comum'].get('organistas', []) if o['id'] == organista_id), None)
+        if organista:
+            return {
+                'organista': organista,
+                'comum_id': comum_result['comum_id'],
+                'sub_regional_id': comum_result['sub_regional_id'],
+                'regional_id': comum_result['regional_id']
+            }
+    
+    # Organista pode ter sido criada/movida nesta mesma requisição: varredura completa
     for regional_id, regional in db.get('regionais', {}).items():
         for sub_regional_id, sub_regional in regional.get('sub_regionais', {}).items():
-            for comum_id, comum in sub_regional.get('comuns', {}).items():
-                organista = next((o for o in comum.get('organistas', []) if o['id'] == organista_id), None)
+            for cid, comum in sub_regional.get('comuns', {}).items():
+                organista = next((o for o in comum.get('organistas', []) if o.get('id') == organista_id), None)
                 if organista:
                     return {
                         'organista': organista,
-                        'comum_id': comum_id,
+                        'comum_id': cid,
                         'sub_regional_id': sub_regional_id,
                         'regional_id': regional_id
                     }
@@ -392,68 +720,30 @@ def get_user_context(user):
 
 def list_all_comuns(db):
     """Lista todas as comuns do sistema"""
-    comuns = []
-    for regional_id, regional in db.get('regionais', {}).items():
-        for sub_regional_id, sub_regional in regional.get('sub_regionais', {}).items():
-            for comum_id, comum in sub_regional.get('comuns', {}).items():
-                comuns.append({
-                    'regional_id': regional_id,
-                    'regional_nome': regional.get('nome'),
-                    'sub_regional_id': sub_regional_id,
-                    'sub_regional_nome': sub_regional.get('nome'),
-                    'comum_id': comum_id,
-                    'comum_nome': comum.get('nome'),
-                    'comum': comum
-                })
-    return comuns
+    comuns = (_comum_listagem(db, caminho) for caminho in _indice_hierarquia(db).ordem)
+    return [c for c in comuns if c]
 
 def list_comuns_in_scope(db, user):
     """Lista comuns dentro do escopo do usuário (regional/sub/comum)."""
     if user.is_master or user.is_visualizador:
         return list_all_comuns(db)
 
-    comuns = []
-    for regional_id, regional in db.get('regionais', {}).items():
-        for sub_regional_id, sub_regional in regional.get('sub_regionais', {}).items():
-            for comum_id, comum in sub_regional.get('comuns', {}).items():
-                # Encarregado da Comum: apenas sua própria
-                if user.is_encarregado_comum or user.is_organista:
-                    # comparar com chave e com id interno
-                    if user.contexto_id in [comum_id, comum.get('id')]:
-                        comuns.append({
-                            'regional_id': regional_id,
-                            'regional_nome': regional.get('nome'),
-                            'sub_regional_id': sub_regional_id,
-                            'sub_regional_nome': sub_regional.get('nome'),
-                            'comum_id': comum_id,
-                            'comum_nome': comum.get('nome'),
-                            'comum': comum
-                        })
-                # Encarregado Sub-Regional: quaisquer comuns da sua sub
-                elif user.is_encarregado_sub:
-                    if user.contexto_id == sub_regional_id:
-                        comuns.append({
-                            'regional_id': regional_id,
-                            'regional_nome': regional.get('nome'),
-                            'sub_regional_id': sub_regional_id,
-                            'sub_regional_nome': sub_regional.get('nome'),
-                            'comum_id': comum_id,
-                            'comum_nome': comum.get('nome'),
-                            'comum': comum
-                        })
-                # Admin Regional: quaisquer comuns da sua regional
-                elif user.is_admin_regional:
-                    if user.contexto_id == regional_id:
-                        comuns.append({
-                            'regional_id': regional_id,
-                            'regional_nome': regional.get('nome'),
-                            'sub_regional_id': sub_regional_id,
-                            'sub_regional_nome': sub_regional.get('nome'),
-                            'comum_id': comum_id,
-                            'comum_nome': comum.get('nome'),
-                            'comum': comum
-                        })
-    return comuns
+    indice = _indice_hierarquia(db)
+    # Encarregado da Comum: apenas sua própria (chave ou id interno)
+    if user.is_encarregado_comum or user.is_organista:
+        caminho = indice.comum(user.contexto_id)
+        caminhos = [caminho] if caminho else []
+    # Encarregado Sub-Regional: quaisquer comuns da sua sub
+    elif user.is_encarregado_sub:
+        caminhos = indice.por_sub_regional.get(user.contexto_id, [])
+    # Admin Regional: quaisquer comuns da sua regional
+    elif user.is_admin_regional:
+        caminhos = indice.por_regional.get(user.contexto_id, [])
+    else:
+        caminhos = []
+
+    comuns = (_comum_listagem(db, caminho) for caminho in caminhos)
+    return [c for c in comuns if c]
 
 def is_comum_in_scope_for_user(db, comum_id, user):
     """Verifica se uma comum pertence ao escopo do usuário."""
@@ -505,16 +795,7 @@ def get_comum_for_user(db, user, comum_id_param=None):
                 return result
         
         # Se não tem sessão, pegar primeira comum disponível
-        for r_id, r_data in db.get("regionais", {}).items():
-            for s_id, s_data in r_data.get("sub_regionais", {}).items():
-                for c_id, c_data in s_data.get("comuns", {}).items():
-                    return {
-                        'comum': c_data,
-                        'regional_id': r_id,
-                        'sub_regional_id': s_id,
-                        'comum_id': c_id
-                    }
-        return None
+        return _comum_result(db, _indice_hierarquia(db).primeira_comum())
     
     if user.is_organista or user.is_encarregado_comum:
         return find_comum_by_id(db, user.contexto_id)
@@ -527,14 +808,15 @@ def get_comum_for_user(db, user, comum_id_param=None):
             if result:
                 return result
         # fallback: primeira comum dentro do escopo
-        comuns = list_comuns_in_scope(db, user)
-        if comuns:
-            return {
-                'comum': comuns[0]['comum'],
-                'comum_id': comuns[0]['comum_id'],
-                'sub_regional_id': comuns[0]['sub_regional_id'],
-                'regional_id': comuns[0]['regional_id']
-            }
+        indice = _indice_hierarquia(db)
+        if user.is_admin_regional:
+            caminhos = indice.por_regional.get(user.contexto_id, [])
+        else:
+            caminhos = indice.por_sub_regional.get(user.contexto_id, [])
+        for caminho in caminhos:
+            result = _comum_result(db, caminho)
+            if result:
+                return result
     
     return None
 
@@ -669,9 +951,46 @@ def index():
     
     print(f"  ✅ Config final enviada ao template: {config}")
     
-    import time
-    cache_bust = int(time.time())
-    return render_template("index.html", cfg=config, user=current_user, timestamp=cache_bust, v=cache_bust)
+    # Dados da sessão para o app.js (que é o mesmo arquivo, em cache, para todos os usuários)
+    app_config = {
+        "user": {
+            "id": current_user.id,
+            "nome": current_user.nome,
+            "tipo": current_user.tipo,
+            "nivel": current_user.nivel,
+            "contexto_id": current_user.contexto_id,
+            "is_admin": current_user.is_admin,
+            "is_master": current_user.is_master,
+            "is_encarregado_comum": current_user.is_encarregado_comum,
+            "is_encarregado_sub": current_user.is_encarregado_sub,
+            "is_organista": current_user.is_organista,
+        },
+        "bimestre": {
+            "inicio": config['bimestre'].get('inicio'),
+            "fim": config['bimestre'].get('fim'),
+            "inicio_br": format_date_br(config['bimestre'].get('inicio')),
+            "fim_br": format_date_br(config['bimestre'].get('fim')),
+        },
+    }
+    
+    response = make_response(render_template("index.html", cfg=config, user=current_user, app_config=app_config))
+    # Só o HTML deixa de ser cacheado; CSS/JS vêm de /assets com cache imutável
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
+
+@app.get("/assets/<nome>")
+def asset_estatico(nome):
+    """Bundle do frontend, na variante pré-comprimida aceita pelo cliente (br > gzip)"""
+    encontrado = _assets.arquivo(nome, request.headers.get('Accept-Encoding', ''))
+    if not encontrado:
+        return jsonify({"error": "Arquivo não encontrado"}), 404
+    caminho, codificacao = encontrado
+    response = send_file(caminho, mimetype=Assets.tipo(nome), conditional=True)
+    if codificacao:
+        response.headers['Content-Encoding'] = codificacao
+    response.headers['Cache-Control'] = CACHE_IMUTAVEL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 @app.route("/login", methods=['GET', 'POST'])
 def login():
@@ -806,61 +1125,64 @@ def trocar_senha():
 
 # ========== ENDPOINTS DE HIERARQUIA (REGIONAL/SUB-REGIONAL/COMUM) ==========
 
+def _escopo_hierarquia(user):
+    """Filtros de get_hierarquia para o escopo do usuário (None = sem acesso)"""
+    if user.is_master or user.is_visualizador:
+        return {}
+    if not user.contexto_id:
+        return None
+    if user.is_admin_regional:
+        return {'regional_id': user.contexto_id}
+    if user.is_encarregado_sub:
+        return {'sub_regional_id': user.contexto_id}
+    return {'comum_id': user.contexto_id}
+
+@app.get("/api/hierarquia")
+@login_required
+def api_hierarquia():
+    """Árvore regional → sub-regionais → comuns do escopo do usuário, em uma única consulta"""
+    try:
+        profundidade = int(request.args.get('profundidade', 3))
+    except ValueError:
+        return jsonify({"error": "profundidade deve ser 1, 2 ou 3"}), 400
+    
+    escopo = _escopo_hierarquia(current_user)
+    if escopo is None:
+        return jsonify([])
+    
+    repo = get_repository('comum')
+    return jsonify(repo.get_hierarquia(profundidade=profundidade, **escopo))
+
 @app.get("/api/comuns")
 @login_required
 def api_list_comuns():
     """Lista todas as comuns que o usuário tem acesso"""
     
-    # POSTGRESQL: Usar repository
-    repo = get_repository('comum')
+    escopo = _escopo_hierarquia(current_user)
+    if escopo is None:
+        return jsonify([])
     
-    if current_user.is_master:
-        # Master vê todas as comuns de todas as regionais
-        regionais = repo.get_all_regionais()
-        comuns = []
-        
-        for regional in regionais:
-            regional_id = regional['id']
-            regional_nome = regional['nome']
-            
-            # Buscar sub-regionais
-            sub_regionais = repo.get_sub_regionais_by_regional(regional_id)
-            for sub in sub_regionais:
-                sub_id = sub['id']
-                sub_nome = sub['nome']
-                
-                # Buscar comuns
-                comuns_sub = repo.get_comuns_by_sub_regional(sub_id)
-                for comum in comuns_sub:
-                    comuns.append({
-                        'regional_id': regional_id,
-                        'regional_nome': regional_nome,
-                        'sub_regional_id': sub_id,
-                        'sub_regional_nome': sub_nome,
-                        'comum_id': comum['id'],
-                        'comum_nome': comum['nome'],
-                        'comum': comum
-                    })
-    else:
-        # Outros usuários: filtrar por contexto
-        # Por enquanto, retornar apenas a comum do contexto
-        comum_id = current_user.contexto_id
-        if comum_id:
-            comum = repo.get_comum_by_id(comum_id)
-            if comum:
-                comuns = [{
-                    'regional_id': comum.get('regional_id'),
-                    'regional_nome': comum.get('regional_nome'),
-                    'sub_regional_id': comum.get('sub_regional_id'),
-                    'sub_regional_nome': comum.get('sub_regional_nome'),
+    # POSTGRESQL: hierarquia inteira em uma consulta (antes: 1 + R + S consultas)
+    repo = get_repository('comum')
+    comuns = []
+    for regional in repo.get_hierarquia(**escopo):
+        for sub in regional['sub_regionais']:
+            for comum in sub['comuns']:
+                comuns.append({
+                    'regional_id': regional['id'],
+                    'regional_nome': regional['nome'],
+                    'sub_regional_id': sub['id'],
+                    'sub_regional_nome': sub['nome'],
                     'comum_id': comum['id'],
                     'comum_nome': comum['nome'],
-                    'comum': comum
-                }]
-            else:
-                comuns = []
-        else:
-            comuns = []
+                    'comum': {
+                        **comum,
+                        'sub_regional_id': sub['id'],
+                        'sub_regional_nome': sub['nome'],
+                        'regional_id': regional['id'],
+                        'regional_nome': regional['nome']
+                    }
+                })
     
     return jsonify(comuns)
 
@@ -912,59 +1234,82 @@ def api_get_contexto():
 
 # ========== ENDPOINTS DE AUDITORIA ==========
 
+def _int_arg(nome, padrao, minimo=1, maximo=None):
+    try:
+        valor = max(minimo, int(request.args.get(nome, padrao)))
+    except (TypeError, ValueError):
+        valor = padrao
+    return min(valor, maximo) if maximo else valor
+
+def _filtros_auditoria(args):
+    """
+    Filtros comuns da lista e do CSV. ?data_inicio=/?data_fim= (ISO) sem ?periodo=
+    valem sozinhas; ?usuario_id= filtra o id exato, ?usuario= por trecho do id/nome.
+    """
+    data_inicio = (args.get('data_inicio') or '').strip()
+    data_fim = (args.get('data_fim') or '').strip()
+    if len(data_fim) == 10:  # só a data: inclui o dia inteiro
+        data_fim += 'T23:59:59.999999'
+    return {
+        'periodo': args.get('periodo') or ('todos' if data_inicio or data_fim else '30d'),
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'categoria': (args.get('categoria') or '').strip(),
+        'tipo': (args.get('tipo') or '').strip(),
+        'usuario_id': (args.get('usuario_id') or '').strip(),
+        'usuario': (args.get('usuario') or '').strip().lower(),
+    }
+
+def _resumo_log(l):
+    """Resumo leve para lista (evitar payloads enormes)"""
+    return {
+        'id': l.get('id'),
+        'timestamp': l.get('timestamp'),
+        'tipo': l.get('tipo'),
+        'categoria': l.get('categoria'),
+        'usuario_id': l.get('usuario_id'),
+        'usuario_nome': l.get('usuario_nome'),
+        'usuario_tipo': l.get('usuario_tipo'),
+        'acao': l.get('acao'),
+        'descricao': l.get('descricao'),
+        'contexto': l.get('contexto'),
+        'status': l.get('status')
+    }
+
 @app.get("/api/auditoria/logs")
 @login_required
 def api_auditoria_logs():
+    """
+    Lista logs com filtros e escopo aplicados no banco.
+    Paginação por ?cursor= (keyset, use proximo_cursor da resposta) ou ?pagina= (compatibilidade;
+    ?page=/?per_page= também são aceitos). Filtros em _filtros_auditoria.
+    ?busca= usa o índice FTS (prefixo, sem acentos); com ?ordem=relevancia ordena por relevância.
+    """
     if not _has_audit_access(current_user):
         return jsonify({"error": "Acesso negado"}), 403
-    db = load_db()
-    logs = db.get('logs_auditoria', [])
-
-    # Filtrar por escopo
-    logs = _filter_logs_by_scope(logs, current_user)
-
-    # Filtros
-    periodo = request.args.get('periodo', '30d')
-    categoria = request.args.get('categoria', '').strip()
-    tipo = request.args.get('tipo', '').strip()
-    usuario = request.args.get('usuario', '').strip().lower()
-    pagina = int(request.args.get('pagina', '1'))
-    por_pagina = int(request.args.get('por_pagina', '50'))
-
-    threshold = _periodo_threshold(periodo)
-    if threshold:
-        logs = [l for l in logs if l.get('timestamp', '') >= threshold]
-    if categoria:
-        logs = [l for l in logs if l.get('categoria') == categoria]
-    if tipo:
-        logs = [l for l in logs if l.get('tipo') == tipo]
-    if usuario:
-        logs = [l for l in logs if usuario in (l.get('usuario_id','') or '').lower() or usuario in (l.get('usuario_nome','') or '').lower()]
-
-    total = len(logs)
-    # Ordenar desc por timestamp
-    logs.sort(key=lambda l: l.get('timestamp', ''), reverse=True)
-    ini = (pagina - 1) * por_pagina
-    fim = ini + por_pagina
-    page_logs = logs[ini:fim]
-
-    # Resumo leve para lista (evitar payloads enormes)
-    def summarize(l):
-        return {
-            'id': l.get('id'),
-            'timestamp': l.get('timestamp'),
-            'tipo': l.get('tipo'),
-            'categoria': l.get('categoria'),
-            'usuario_id': l.get('usuario_id'),
-            'usuario_nome': l.get('usuario_nome'),
-            'usuario_tipo': l.get('usuario_tipo'),
-            'acao': l.get('acao'),
-            'descricao': l.get('descricao'),
-            'contexto': l.get('contexto'),
-            'status': l.get('status')
-        }
 
-    return jsonify({'logs': [summarize(l) for l in page_logs], 'total': total, 'pagina': pagina, 'por_pagina': por_pagina})
+    filtros = {**_filtros_auditoria(request.args), 'busca': request.args.get('busca', '').strip()}
+    pagina = _int_arg('pagina', _int_arg('page', 1))
+    por_pagina = _int_arg('por_pagina', _int_arg('per_page', 50, maximo=500), maximo=500)
+    cursor = request.args.get('cursor')
+
+    if filtros['busca'] and request.args.get('ordem') == 'relevancia':
+        # Busca textual ordenada por relevância (FTS5/bm25); sem paginação profunda
+        logs = _audit_repo().search_ranked(filtros['busca'], filtros, _audit_scope(current_user), limite=por_pagina)
+        return jsonify({'logs': [_resumo_log(l) for l in logs], 'total': len(logs), 'total_limitado': False,
+                        'proximo_cursor': None, 'pagina': 1, 'por_pagina': por_pagina})
+
+    resultado = _audit_repo().search_logs(filtros, _audit_scope(current_user), limite=por_pagina,
+                                          cursor=cursor, pagina=None if cursor else pagina,
+                                          com_total=not cursor)
+    return jsonify({
+        'logs': [_resumo_log(l) for l in resultado['logs']],
+        'total': resultado['total'],
+        'total_limitado': resultado['total_limitado'],
+        'proximo_cursor': resultado['proximo_cursor'],
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+    })
 
 
 @app.get("/api/auditoria/logs/<log_id>")
@@ -972,9 +1317,7 @@ def api_auditoria_logs():
 def api_auditoria_log_detail(log_id):
     if not _has_audit_access(current_user):
         return jsonify({"error": "Acesso negado"}), 403
-    db = load_db()
-    logs = _filter_logs_by_scope(db.get('logs_auditoria', []), current_user)
-    log = next((l for l in logs if l.get('id') == log_id), None)
+    log = _audit_repo().fetch_log(log_id, _audit_scope(current_user))
     if not log:
         return jsonify({"error": "Não encontrado"}), 404
     return jsonify(log)
@@ -985,305 +1328,68 @@ def api_auditoria_log_detail(log_id):
 def api_auditoria_stats():
     if not _has_audit_access(current_user):
         return jsonify({"error": "Acesso negado"}), 403
-    db = load_db()
-    logs = _filter_logs_by_scope(db.get('logs_auditoria', []), current_user)
-
-    now = datetime.utcnow()
-    iso_7d = (now - timedelta(days=7)).isoformat()
-    iso_24h = (now - timedelta(hours=24)).isoformat()
-
-    logins_7d = sum(1 for l in logs if l.get('tipo') == 'login' and l.get('timestamp','') >= iso_7d and l.get('status') == 'sucesso')
-    logins_falhas = sum(1 for l in logs if l.get('tipo') == 'login' and l.get('timestamp','') >= iso_7d and l.get('status') == 'falha')
-    alteracoes_24h = sum(1 for l in logs if l.get('tipo') in ['create','update','delete'] and l.get('timestamp','') >= iso_24h)
-    usuarios_ativos = len({(l.get('usuario_id') or '') for l in logs if l.get('timestamp','') >= iso_7d and l.get('usuario_id')})
-
-    return jsonify({
-        'logins_7d': logins_7d,
-        'logins_falhas': logins_falhas,
-        'alteracoes_24h': alteracoes_24h,
-        'usuarios_ativos': usuarios_ativos,
-    })
+    return jsonify(_audit_repo().stats(_audit_scope(current_user)))
 
 
-@app.get("/api/auditoria/export/csv")
+@app.get("/api/auditoria/metricas")
 @login_required
-def api_auditoria_export_csv():
-    if not _has_audit_access(current_user):
+def api_auditoria_metricas():
+    """Métricas da fila de escrita da auditoria neste processo (descartes, atraso, tamanho)"""
+    if not current_user.is_master:
         return jsonify({"error": "Acesso negado"}), 403
-    db = load_db()
-    logs = _filter_logs_by_scope(db.get('logs_auditoria', []), current_user)
-
-    periodo = request.args.get('periodo', '30d')
-    categoria = request.args.get('categoria', '').strip()
-    tipo = request.args.get('tipo', '').strip()
-    usuario = request.args.get('usuario', '').strip().lower()
-    threshold = _periodo_threshold(periodo)
-    if threshold:
-        logs = [l for l in logs if l.get('timestamp', '') >= threshold]
-    if categoria:
-        logs = [l for l in logs if l.get('categoria') == categoria]
-    if tipo:
-        logs = [l for l in logs if l.get('tipo') == tipo]
-    if usuario:
-        logs = [l for l in logs if usuario in (l.get('usuario_id','') or '').lower() or usuario in (l.get('usuario_nome','') or '').lower()]
-
-    # CSV response
-    from io import StringIO
-    si = StringIO()
-    writer = csv.writer(si)
-    writer.writerow(["timestamp","tipo","categoria","acao","descricao","usuario_id","usuario_nome","usuario_tipo","regional_id","sub_regional_id","comum_id","status","ip","user_agent"]) 
-    for l in logs:
-        ctx = l.get('contexto') or {}
-        writer.writerow([
-            l.get('timestamp',''), l.get('tipo',''), l.get('categoria',''), l.get('acao',''), l.get('descricao',''),
-            l.get('usuario_id',''), l.get('usuario_nome',''), l.get('usuario_tipo',''),
-            ctx.get('regional_id',''), ctx.get('sub_regional_id',''), ctx.get('comum_id',''),
-            l.get('status',''), l.get('ip',''), l.get('user_agent','')
-        ])
-
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = f"attachment; filename=auditoria_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-    output.headers["Content-type"] = "text/csv; charset=utf-8"
-    return output
+    return jsonify(_escritor_auditoria.metricas())
 
-# ========== ENDPOINTS DE AUDITORIA ==========
 
-@app.get("/api/auditoria/logs")
+@app.get("/api/compressao/metricas")
 @login_required
-def api_get_logs_auditoria():
-    """Retorna logs de auditoria filtrados por escopo do usuário"""
-    # Apenas Master, Admin Regional e Encarregado Sub podem acessar
-    if not (current_user.is_master or current_user.is_admin_regional or current_user.is_encarregado_sub):
-        return jsonify({"error": "Sem permissão para acessar logs de auditoria"}), 403
-    
-    db = load_db()
-    logs = db.get('logs_auditoria', [])
-    
-    # Filtros da query string
-    categoria = request.args.get('categoria')
-    tipo = request.args.get('tipo')
-    usuario_id = request.args.get('usuario_id')
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
-    busca = request.args.get('busca', '').lower()
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 50))
-    
-    # Filtrar por escopo do usuário
-    logs_filtrados = []
-    for log in logs:
-        # Master vê tudo
-        if current_user.is_master:
-            logs_filtrados.append(log)
-            continue
-        
-        # Admin Regional vê apenas da sua regional
-        if current_user.is_admin_regional:
-            contexto = log.get('contexto', {})
-            if contexto.get('regional_id') == current_user.contexto_id:
-                logs_filtrados.append(log)
-            continue
-        
-        # Encarregado Sub vê apenas da sua sub-regional
-        if current_user.is_encarregado_sub:
-            contexto = log.get('contexto', {})
-            if contexto.get('sub_regional_id') == current_user.contexto_id:
-                logs_filtrados.append(log)
-            continue
-    
-    # Aplicar filtros adicionais
-    if categoria:
-        logs_filtrados = [l for l in logs_filtrados if l.get('categoria') == categoria]
-    
-    if tipo:
-        logs_filtrados = [l for l in logs_filtrados if l.get('tipo') == tipo]
-    
-    if usuario_id:
-        logs_filtrados = [l for l in logs_filtrados if l.get('usuario_id') == usuario_id]
-    
-    if data_inicio:
-        logs_filtrados = [l for l in logs_filtrados if l.get('timestamp', '') >= data_inicio]
-    
-    if data_fim:
-        logs_filtrados = [l for l in logs_filtrados if l.get('timestamp', '') <= data_fim]
-    
-    if busca:
-        logs_filtrados = [
-            l for l in logs_filtrados 
-            if busca in l.get('descricao', '').lower() 
-            or busca in l.get('usuario_nome', '').lower()
-            or busca in l.get('acao', '').lower()
-        ]
-    
-    # Ordenar por timestamp (mais recentes primeiro)
-    logs_filtrados.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    
-    # Paginação
-    total = len(logs_filtrados)
-    start = (page - 1) * per_page
-    end = start + per_page
-    logs_paginados = logs_filtrados[start:end]
-    
-    return jsonify({
-        "logs": logs_paginados,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page
-    })
+def api_compressao_metricas():
+    """Bytes economizados pela compressão, por rota, neste processo"""
+    if not current_user.is_master:
+        return jsonify({"error": "Acesso negado"}), 403
+    return jsonify(_compressao.metricas())
 
-@app.get("/api/auditoria/logs/<log_id>")
+
+@app.get("/api/auditoria/particoes")
 @login_required
-def api_get_log_detalhe(log_id):
-    """Retorna detalhes completos de um log específico"""
-    if not (current_user.is_master or current_user.is_admin_regional or current_user.is_encarregado_sub):
-        return jsonify({"error": "Sem permissão"}), 403
-    
-    db = load_db()
-    logs = db.get('logs_auditoria', [])
-    
-    log = next((l for l in logs if l.get('id') == log_id), None)
-    if not log:
-        return jsonify({"error": "Log não encontrado"}), 404
-    
-    # Verificar escopo
+def api_auditoria_particoes():
+    """Partições mensais da auditoria (online/arquivadas) e tamanho em disco"""
     if not current_user.is_master:
-        contexto = log.get('contexto', {})
-        if current_user.is_admin_regional:
-            if contexto.get('regional_id') != current_user.contexto_id:
-                return jsonify({"error": "Sem permissão para este log"}), 403
-        elif current_user.is_encarregado_sub:
-            if contexto.get('sub_regional_id') != current_user.contexto_id:
-                return jsonify({"error": "Sem permissão para este log"}), 403
-    
-    return jsonify(log)
+        return jsonify({"error": "Acesso negado"}), 403
+    return jsonify(_audit_repo().particoes())
 
-@app.get("/api/auditoria/estatisticas")
-@login_required
-def api_get_estatisticas_auditoria():
-    """Retorna estatísticas de uso do sistema"""
-    if not (current_user.is_master or current_user.is_admin_regional or current_user.is_encarregado_sub):
-        return jsonify({"error": "Sem permissão"}), 403
-    
-    db = load_db()
-    logs = db.get('logs_auditoria', [])
-    
-    # Filtrar por escopo
-    logs_filtrados = []
-    for log in logs:
-        if current_user.is_master:
-            logs_filtrados.append(log)
-        elif current_user.is_admin_regional:
-            contexto = log.get('contexto', {})
-            if contexto.get('regional_id') == current_user.contexto_id:
-                logs_filtrados.append(log)
-        elif current_user.is_encarregado_sub:
-            contexto = log.get('contexto', {})
-            if contexto.get('sub_regional_id') == current_user.contexto_id:
-                logs_filtrados.append(log)
-    
-    # Calcular estatísticas
-    agora = datetime.utcnow()
-    ultimos_7_dias = (agora - timedelta(days=7)).isoformat()
-    ultimas_24h = (agora - timedelta(hours=24)).isoformat()
-    
-    stats = {
-        "total_logs": len(logs_filtrados),
-        "logins_ultimos_7_dias": len([l for l in logs_filtrados if l.get('tipo') == 'login' and l.get('timestamp', '') >= ultimos_7_dias]),
-        "logins_falhos_ultimos_7_dias": len([l for l in logs_filtrados if l.get('acao') == 'login_falha' and l.get('timestamp', '') >= ultimos_7_dias]),
-        "alteracoes_ultimas_24h": len([l for l in logs_filtrados if l.get('tipo') in ['create', 'update', 'delete'] and l.get('timestamp', '') >= ultimas_24h]),
-        "por_categoria": {},
-        "por_tipo": {},
-        "usuarios_ativos": set()
-    }
-    
-    # Contar por categoria e tipo
-    for log in logs_filtrados:
-        cat = log.get('categoria', 'outros')
-        tipo = log.get('tipo', 'outros')
-        stats["por_categoria"][cat] = stats["por_categoria"].get(cat, 0) + 1
-        stats["por_tipo"][tipo] = stats["por_tipo"].get(tipo, 0) + 1
-        
-        if log.get('tipo') == 'login' and log.get('status') == 'sucesso':
-            stats["usuarios_ativos"].add(log.get('usuario_id'))
-    
-    stats["usuarios_ativos"] = len(stats["usuarios_ativos"])
-    
-    return jsonify(stats)
 
-@app.get("/api/auditoria/export/csv")
-@login_required
-def api_export_csv_auditoria():
-    """Exporta logs de auditoria em CSV"""
-    if not (current_user.is_master or current_user.is_admin_regional or current_user.is_encarregado_sub):
-        return jsonify({"error": "Sem permissão"}), 403
-    
-    import csv
-    from io import StringIO
-    
-    db = load_db()
-    logs = db.get('logs_auditoria', [])
-    
-    # Filtrar por escopo (mesma lógica do endpoint principal)
-    logs_filtrados = []
-    for log in logs:
-        if current_user.is_master:
-            logs_filtrados.append(log)
-        elif current_user.is_admin_regional:
-            contexto = log.get('contexto', {})
-            if contexto.get('regional_id') == current_user.contexto_id:
-                logs_filtrados.append(log)
-        elif current_user.is_encarregado_sub:
-            contexto = log.get('contexto', {})
-            if contexto.get('sub_regional_id') == current_user.contexto_id:
-                logs_filtrados.append(log)
-    
-    # Ordenar
-    logs_filtrados.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    
-    # Criar CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Cabeçalho
-    writer.writerow([
-        'Data/Hora', 'Usuário', 'Tipo Usuário', 'Tipo', 'Categoria', 
-        'Ação', 'Descrição', 'Status', 'IP', 'Regional', 'Sub-Regional', 'Comum'
-    ])
-    
-    # Dados
-    for log in logs_filtrados:
-        contexto = log.get('contexto', {})
-        writer.writerow([
-            log.get('timestamp', ''),
-            log.get('usuario_nome', ''),
-            log.get('usuario_tipo', ''),
-            log.get('tipo', ''),
-            log.get('categoria', ''),
-            log.get('acao', ''),
-            log.get('descricao', ''),
-            log.get('status', ''),
-            log.get('ip', ''),
-            contexto.get('regional_id', ''),
-            contexto.get('sub_regional_id', ''),
-            contexto.get('comum_id', '')
-        ])
-    
-    # Preparar resposta
-    output.seek(0)
-    response = make_response(output.getvalue())
+def _resposta_csv(partes, nome_arquivo):
+    """Resposta em streaming (chunked): o primeiro bloco sai antes de ler todos os logs"""
+    response = Response(stream_with_context(partes), mimetype='text/csv')
     response.headers['Content-Type'] = 'text/csv; charset=utf-8'
-    response.headers['Content-Disposition'] = f'attachment; filename=auditoria_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    
+    response.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo}'
+    # nginx não deve acumular a resposta antes de repassar
+    response.headers['X-Accel-Buffering'] = 'no'
     return response
 
+@app.get("/api/auditoria/export/csv")
+@login_required
+def api_auditoria_export_csv():
+    if not _has_audit_access(current_user):
+        return jsonify({"error": "Acesso negado"}), 403
+    partes = _audit_repo().iter_csv(_filtros_auditoria(request.args), _audit_scope(current_user))
+    return _resposta_csv(partes, f"auditoria_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv")
+
 @app.get("/organistas")
 @login_required
 def list_organistas():
-    """Lista organistas usando PostgreSQL"""
+    """
+    Lista organistas usando PostgreSQL.
+    ETag pelo carimbo da lista da comum; ?since=<versão> devolve {organistas, removidos} só com as alteradas.
+    """
     # POSTGRESQL: Usar repository
     repo = get_repository('organista')
     comum_id = current_user.contexto_id
+    versao = repo.versao_comum(comum_id) if comum_id else None
+    if versao and 'since' not in request.args:
+        response = _nao_modificado(etag_versao('organistas', comum_id, versao))
+        if response:
+            return response
     
     if current_user.is_master:
         # Master vê todos os organistas de todas as regionais
@@ -1301,7 +1407,7 @@ def list_organistas():
     for org in organistas:
         org_dict = {k: v for k, v in org.items() if k not in ['password_hash', 'created_at', 'updated_at']}
         result.append(org_dict)
-    return jsonify(result)
+    return _resposta_sincronizada('organistas', comum_id, versao, result, lambda o: o.get('id'), 'organistas', result)
 
 @app.post("/organistas")
 @login_required
@@ -1403,6 +1509,7 @@ def update_organista(org_id):
         updated = repo.update(org_id, data)
         if not updated:
             return jsonify({"error": "Erro ao atualizar organista"}), 500
+        invalidar_identidade_apos_commit(org_id)
         
         # Log
         audit_repo = get_repository('audit')
@@ -1440,6 +1547,7 @@ def delete_organista(org_id):
         success = repo.delete(org_id)
         if not success:
             return jsonify({"error": "Erro ao deletar organista"}), 500
+        invalidar_identidade_apos_commit(org_id)
         
         # Log
         audit_repo = get_repository('audit')
@@ -1605,34 +1713,30 @@ def admin_all_indisp():
     if not comum_id:
         return jsonify({"error": "Contexto não encontrado"}), 404
     
-    # Buscar todas indisponibilidades da comum (precisamos iterar pelos meses)
-    # Por enquanto, vamos buscar todos os organistas e suas indisponibilidades
-    organista_repo = get_repository('organista')
+    # Uma única consulta para a comum inteira (opcionalmente limitada por meses)
     indisp_repo = get_repository('indisponibilidade')
-    
-    organistas = organista_repo.get_by_comum(comum_id)
+    agrupado = indisp_repo.get_by_comum_agrupado(
+        comum_id,
+        mes_inicio=request.args.get('mes_inicio'),
+        mes_fim=request.args.get('mes_fim')
+    )
     
     result = {}
-    for org in organistas:
-        org_id = org['id']
-        indisps = indisp_repo.get_by_organista(org_id)
-        
+    for org_id, org in agrupado.items():
         # Converter mes → data para compatibilidade
-        indisps_convertidas = []
-        for indisp in indisps:
-            indisps_convertidas.append({
-                'id': org_id,
-                'data': indisp.get('mes') + '-01',
-                'autor': current_user.id,
-                'status': 'confirmada',
-                'motivo': indisp.get('motivo')
-            })
-        
-        if indisps_convertidas:  # Só adicionar se tiver indisponibilidades
-            result[org_id] = {
-                "nome": org.get('nome'),
-                "indisponibilidades": indisps_convertidas
-            }
+        result[org_id] = {
+            "nome": org['nome'],
+            "indisponibilidades": [
+                {
+                    'id': org_id,
+                    'data': indisp.get('mes') + '-01',
+                    'autor': current_user.id,
+                    'status': 'confirmada',
+                    'motivo': indisp.get('motivo')
+                }
+                for indisp in org['indisponibilidades']
+            ]
+        }
     
     return jsonify(result)
 
@@ -1697,21 +1801,26 @@ def update_config():
     comum_data["config"].update(payload)
     
     print(f"  ✅ Config atualizada: {comum_data['config']}")
-    
-    db["logs"].append({
+
+    registrar_log_comum(comum_data, {
         "quando": datetime.utcnow().isoformat(),
         "acao": "update_config",
         "por": current_user.id,
         "payload": payload
     })
-    save_db(db)
+    save_comum(comum_result['comum_id'], comum_data, db)
     
     return jsonify({"ok": True, "config": comum_data["config"]})
 
-def gerar_escala_automatica(db):
+def gerar_escala_automatica(db, motor='bitset', com_logs=True, prazo_segundos=2.0):
     """
     Algoritmo de geração de escala bimestral
     Retorna lista de alocações com log de decisões
+    
+    motor='bitset' usa escala_engine (mesma saída, sem reordenar candidatos a cada dia);
+    motor='legado' mantém o laço original dia a dia; motor='otimo' distribui todas
+    as vagas minimizando a variância por organista (fluxo de custo mínimo), com
+    prazo_segundos e o resultado guloso como fallback. com_logs=False dispensa o log.
     """
     config = db["config"]
     inicio = datetime.fromisoformat(config["bimestre"]["inicio"])
@@ -1719,6 +1828,17 @@ def gerar_escala_automatica(db):
     organistas = db["organistas"]
     indisponibilidades = {(i["id"], i["data"]) for i in db["indisponibilidades"]}
     
+    if motor == 'otimo':
+        return gerar_escala_otima(MotorEscala(organistas, indisponibilidades), inicio, fim,
+                                  prazo_segundos=prazo_segundos, com_logs=com_logs)
+    if motor == 'bitset':
+        motor_escala = MotorEscala(organistas, indisponibilidades)
+        # IDs repetidos compartilham contador no algoritmo original: só o legado reproduz
+        if motor_escala.ids_unicos:
+            return motor_escala.gerar(inicio, fim, com_logs=com_logs)
+    elif motor != 'legado':
+        raise ValueError(f"Motor de escala desconhecido: {motor}")
+    
     escala = []
     logs_decisao = []
     
@@ -1913,6 +2033,209 @@ def validar_regras_especiais(organista, data, tipo):
 #     except Exception as e:
 #         return jsonify({"error": str(e)}), 500
 
+# ========== JOBS EM SEGUNDO PLANO ==========
+# Exportações e geração em lote rodam no pool da fila de jobs (jobs.py),
+# não nas threads de requisição do gunicorn. O cliente recebe o id e consulta o status.
+
+def _escopo_do_usuario(user):
+    """Escopo serializável do usuário (os jobs rodam fora da requisição, sem current_user)"""
+    return {
+        'id': user.id,
+        'is_master': user.is_master,
+        'is_admin_regional': user.is_admin_regional,
+        'is_encarregado_sub': user.is_encarregado_sub,
+        'contexto_id': user.contexto_id,
+    }
+
+def _job_csv_auditoria(params):
+    escopo = _audit_scope(SimpleNamespace(**params['escopo']))
+    # Blocos do iter_csv vão direto para o arquivo do job (memória constante)
+    return (_audit_repo().iter_csv(params.get('filtros', {}), escopo), 'text/csv; charset=utf-8',
+            f"auditoria_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv")
+
+def _job_pdf(layout, campo):
+    def executar(params):
+        db = load_db()
+        comum_result = find_comum_by_id(db, params['comum_id'])
+        if not comum_result:
+            raise ValueError("Comum não encontrada")
+        comum_data = comum_result['comum']
+        itens = comum_data.get(campo, [])
+        if not itens:
+            raise ValueError("Nenhuma escala para exportar")
+        comum_id = comum_result['comum_id']
+        pdf = _pdf_cache.obter(comum_id, _versao_pdf(db, comum_id), layout, itens, comum_data.get('nome', 'Comum'))
+        return pdf, 'application/pdf', f"{layout}_{comum_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
+    return executar
+
+def _job_escala_lote(params):
+    db = load_db()
+    indice = _indice_hierarquia(db)
+    if params.get('sub_regional_id'):
+        caminhos = indice.por_sub_regional.get(params['sub_regional_id'], [])
+    else:
+        caminhos = indice.por_regional.get(params.get('regional_id'), [])
+    comuns = {}
+    for caminho in caminhos:
+        resolvido = resolver_caminho(db, caminho)
+        if resolvido:
+            comuns[caminho[2]] = resolvido[2]
+    linhas = (json.dumps(evento, ensure_ascii=False) + "\n"
+              for evento in gerar_lote(comuns, params.get('inicio'), params.get('fim'),
+                                       com_logs=params.get('logs', True),
+                                       motor=params.get('motor') or 'bitset'))
+    return linhas, 'application/x-ndjson', "escala_lote.ndjson"
+
+_jobs = FilaDeJobs(base_dir=os.environ.get('JOBS_DIR', 'data/jobs'),
+                   max_workers=int(os.environ.get('JOBS_WORKERS', '2')))
+_jobs.registrar('auditoria_csv', _job_csv_auditoria)
+_jobs.registrar('escala_pdf', _job_pdf('escala', 'escala'))
+_jobs.registrar('rjm_pdf', _job_pdf('rjm', 'escala_rjm'))
+_jobs.registrar('escala_lote', _job_escala_lote)
+
+def _job_publico(job):
+    return {
+        "id": job["id"],
+        "tipo": job["tipo"],
+        "status": job["status"],
+        "criado_em": job["criado_em"],
+        "concluido_em": job.get("concluido_em"),
+        "erro": job.get("erro"),
+        "tamanho": job.get("tamanho"),
+        "status_url": url_for('api_status_job', job_id=job["id"]),
+        "download_url": url_for('api_download_job', job_id=job["id"]) if job["status"] == "concluido" else None,
+    }
+
+@app.post("/api/jobs")
+@login_required
+def api_criar_job():
+    """
+    Enfileira um job. Payload: {"tipo": "auditoria_csv" | "escala_pdf" | "rjm_pdf" | "escala_lote", "params": {...}}
+    Retorna 202 com o id e as URLs de status/download.
+    """
+    payload = request.get_json() or {}
+    tipo = payload.get("tipo")
+    params = payload.get("params") or {}
+    db = load_db()
+    
+    if tipo == 'auditoria_csv':
+        if not _has_audit_access(current_user):
+            return jsonify({"error": "Acesso negado"}), 403
+        params = {'escopo': _escopo_do_usuario(current_user), 'filtros': _filtros_auditoria(params)}
+    elif tipo in ('escala_pdf', 'rjm_pdf'):
+        comum_result = get_comum_for_user(db, current_user)
+        if not comum_result:
+            return jsonify({"error": "Comum não encontrada."}), 404
+        params = {'comum_id': comum_result['comum_id']}
+    elif tipo == 'escala_lote':
+        if not (current_user.is_master or current_user.is_admin_regional or current_user.is_encarregado_sub):
+            return jsonify({"error": "Sem permissão"}), 403
+        if not params.get('sub_regional_id') and not params.get('regional_id'):
+            if current_user.is_encarregado_sub:
+                params['sub_regional_id'] = current_user.contexto_id
+            elif current_user.is_admin_regional:
+                params['regional_id'] = current_user.contexto_id
+            else:
+                return jsonify({"error": "Informe sub_regional_id ou regional_id"}), 400
+        indice = _indice_hierarquia(db)
+        caminhos = (indice.por_sub_regional.get(params['sub_regional_id'], []) if params.get('sub_regional_id')
+                    else indice.por_regional.get(params['regional_id'], []))
+        if not all(is_comum_in_scope_for_user(db, caminho[2], current_user) for caminho in caminhos):
+            return jsonify({"error": "Escopo fora da sua permissão"}), 403
+        if (params.get('motor') or 'bitset') not in MOTORES_LOTE:
+            return jsonify({"error": f"Motor inválido (use {', '.join(MOTORES_LOTE)})"}), 400
+    else:
+        return jsonify({"error": "Tipo de job inválido"}), 400
+    
+    job = _jobs.enfileirar(tipo, params, criado_por=current_user.id)
+    return jsonify(_job_publico(job)), 202
+
+@app.get("/api/jobs")
+@login_required
+def api_listar_jobs():
+    """Jobs recentes do usuário"""
+    return jsonify({"jobs": _jobs.listar(current_user.id)})
+
+def _job_do_usuario(job_id):
+    job = _jobs.obter(job_id)
+    if not job or (job["criado_por"] != current_user.id and not current_user.is_master):
+        return None
+    return job
+
+@app.get("/api/jobs/<job_id>")
+@login_required
+def api_status_job(job_id):
+    job = _job_do_usuario(job_id)
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify(_job_publico(job))
+
+@app.get("/api/jobs/<job_id>/download")
+@login_required
+def api_download_job(job_id):
+    job = _job_do_usuario(job_id)
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+    if job["status"] != "concluido":
+        return jsonify({"error": "Job ainda não concluído", "status": job["status"]}), 409
+    if not job.get("arquivo") or not os.path.exists(job["arquivo"]):
+        return jsonify({"error": "Resultado expirado"}), 410
+    return send_file(job["arquivo"], mimetype=job["mimetype"], as_attachment=True,
+                     download_name=job["nome_arquivo"])
+
+@app.post("/escala/gerar-lote")
+@login_required
+def gerar_escala_lote():
+    """
+    Gera (preview, não salva) a escala de todas as comuns de uma sub-regional ou regional.
+    Resposta em NDJSON: uma linha por comum conforme cada uma termina, e um resumo no fim.
+    Payload: {"sub_regional_id" | "regional_id", "inicio"?, "fim"?, "logs"?: true,
+              "motor"?: "bitset" (guloso) | "otimo" (fluxo de custo mínimo)}
+    """
+    if not (current_user.is_master or current_user.is_admin_regional or current_user.is_encarregado_sub):
+        return jsonify({"error": "Sem permissão"}), 403
+    
+    payload = request.get_json() or {}
+    motor = payload.get("motor") or 'bitset'
+    if motor not in MOTORES_LOTE:
+        return jsonify({"error": f"Motor inválido (use {', '.join(MOTORES_LOTE)})"}), 400
+    sub_regional_id = payload.get("sub_regional_id")
+    regional_id = payload.get("regional_id")
+    if not sub_regional_id and not regional_id:
+        # Sem escopo explícito: o do próprio usuário
+        if current_user.is_encarregado_sub:
+            sub_regional_id = current_user.contexto_id
+        elif current_user.is_admin_regional:
+            regional_id = current_user.contexto_id
+        else:
+            return jsonify({"error": "Informe sub_regional_id ou regional_id"}), 400
+    
+    db = load_db()
+    indice = _indice_hierarquia(db)
+    if sub_regional_id:
+        caminhos = indice.por_sub_regional.get(sub_regional_id, [])
+    else:
+        caminhos = indice.por_regional.get(regional_id, [])
+    if not caminhos:
+        return jsonify({"error": "Nenhuma comum encontrada no escopo"}), 404
+    if not all(is_comum_in_scope_for_user(db, caminho[2], current_user) for caminho in caminhos):
+        return jsonify({"error": "Escopo fora da sua permissão"}), 403
+    
+    comuns = {}
+    for caminho in caminhos:
+        resolvido = resolver_caminho(db, caminho)
+        if resolvido:
+            comuns[caminho[2]] = resolvido[2]
+    
+    def gerar():
+        for evento in gerar_lote(comuns, payload.get("inicio"), payload.get("fim"),
+                                 com_logs=payload.get("logs", True), motor=motor):
+            if evento["tipo"] == "resumo":
+                print(f"⚙️ [LOTE] {evento['comuns']} comuns em {evento['segundos']}s ({evento['comuns_por_segundo']} comuns/s)")
+            yield json.dumps(evento, ensure_ascii=False) + "\n"
+    
+    return Response(stream_with_context(gerar()), mimetype='application/x-ndjson')
+
 @app.post("/escala/publicar")
 @login_required
 @require_edit_permission
@@ -1947,16 +2270,19 @@ def publicar_escala():
         comum_data["escala_publicada_em"] = datetime.utcnow().isoformat()
         comum_data["escala_publicada_por"] = current_user.id
         
-        # Atualizar no banco
-        db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-        
-        db.setdefault("logs", []).append({
+        registrar_log_comum(comum_data, {
             "quando": datetime.utcnow().isoformat(),
             "acao": "publicar_escala",
             "por": current_user.id,
             "comum_id": comum_id,
             "payload": {"total_dias": len(escala)}
         })
+        # Grava apenas a partição desta comum
+        versao = save_comum(comum_id, comum_data, db)
+        notificar_comum(comum_id, versao, 'escala', 'publicar_escala')
+        # O PDF da nova versão já fica pronto para os downloads
+        _pdf_cache.pre_renderizar(comum_id, versao, 'escala',
+                                  escala, comum_data.get('nome', 'Comum'))
     else:
         # ESTRUTURA ANTIGA
         db["escala"] = escala
@@ -1969,15 +2295,123 @@ def publicar_escala():
             "por": current_user.id,
             "payload": {"total_dias": len(escala)}
         })
-    
-    save_db(db)
+        save_db(db)
     
     return jsonify({"ok": True, "message": "Escala publicada com sucesso!"})
 
+# ========== SINCRONIZAÇÃO (ETag por versão da comum e ?since=<versão>; ver sincronizacao.py) ==========
+
+_historico_sync = HistoricoVersoes()
+
+def _comum_id_sem_carregar():
+    """Comum do usuário quando dá para saber sem montar o documento (None = depende do load_db)"""
+    if current_user.is_organista or current_user.is_encarregado_comum:
+        return current_user.contexto_id
+    if current_user.is_master:
+        return session.get('comum_id')
+    return None
+
+def _nao_modificado(etag):
+    # Comparação fraca: respostas comprimidas levam o ETag como W/"..."
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _atalho_304(recurso, variante=''):
+    """304 antes do load_db quando a comum e a versão já são conhecidas e o cliente está atualizado"""
+    comum_id = _comum_id_sem_carregar()
+    if not comum_id or 'since' in request.args or not request.if_none_match:
+        return None
+    versao = _store.versao_comum(comum_id)
+    if not versao:
+        return None
+    return _nao_modificado(etag_versao(recurso, comum_id, versao, variante))
+
+def _resposta_sincronizada(recurso, comum_id, versao, itens, chave, campo, corpo, variante='', extras=None):
+    """
+    Sem ?since: `corpo` completo com ETag (304 se o cliente já tem a versão).
+    Com ?since: {campo: itens alterados, removidos: [chaves], delta, versao, **extras}.
+    """
+    if versao is None:
+        # Estrutura antiga: sem versão por comum
+        return jsonify(corpo)
+    versao = str(versao)
+    escopo = (recurso, comum_id, variante)
+    desde = request.args.get('since')
+    if desde is None:
+        etag = etag_versao(recurso, comum_id, versao, variante)
+        response = _nao_modificado(etag)
+        if response:
+            return response
+        _historico_sync.registrar(escopo, versao, itens, chave)
+        response = jsonify(corpo)
+        response.set_etag(etag)
+    else:
+        if desde == versao:
+            delta = (set(), [])
+        else:
+            _historico_sync.registrar(escopo, versao, itens, chave)
+            delta = _historico_sync.delta(escopo, desde, versao)
+        if delta is None:
+            parcial = {campo: itens, "removidos": [], "delta": False}
+        else:
+            alteradas, removidas = delta
+            parcial = {campo: [item for item in itens if str(chave(item)) in alteradas],
+                       "removidos": removidas, "delta": True}
+        parcial.update(extras or {})
+        parcial["versao"] = versao
+        response = jsonify(parcial)
+    response.headers['X-Versao'] = versao
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.get("/eventos")
+@login_required
+def stream_eventos():
+    """
+    Server-Sent Events da comum do usuário: escala, RJM e trocas gravadas por outros.
+    Ao receber um evento o cliente rebusca só o recurso afetado (ETag / ?since).
+    """
+    comum_id = _comum_id_sem_carregar()
+    if not comum_id:
+        db = load_db()
+        comum_result = get_comum_for_user(db, current_user) if 'regionais' in db else None
+        if not comum_result:
+            return jsonify({"error": "Comum não encontrada"}), 404
+        comum_id = comum_result['comum_id']
+    
+    canal = _canal_eventos()
+    fila = canal.assinar(comum_id)
+    if fila is None:
+        # Sem thread livre para mais um stream: o cliente continua com as buscas normais
+        response = jsonify({"error": "Limite de conexões de eventos atingido"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    
+    partes = canal.stream(comum_id, fila,
+                          versao_atual=_store.versao_comum(comum_id),
+                          ultimo_id=request.headers.get('Last-Event-ID'),
+                          duracao_maxima=float(os.environ.get('SSE_DURACAO_MAXIMA', '300')))
+    response = Response(stream_with_context(partes), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx: entrega cada evento na hora, sem bufferizar
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.get("/escala/atual")
 @login_required
 def obter_escala():
-    """Retorna a escala atual publicada - com suporte para estrutura antiga e nova"""
+    """
+    Retorna a escala atual publicada - com suporte para estrutura antiga e nova.
+    ETag pela versão da comum; ?since=<versão> devolve só os dias alterados.
+    """
+    atalho = _atalho_304('escala')
+    if atalho:
+        return atalho
     db = load_db()
     
     # NOVA ESTRUTURA
@@ -1990,27 +2424,34 @@ def obter_escala():
         organistas = comum_data['comum'].get('organistas', [])
         publicada_em = comum_data['comum'].get('escala_publicada_em')
         publicada_por = comum_data['comum'].get('escala_publicada_por')
+        comum_id = comum_data['comum_id']
+        versao = db.versoes_comuns.get(comum_id) if hasattr(db, 'versoes_comuns') else None
     else:
         # ESTRUTURA ANTIGA
         escala = db.get("escala", [])
         organistas = db.get("organistas", [])
         publicada_em = db.get("escala_publicada_em")
         publicada_por = db.get("escala_publicada_por")
+        comum_id, versao = None, None
     
     if not escala:
-        return jsonify({
-            "escala": [],
-            "estatisticas": {}
-        })
+        corpo = {"escala": [], "estatisticas": {}}
+        return _resposta_sincronizada('escala', comum_id, versao, [], _chave_dia, 'escala', corpo,
+                                      extras={"estatisticas": {}})
     
-    stats = calcular_estatisticas(escala, organistas)
+    stats = estatisticas.estatisticas_comum(comum_id, versao, escala, organistas)
     
-    return jsonify({
+    corpo = {
         "escala": escala,
         "publicada_em": publicada_em,
         "publicada_por": publicada_por,
         "estatisticas": stats["por_organista"]
-    })
+    }
+    extras = {k: v for k, v in corpo.items() if k != "escala"}
+    return _resposta_sincronizada('escala', comum_id, versao, escala, _chave_dia, 'escala', corpo, extras=extras)
+
+def _chave_dia(dia):
+    return dia.get('data')
 
 @app.delete("/escala/delete")
 @require_edit_permission
@@ -2041,10 +2482,8 @@ def deletar_escala():
             comum_data['comum']['escala_publicada_em'] = None
             comum_data['comum']['escala_publicada_por'] = None
             
-            # Navegar até o local correto e salvar
-            regional = db['regionais'][comum_data['regional_id']]
-            sub_regional = regional['sub_regionais'][comum_data['sub_regional_id']]
-            sub_regional['comuns'][comum_data['comum_id']] = comum_data['comum']
+            # Grava apenas a partição desta comum
+            save_comum(comum_data['comum_id'], comum_data['comum'], db)
             
         else:
             # ESTRUTURA ANTIGA
@@ -2054,14 +2493,15 @@ def deletar_escala():
             db['escala'] = []
             db['escala_publicada_em'] = None
             db['escala_publicada_por'] = None
-        
-        save_db(db)
+            save_db(db)
         
         return jsonify({
             "success": True,
             "message": "Escala deletada com sucesso"
         })
         
+    except ConflitoVersao:
+        raise
     except Exception as e:
         print(f"❌ Erro ao deletar escala: {e}")
         import traceback
@@ -2101,24 +2541,24 @@ def editar_dia_escala(data_iso):
             return jsonify({"error": "Data não encontrada na escala."}), 404
         
         # Atualizar alocações
-        if "meia_hora" in alocacao:
-            dia["meia_hora"] = alocacao["meia_hora"]
-        if "culto" in alocacao:
-            dia["culto"] = alocacao["culto"]
-        if "unica" in alocacao:
-            dia["unica"] = alocacao["unica"]
+        alteracoes = []
+        for campo in ("meia_hora", "culto", "unica"):
+            if campo in alocacao:
+                alteracoes.append((campo, dia.get(campo), alocacao[campo]))
+                dia[campo] = alocacao[campo]
         
         # Salvar de volta
         comum_data["escala"] = escala
-        db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-        
-        db.setdefault("logs", []).append({
+        registrar_log_comum(comum_data, {
             "quando": datetime.utcnow().isoformat(),
             "acao": "editar_escala",
             "por": current_user.id,
             "comum_id": comum_id,
             "payload": {"data": data_iso, "alteracoes": payload}
         })
+        versao = save_comum(comum_id, comum_data, db)
+        atualizar_estatisticas_comum(comum_id, versao, alteracoes)
+        notificar_comum(comum_id, versao, 'escala', 'editar_escala', datas=[data_iso])
     else:
         # ESTRUTURA ANTIGA
         # Encontrar o dia na escala
@@ -2140,63 +2580,90 @@ def editar_dia_escala(data_iso):
             "por": current_user.id,
             "payload": {"data": data_iso, "alteracoes": payload}
         })
-    
-    save_db(db)
+        save_db(db)
     
     return jsonify({"ok": True, "dia": dia})
 
-def calcular_estatisticas(escala, organistas):
-    """Calcula estatísticas da escala"""
-    # Normalizar nomes de dias para português para contagem
-    def dia_normalizado(d):
-        m = {
-            'Sunday': 'Domingo', 'Monday': 'Segunda', 'Tuesday': 'Terça', 'Wednesday': 'Quarta',
-            'Thursday': 'Quinta', 'Friday': 'Sexta', 'Saturday': 'Sábado',
-            'Domingo': 'Domingo', 'Segunda': 'Segunda', 'Terça': 'Terça', 'Quarta': 'Quarta',
-            'Quinta': 'Quinta', 'Sexta': 'Sexta', 'Sábado': 'Sábado'
-        }
-        return m.get(d, d)
-
-    stats = {
-        "total_dias": len(escala),
-        "domingos": sum(1 for d in escala if dia_normalizado(d.get("dia_semana")) == "Domingo"),
-        "tercas": sum(1 for d in escala if dia_normalizado(d.get("dia_semana")) == "Terça"),
-        "por_organista": {}
-    }
+@app.post("/escala/reprogramar")
+@login_required
+@require_edit_permission
+def reprogramar_escala():
+    """
+    Recalcula só as vagas afetadas por uma nova indisponibilidade e devolve o diff.
+    Payload: {"organista_id", "data", "aplicar": false}. Com aplicar=true o diff é salvo.
+    """
+    if not current_user.is_admin:
+        return jsonify({"error": "Apenas administrador pode editar escala."}), 403
     
-    # Contar por organista
-    for org in organistas:
-        org_id = org["id"]
-        stats["por_organista"][org_id] = {
-            "nome": org["nome"],
-            "meia_hora": 0,
-            "culto": 0,
-            "terca": 0,
-            "total": 0
-        }
+    payload = request.get_json() or {}
+    organista_id = payload.get("organista_id")
+    data_iso = payload.get("data")
+    if not organista_id or not data_iso:
+        return jsonify({"error": "organista_id e data são obrigatórios."}), 400
     
-    for dia in escala:
-        dia_semana_pt = dia_normalizado(dia.get("dia_semana"))
-        if dia_semana_pt == "Domingo":
-            if dia.get("meia_hora") and dia["meia_hora"] in stats["por_organista"]:
-                stats["por_organista"][dia["meia_hora"]]["meia_hora"] += 1
-                stats["por_organista"][dia["meia_hora"]]["total"] += 1
-            
-            if dia.get("culto") and dia["culto"] in stats["por_organista"]:
-                stats["por_organista"][dia["culto"]]["culto"] += 1
-                stats["por_organista"][dia["culto"]]["total"] += 1
-        
-        elif dia_semana_pt == "Terça":
-            if dia.get("unica") and dia["unica"] in stats["por_organista"]:
-                stats["por_organista"][dia["unica"]]["terca"] += 1
-                stats["por_organista"][dia["unica"]]["total"] += 1
+    db = load_db()
+    comum_result = get_comum_for_user(db, current_user)
+    if not comum_result:
+        return jsonify({"error": "Comum não encontrada."}), 404
+    if not can_manage_comum(db, comum_result['comum_id'], current_user):
+        return jsonify({"error": "Sem permissão para esta comum"}), 403
+    
+    comum_data = comum_result['comum']
+    comum_id = comum_result['comum_id']
+    escala = comum_data.get("escala", [])
+    indisponibilidades = [(i["id"], i["data"]) for i in comum_data.get("indisponibilidades", [])]
+    
+    reprogramador = ReprogramadorEscala(escala, comum_data.get("organistas", []), indisponibilidades)
+    diff = reprogramador.indisponibilidade(organista_id, data_iso)
+    
+    if payload.get("aplicar") and diff:
+        aplicar_diff(escala, diff)
+        comum_data["escala"] = escala
+        registrar_log_comum(comum_data, {
+            "quando": datetime.utcnow().isoformat(),
+            "acao": "reprogramar_escala",
+            "por": current_user.id,
+            "comum_id": comum_id,
+            "payload": {"organista_id": organista_id, "data": data_iso, "diff": diff}
+        })
+        versao = save_comum(comum_id, comum_data, db)
+        atualizar_estatisticas_comum(comum_id, versao, [(m["campo"], m["antes"], m["depois"]) for m in diff])
+        notificar_comum(comum_id, versao, 'escala', 'reprogramar_escala', datas=sorted({m["data"] for m in diff if m.get("data")}))
     
-    return stats
+    return jsonify({"ok": True, "diff": diff, "aplicado": bool(payload.get("aplicar") and diff)})
+
+def calcular_estatisticas(escala, organistas):
+    """Calcula estatísticas da escala (uma passada, nomes e ids resolvidos; ver estatisticas.py)"""
+    return estatisticas.calcular(escala, organistas)
+
+def _versao_pdf(db, comum_id):
+    """Versão que identifica o PDF: a da partição da comum (ou a do documento, na estrutura antiga)"""
+    if comum_id is None:
+        return "legado-" + "-".join(str(v) for v in (getattr(db, 'versao', None) or (0,)))
+    return db.versoes_comuns.get(comum_id, 0) if hasattr(db, 'versoes_comuns') else _store.versao_comum(comum_id)
+
+def _responder_pdf(comum_id, versao, layout, itens, comum_nome, nome_arquivo):
+    """Serve o PDF do cache com ETag/304 e Content-Length"""
+    etag = CachePDF.etag(comum_id or 'legado', versao, layout)
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    pdf = _pdf_cache.obter(comum_id or 'legado', versao, layout, itens, comum_nome)
+    response = make_response(pdf)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo}'
+    response.headers['Content-Length'] = str(len(pdf))
+    # Sempre revalida (o conteúdo depende do login), mas sem baixar de novo se não mudou
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    return response
 
 @app.get("/escala/pdf")
 @login_required
 def exportar_escala_pdf():
-    """Exporta a escala em formato PDF"""
+    """Exporta a escala em formato PDF (renderizado uma vez por versão da escala)"""
     try:
         db = load_db()
         
@@ -2207,155 +2674,20 @@ def exportar_escala_pdf():
                 return jsonify({"erro": "Comum não encontrada"}), 404
             
             comum_data = comum_result['comum']
+            comum_id = comum_result['comum_id']
             comum_nome = comum_data.get('nome', 'Comum')
             escala = comum_data.get("escala", [])
         else:
             # ESTRUTURA ANTIGA
+            comum_id = None
             comum_nome = "Vila Paula"
             escala = db.get("escala", [])
         
         if not escala:
             return jsonify({"erro": "Nenhuma escala publicada"}), 404
         
-        # Criar PDF em memória
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
-                              rightMargin=1*cm, leftMargin=1*cm,
-                              topMargin=1*cm, bottomMargin=1*cm)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#667eea'),
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Meses em português
-        meses_pt = {
-            1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
-            5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
-            9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
-        }
-        
-        title = Paragraph(
-            f"Rodízio de Organistas - {comum_nome}",
-            title_style
-        )
-        elements.append(title)
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Agrupar por mês
-        escala_por_mes = {}
-        
-        dias_semana = {
-            'Sunday': 'Domingo',
-            'Tuesday': 'Terça',
-            'Monday': 'Segunda',
-            'Wednesday': 'Quarta',
-            'Thursday': 'Quinta',
-            'Friday': 'Sexta',
-            'Saturday': 'Sábado'
-        }
-        
-        for item in escala:
-            data = datetime.strptime(item["data"], '%Y-%m-%d')
-            mes_ano = f"{data.year}-{data.month:02d}"
-            
-            if mes_ano not in escala_por_mes:
-                escala_por_mes[mes_ano] = {
-                    'nome': f"{meses_pt[data.month]}/{data.year}",
-                    'itens': []
-                }
-            escala_por_mes[mes_ano]['itens'].append(item)
-        
-        # Renderizar cada mês
-        for mes_ano in sorted(escala_por_mes.keys()):
-            mes = escala_por_mes[mes_ano]
-            
-            # Título do mês
-            mes_style = ParagraphStyle(
-                'MesTitle',
-                parent=styles['Heading2'],
-                fontSize=14,
-                textColor=colors.HexColor('#667eea'),
-                spaceAfter=10,
-                fontName='Helvetica-Bold'
-            )
-            elements.append(Paragraph(mes['nome'], mes_style))
-            elements.append(Spacer(1, 0.3*cm))
-            
-            # Tabela do mês
-            data_table = [['Data', 'Dia', 'Meia-hora', 'Culto']]
-            
-            for item in mes['itens']:
-                data_obj = datetime.strptime(item["data"], '%Y-%m-%d')
-                data_br = data_obj.strftime('%d/%m')
-                dia = dias_semana.get(item["dia_semana"], item["dia_semana"])
-                
-                if item["dia_semana"] == "Sunday":
-                    # DOMINGO: Duas fases separadas (Meia-hora e Culto)
-                    meia_hora = item.get("meia_hora", "—")
-                    culto = item.get("culto", "—")
-                else:
-                    # TERÇA-FEIRA: Duas fases (podem ser pessoas diferentes)
-                    # Compatibilidade: tenta 'meia_hora'/'culto' primeiro, senão usa 'unica'
-                    meia_hora = item.get("meia_hora") or item.get("unica", "—")
-                    culto = item.get("culto") or item.get("unica", "—")
-                
-                data_table.append([data_br, dia, meia_hora, culto])
-            
-            # Estilo da tabela
-            table = Table(data_table, colWidths=[3*cm, 3.5*cm, 7*cm, 7*cm])
-            table.setStyle(TableStyle([
-                # Cabeçalho
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#808080')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('TOPPADDING', (0, 0), (-1, 0), 12),
-                
-                # Corpo
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (1, -1), 'CENTER'),
-                ('ALIGN', (2, 1), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('LEFTPADDING', (0, 1), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                
-                # Grades
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                
-                # Linhas alternadas
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
-            ]))
-            
-            elements.append(table)
-            elements.append(Spacer(1, 0.8*cm))
-        
-        # Gerar PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        # Retornar PDF
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=Rodizio_Organistas_{datetime.now().strftime("%Y%m%d")}.pdf'
-        
-        return response
+        return _responder_pdf(comum_id, _versao_pdf(db, comum_id), 'escala', escala, comum_nome,
+                              f'Rodizio_Organistas_{datetime.now().strftime("%Y%m%d")}.pdf')
         
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
@@ -2426,25 +2758,29 @@ def criar_escala_rjm_vazia():
         current_date += timedelta(days=1)
     
     # Salvar escala RJM
-    if 'regionais' in db:
-        comum_data["escala_rjm"] = escala_rjm
-        db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    else:
-        db["escala_rjm"] = escala_rjm
-    db["logs"].append({
+    log_entry = {
         "quando": datetime.utcnow().isoformat(),
         "acao": "criar_escala_rjm_vazia",
         "quem": current_user.id,
         "total_domingos": len(escala_rjm)
-    })
-    
-    save_db(db)
+    }
+    if 'regionais' in db:
+        comum_data["escala_rjm"] = escala_rjm
+        registrar_log_comum(comum_data, log_entry)
+        save_comum(comum_id, comum_data, db)
+    else:
+        db["escala_rjm"] = escala_rjm
+        db["logs"].append(log_entry)
+        save_db(db)
     return jsonify({"message": f"Escala RJM criada com {len(escala_rjm)} domingos.", "total": len(escala_rjm)}), 200
 
 @app.get("/rjm/atual")
 @login_required
 def get_escala_rjm():
-    """Retorna a escala RJM atual"""
+    """Retorna a escala RJM atual (ETag pela versão da comum; ?since=<versão> devolve só os domingos alterados)"""
+    atalho = _atalho_304('rjm')
+    if atalho:
+        return atalho
     db = load_db()
     
     # NOVA ESTRUTURA
@@ -2454,7 +2790,10 @@ def get_escala_rjm():
             return jsonify({"escala_rjm": []}), 200
         
         comum_data = comum_result['comum']
-        return jsonify({"escala_rjm": comum_data.get("escala_rjm", [])}), 200
+        comum_id = comum_result['comum_id']
+        escala_rjm = comum_data.get("escala_rjm", [])
+        return _resposta_sincronizada('rjm', comum_id, db.versoes_comuns.get(comum_id), escala_rjm, _chave_dia,
+                                      'escala_rjm', {"escala_rjm": escala_rjm})
     else:
         # ESTRUTURA ANTIGA
         return jsonify({"escala_rjm": db.get("escala_rjm", [])}), 200
@@ -2486,10 +2825,8 @@ def deletar_escala_rjm():
             # Deletar escala RJM
             comum_data['comum']['escala_rjm'] = []
             
-            # Navegar até o local correto e salvar
-            regional = db['regionais'][comum_data['regional_id']]
-            sub_regional = regional['sub_regionais'][comum_data['sub_regional_id']]
-            sub_regional['comuns'][comum_data['comum_id']] = comum_data['comum']
+            # Grava apenas a partição desta comum
+            save_comum(comum_data['comum_id'], comum_data['comum'], db)
             
         else:
             # ESTRUTURA ANTIGA
@@ -2497,14 +2834,15 @@ def deletar_escala_rjm():
                 return jsonify({"success": False, "error": "Não há escala RJM para deletar"}), 400
             
             db['escala_rjm'] = []
-        
-        save_db(db)
+            save_db(db)
         
         return jsonify({
             "success": True,
             "message": "Escala RJM deletada com sucesso"
         })
         
+    except ConflitoVersao:
+        raise
     except Exception as e:
         print(f"❌ Erro ao deletar escala RJM: {e}")
         import traceback
@@ -2555,15 +2893,17 @@ def atualizar_escala_rjm_multiplos():
         
         # Salvar de volta
         comum_data["escala_rjm"] = escala_rjm
-        db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-        
-        db.setdefault("logs", []).append({
+        registrar_log_comum(comum_data, {
             "quando": datetime.utcnow().isoformat(),
             "acao": "atualizar_escala_rjm_multiplos",
             "quem": current_user.id,
             "comum_id": comum_id,
             "total_alteracoes": contador_atualizados
         })
+        versao = save_comum(comum_id, comum_data, db)
+        notificar_comum(comum_id, versao, 'rjm', 'atualizar_escala_rjm_multiplos')
+        _pdf_cache.pre_renderizar(comum_id, versao, 'rjm',
+                                  escala_rjm, comum_data.get('nome', 'Comum'))
     else:
         # ESTRUTURA ANTIGA
         contador_atualizados = 0
@@ -2584,14 +2924,13 @@ def atualizar_escala_rjm_multiplos():
             "quem": current_user.id,
             "total_alteracoes": contador_atualizados
         })
-    
-    save_db(db)
+        save_db(db)
     return jsonify({"message": f"{contador_atualizados} itens atualizados com sucesso."}), 200
 
 @app.get("/rjm/pdf")
 @login_required
 def exportar_pdf_rjm():
-    """Exporta a escala RJM em PDF"""
+    """Exporta a escala RJM em PDF (renderizado uma vez por versão da escala)"""
     db = load_db()
     
     # NOVA ESTRUTURA
@@ -2601,102 +2940,20 @@ def exportar_pdf_rjm():
             return jsonify({"error": "Comum não encontrada."}), 404
         
         comum_data = comum_result['comum']
+        comum_id = comum_result['comum_id']
         comum_nome = comum_data.get('nome', 'Comum')
         escala_rjm = comum_data.get("escala_rjm", [])
     else:
         # ESTRUTURA ANTIGA
+        comum_id = None
         comum_nome = "Vila Paula"
         escala_rjm = db.get("escala_rjm", [])
     
     if not escala_rjm:
         return jsonify({"error": "Nenhuma escala RJM para exportar."}), 404
     
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    title = Paragraph("Escala RJM - Reunião de Jovens e Menores", title_style)
-    elements.append(title)
-    
-    subtitle = Paragraph(f"{comum_nome} - Domingos 10:00", styles['Normal'])
-    elements.append(subtitle)
-    elements.append(Spacer(1, 20))
-    
-    # Mapeamento de meses para português
-    meses_pt = {
-        1: 'JANEIRO', 2: 'FEVEREIRO', 3: 'MARÇO', 4: 'ABRIL',
-        5: 'MAIO', 6: 'JUNHO', 7: 'JULHO', 8: 'AGOSTO',
-        9: 'SETEMBRO', 10: 'OUTUBRO', 11: 'NOVEMBRO', 12: 'DEZEMBRO'
-    }
-    
-    # Agrupar por mês
-    meses = defaultdict(list)
-    for item in escala_rjm:
-        data = datetime.fromisoformat(item["data"])
-        mes_ano_key = f"{data.year}-{data.month:02d}"  # Para ordenação
-        mes_ano_nome = f"{meses_pt[data.month]} {data.year}"
-        meses[mes_ano_key] = {
-            'nome': mes_ano_nome,
-            'itens': meses.get(mes_ano_key, {}).get('itens', []) + [item]
-        }
-    
-    # Criar tabela para cada mês (ordenado)
-    for mes_ano_key in sorted(meses.keys()):
-        mes_data = meses[mes_ano_key]
-        mes_ano_nome = mes_data['nome']
-        itens = mes_data['itens']
-        
-        elements.append(Paragraph(f"<b>{mes_ano_nome}</b>", styles['Heading2']))
-        elements.append(Spacer(1, 10))
-        
-        # Dados da tabela
-        table_data = [['Data', 'Dia', 'Organista']]
-        
-        for item in itens:
-            data = datetime.fromisoformat(item["data"])
-            data_formatada = data.strftime("%d/%m/%Y")
-            organista = item.get("organista", "-")
-            
-            table_data.append([
-                data_formatada,
-                "Domingo",
-                organista
-            ])
-        
-        # Criar tabela
-        table = Table(table_data, colWidths=[3*cm, 3*cm, 8*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f59e0b')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 20))
-    
-    # Gerar PDF
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return buffer.getvalue(), 200, {
-        'Content-Type': 'application/pdf',
-        'Content-Disposition': f'attachment; filename=escala_rjm_{datetime.now().strftime("%Y%m%d")}.pdf'
-    }
+    return _responder_pdf(comum_id, _versao_pdf(db, comum_id), 'rjm', escala_rjm, comum_nome,
+                          f'escala_rjm_{datetime.now().strftime("%Y%m%d")}.pdf')
 
 # ========== TROCAS (Solicitações de Substituição/Troca) ==========
 
@@ -2748,7 +3005,14 @@ def _add_historico(troca, acao, por):
 @app.get("/trocas")
 @login_required
 def listar_trocas():
-    """Lista trocas da comum atual. Admin vê todas. Organista vê as envolvidas."""
+    """
+    Lista trocas da comum atual. Admin vê todas. Organista vê as envolvidas.
+    ETag pela versão da comum; ?since=<versão> devolve {trocas, removidos} só com as alteradas.
+    """
+    variante = 'admin' if current_user.is_admin else current_user.id
+    atalho = _atalho_304('trocas', variante)
+    if atalho:
+        return atalho
     db = load_db()
     if 'regionais' not in db:
         # Estrutura antiga: manter compatibilidade mínima
@@ -2762,9 +3026,10 @@ def listar_trocas():
         return jsonify([])
 
     trocas = _ensure_trocas_array(comum_data)
-    if current_user.is_admin:
-        return jsonify(trocas)
-    return jsonify([t for t in trocas if t.get('solicitante_id') == current_user.id or t.get('alvo_id') == current_user.id])
+    if not current_user.is_admin:
+        trocas = [t for t in trocas if t.get('solicitante_id') == current_user.id or t.get('alvo_id') == current_user.id]
+    return _resposta_sincronizada('trocas', comum_id, db.versoes_comuns.get(comum_id), trocas,
+                                  lambda t: t.get('id'), 'trocas', trocas, variante=variante)
 
 @app.post("/trocas")
 @login_required
@@ -2838,14 +3103,14 @@ def criar_troca():
     trocas.append(troca)
 
     # Persistir
-    db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    db.setdefault('logs', []).append({
+    registrar_log_comum(comum_data, {
         'quando': datetime.utcnow().isoformat(),
         'acao': 'criar_troca',
         'por': current_user.id,
         'payload': {k: v for k, v in troca.items() if k not in ['historico']}
     })
-    save_db(db)
+    versao = save_comum(comum_id, comum_data, db)
+    notificar_comum(comum_id, versao, 'trocas', 'criar_troca', troca_id=troca['id'], status=troca['status'])
     return jsonify({"ok": True, "troca": troca})
 
 @app.post("/trocas/<troca_id>/aceitar")
@@ -2878,8 +3143,8 @@ def aceitar_troca(troca_id):
     troca['atualizado_em'] = datetime.utcnow().isoformat()
     _add_historico(troca, 'aceita', current_user.id)
 
-    db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    save_db(db)
+    versao = save_comum(comum_id, comum_data, db)
+    notificar_comum(comum_id, versao, 'trocas', 'aceitar_troca', troca_id=troca['id'], status=troca['status'])
     return jsonify({"ok": True, "troca": troca})
 
 @app.post("/trocas/<troca_id>/recusar")
@@ -2905,8 +3170,8 @@ def recusar_troca(troca_id):
     troca['status'] = 'recusada'
     troca['atualizado_em'] = datetime.utcnow().isoformat()
     _add_historico(troca, 'recusada', current_user.id)
-    db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    save_db(db)
+    versao = save_comum(comum_id, comum_data, db)
+    notificar_comum(comum_id, versao, 'trocas', 'recusar_troca', troca_id=troca['id'], status=troca['status'])
     return jsonify({"ok": True, "troca": troca})
 
 @app.post("/trocas/<troca_id>/cancelar")
@@ -2931,8 +3196,8 @@ def cancelar_troca(troca_id):
     troca['status'] = 'cancelada'
     troca['atualizado_em'] = datetime.utcnow().isoformat()
     _add_historico(troca, 'cancelada', current_user.id)
-    db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    save_db(db)
+    versao = save_comum(comum_id, comum_data, db)
+    notificar_comum(comum_id, versao, 'trocas', 'cancelar_troca', troca_id=troca['id'], status=troca['status'])
     return jsonify({"ok": True, "troca": troca})
 
 @app.post("/trocas/<troca_id>/aprovar")
@@ -2968,6 +3233,7 @@ def aprovar_troca(troca_id):
             return jsonify({"error": "Data não encontrada na escala"}), 404
         if troca['slot'] not in ['meia_hora', 'culto']:
             return jsonify({"error": "Slot inválido"}), 400
+        alteracoes = [(troca['slot'], dia.get(troca['slot']), troca['alvo_nome'])]
         dia[troca['slot']] = troca['alvo_nome']
         # Sinalizar que esta alocação veio de uma troca (para UI)
         proveniencia = dia.setdefault('_proveniencia', {})
@@ -2977,6 +3243,7 @@ def aprovar_troca(troca_id):
         if not item:
             return jsonify({"error": "Data não encontrada na RJM"}), 404
         item['organista'] = troca['alvo_nome']
+        alteracoes = []  # RJM não entra nas estatísticas da escala
         # Sinalizar proveniência na RJM
         proveniencia = item.setdefault('_proveniencia', {})
         proveniencia['unica'] = 'troca'
@@ -2986,14 +3253,17 @@ def aprovar_troca(troca_id):
     _add_historico(troca, 'aprovada', current_user.id)
 
     # Persistir e logar
-    db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    db.setdefault('logs', []).append({
+    registrar_log_comum(comum_data, {
         'quando': datetime.utcnow().isoformat(),
         'acao': 'aprovar_troca',
         'por': current_user.id,
         'payload': {'troca_id': troca_id}
     })
-    save_db(db)
+    versao = save_comum(comum_id, comum_data, db)
+    atualizar_estatisticas_comum(comum_id, versao, alteracoes)
+    # A aprovação também troca a vaga: a escala (ou a RJM) do dia mudou
+    notificar_comum(comum_id, versao, 'trocas', 'aprovar_troca', troca_id=troca['id'], status=troca['status'],
+                    afeta='escala' if troca['tipo'] == 'culto' else 'rjm', datas=[troca['data']])
     return jsonify({"ok": True, "troca": troca})
 
 @app.post("/trocas/<troca_id>/reprovar")
@@ -3025,14 +3295,14 @@ def reprovar_troca(troca_id):
     _add_historico(troca, 'reprovada', current_user.id)
 
     # Persistir e logar
-    db['regionais'][regional_id]['sub_regionais'][sub_regional_id]['comuns'][comum_id] = comum_data
-    db.setdefault('logs', []).append({
+    registrar_log_comum(comum_data, {
         'quando': datetime.utcnow().isoformat(),
         'acao': 'reprovar_troca',
         'por': current_user.id,
         'payload': {'troca_id': troca_id}
     })
-    save_db(db)
+    versao = save_comum(comum_id, comum_data, db)
+    notificar_comum(comum_id, versao, 'trocas', 'reprovar_troca', troca_id=troca['id'], status=troca['status'])
     return jsonify({"ok": True, "troca": troca})
 
 # ==================== API de Contexto e Hierarquia ====================
@@ -3776,6 +4046,7 @@ def editar_usuario(user_id):
         usuario['password_hash'] = generate_password_hash(data['senha'])
     
     save_db(db)
+    invalidar_identidade_apos_commit(user_id)
     
     return jsonify({
         "success": True,
@@ -3803,6 +4074,7 @@ def deletar_usuario(user_id):
     
     del db["usuarios"][user_id]
     save_db(db)
+    invalidar_identidade_apos_commit(user_id)
     
     return jsonify({"success": True, "message": "Usuário deletado"})
 
@@ -3879,7 +4151,7 @@ def update_comum_config(comum_id):
     if 'fechamento_publicacao_dias' in data:
         comum["config"]["fechamento_publicacao_dias"] = data['fechamento_publicacao_dias']
     
-    save_db(db)
+    save_comum(comum_result['comum_id'], comum, db)
     
     return jsonify({
         "success": True,
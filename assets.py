@@ -0,0 +1,318 @@
+"""
+Bundles estáticos do frontend (CSS e JS do SPA)
+As fontes ficam em frontend/; o build minifica cada arquivo e grava em
+static/dist/ o bundle com o hash do conteúdo no nome (app.<hash>.js), as
+versões pré-comprimidas (.gz e, com o módulo brotli, .br) e um manifest.json
+{nome lógico: arquivo}. Como o nome muda a cada alteração, os bundles são
+servidos com Cache-Control immutable e o HTML só precisa referenciar o nome atual.
+
+    python assets.py           # build (roda na imagem Docker)
+
+Em desenvolvimento, se uma fonte for mais nova que o manifest, o build roda
+sozinho na próxima renderização.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há .gz
+    brotli = None
+
+from compressao import pesos_codificacao
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FONTE_DIR = os.path.join(BASE_DIR, 'frontend')
+DESTINO_DIR = os.path.join(BASE_DIR, 'static', 'dist')
+MANIFEST = 'manifest.json'
+URL_PREFIXO = '/assets/'
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+EXTENSOES = ('.css', '.js')
+
+TIPOS = {'.css': 'text/css; charset=utf-8', '.js': 'application/javascript; charset=utf-8'}
+
+
+# ========== MINIFICAÇÃO ==========
+# Conservadora de propósito: remove comentários e espaços, sem renomear nem
+# reescrever nada. Quebras de linha do JS são mantidas (inserção automática de
+# ponto e vírgula); strings, template literals e regex são copiados intactos.
+
+_PALAVRA = re.compile(r'[\w$\\]')
+# Depois destas palavras uma "/" abre uma regex, não uma divisão
+_ANTES_DE_REGEX = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                   'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+
+def _eh_palavra(c: str) -> bool:
+    return bool(c) and (bool(_PALAVRA.match(c)) or ord(c) > 127)
+
+
+def minificar_js(fonte: str) -> str:
+    saida = []
+    n = len(fonte)
+    i = 0
+    anterior = ''       # último caractere significativo emitido
+    ultima_palavra = ''  # último identificador emitido (para decidir regex x divisão)
+    espaco = ''         # '', ' ' ou '\n' pendente
+    chaves = []         # profundidade de { } em cada ${ } de template literal aberto
+
+    def emitir(texto: str, palavra: str = ''):
+        nonlocal anterior, ultima_palavra, espaco
+        if espaco == '\n' and saida:
+            saida.append('\n')
+        elif espaco and (
+            (_eh_palavra(anterior) and _eh_palavra(texto[0]))
+            or (anterior in '+-' and texto[0] in '+-')
+        ):
+            saida.append(' ')
+        espaco = ''
+        saida.append(texto)
+        anterior = texto[-1]
+        ultima_palavra = palavra
+
+    def template(inicio: int) -> int:
+        """Copia um template literal a partir de `inicio` (depois da crase ou do `}`)"""
+        j = inicio
+        while j < n:
+            c = fonte[j]
+            if c == '\\':
+                j += 2
+            elif c == '`':
+                return j + 1
+            elif c == '$' and j + 1 < n and fonte[j + 1] == '{':
+                chaves.append(0)
+                return j + 2
+            else:
+                j += 1
+        raise ValueError('template literal não terminado')
+
+    while i < n:
+        c = fonte[i]
+        if c in ' \t\r\n\f\v\ufeff':
+            if c == '\n':
+                espaco = '\n'
+            elif not espaco:
+                espaco = ' '
+            i += 1
+        elif c == '/' and fonte.startswith('//', i):
+            fim = fonte.find('\n', i)
+            i = n if fim < 0 else fim
+        elif c == '/' and fonte.startswith('/*', i):
+            fim = fonte.find('*/', i + 2)
+            if fim < 0:
+                raise ValueError('comentário não terminado')
+            if '\n' in fonte[i:fim]:
+                espaco = '\n'
+            elif not espaco:
+                espaco = ' '
+            i = fim + 2
+        elif c in '\'"':
+            j = i + 1
+            while j < n and fonte[j] != c:
+                if fonte[j] == '\n':
+                    raise ValueError(f'string não terminada na posição {i}')
+                j += 2 if fonte[j] == '\\' else 1
+            emitir(fonte[i:j + 1])
+            i = j + 1
+        elif c == '`':
+            j = template(i + 1)
+            emitir(fonte[i:j])
+            i = j
+        elif c == '}' and chaves and chaves[-1] == 0:
+            # Fim de um ${ } : volta para dentro do template literal
+            chaves.pop()
+            j = template(i + 1)
+            emitir(fonte[i:j])
+            i = j
+        elif c == '/' and (anterior == '' or anterior in '(,=:[!&|?{};+-*%<>~^'
+                           or ultima_palavra in _ANTES_DE_REGEX):
+            j = i + 1
+            classe = False
+            while j < n and (classe or fonte[j] != '/'):
+                if fonte[j] == '\n':
+                    raise ValueError(f'regex não terminada na posição {i}')
+                if fonte[j] == '\\':
+                    j += 1
+                elif fonte[j] == '[':
+                    classe = True
+                elif fonte[j] == ']':
+                    classe = False
+                j += 1
+            j += 1
+            while j < n and _eh_palavra(fonte[j]):
+                j += 1
+            emitir(fonte[i:j])
+            i = j
+        elif _eh_palavra(c):
+            j = i + 1
+            while j < n and (_eh_palavra(fonte[j]) or (fonte[j] == '.' and fonte[i].isdigit())):
+                j += 1
+            emitir(fonte[i:j], fonte[i:j])
+            i = j
+        else:
+            if chaves:
+                if c == '{':
+                    chaves[-1] += 1
+                elif c == '}':
+                    chaves[-1] -= 1
+            emitir(c)
+            i += 1
+    return ''.join(saida) + '\n'
+
+
+def minificar_css(fonte: str) -> str:
+    partes = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', fonte)
+    saida = []
+    for k, parte in enumerate(partes):
+        if k % 2:
+            saida.append(parte)  # string: intacta
+            continue
+        parte = re.sub(r'/\*.*?\*/', '', parte, flags=re.S)
+        parte = re.sub(r'\s+', ' ', parte)
+        parte = re.sub(r' ?([{};,>]) ?', r'\1', parte)
+        parte = re.sub(r'([{;][\w-]+): ', r'\1:', parte)
+        parte = parte.replace(';}', '}')
+        saida.append(parte)
+    return ''.join(saida).strip() + '\n'
+
+
+MINIFICADORES = {'.css': minificar_css, '.js': minificar_js}
+
+
+# ========== BUILD ==========
+
+def _gravar(caminho: str, dados: bytes) -> None:
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+
+def construir(fonte_dir: str = FONTE_DIR, destino_dir: str = DESTINO_DIR) -> Dict[str, Dict]:
+    """Gera os bundles e o manifest; remove bundles que não estão nem no manifest atual nem no anterior"""
+    os.makedirs(destino_dir, exist_ok=True)
+    caminho_manifest = os.path.join(destino_dir, MANIFEST)
+    anterior = ler_manifest(destino_dir) or {}
+
+    manifest = {}
+    for nome in sorted(os.listdir(fonte_dir)):
+        base, ext = os.path.splitext(nome)
+        if ext not in EXTENSOES:
+            continue
+        with open(os.path.join(fonte_dir, nome), encoding='utf-8') as f:
+            fonte = f.read()
+        dados = MINIFICADORES[ext](fonte).encode('utf-8')
+        arquivo = f"{base}.{hashlib.sha256(dados).hexdigest()[:12]}{ext}"
+        destino = os.path.join(destino_dir, arquivo)
+        if not os.path.exists(destino):
+            _gravar(destino, dados)
+        if not os.path.exists(destino + '.gz'):
+            _gravar(destino + '.gz', gzip.compress(dados, compresslevel=9, mtime=0))
+        if brotli is not None and not os.path.exists(destino + '.br'):
+            _gravar(destino + '.br', brotli.compress(dados, quality=11))
+        manifest[nome] = {
+            "arquivo": arquivo,
+            "fonte": len(fonte.encode('utf-8')),
+            "minificado": len(dados),
+            "gzip": os.path.getsize(destino + '.gz'),
+            "brotli": os.path.getsize(destino + '.br') if os.path.exists(destino + '.br') else None,
+        }
+
+    _gravar(caminho_manifest, json.dumps(manifest, indent=2).encode('utf-8'))
+
+    manter = {v["arquivo"] for v in list(manifest.values()) + list(anterior.values())}
+    for nome in os.listdir(destino_dir):
+        raiz = re.sub(r'\.(gz|br)$', '', nome)
+        if nome != MANIFEST and os.path.splitext(raiz)[1] in EXTENSOES and raiz not in manter:
+            os.remove(os.path.join(destino_dir, nome))
+    return manifest
+
+
+def ler_manifest(destino_dir: str = DESTINO_DIR) -> Optional[Dict[str, Dict]]:
+    try:
+        with open(os.path.join(destino_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ========== USO NA APLICAÇÃO ==========
+
+class Assets:
+    """Resolve nomes lógicos (app.js) para a URL do bundle e escolhe a variante comprimida"""
+
+    def __init__(self, fonte_dir: str = FONTE_DIR, destino_dir: str = DESTINO_DIR,
+                 recompilar: bool = True, intervalo_verificacao: float = 2.0):
+        self.fonte_dir = fonte_dir
+        self.destino_dir = destino_dir
+        self.recompilar = recompilar
+        self.intervalo_verificacao = intervalo_verificacao
+        self._manifest = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _desatualizado(self) -> bool:
+        try:
+            gerado = os.path.getmtime(os.path.join(self.destino_dir, MANIFEST))
+        except OSError:
+            return True
+        try:
+            fontes = [os.path.getmtime(os.path.join(self.fonte_dir, nome))
+                      for nome in os.listdir(self.fonte_dir) if nome.endswith(EXTENSOES)]
+        except OSError:
+            return False  # imagem sem as fontes: usa o que foi gerado no build
+        return any(m > gerado for m in fontes)
+
+    def manifest(self) -> Dict[str, Dict]:
+        agora = time.monotonic()
+        if self._manifest is not None and agora - self._verificado_em < self.intervalo_verificacao:
+            return self._manifest
+        with self._lock:
+            if self._manifest is None or agora - self._verificado_em >= self.intervalo_verificacao:
+                if self.recompilar and self._desatualizado():
+                    print("🧱 [ASSETS] Fontes do frontend alteradas, gerando bundles")
+                    self._manifest = construir(self.fonte_dir, self.destino_dir)
+                elif self._manifest is None or not self.recompilar:
+                    self._manifest = ler_manifest(self.destino_dir) or {}
+                self._verificado_em = agora
+            return self._manifest
+
+    def url(self, nome: str) -> str:
+        item = self.manifest().get(nome)
+        if not item:
+            raise KeyError(f"Asset desconhecido: {nome}")
+        return URL_PREFIXO + item["arquivo"]
+
+    def arquivo(self, nome: str, accept_encoding: str = '') -> Optional[Tuple[str, Optional[str]]]:
+        """(caminho, content-encoding) do bundle; None se o nome não é um bundle gerado"""
+        if '/' in nome or '\\' in nome or os.path.splitext(nome)[1] not in EXTENSOES:
+            return None
+        caminho = os.path.join(self.destino_dir, nome)
+        if not os.path.isfile(caminho):
+            return None
+        aceitas = pesos_codificacao(accept_encoding)
+        for codificacao, sufixo in (('br', '.br'), ('gzip', '.gz')):
+            if aceitas.get(codificacao, 0) > 0 and os.path.isfile(caminho + sufixo):
+                return caminho + sufixo, codificacao
+        return caminho, None
+
+    @staticmethod
+    def tipo(nome: str) -> str:
+        return TIPOS.get(os.path.splitext(nome)[1], 'application/octet-stream')
+
+
+if __name__ == '__main__':
+    manifest = construir(*sys.argv[1:3])
+    if brotli is None:
+        print("⚠️ [ASSETS] Módulo brotli ausente: apenas .gz gerado")
+    for nome, item in manifest.items():
+        print(f"✅ {nome} → {item['arquivo']}: {item['fonte']} → {item['minificado']} bytes "
+              f"(gzip {item['gzip']}, brotli {item['brotli']})")
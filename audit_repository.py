@@ -1,63 +1,534 @@
+"""
+Logs de auditoria em SQLite, particionados por mês
+Cada mês é um arquivo próprio (auditoria/logs_AAAA-MM.db) com a mesma tabela,
+índices e FTS. Consultas com período (24h/7d/30d, data_inicio/data_fim, cursor)
+abrem só os meses que cobrem o intervalo, do mais novo para o mais antigo.
+
+Retenção e arquivamento trabalham com arquivos inteiros (manutencao):
+    meses fechados   → compactados uma vez (FTS optimize + VACUUM)
+    além dos quentes → arquivados em logs_AAAA-MM.db.gz e saem das consultas
+    além da retenção → removidos
+"""
+
+import base64
+import csv
+import gzip
+import heapq
+import json
 import os
+import re
+import shutil
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from io import StringIO
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
+
+import portalocker
+
+CSV_COLUNAS = ["timestamp", "tipo", "categoria", "acao", "descricao", "usuario_id", "usuario_nome", "usuario_tipo",
+               "regional_id", "sub_regional_id", "comum_id", "status", "ip", "user_agent"]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs_auditoria (
+  id TEXT PRIMARY KEY,
+  timestamp TEXT,
+  tipo TEXT,
+  categoria TEXT,
+  acao TEXT,
+  descricao TEXT,
+  usuario_id TEXT,
+  usuario_nome TEXT,
+  usuario_tipo TEXT,
+  regional_id TEXT,
+  sub_regional_id TEXT,
+  comum_id TEXT,
+  status TEXT,
+  ip TEXT,
+  user_agent TEXT,
+  contexto TEXT,
+  dados_antes TEXT,
+  dados_depois TEXT,
+  mensagem_erro TEXT
+);
+"""
+
+# Índices compostos na ordem da listagem (timestamp DESC, id DESC):
+# cada combinação de filtro de igualdade + escopo lê só a faixa da página
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_logs_ts_id ON logs_auditoria(timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_regional_ts ON logs_auditoria(regional_id, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_sub_ts ON logs_auditoria(sub_regional_id, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_categoria_ts ON logs_auditoria(categoria, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_tipo_ts ON logs_auditoria(tipo, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_usuario_ts ON logs_auditoria(usuario_id, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_regional_cat_ts ON logs_auditoria(regional_id, categoria, timestamp DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_sub_cat_ts ON logs_auditoria(sub_regional_id, categoria, timestamp DESC, id DESC)",
+]
+
+# Índice de texto (FTS5, conteúdo externo): sem acentos/caixa, mantido por triggers.
+# INSERT OR REPLACE apaga a linha antiga; recursive_triggers faz o trigger de delete disparar.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_auditoria_fts USING fts5(
+  descricao, acao, usuario_nome,
+  content='logs_auditoria', content_rowid='rowid',
+  tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS logs_auditoria_fts_ai AFTER INSERT ON logs_auditoria BEGIN
+  INSERT INTO logs_auditoria_fts(rowid, descricao, acao, usuario_nome)
+  VALUES (new.rowid, new.descricao, new.acao, new.usuario_nome);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_auditoria_fts_ad AFTER DELETE ON logs_auditoria BEGIN
+  INSERT INTO logs_auditoria_fts(logs_auditoria_fts, rowid, descricao, acao, usuario_nome)
+  VALUES ('delete', old.rowid, old.descricao, old.acao, old.usuario_nome);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_auditoria_fts_au AFTER UPDATE ON logs_auditoria BEGIN
+  INSERT INTO logs_auditoria_fts(logs_auditoria_fts, rowid, descricao, acao, usuario_nome)
+  VALUES ('delete', old.rowid, old.descricao, old.acao, old.usuario_nome);
+  INSERT INTO logs_auditoria_fts(rowid, descricao, acao, usuario_nome)
+  VALUES (new.rowid, new.descricao, new.acao, new.usuario_nome);
+END;
+"""
+
+# Acima disso o total da listagem é informado como "mais de N" (contar tudo custaria O(n))
+LIMITE_TOTAL = 10000
+
+# Intervalo mínimo entre duas manutenções das partições no mesmo processo
+INTERVALO_MANUTENCAO = 3600
+
+_RE_PARTICAO = re.compile(r"^logs_(\d{4}-\d{2})\.db$")
+_RE_ARQUIVADA = re.compile(r"^logs_(\d{4}-\d{2})(?:\.\d+)?\.db\.gz$")
+
+_schemas_prontos = set()
+_schemas_lock = threading.RLock()
+
+
+def mes_do_timestamp(timestamp: Optional[str]) -> str:
+    """'2026-10-18T12:00:00' → '2026-10' (sem timestamp válido, o mês atual)"""
+    if timestamp and re.match(r"\d{4}-\d{2}", timestamp):
+        return timestamp[:7]
+    return datetime.utcnow().strftime("%Y-%m")
+
+
+def meses_antes(mes: str, n: int) -> str:
+    """Mês `n` meses antes de `mes` (ambos 'AAAA-MM')"""
+    indice = int(mes[:4]) * 12 + int(mes[5:7]) - 1 - n
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def _codificar_cursor(timestamp: str, log_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp}|{log_id}".encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(cursor: str) -> Optional[Tuple[str, str]]:
+    try:
+        timestamp, _, log_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition("|")
+    except (ValueError, UnicodeError):
+        return None
+    return (timestamp, log_id) if log_id else None
+
+
+def consulta_fts(busca: str) -> Optional[str]:
+    """
+    Texto livre → expressão MATCH do FTS5: cada palavra vira um prefixo entre aspas
+    ("concei"* AND "escala"*), sem expor a sintaxe do FTS ao usuário.
+    """
+    palavras = re.findall(r"\w+", busca or "")
+    if not palavras:
+        return None
+    return " AND ".join(f'"{p}"*' for p in palavras)
+
+
+def linhas_csv(linhas: Iterable[Iterable], cabecalho: Optional[List[str]] = None,
+               linhas_por_bloco: int = 500) -> Iterator[str]:
+    """
+    Formata linhas como CSV e entrega em blocos de texto.
+    Um único StringIO é reaproveitado: a memória não cresce com o número de linhas.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if cabecalho:
+        writer.writerow(cabecalho)
+    pendentes = 0
+    for linha in linhas:
+        writer.writerow(linha)
+        pendentes += 1
+        if pendentes >= linhas_por_bloco:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendentes = 0
+    resto = buffer.getvalue()
+    if resto:
+        yield resto
 
 class AuditRepo:
-    def __init__(self, db_path: str = "data/rodizio.db"):
+    def __init__(self, db_path: str = "data/rodizio.db", particoes_dir: Optional[str] = None,
+                 meses_retencao: Optional[int] = None, meses_quentes: Optional[int] = None):
+        # db_path: banco que tinha a tabela única (migrada para as partições no ensure_schema)
         self.db_path = db_path
+        self.particoes_dir = particoes_dir or os.path.join(os.path.dirname(db_path) or ".", "auditoria")
+        self.meses_retencao = meses_retencao or None
+        self.meses_quentes = meses_quentes or None
+        self._ultima_manutencao = 0.0
 
-    def _connect(self):
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self, path: str):
+        conn = sqlite3.connect(path)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys=ON;")
         conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA recursive_triggers=ON;")
         return conn
 
-    def insert_log(self, log: Dict):
-        q = (
-            "INSERT OR REPLACE INTO logs_auditoria("
-            "id, timestamp, tipo, categoria, acao, descricao, usuario_id, usuario_nome, usuario_tipo, "
-            "regional_id, sub_regional_id, comum_id, status, ip, user_agent)"
-            " VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
-        )
-        vals = (
+    @contextmanager
+    def _lock_particoes(self, bloquear: bool = True):
+        """Lock entre processos para migração/manutenção; sem `bloquear`, cede None se ocupado"""
+        os.makedirs(self.particoes_dir, exist_ok=True)
+        with open(os.path.join(self.particoes_dir, ".manutencao.lock"), "a") as lf:
+            try:
+                portalocker.lock(lf, portalocker.LOCK_EX if bloquear else portalocker.LOCK_EX | portalocker.LOCK_NB)
+            except portalocker.LockException:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                portalocker.unlock(lf)
+
+    # ========== PARTIÇÕES ==========
+
+    def _particao_path(self, mes: str) -> str:
+        return os.path.join(self.particoes_dir, f"logs_{mes}.db")
+
+    def _garantir_particao(self, mes: str) -> str:
+        """Cria o arquivo do mês com tabela, índices e FTS (uma vez por processo)"""
+        path = self._particao_path(mes)
+        with _schemas_lock:
+            if path in _schemas_prontos and os.path.exists(path):
+                return path
+            os.makedirs(self.particoes_dir, exist_ok=True)
+            with self._connect(path) as conn:
+                conn.executescript(SCHEMA)
+                for ddl in INDICES:
+                    conn.execute(ddl)
+                conn.executescript(FTS_SCHEMA)
+            _schemas_prontos.add(path)
+        return path
+
+    def _meses(self) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """(meses online, [(mês, arquivo .gz)]) do mais novo para o mais antigo"""
+        try:
+            nomes = os.listdir(self.particoes_dir)
+        except FileNotFoundError:
+            return [], []
+        online, arquivadas = [], []
+        for nome in nomes:
+            m = _RE_PARTICAO.match(nome)
+            if m:
+                online.append(m.group(1))
+                continue
+            m = _RE_ARQUIVADA.match(nome)
+            if m:
+                arquivadas.append((m.group(1), nome))
+        return sorted(online, reverse=True), sorted(arquivadas, reverse=True)
+
+    def _particoes(self, filters: Optional[Dict], ate: Optional[str] = None) -> List[str]:
+        """
+        Arquivos dos meses que podem conter linhas do filtro (período, data_inicio,
+        data_fim) e, com cursor, só os meses até o timestamp `ate`. Mais novo primeiro.
+        """
+        inicio, fim = self._intervalo(filters or {})
+        meses = self._meses()[0]
+        if inicio:
+            meses = [m for m in meses if m >= inicio[:7]]
+        if fim:
+            meses = [m for m in meses if m <= fim[:7]]
+        if ate:
+            meses = [m for m in meses if m <= ate[:7]]
+        return [self._particao_path(m) for m in meses]
+
+    def ensure_schema(self, logs_legados: Optional[Callable[[], List[Dict]]] = None):
+        """
+        Prepara o diretório de partições (uma vez por processo).
+        A tabela única antiga em db_path é redistribuída por mês e removida;
+        sem nenhuma partição, importa os logs legados (partição JSON) uma única vez.
+        """
+        with _schemas_lock:
+            if self.db_path in _schemas_prontos:
+                return
+        # Fora do _schemas_lock: o lock de arquivo serializa os processos (e threads)
+        with self._lock_particoes():
+            migrados = self._migrar_tabela_unica()
+            if migrados:
+                print(f"📦 [AUDIT] {migrados} logs da tabela única redistribuídos em partições mensais")
+            online, arquivadas = self._meses()
+            if not online and not arquivadas and logs_legados:
+                importados = self._inserir(logs_legados())
+                if importados:
+                    print(f"📦 [AUDIT] {importados} logs importados da partição JSON para {self.particoes_dir}")
+        with _schemas_lock:
+            _schemas_prontos.add(self.db_path)
+
+    def _migrar_tabela_unica(self, tamanho_lote: int = 5000) -> int:
+        if not os.path.exists(self.db_path):
+            return 0
+        with self._connect(self.db_path) as conn:
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_auditoria'").fetchone()
+            if not existe:
+                return 0
+            total = 0
+            cur = conn.execute("SELECT * FROM logs_auditoria")
+            while True:
+                rows = cur.fetchmany(tamanho_lote)
+                if not rows:
+                    break
+                total += self._inserir(self._para_log(r) for r in rows)
+            conn.execute("DROP TABLE IF EXISTS logs_auditoria_fts")
+            conn.execute("DROP TABLE logs_auditoria")
+        return total
+
+    # ========== ESCRITA ==========
+
+    _INSERT = (
+        "INSERT OR REPLACE INTO logs_auditoria("
+        "id, timestamp, tipo, categoria, acao, descricao, usuario_id, usuario_nome, usuario_tipo, "
+        "regional_id, sub_regional_id, comum_id, status, ip, user_agent, "
+        "contexto, dados_antes, dados_depois, mensagem_erro)"
+        " VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+    )
+
+    @staticmethod
+    def _valores(log: Dict) -> Tuple:
+        contexto = log.get("contexto") or {}
+
+        def como_json(valor):
+            return json.dumps(valor, ensure_ascii=False, default=str) if valor is not None else None
+
+        return (
             log.get("id"), log.get("timestamp"), log.get("tipo"), log.get("categoria"), log.get("acao"), log.get("descricao"),
             log.get("usuario_id"), log.get("usuario_nome"), log.get("usuario_tipo"),
-            (log.get("contexto") or {}).get("regional_id"),
-            (log.get("contexto") or {}).get("sub_regional_id"),
-            (log.get("contexto") or {}).get("comum_id"),
-            log.get("status"), log.get("ip"), log.get("user_agent")
+            contexto.get("regional_id"),
+            contexto.get("sub_regional_id"),
+            contexto.get("comum_id"),
+            log.get("status"), log.get("ip"), log.get("user_agent"),
+            como_json(contexto), como_json(log.get("dados_antes")), como_json(log.get("dados_depois")),
+            log.get("mensagem_erro"),
         )
-        with self._connect() as conn:
-            conn.execute(q, vals)
+
+    def _inserir(self, logs: Iterable[Dict]) -> int:
+        """Agrupa por mês e grava cada grupo na sua partição (meses além da retenção são ignorados)"""
+        corte = None
+        if self.meses_retencao:
+            corte = meses_antes(datetime.utcnow().strftime("%Y-%m"), self.meses_retencao)
+        por_mes: Dict[str, List[Tuple]] = {}
+        for log in logs:
+            if not log.get("id"):
+                continue
+            mes = mes_do_timestamp(log.get("timestamp"))
+            if corte and mes < corte:
+                continue
+            por_mes.setdefault(mes, []).append(self._valores(log))
+        for mes, valores in por_mes.items():
+            with self._connect(self._garantir_particao(mes)) as conn:
+                conn.executemany(self._INSERT, valores)
+        return sum(len(v) for v in por_mes.values())
+
+    def insert_log(self, log: Dict):
+        self.insert_logs([log])
+
+    def insert_logs(self, logs: Iterable[Dict]) -> int:
+        gravados = self._inserir(logs)
+        self._manter_se_preciso()
+        return gravados
+
+    # ========== RETENÇÃO / ARQUIVAMENTO ==========
+
+    def _manter_se_preciso(self) -> None:
+        agora = time.monotonic()
+        if self._ultima_manutencao and agora - self._ultima_manutencao < INTERVALO_MANUTENCAO:
+            return
+        self._ultima_manutencao = agora
+        try:
+            resumo = self.manutencao()
+            if resumo and any(resumo.values()):
+                print(f"🗄️ [AUDIT] Manutenção das partições: {resumo}")
+        except Exception as e:
+            print(f"⚠️ [AUDIT] Falha na manutenção das partições: {e}")
+
+    def manutencao(self) -> Optional[Dict]:
+        """
+        Compacta meses fechados, arquiva os que saíram da janela quente e remove
+        os que passaram da retenção. None se outro processo já está fazendo isso.
+        """
+        with self._lock_particoes(bloquear=False) as obtido:
+            if not obtido:
+                return None
+            atual = datetime.utcnow().strftime("%Y-%m")
+            corte_retencao = meses_antes(atual, self.meses_retencao) if self.meses_retencao else None
+            corte_quente = meses_antes(atual, self.meses_quentes) if self.meses_quentes else None
+            resumo = {"compactadas": 0, "arquivadas": 0, "removidas": 0}
+            online, arquivadas = self._meses()
+
+            for mes, nome in arquivadas:
+                if corte_retencao and mes < corte_retencao:
+                    os.remove(os.path.join(self.particoes_dir, nome))
+                    resumo["removidas"] += 1
+
+            for mes in online:
+                path = self._particao_path(mes)
+                if corte_retencao and mes < corte_retencao:
+                    self._remover_arquivos(path)
+                    resumo["removidas"] += 1
+                elif mes < atual:
+                    if self._compactar(path):
+                        resumo["compactadas"] += 1
+                    if corte_quente and mes < corte_quente:
+                        self._arquivar(mes, path)
+                        resumo["arquivadas"] += 1
+            return resumo
+
+    def _compactar(self, path: str) -> bool:
+        """FTS optimize + VACUUM uma única vez por mês fechado (marcado em user_version)"""
+        conn = self._connect(path)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+                return False
+            conn.execute("INSERT INTO logs_auditoria_fts(logs_auditoria_fts) VALUES ('optimize')")
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA user_version = 1")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        return True
+
+    def _arquivar(self, mes: str, path: str) -> str:
+        """Comprime o arquivo do mês em .db.gz e tira a partição das consultas"""
+        destino = os.path.join(self.particoes_dir, f"logs_{mes}.db.gz")
+        n = 1
+        while os.path.exists(destino):
+            # Linhas atrasadas gravadas num mês já arquivado viram um segundo arquivo
+            destino = os.path.join(self.particoes_dir, f"logs_{mes}.{n}.db.gz")
+            n += 1
+        # Cópia pela API de backup: inclui o que ainda está só no -wal (linhas atrasadas
+        # num mês já compactado, cujo checkpoint não roda de novo)
+        copia = destino + ".db.tmp"
+        conn = self._connect(path)
+        try:
+            alvo = sqlite3.connect(copia)
+            try:
+                conn.backup(alvo)
+            finally:
+                alvo.close()
+        finally:
+            conn.close()
+        try:
+            with open(copia, "rb") as origem, gzip.open(destino + ".tmp", "wb") as gz:
+                shutil.copyfileobj(origem, gz)
+            os.replace(destino + ".tmp", destino)
+        finally:
+            os.remove(copia)
+        self._remover_arquivos(path)
+        return destino
+
+    def _remover_arquivos(self, path: str) -> None:
+        for sufixo in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + sufixo)
+            except FileNotFoundError:
+                pass
+        with _schemas_lock:
+            _schemas_prontos.discard(path)
+
+    def restaurar(self, mes: str) -> bool:
+        """Descomprime um mês arquivado de volta para as consultas (até a próxima manutenção)"""
+        with self._lock_particoes():
+            arquivos = [os.path.join(self.particoes_dir, nome) for m, nome in self._meses()[1] if m == mes]
+            path = self._particao_path(mes)
+            if not arquivos or os.path.exists(path):
+                return False
+            with gzip.open(arquivos[0], "rb") as gz, open(path, "wb") as destino:
+                shutil.copyfileobj(gz, destino)
+            # Arquivos extras do mesmo mês (linhas atrasadas) entram na partição restaurada
+            for extra in arquivos[1:]:
+                with gzip.open(extra, "rb") as gz, open(extra[:-3], "wb") as destino:
+                    shutil.copyfileobj(gz, destino)
+                conn = self._connect(path)
+                try:
+                    conn.execute("ATTACH DATABASE ? AS extra", (extra[:-3],))
+                    conn.execute("INSERT OR REPLACE INTO logs_auditoria SELECT * FROM extra.logs_auditoria")
+                    conn.commit()
+                    conn.execute("DETACH DATABASE extra")
+                finally:
+                    conn.close()
+                os.remove(extra[:-3])
+            conn = self._connect(path)
+            try:
+                conn.execute("PRAGMA user_version = 0")
+            finally:
+                conn.close()
+            for arquivo in arquivos:
+                os.remove(arquivo)
+            return True
+
+    def particoes(self) -> List[Dict]:
+        """Meses online e arquivados com o tamanho em disco"""
+        online, arquivadas = self._meses()
+        lista = [{"mes": mes, "estado": "online", "bytes": os.path.getsize(self._particao_path(mes))}
+                 for mes in online]
+        lista += [{"mes": mes, "estado": "arquivada", "bytes": os.path.getsize(os.path.join(self.particoes_dir, nome))}
+                  for mes, nome in arquivadas]
+        return sorted(lista, key=lambda p: p["mes"], reverse=True)
+
+    # ========== LEITURA ==========
+
+    @staticmethod
+    def _para_log(row: sqlite3.Row) -> Dict:
+        """Linha → formato do log (contexto e dados como objetos)"""
+        log = dict(row)
+        for coluna in ("contexto", "dados_antes", "dados_depois"):
+            if log.get(coluna):
+                try:
+                    log[coluna] = json.loads(log[coluna])
+                except ValueError:
+                    pass
+        if not isinstance(log.get("contexto"), dict):
+            log["contexto"] = {k: log.get(k) for k in ("regional_id", "sub_regional_id", "comum_id") if log.get(k)}
+        return log
+
+    @staticmethod
+    def _intervalo(filters: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """(início, fim) em ISO do período/datas do filtro; None = sem limite"""
+        dias = {"24h": 1, "7d": 7, "30d": 30}.get(filters.get("periodo", "30d"))
+        inicios = [d for d in ((datetime.utcnow() - timedelta(days=dias)).isoformat() if dias else None,
+                               filters.get("data_inicio")) if d]
+        return (max(inicios) if inicios else None), (filters.get("data_fim") or None)
 
     def _build_filters(self, filters: Dict, scope: Dict) -> Tuple[str, List]:
         where = []
         params: List = []
         # scope
         if scope:
+            if scope.get("deny"):
+                where.append("1 = 0")
             if scope.get("regional_id"):
                 where.append("regional_id = ?")
                 params.append(scope["regional_id"])
             if scope.get("sub_regional_id"):
                 where.append("sub_regional_id = ?")
                 params.append(scope["sub_regional_id"])
-        # periodo
-        periodo = (filters or {}).get("periodo", "30d")
-        now = datetime.utcnow()
-        if periodo == "24h":
-            threshold = (now - timedelta(days=1)).isoformat()
-            where.append("timestamp >= ?")
-            params.append(threshold)
-        elif periodo == "7d":
-            threshold = (now - timedelta(days=7)).isoformat()
-            where.append("timestamp >= ?")
-            params.append(threshold)
-        elif periodo == "30d":
-            threshold = (now - timedelta(days=30)).isoformat()
+        # periodo / data_inicio / data_fim
+        inicio, fim = self._intervalo(filters or {})
+        if inicio:
             where.append("timestamp >= ?")
-            params.append(threshold)
+            params.append(inicio)
+        if fim:
+            where.append("timestamp <= ?")
+            params.append(fim)
         # categoria/tipo/usuario/busca
         categoria = (filters or {}).get("categoria")
         if categoria:
@@ -67,69 +538,154 @@ class AuditRepo:
         if tipo:
             where.append("tipo = ?")
             params.append(tipo)
+        usuario_id = (filters or {}).get("usuario_id")
+        if usuario_id:
+            where.append("usuario_id = ?")
+            params.append(usuario_id)
         usuario = (filters or {}).get("usuario")
         if usuario:
             like = f"%{usuario.lower()}%"
             where.append("(LOWER(COALESCE(usuario_id,'')) LIKE ? OR LOWER(COALESCE(usuario_nome,'')) LIKE ?)")
             params.extend([like, like])
-        busca = (filters or {}).get("busca")
+        busca = consulta_fts((filters or {}).get("busca"))
         if busca:
-            like = f"%{busca.lower()}%"
-            where.append("(LOWER(COALESCE(descricao,'')) LIKE ? OR LOWER(COALESCE(acao,'')) LIKE ?)")
-            params.extend([like, like])
+            where.append("rowid IN (SELECT rowid FROM logs_auditoria_fts WHERE logs_auditoria_fts MATCH ?)")
+            params.append(busca)
         clause = (" WHERE " + " AND ".join(where)) if where else ""
         return clause, params
 
-    def fetch_logs(self, filters: Dict, scope: Dict, pagina: int, por_pagina: int) -> Tuple[List[Dict], int]:
+    def search_logs(self, filters: Dict, scope: Dict, limite: int = 50, cursor: Optional[str] = None,
+                    pagina: Optional[int] = None, com_total: bool = True) -> Dict:
+        """
+        Ordenado por (timestamp, id) DESC percorrendo os meses do mais novo ao mais antigo.
+        Com `cursor` (keyset) o custo não depende da profundidade da página;
+        `pagina` (OFFSET) fica para clientes antigos. O total é limitado a LIMITE_TOTAL.
+        """
         where, params = self._build_filters(filters, scope)
-        order = " ORDER BY timestamp DESC"
-        limit = " LIMIT ? OFFSET ?"
-        with self._connect() as conn:
-            total = conn.execute(f"SELECT COUNT(*) FROM logs_auditoria{where}", params).fetchone()[0]
-            params_page = params + [por_pagina, (pagina - 1) * por_pagina]
-            rows = conn.execute(f"SELECT * FROM logs_auditoria{where}{order}{limit}", params_page).fetchall()
-        logs = [dict(r) for r in rows]
-        return logs, total
-
-    def fetch_log(self, log_id: str) -> Optional[Dict]:
-        with self._connect() as conn:
-            row = conn.execute("SELECT * FROM logs_auditoria WHERE id = ?", (log_id,)).fetchone()
-        return dict(row) if row else None
+        where_pagina, params_pagina = where, list(params)
+        keyset = _decodificar_cursor(cursor) if cursor else None
+        if keyset:
+            where_pagina += (" AND " if where else " WHERE ") + "(timestamp < ? OR (timestamp = ? AND id < ?))"
+            params_pagina.extend([keyset[0], keyset[0], keyset[1]])
+        sql = f"SELECT * FROM logs_auditoria{where_pagina} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
 
-    def stats(self, scope: Dict) -> Dict:
-        where, params = self._build_filters({"periodo": "7d"}, scope)
-        q_logs_7d = f"SELECT * FROM logs_auditoria{where}"
-        with self._connect() as conn:
-            rows = conn.execute(q_logs_7d, params).fetchall()
-        logs = [dict(r) for r in rows]
-        now = datetime.utcnow()
-        iso_24h = (now - timedelta(hours=24)).isoformat()
-        logins_7d = sum(1 for l in logs if l.get("tipo") == "login" and l.get("status") == "sucesso")
-        logins_falhas = sum(1 for l in logs if l.get("tipo") == "login" and l.get("status") == "falha")
-        alteracoes_24h = sum(1 for l in logs if l.get("tipo") in ("create","update","delete") and (l.get("timestamp") or '') >= iso_24h)
-        usuarios_ativos = len({(l.get("usuario_id") or '') for l in logs if l.get("usuario_id")})
+        paginaveis = set(self._particoes(filters, ate=keyset[0] if keyset else None))
+        pular = (pagina - 1) * limite if pagina and not keyset else 0
+        rows: List[sqlite3.Row] = []
+        total = 0
+        for path in self._particoes(filters):
+            falta = limite + 1 - len(rows)
+            if falta <= 0 and (not com_total or total > LIMITE_TOTAL):
+                break
+            with self._connect(path) as conn:
+                if path in paginaveis and falta > 0:
+                    if pular:
+                        # Meses inteiros antes do OFFSET são só contados
+                        n = conn.execute(f"SELECT COUNT(*) FROM logs_auditoria{where_pagina}", params_pagina).fetchone()[0]
+                        if n <= pular:
+                            pular -= n
+                            falta = 0
+                    if falta > 0:
+                        rows += conn.execute(sql, params_pagina + [falta, pular]).fetchall()
+                        pular = 0
+                if com_total and total <= LIMITE_TOTAL:
+                    total += conn.execute(
+                        f"SELECT COUNT(*) FROM (SELECT 1 FROM logs_auditoria{where} LIMIT ?)",
+                        params + [LIMITE_TOTAL + 1 - total]
+                    ).fetchone()[0]
+
+        logs = [self._para_log(r) for r in rows[:limite]]
+        proximo = _codificar_cursor(logs[-1]["timestamp"] or "", logs[-1]["id"]) if len(rows) > limite else None
         return {
-            "logins_7d": logins_7d,
-            "logins_falhas": logins_falhas,
-            "alteracoes_24h": alteracoes_24h,
-            "usuarios_ativos": usuarios_ativos,
+            "logs": logs,
+            "proximo_cursor": proximo,
+            "total": min(total, LIMITE_TOTAL) if com_total else None,
+            "total_limitado": com_total and total > LIMITE_TOTAL,
         }
 
-    def export_csv(self, filters: Dict, scope: Dict) -> str:
-        import csv
-        from io import StringIO
+    def search_ranked(self, busca: str, filters: Dict, scope: Dict, limite: int = 50) -> List[Dict]:
+        """Logs que casam com a busca, do mais relevante (bm25) ao menos relevante"""
+        consulta = consulta_fts(busca)
+        if not consulta:
+            return []
+        where, params = self._build_filters(dict(filters or {}, busca=None), scope)
+        por_mes = []
+        for path in self._particoes(filters):
+            with self._connect(path) as conn:
+                por_mes.append(conn.execute(
+                    "SELECT l.*, f.relevancia FROM logs_auditoria l JOIN ("
+                    "  SELECT rowid, bm25(logs_auditoria_fts, 1.0, 2.0, 1.0) AS relevancia"
+                    "  FROM logs_auditoria_fts WHERE logs_auditoria_fts MATCH ?"
+                    f") f ON f.rowid = l.rowid{where} "
+                    "ORDER BY f.relevancia, l.timestamp DESC LIMIT ?",
+                    [consulta] + params + [limite]
+                ).fetchall())
+        # bm25 usa as estatísticas de cada mês: a ordem entre meses é aproximada
+        rows = heapq.merge(*por_mes, key=lambda r: r["relevancia"])
+        return [self._para_log(r) for _, r in zip(range(limite), rows)]
+
+    def fetch_logs(self, filters: Dict, scope: Dict, pagina: int, por_pagina: int) -> Tuple[List[Dict], int]:
+        resultado = self.search_logs(filters, scope, limite=por_pagina, pagina=pagina)
+        return resultado["logs"], resultado["total"]
+
+    def fetch_log(self, log_id: str, scope: Optional[Dict] = None) -> Optional[Dict]:
+        where, params = self._build_filters({"periodo": "todos"}, scope or {})
+        where += (" AND " if where else " WHERE ") + "id = ?"
+        for path in self._particoes({"periodo": "todos"}):
+            with self._connect(path) as conn:
+                row = conn.execute(f"SELECT * FROM logs_auditoria{where}", params + [log_id]).fetchone()
+            if row:
+                return self._para_log(row)
+        return None
+
+    def stats(self, scope: Dict) -> Dict:
+        """Contagens agregadas no banco (sem trazer os logs para o Python)"""
+        filtros = {"periodo": "7d"}
+        where, params = self._build_filters(filtros, scope)
+        iso_24h = (datetime.utcnow() - timedelta(hours=24)).isoformat()
+        resultado = {"logins_7d": 0, "logins_falhas": 0, "alteracoes_24h": 0}
+        usuarios = set()
+        for path in self._particoes(filtros):
+            with self._connect(path) as conn:
+                row = conn.execute(
+                    "SELECT "
+                    "COUNT(CASE WHEN tipo = 'login' AND status = 'sucesso' THEN 1 END) AS logins_7d, "
+                    "COUNT(CASE WHEN tipo = 'login' AND status = 'falha' THEN 1 END) AS logins_falhas, "
+                    "COUNT(CASE WHEN tipo IN ('create','update','delete') AND timestamp >= ? THEN 1 END) AS alteracoes_24h "
+                    f"FROM logs_auditoria{where}",
+                    [iso_24h] + params
+                ).fetchone()
+                usuarios.update(r[0] for r in conn.execute(
+                    f"SELECT DISTINCT usuario_id FROM logs_auditoria{where}", params) if r[0] is not None)
+            for chave in resultado:
+                resultado[chave] += row[chave]
+        resultado["usuarios_ativos"] = len(usuarios)
+        return resultado
+
+    def iter_csv(self, filters: Dict, scope: Dict, tamanho_lote: int = 1000) -> Iterator[str]:
+        """
+        CSV em blocos, lendo cada mês com fetchmany (nunca materializa o resultado).
+        Uma conexão por vez fica aberta enquanto o gerador é consumido.
+        """
         where, params = self._build_filters(filters, scope)
-        order = " ORDER BY timestamp DESC"
-        with self._connect() as conn:
-            rows = conn.execute(f"SELECT * FROM logs_auditoria{where}{order}", params).fetchall()
-        si = StringIO()
-        writer = csv.writer(si)
-        writer.writerow(["timestamp","tipo","categoria","acao","descricao","usuario_id","usuario_nome","usuario_tipo","regional_id","sub_regional_id","comum_id","status","ip","user_agent"]) 
-        for r in rows:
-            writer.writerow([
-                r["timestamp"], r["tipo"], r["categoria"], r["acao"], r["descricao"],
-                r["usuario_id"], r["usuario_nome"], r["usuario_tipo"],
-                r["regional_id"], r["sub_regional_id"], r["comum_id"],
-                r["status"], r["ip"], r["user_agent"]
-            ])
-        return si.getvalue()
+        sql = f"SELECT {', '.join(CSV_COLUNAS)} FROM logs_auditoria{where} ORDER BY timestamp DESC"
+        particoes = self._particoes(filters)
+
+        def linhas():
+            for path in particoes:
+                conn = self._connect(path)
+                try:
+                    cur = conn.execute(sql, params)
+                    while True:
+                        rows = cur.fetchmany(tamanho_lote)
+                        if not rows:
+                            break
+                        for r in rows:
+                            yield tuple(r)
+                finally:
+                    conn.close()
+
+        return linhas_csv(linhas(), CSV_COLUNAS)
+
+    def export_csv(self, filters: Dict, scope: Dict) -> str:
+        return "".join(self.iter_csv(filters, scope))
@@ -0,0 +1,164 @@
+"""
+Escrita assíncrona dos logs de auditoria
+A requisição só coloca o evento numa fila em memória; uma thread por processo
+grava os eventos em lote a cada `intervalo_ms` ou a cada `tamanho_lote` eventos,
+e o que sobrar é gravado no encerramento do processo (atexit).
+
+Fila limitada: quando cheia, a política define o que acontece
+    descartar_antigos  remove o evento mais antigo (padrão: a requisição nunca espera)
+    descartar_novos    descarta o evento que está chegando
+    bloquear           espera até `espera_maxima_ms` e, se continuar cheia, descarta o novo
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+POLITICAS = ('descartar_antigos', 'descartar_novos', 'bloquear')
+
+
+class EscritorAuditoria:
+    def __init__(self, gravar_lote: Callable[[List[Dict]], int], intervalo_ms: int = 200,
+                 tamanho_lote: int = 200, capacidade: int = 10000,
+                 politica: str = 'descartar_antigos', espera_maxima_ms: int = 50):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política inválida: {politica}")
+        self.gravar_lote = gravar_lote
+        self.intervalo = intervalo_ms / 1000
+        self.tamanho_lote = tamanho_lote
+        self.capacidade = capacidade
+        self.politica = politica
+        self.espera_maxima = espera_maxima_ms / 1000
+
+        # (instante em que entrou na fila, evento)
+        self._fila: deque = deque()
+        self._cond = threading.Condition()
+        self._gravando = 0
+        self._thread = None
+        self._pid = None
+        self._parando = False
+        self._metricas = {
+            "enfileirados": 0, "gravados": 0, "descartados": 0, "lotes": 0,
+            "falhas": 0, "atraso_ultimo_ms": 0.0, "atraso_max_ms": 0.0,
+        }
+        atexit.register(self.parar)
+
+    # ========== PRODUTOR (threads de requisição) ==========
+
+    def registrar(self, evento: Dict) -> bool:
+        """Enfileira o evento; False se ele foi descartado pela política da fila cheia"""
+        self._garantir_thread()
+        with self._cond:
+            if len(self._fila) >= self.capacidade:
+                if self.politica == 'descartar_antigos':
+                    self._fila.popleft()
+                    self._metricas["descartados"] += 1
+                elif self.politica == 'bloquear':
+                    self._cond.notify_all()
+                    self._cond.wait_for(lambda: len(self._fila) < self.capacidade, timeout=self.espera_maxima)
+                if len(self._fila) >= self.capacidade:
+                    self._metricas["descartados"] += 1
+                    return False
+            self._fila.append((time.monotonic(), evento))
+            self._metricas["enfileirados"] += 1
+            if len(self._fila) >= self.tamanho_lote:
+                self._cond.notify_all()
+        return True
+
+    # ========== CONSUMIDOR (thread de escrita) ==========
+
+    def _garantir_thread(self) -> None:
+        # Depois de um fork (gunicorn) a thread do processo pai não existe no filho
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._parando = False
+            self._thread = threading.Thread(target=self._loop, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _retirar_lote(self) -> List:
+        lote = []
+        while self._fila and len(lote) < self.tamanho_lote:
+            lote.append(self._fila.popleft())
+        self._gravando = len(lote)
+        return lote
+
+    def _gravar(self, lote: List) -> bool:
+        try:
+            self.gravar_lote([evento for _, evento in lote])
+        except Exception as e:
+            print(f"⚠️ [AUDIT] Falha ao gravar lote de {len(lote)} logs: {e}")
+            with self._cond:
+                self._metricas["falhas"] += 1
+                # Devolve à frente da fila (mantém a ordem) respeitando a capacidade
+                espaco = max(0, self.capacidade - len(self._fila))
+                self._fila.extendleft(reversed(lote[:espaco]))
+                self._metricas["descartados"] += len(lote) - min(len(lote), espaco)
+                self._gravando = 0
+            return False
+        agora = time.monotonic()
+        atraso = (agora - lote[0][0]) * 1000
+        with self._cond:
+            self._metricas["gravados"] += len(lote)
+            self._metricas["lotes"] += 1
+            self._metricas["atraso_ultimo_ms"] = round(atraso, 1)
+            self._metricas["atraso_max_ms"] = round(max(self._metricas["atraso_max_ms"], atraso), 1)
+            self._gravando = 0
+            self._cond.notify_all()
+        return True
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._parando or len(self._fila) >= self.tamanho_lote,
+                                    timeout=self.intervalo)
+                lote = self._retirar_lote()
+                parando = self._parando
+            if lote and not self._gravar(lote):
+                # Banco indisponível: espera um intervalo antes de tentar de novo
+                time.sleep(self.intervalo)
+            if parando and not lote:
+                return
+
+    # ========== CONTROLE ==========
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a fila esvaziar (True) ou o timeout (False)"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            # Sem thread de escrita neste processo: grava aqui mesmo
+            with self._cond:
+                pendentes = list(self._fila)
+                self._fila.clear()
+            for i in range(0, len(pendentes), self.tamanho_lote):
+                self._gravar(pendentes[i:i + self.tamanho_lote])
+            return not self._fila
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._fila and not self._gravando, timeout=timeout)
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """Grava o que estiver na fila e encerra a thread (registrado no atexit)"""
+        if self._thread is None or self._pid != os.getpid():
+            self.flush(timeout)
+            return
+        with self._cond:
+            self._parando = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._fila:
+            self.flush(timeout)
+
+    def metricas(self) -> Dict:
+        with self._cond:
+            dados = dict(self._metricas)
+            dados["fila"] = len(self._fila)
+            dados["capacidade"] = self.capacidade
+            dados["politica"] = self.politica
+            dados["idade_mais_antigo_ms"] = round((time.monotonic() - self._fila[0][0]) * 1000, 1) if self._fila else 0.0
+        return dados
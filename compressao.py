@@ -0,0 +1,184 @@
+"""
+Compressão das respostas do Flask (gzip; brotli se o módulo estiver instalado)
+Só entram tipos de texto da lista permitida e corpos com pelo menos
+`tamanho_minimo` bytes. Respostas em streaming (CSV da auditoria) são
+comprimidas bloco a bloco. Passam intactas: Server-Sent Events (fora da
+lista), respostas já codificadas (bundles pré-comprimidos de /assets),
+arquivos enviados com send_file e Cache-Control: no-transform.
+
+O ETag forte de uma resposta comprimida vira fraco (W/"..."): o corpo muda,
+a versão representada não, e o If-None-Match usa comparação fraca.
+
+Métricas por rota (endpoint do Flask): respostas, comprimidas, bytes antes e
+depois da compressão e tempo gasto comprimindo.
+"""
+
+import gzip
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há gzip
+    brotli = None
+
+TIPOS_PADRAO = (
+    'application/json', 'application/javascript', 'application/xml',
+    'text/html', 'text/css', 'text/csv', 'text/plain', 'text/xml', 'image/svg+xml',
+)
+
+
+def pesos_codificacao(accept_encoding: str) -> Dict[str, float]:
+    """{codificação: q} do Accept-Encoding; q=0 (ou q inválido) recusa a codificação"""
+    aceitas = {}
+    for parte in (accept_encoding or '').split(','):
+        nome, _, parametros = parte.partition(';')
+        peso = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        aceitas[nome.strip().lower()] = peso
+    return aceitas
+
+
+class CompressaoRespostas:
+    def __init__(self, tamanho_minimo: int = 1024, nivel_gzip: int = 6, qualidade_brotli: int = 4,
+                 tipos: Iterable[str] = TIPOS_PADRAO, usar_brotli: bool = True, ativo: bool = True):
+        self.tamanho_minimo = tamanho_minimo
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_brotli = qualidade_brotli
+        self.tipos = frozenset(tipos)
+        self.usar_brotli = usar_brotli and brotli is not None
+        self.ativo = ativo
+        self._metricas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def codificacao(self, accept_encoding: str) -> Optional[str]:
+        """'br', 'gzip' ou None conforme o Accept-Encoding (respeita q=0)"""
+        aceitas = pesos_codificacao(accept_encoding)
+        if self.usar_brotli and aceitas.get('br', 0) > 0:
+            return 'br'
+        if aceitas.get('gzip', 0) > 0:
+            return 'gzip'
+        return None
+
+    # ========== MIDDLEWARE (after_request) ==========
+
+    def processar(self, response, accept_encoding: str, metodo: str, rota: str):
+        """Comprime a resposta no lugar, se couber, e a devolve"""
+        if (not self.ativo or metodo == 'HEAD'
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.mimetype not in self.tipos
+                or 'Content-Encoding' in response.headers
+                or 'no-transform' in (response.headers.get('Cache-Control') or '')
+                or response.direct_passthrough):
+            return response
+
+        # A representação depende do Accept-Encoding mesmo quando não comprimimos
+        response.vary.add('Accept-Encoding')
+        codificacao = self.codificacao(accept_encoding)
+
+        if response.is_streamed:
+            if codificacao:
+                self._comprimir_stream(response, codificacao, rota)
+            return response
+
+        dados = response.get_data()
+        if not codificacao or len(dados) < self.tamanho_minimo:
+            self._registrar(rota, len(dados), len(dados), 0.0, comprimida=False)
+            return response
+
+        inicio = time.perf_counter()
+        if codificacao == 'br':
+            comprimido = brotli.compress(dados, quality=self.qualidade_brotli)
+        else:
+            comprimido = gzip.compress(dados, compresslevel=self.nivel_gzip, mtime=0)
+        duracao = time.perf_counter() - inicio
+        if len(comprimido) >= len(dados):
+            self._registrar(rota, len(dados), len(dados), duracao, comprimida=False)
+            return response
+
+        response.set_data(comprimido)
+        response.headers['Content-Encoding'] = codificacao
+        self._enfraquecer_etag(response)
+        self._registrar(rota, len(dados), len(comprimido), duracao, comprimida=True)
+        return response
+
+    @staticmethod
+    def _enfraquecer_etag(response) -> None:
+        etag, fraco = response.get_etag()
+        if etag and not fraco:
+            response.set_etag(etag, weak=True)
+
+    def _comprimir_stream(self, response, codificacao: str, rota: str) -> None:
+        original = response.response
+        response.response = self._blocos_comprimidos(original, codificacao, rota)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = codificacao
+        self._enfraquecer_etag(response)
+
+    def _blocos_comprimidos(self, original, codificacao: str, rota: str) -> Iterator[bytes]:
+        if codificacao == 'br':
+            compressor = brotli.Compressor(quality=self.qualidade_brotli)
+            comprimir, finalizar = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.nivel_gzip, zlib.DEFLATED, 31)  # 31: cabeçalho gzip
+            comprimir, finalizar = compressor.compress, compressor.flush
+        antes = depois = 0
+        duracao = 0.0
+        try:
+            for parte in original:
+                if isinstance(parte, str):
+                    parte = parte.encode('utf-8')
+                inicio = time.perf_counter()
+                bloco = comprimir(parte)
+                duracao += time.perf_counter() - inicio
+                antes += len(parte)
+                if bloco:
+                    depois += len(bloco)
+                    yield bloco
+            bloco = finalizar()
+            depois += len(bloco)
+            yield bloco
+        finally:
+            if hasattr(original, 'close'):
+                original.close()
+            self._registrar(rota, antes, depois, duracao, comprimida=True)
+
+    # ========== MÉTRICAS ==========
+
+    def _registrar(self, rota: str, antes: int, depois: int, duracao: float, comprimida: bool) -> None:
+        with self._lock:
+            item = self._metricas.setdefault(rota, {
+                "respostas": 0, "comprimidas": 0, "bytes_originais": 0,
+                "bytes_enviados": 0, "tempo_ms": 0.0,
+            })
+            item["respostas"] += 1
+            item["comprimidas"] += int(comprimida)
+            item["bytes_originais"] += antes
+            item["bytes_enviados"] += depois
+            item["tempo_ms"] += duracao * 1000
+
+    def metricas(self) -> Dict:
+        """Bytes economizados por rota neste processo (maior economia primeiro)"""
+        with self._lock:
+            rotas = {rota: dict(item) for rota, item in self._metricas.items()}
+        total = {"respostas": 0, "comprimidas": 0, "bytes_originais": 0, "bytes_enviados": 0, "tempo_ms": 0.0}
+        for item in rotas.values():
+            for chave in total:
+                total[chave] += item[chave]
+        for item in list(rotas.values()) + [total]:
+            item["bytes_economizados"] = item["bytes_originais"] - item["bytes_enviados"]
+            item["taxa"] = round(item["bytes_enviados"] / item["bytes_originais"], 3) if item["bytes_originais"] else None
+            item["tempo_ms"] = round(item["tempo_ms"], 1)
+        return {
+            "tamanho_minimo": self.tamanho_minimo,
+            "brotli": self.usar_brotli,
+            "total": total,
+            "rotas": dict(sorted(rotas.items(), key=lambda kv: kv[1]["bytes_economizados"], reverse=True)),
+        }
@@ -5,6 +5,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from contextlib import contextmanager
+from contextvars import ContextVar
 import os
 from dotenv import load_dotenv
 
@@ -39,6 +40,62 @@ Session = scoped_session(SessionLocal)
 # Base para modelos ORM
 Base = declarative_base()
 
+class UnidadeDeTrabalho:
+    """
+    Sessão compartilhada por todos os repositories durante uma requisição HTTP.
+    A sessão só é aberta no primeiro acesso ao banco e é confirmada uma única
+    vez ao final da requisição (commit/rollback feitos por quem a iniciou).
+    """
+
+    def __init__(self):
+        self.session = None
+
+    def obter_sessao(self):
+        if self.session is None:
+            self.session = SessionLocal()
+        return self.session
+
+    def commit(self):
+        if self.session is not None:
+            self.session.commit()
+
+    def rollback(self):
+        if self.session is not None:
+            self.session.rollback()
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+_unidade_atual = ContextVar('unidade_de_trabalho', default=None)
+
+def iniciar_unidade_de_trabalho():
+    """Associa uma nova unidade de trabalho ao contexto atual; retorna o token para finalizar"""
+    return _unidade_atual.set(UnidadeDeTrabalho())
+
+def unidade_de_trabalho_atual():
+    """Unidade de trabalho do contexto atual (None fora de requisição)"""
+    return _unidade_atual.get()
+
+def finalizar_unidade_de_trabalho(token, commit=True):
+    """Confirma (ou desfaz) e fecha a unidade de trabalho iniciada com `token`"""
+    unidade = _unidade_atual.get()
+    try:
+        if unidade is not None:
+            if commit:
+                unidade.commit()
+            else:
+                unidade.rollback()
+    except Exception:
+        unidade.rollback()
+        raise
+    finally:
+        if unidade is not None:
+            unidade.close()
+        _unidade_atual.reset(token)
+
 @contextmanager
 def get_db_session():
     """
@@ -50,7 +107,21 @@ def get_db_session():
             # ... operações
             # commit automático no sucesso
             # rollback automático em exceção
+    
+    Dentro de uma unidade de trabalho (requisição HTTP) a sessão da requisição
+    é reutilizada e o commit fica para o final da requisição; uma exceção
+    desfaz a unidade inteira.
     """
+    unidade = _unidade_atual.get()
+    if unidade is not None:
+        session = unidade.obter_sessao()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        return
+    
     session = Session()
     try:
         yield session
@@ -6,6 +6,12 @@
 -- Extensões úteis
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pg_trgm";  -- Para busca fuzzy
+CREATE EXTENSION IF NOT EXISTS "unaccent";  -- Busca sem acentos ("Conceição" = "conceicao")
+
+-- unaccent() é STABLE (depende do dicionário); o wrapper IMMUTABLE permite usá-lo em índices
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
 
 -- ============================================================
 -- HIERARQUIA ORGANIZACIONAL
@@ -213,9 +219,21 @@ CREATE TABLE IF NOT EXISTS usuarios (
 -- LOGS DE AUDITORIA
 -- ============================================================
 
+-- Particionada por mês (RANGE em timestamp): retenção = DROP da partição inteira
+-- e consultas com período leem só as partições do intervalo (partition pruning)
+
+-- Instalações antigas: a tabela comum vira logs_auditoria_legado e é copiada mais abaixo
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'logs_auditoria' AND relkind = 'r') THEN
+        ALTER TABLE logs_auditoria RENAME TO logs_auditoria_legado;
+        DROP INDEX IF EXISTS idx_logs_timestamp, idx_logs_usuario, idx_logs_tipo, idx_logs_categoria;
+    END IF;
+END $$;
+
 CREATE TABLE IF NOT EXISTS logs_auditoria (
-    id VARCHAR(50) PRIMARY KEY,
-    timestamp TIMESTAMPTZ DEFAULT NOW(),
+    id VARCHAR(50) NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     tipo VARCHAR(20) NOT NULL,  -- login, logout, create, update, delete
     categoria VARCHAR(50) NOT NULL,  -- autenticacao, organista, escala, etc
     usuario_id VARCHAR(50),
@@ -229,8 +247,97 @@ CREATE TABLE IF NOT EXISTS logs_auditoria (
     ip VARCHAR(50),
     user_agent TEXT,
     status VARCHAR(20),  -- sucesso, falha, erro
-    mensagem_erro TEXT
-);
+    mensagem_erro TEXT,
+    PRIMARY KEY (id, timestamp)  -- a chave de partição precisa fazer parte da PK
+) PARTITION BY RANGE (timestamp);
+
+-- Linhas fora das partições mensais existentes (mês sem partição na hora do INSERT).
+-- criar_particao_logs move essas linhas para a partição do mês quando ela é criada.
+CREATE TABLE IF NOT EXISTS logs_auditoria_default PARTITION OF logs_auditoria DEFAULT;
+
+-- Cria (se não existir) a partição logs_auditoria_AAAA_MM do mês de `mes`.
+-- Se a DEFAULT já tem linhas desse mês, o CREATE ... PARTITION OF falharia: a partição
+-- é criada como tabela avulsa, recebe as linhas (removidas da DEFAULT) e é anexada.
+CREATE OR REPLACE FUNCTION criar_particao_logs(mes DATE) RETURNS TEXT AS $$
+DECLARE
+    inicio DATE := date_trunc('month', mes)::date;
+    fim DATE := (date_trunc('month', mes) + INTERVAL '1 month')::date;
+    nome TEXT := 'logs_auditoria_' || to_char(mes, 'YYYY_MM');
+BEGIN
+    -- Vários workers podem fazer a manutenção ao mesmo tempo
+    PERFORM pg_advisory_xact_lock(hashtext('logs_auditoria_particoes'));
+    IF to_regclass(nome) IS NOT NULL THEN
+        RETURN nome;
+    END IF;
+    IF EXISTS (SELECT 1 FROM logs_auditoria_default WHERE timestamp >= inicio AND timestamp < fim) THEN
+        EXECUTE format('CREATE TABLE %I (LIKE logs_auditoria INCLUDING DEFAULTS)', nome);
+        EXECUTE format(
+            'WITH movidas AS (DELETE FROM logs_auditoria_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM movidas',
+            inicio, fim, nome
+        );
+        EXECUTE format(
+            'ALTER TABLE logs_auditoria ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            nome, inicio, fim
+        );
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF logs_auditoria FOR VALUES FROM (%L) TO (%L)',
+            nome, inicio, fim
+        );
+    END IF;
+    RETURN nome;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Garante as partições do mês atual e dos próximos `meses_a_frente` meses
+CREATE OR REPLACE FUNCTION criar_particoes_logs(meses_a_frente INT DEFAULT 2) RETURNS SETOF TEXT AS $$
+    SELECT criar_particao_logs((date_trunc('month', NOW()) + make_interval(months => n))::date)
+    FROM generate_series(0, meses_a_frente) AS n;
+$$ LANGUAGE sql;
+
+-- Remove (DETACH + DROP) as partições mensais anteriores aos últimos `meses_retencao` meses
+CREATE OR REPLACE FUNCTION remover_particoes_logs(meses_retencao INT) RETURNS SETOF TEXT AS $$
+DECLARE
+    corte DATE := (date_trunc('month', NOW()) - make_interval(months => meses_retencao))::date;
+    particao RECORD;
+BEGIN
+    FOR particao IN
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'logs_auditoria' AND c.relname ~ '^logs_auditoria_[0-9]{4}_[0-9]{2}$'
+    LOOP
+        IF to_date(substr(particao.relname, 16), 'YYYY_MM') < corte THEN
+            EXECUTE format('ALTER TABLE logs_auditoria DETACH PARTITION %I', particao.relname);
+            EXECUTE format('DROP TABLE %I', particao.relname);
+            RETURN NEXT particao.relname;
+        END IF;
+    END LOOP;
+    -- Linhas antigas que ficaram na DEFAULT seguem a mesma retenção
+    DELETE FROM logs_auditoria_default WHERE timestamp < corte;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Meses seguintes: o app chama criar_particoes_logs/remover_particoes_logs pela thread de
+-- escrita da auditoria, no máximo a cada 6 h por processo (_manter_particoes_postgres)
+SELECT criar_particoes_logs(2);
+
+-- Cópia da tabela antiga (uma partição por mês presente nos dados)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'logs_auditoria_legado' AND relkind = 'r') THEN
+        PERFORM criar_particao_logs(mes::date)
+        FROM (SELECT DISTINCT date_trunc('month', timestamp) AS mes
+              FROM logs_auditoria_legado WHERE timestamp IS NOT NULL) meses;
+        INSERT INTO logs_auditoria
+        SELECT id, COALESCE(timestamp, NOW()), tipo, categoria, usuario_id, usuario_nome, usuario_tipo,
+               acao, descricao, contexto, dados_antes, dados_depois, ip, user_agent, status, mensagem_erro
+        FROM logs_auditoria_legado
+        ON CONFLICT DO NOTHING;
+        DROP TABLE logs_auditoria_legado;
+    END IF;
+END $$;
 
 -- ============================================================
 -- ÍNDICES PARA PERFORMANCE
@@ -244,16 +351,22 @@ CREATE INDEX IF NOT EXISTS idx_comuns_sub_regional ON comuns(sub_regional_id);
 CREATE INDEX IF NOT EXISTS idx_organistas_comum ON organistas(comum_id);
 CREATE INDEX IF NOT EXISTS idx_organistas_tipo ON organistas(tipo_id);
 CREATE INDEX IF NOT EXISTS idx_organistas_ativo ON organistas(ativo);
-CREATE INDEX IF NOT EXISTS idx_organistas_nome ON organistas USING gin(nome gin_trgm_ops);
+-- Busca (OrganistaRepository.search): trigramas sobre o nome sem acento e o telefone só com dígitos
+CREATE INDEX IF NOT EXISTS idx_organistas_nome_trgm ON organistas USING gin (f_unaccent(lower(nome)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_organistas_telefone_trgm ON organistas USING gin (regexp_replace(telefone, '\D', '', 'g') gin_trgm_ops);
 
 -- Escalas
 CREATE INDEX IF NOT EXISTS idx_escala_comum ON escala(comum_id);
 CREATE INDEX IF NOT EXISTS idx_escala_data ON escala(data);
 CREATE INDEX IF NOT EXISTS idx_escala_comum_data ON escala(comum_id, data);
 CREATE INDEX IF NOT EXISTS idx_escala_organista ON escala(organista_id);
+-- Consultas por mês usam intervalo semiaberto em data (data >= inicio AND data < fim)
+CREATE INDEX IF NOT EXISTS idx_escala_comum_data_horario ON escala(comum_id, data, horario);
+CREATE INDEX IF NOT EXISTS idx_escala_organista_data ON escala(organista_id, data) INCLUDE (tipo);
 
 CREATE INDEX IF NOT EXISTS idx_escala_rjm_comum ON escala_rjm(comum_id);
 CREATE INDEX IF NOT EXISTS idx_escala_rjm_data ON escala_rjm(data);
+CREATE INDEX IF NOT EXISTS idx_escala_rjm_comum_data ON escala_rjm(comum_id, data, horario);
 
 -- Indisponibilidades
 CREATE INDEX IF NOT EXISTS idx_indisponibilidades_organista ON indisponibilidades(organista_id);
@@ -269,7 +382,7 @@ CREATE INDEX IF NOT EXISTS idx_usuarios_username ON usuarios(username);
 CREATE INDEX IF NOT EXISTS idx_usuarios_nivel ON usuarios(nivel);
 CREATE INDEX IF NOT EXISTS idx_usuarios_contexto ON usuarios(contexto_id);
 
--- Logs
+-- Logs (criados na tabela particionada, propagados para cada partição)
 CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs_auditoria(timestamp);
 CREATE INDEX IF NOT EXISTS idx_logs_usuario ON logs_auditoria(usuario_id);
 CREATE INDEX IF NOT EXISTS idx_logs_tipo ON logs_auditoria(tipo);
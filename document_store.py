@@ -0,0 +1,360 @@
+"""
+Document store particionado por comum
+Substitui o db.json monolítico: cada comum fica em um arquivo próprio
+(com lock próprio) e a hierarquia/usuários ficam em um índice pequeno.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import portalocker
+
+CHAVE_AUDITORIA = 'logs_auditoria'
+
+
+class ConflitoVersao(Exception):
+    """A partição foi gravada por outra requisição depois do load que originou a alteração"""
+
+    def __init__(self, particao: str, esperada: int, atual: int):
+        super().__init__(f"Partição {particao} na versão {atual}, esperada {esperada}")
+        self.particao = particao
+        self.esperada = esperada
+        self.atual = atual
+
+
+def _digest(dados) -> str:
+    return hashlib.sha1(json.dumps(dados, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _copiar(obj):
+    """Cópia profunda para estruturas JSON (bem mais rápida que copy.deepcopy)"""
+    if isinstance(obj, dict):
+        return {k: _copiar(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_copiar(v) for v in obj]
+    return obj
+
+
+class Documento(dict):
+    """
+    Documento montado; `versao` identifica as versões das partições que o compõem,
+    `versoes_comuns` guarda a versão lida de cada comum e `digests` o conteúdo
+    lido de cada partição (comum, 'index', auditoria), para o save gravar só o
+    que esta requisição alterou.
+    """
+    versao: Optional[tuple] = None
+    versoes_comuns: Dict[str, int] = {}
+    versoes_particoes: Optional[Dict[str, int]] = None
+    digests: Optional[Dict[str, str]] = None
+
+    def registrar_gravacao(self, comum_id: str, comum: Dict, versao: int) -> None:
+        """Após um save_comum fora do save(): o documento passa a refletir a versão gravada"""
+        if self.digests is None:
+            return
+        self.versoes_comuns[comum_id] = versao
+        self.digests[comum_id] = _digest(comum)
+
+
+DB_PADRAO = {
+    "organistas": [], "indisponibilidades": [], "escala": [], "escala_rjm": [], "logs": [],
+    "config": {"bimestre": {"inicio": "2025-10-01", "fim": "2025-11-30"},
+               "fechamento_publicacao_dias": 3}
+}
+
+
+class DocumentStore:
+    """
+    Armazena o documento do sistema em partições:
+
+        <base_dir>/index.json          hierarquia (comuns só como lista de chaves), usuários, etc
+        <base_dir>/comuns/<id>.json    documento completo de uma comum
+        <base_dir>/auditoria.json      logs de auditoria
+        <base_dir>/locks/*.lock        um lock por partição
+
+    Cada partição é gravada como {"versao": n, "dados": {...}} e a versão
+    é incrementada a cada escrita.
+
+    Leituras passam por um cache em memória (por processo) validado pela
+    assinatura do arquivo (inode, mtime, tamanho). Como toda escrita é um
+    os.replace, outro worker que grave a partição muda o inode e invalida
+    o cache dos demais sem nenhuma coordenação extra.
+    """
+
+    def __init__(self, base_dir: str = "data/store", legacy_path: str = "data/db.json"):
+        self.base_dir = base_dir
+        self.legacy_path = legacy_path
+        self.comuns_dir = os.path.join(base_dir, 'comuns')
+        self.locks_dir = os.path.join(base_dir, 'locks')
+        self.index_path = os.path.join(base_dir, 'index.json')
+        self.auditoria_path = os.path.join(base_dir, 'auditoria.json')
+        # path -> (assinatura, versao, dados, digest)
+        self._cache: Dict[str, Tuple[tuple, int, object, str]] = {}
+        self._cache_lock = threading.Lock()
+
+    # ========== CAMINHOS E LOCKS ==========
+
+    def _comum_path(self, comum_id: str) -> str:
+        return os.path.join(self.comuns_dir, quote(comum_id, safe='') + '.json')
+
+    @contextmanager
+    def _lock(self, nome: str, exclusivo: bool):
+        os.makedirs(self.locks_dir, exist_ok=True)
+        lock_path = os.path.join(self.locks_dir, quote(nome, safe='') + '.lock')
+        with open(lock_path, 'a') as lf:
+            portalocker.lock(lf, portalocker.LOCK_EX if exclusivo else portalocker.LOCK_SH)
+            try:
+                yield
+            finally:
+                portalocker.unlock(lf)
+
+    # ========== LEITURA/ESCRITA DE PARTIÇÕES ==========
+
+    def _ler(self, path: str) -> Tuple[int, Optional[object]]:
+        """Retorna (versao, dados) de uma partição; (0, None) se não existir"""
+        if not os.path.exists(path):
+            return 0, None
+        with open(path, 'r', encoding='utf-8') as f:
+            envelope = json.load(f)
+        return envelope.get('versao', 0), envelope.get('dados')
+
+    @staticmethod
+    def _assinatura(path: str) -> Optional[tuple]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _ler_cache(self, path: str, lock_nome: Optional[str]) -> Tuple[int, Optional[object]]:
+        """
+        Retorna (versao, dados) da partição usando o cache quando a assinatura
+        do arquivo não mudou. Os dados retornados são do cache: não alterar.
+        Com lock_nome, o arquivo é relido sob lock compartilhado em caso de miss;
+        sem lock_nome, o chamador já detém o lock da partição.
+        """
+        versao, dados, _ = self._entrada_cache(path, lock_nome)
+        return versao, dados
+
+    def _entrada_cache(self, path: str, lock_nome: Optional[str]) -> Tuple[int, Optional[object], Optional[str]]:
+        """Como _ler_cache, mais o digest do conteúdo (calculado uma vez por leitura do disco)"""
+        assinatura = self._assinatura(path)
+        if assinatura is None:
+            return 0, None, None
+        entrada = self._cache.get(path)
+        if entrada and entrada[0] == assinatura:
+            return entrada[1], entrada[2], entrada[3]
+
+        if lock_nome:
+            with self._lock(lock_nome, False):
+                assinatura = self._assinatura(path)
+                versao, dados = self._ler(path)
+        else:
+            versao, dados = self._ler(path)
+        digest = _digest(dados)
+        with self._cache_lock:
+            self._cache[path] = (assinatura, versao, dados, digest)
+        return versao, dados, digest
+
+    def _gravar(self, path: str, versao: int, dados) -> str:
+        """Escrita atômica (temp + replace), com fallback para escrita direta"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        envelope = {"versao": versao, "dados": dados}
+        try:
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.json', text=True)
+            try:
+                with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+                    json.dump(envelope, f, ensure_ascii=False)
+                os.replace(temp_path, path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    try:
+                        os.unlink(temp_path)
+                    except OSError:
+                        pass
+                raise
+        except Exception as atomic_err:
+            # Volumes montados (Docker) às vezes não permitem rename
+            print(f"⚠️ Atomic write falhou, usando write direto: {atomic_err}")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(envelope, f, ensure_ascii=False)
+        # Chamado sob o lock exclusivo da partição: o cache já recebe a nova versão
+        digest = _digest(dados)
+        with self._cache_lock:
+            self._cache[path] = (self._assinatura(path), versao, _copiar(dados), digest)
+        return digest
+
+    # ========== SEPARAÇÃO DO DOCUMENTO ==========
+
+    def _separar(self, db: Dict) -> Tuple[Dict, Dict[str, Dict], Optional[List]]:
+        """Divide o documento completo em (índice, comuns, logs de auditoria)"""
+        raiz = {k: v for k, v in db.items() if k not in ('regionais', CHAVE_AUDITORIA)}
+        comuns = {}
+        if 'regionais' in db:
+            regionais = {}
+            for regional_id, regional in db['regionais'].items():
+                subs = {}
+                for sub_id, sub in regional.get('sub_regionais', {}).items():
+                    chaves = []
+                    for comum_id, comum in sub.get('comuns', {}).items():
+                        chaves.append(comum_id)
+                        comuns[comum_id] = comum
+                    subs[sub_id] = {**sub, 'comuns': chaves}
+                regionais[regional_id] = {**regional, 'sub_regionais': subs}
+            raiz['regionais'] = regionais
+        return raiz, comuns, db.get(CHAVE_AUDITORIA)
+
+    def _garantir_migracao(self) -> None:
+        """Na primeira execução, divide o db.json legado em partições"""
+        if os.path.exists(self.index_path) or not os.path.exists(self.legacy_path):
+            return
+        with self._lock('index', True):
+            if os.path.exists(self.index_path):
+                return
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                db = json.load(f)
+            raiz, comuns, logs = self._separar(db)
+            for comum_id, comum in comuns.items():
+                self._gravar(self._comum_path(comum_id), 1, comum)
+            self._gravar(self.auditoria_path, 1, logs or [])
+            self._gravar(self.index_path, 1, raiz)
+            print(f"📦 [STORE] db.json migrado para {len(comuns)} partições em {self.base_dir}")
+
+    # ========== API PÚBLICA ==========
+
+    def load(self) -> Dict:
+        """Monta o documento completo (compatível com o antigo load_db)"""
+        self._garantir_migracao()
+        versao_index, raiz, digest_index = self._entrada_cache(self.index_path, 'index')
+        if raiz is None:
+            return Documento(_copiar(DB_PADRAO))
+
+        db = Documento(_copiar(raiz))
+        versoes = [versao_index]
+        versoes_comuns = {}
+        digests = {'index': digest_index}
+        for regional in db.get('regionais', {}).values():
+            for sub in regional.get('sub_regionais', {}).values():
+                comuns = {}
+                for comum_id in sub.get('comuns', []):
+                    versao, dados, digest = self._entrada_cache(self._comum_path(comum_id), comum_id)
+                    comuns[comum_id] = _copiar(dados) or {}
+                    versoes.append(versao)
+                    versoes_comuns[comum_id] = versao
+                    digests[comum_id] = digest
+                sub['comuns'] = comuns
+        versao_logs, logs, digests[CHAVE_AUDITORIA] = self._entrada_cache(self.auditoria_path, CHAVE_AUDITORIA)
+        db[CHAVE_AUDITORIA] = _copiar(logs or [])
+        if "escala_rjm" not in db:
+            db["escala_rjm"] = []
+        db.versao = tuple(versoes)
+        db.versoes_comuns = versoes_comuns
+        db.versoes_particoes = {'index': versao_index, CHAVE_AUDITORIA: versao_logs}
+        db.digests = digests
+        return db
+
+    def save(self, db: Dict) -> None:
+        """
+        Persiste o documento completo.
+
+        Com um Documento vindo do load(), grava só as partições que esta
+        requisição alterou (conteúdo diferente do lido) e levanta ConflitoVersao
+        se alguma delas foi gravada por outra requisição depois do load: uma
+        cópia antiga nunca sobrescreve edições concorrentes. Um dict simples
+        (sem snapshot) grava o que difere do disco, sem verificação de versão.
+        """
+        self._garantir_migracao()
+        raiz, comuns, logs = self._separar(db)
+        digests = getattr(db, 'digests', None)
+        if digests is None:
+            for comum_id, comum in comuns.items():
+                self.save_comum(comum_id, comum, somente_se_alterado=True)
+            if logs is not None:
+                self._gravar_particao(CHAVE_AUDITORIA, self.auditoria_path, logs, None)
+            self._gravar_particao('index', self.index_path, raiz, None)
+            return
+
+        alteradas = {comum_id: comum for comum_id, comum in comuns.items()
+                     if _digest(comum) != digests.get(comum_id)}
+        logs_alterados = logs is not None and _digest(logs) != digests.get(CHAVE_AUDITORIA)
+        raiz_alterada = _digest(raiz) != digests.get('index')
+
+        # Verificação prévia (sem locks) para não gravar metade do documento antes
+        # de um conflito certo; a verificação definitiva é feita sob o lock de cada partição
+        for comum_id in alteradas:
+            esperada, atual = db.versoes_comuns.get(comum_id, 0), self.versao_comum(comum_id)
+            if atual != esperada:
+                raise ConflitoVersao(comum_id, esperada, atual)
+
+        for comum_id, comum in alteradas.items():
+            versao = self.save_comum(comum_id, comum, versao_esperada=db.versoes_comuns.get(comum_id, 0))
+            db.registrar_gravacao(comum_id, comum, versao)
+        if logs_alterados:
+            versao = self._gravar_particao(CHAVE_AUDITORIA, self.auditoria_path, logs,
+                                           db.versoes_particoes[CHAVE_AUDITORIA])
+            db.versoes_particoes[CHAVE_AUDITORIA] = versao
+            digests[CHAVE_AUDITORIA] = _digest(logs)
+        if raiz_alterada:
+            versao = self._gravar_particao('index', self.index_path, raiz, db.versoes_particoes['index'])
+            db.versoes_particoes['index'] = versao
+            digests['index'] = _digest(raiz)
+
+    def _gravar_particao(self, nome: str, path: str, dados, versao_esperada: Optional[int]) -> int:
+        """Grava índice/auditoria se o conteúdo difere do disco; retorna a versão resultante"""
+        with self._lock(nome, True):
+            versao, _, digest = self._entrada_cache(path, None)
+            if digest is not None and digest == _digest(dados):
+                return versao
+            if versao_esperada is not None and versao != versao_esperada:
+                raise ConflitoVersao(nome, versao_esperada, versao)
+            self._gravar(path, versao + 1, dados)
+        return versao + 1
+
+    def load_comum(self, comum_id: str) -> Optional[Dict]:
+        """Lê apenas a partição de uma comum (cópia independente do cache)"""
+        _, dados = self._ler_cache(self._comum_path(comum_id), comum_id)
+        return _copiar(dados)
+
+    def versao_comum(self, comum_id: str) -> int:
+        """Versão atual da partição de uma comum (0 se não existir)"""
+        versao, _ = self._ler_cache(self._comum_path(comum_id), comum_id)
+        return versao
+
+    def save_comum(self, comum_id: str, comum: Dict, somente_se_alterado: bool = False,
+                   versao_esperada: Optional[int] = None) -> int:
+        """
+        Grava apenas a partição de uma comum, sob o lock dessa comum, e retorna
+        a versão gravada (a atual, se nada foi gravado).
+        Edições em comuns diferentes nunca disputam o mesmo lock.
+        Com `versao_esperada` (a versão do load), levanta ConflitoVersao se outra
+        requisição gravou a comum nesse intervalo.
+        """
+        with self._lock(comum_id, True):
+            versao, atual, digest = self._entrada_cache(self._comum_path(comum_id), None)
+            if atual is not None and digest == _digest(comum):
+                if somente_se_alterado or versao_esperada is not None:
+                    return versao
+            if versao_esperada is not None and versao != versao_esperada:
+                raise ConflitoVersao(comum_id, versao_esperada, versao)
+            self._gravar(self._comum_path(comum_id), versao + 1, comum)
+        return versao + 1
+
+    def load_logs_auditoria(self) -> List[Dict]:
+        _, logs = self._ler_cache(self.auditoria_path, CHAVE_AUDITORIA)
+        return _copiar(logs or [])
+
+    def anexar_log_auditoria(self, log_entry: Dict, limite: int = 10000) -> None:
+        """Adiciona um log de auditoria sem tocar no índice nem nas comuns"""
+        self._garantir_migracao()
+        with self._lock(CHAVE_AUDITORIA, True):
+            versao, logs = self._ler_cache(self.auditoria_path, None)
+            logs = list(logs or [])
+            logs.append(log_entry)
+            if len(logs) > limite:
+                logs = logs[-limite:]
+            self._gravar(self.auditoria_path, versao + 1, logs)
@@ -27,11 +27,33 @@ chmod 644 /app/data/db.json 2>/dev/null || true
 
 echo -e "${GREEN}Sistema pronto! Iniciando servidor...${NC}"
 
+# Threads por worker: o app usa o mesmo valor para limitar os streams SSE
+export GUNICORN_THREADS="${GUNICORN_THREADS:-4}"
+
+# Gunicorn só para /eventos (Server-Sent Events, nginx roteia para a :8091).
+# Cada stream prende uma thread por até SSE_DURACAO_MAXIMA; num processo próprio
+# os streams não ocupam as threads dos workers que atendem o restante do app.
+if [ "${SSE_PROCESSO_SEPARADO:-1}" = "1" ]; then
+    SSE_THREADS="${SSE_THREADS:-32}"
+    echo -e "${GREEN}Iniciando processo de eventos (SSE) na porta 8091 com ${SSE_THREADS} threads...${NC}"
+    GUNICORN_THREADS="$SSE_THREADS" SSE_THREADS_LIVRES=2 gunicorn \
+        --bind 0.0.0.0:8091 \
+        --workers 1 \
+        --threads "$SSE_THREADS" \
+        --worker-class gthread \
+        --worker-tmp-dir /dev/shm \
+        --access-logfile - \
+        --error-logfile - \
+        --log-level info \
+        --timeout 120 \
+        app:app &
+fi
+
 # Iniciar aplicação com Gunicorn
 exec gunicorn \
     --bind 0.0.0.0:8090 \
     --workers 2 \
-    --threads 4 \
+    --threads "$GUNICORN_THREADS" \
     --worker-class gthread \
     --worker-tmp-dir /dev/shm \
     --access-logfile - \
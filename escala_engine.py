@@ -0,0 +1,408 @@
+"""
+Motor de geração de escala (Domingos: Meia-hora + Culto; Terças: organista única)
+Reimplementação de gerar_escala_automatica com bitsets: produz exatamente a
+mesma escala (e o mesmo log de decisões, quando pedido) que o algoritmo guloso
+original, sem reordenar candidatos a cada dia.
+
+Cada organista é um bit (posição = ordem na lista de organistas). A elegibilidade
+de cada vaga é uma máscara fixa (dias_permitidos × tipos) menos a máscara de
+indisponíveis da data. A justiça usa baldes por contagem: balde[n] = organistas
+que tocaram n vezes naquela vaga. O escolhido é o menor bit elegível no menor
+balde não vazio, o mesmo que o sort estável por contador + [0] do original.
+
+Regras especiais (validar_regras_especiais) estão desativadas no sistema e não
+são consideradas aqui.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DOMINGO = 6
+TERCA = 1
+
+
+def _bits(mascara: int):
+    """Índices dos bits ligados, em ordem crescente"""
+    while mascara:
+        menor = mascara & -mascara
+        yield menor.bit_length() - 1
+        mascara ^= menor
+
+
+def _como_data(valor) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.fromisoformat(valor).date()
+
+
+class _Justica:
+    """Contadores de uma vaga agrupados em baldes (contagem → máscara de organistas)"""
+
+    def __init__(self, total: int):
+        self.baldes: Dict[int, int] = {0: (1 << total) - 1} if total else {}
+        self.contagens = [0] * total
+
+    def escolher(self, elegiveis: int) -> Optional[int]:
+        for contagem in sorted(self.baldes):
+            candidatos = self.baldes[contagem] & elegiveis
+            if candidatos:
+                return (candidatos & -candidatos).bit_length() - 1
+        return None
+
+    def incrementar(self, indice: int) -> int:
+        contagem = self.contagens[indice]
+        bit = 1 << indice
+        restante = self.baldes[contagem] & ~bit
+        if restante:
+            self.baldes[contagem] = restante
+        else:
+            del self.baldes[contagem]
+        self.baldes[contagem + 1] = self.baldes.get(contagem + 1, 0) | bit
+        self.contagens[indice] = contagem + 1
+        return contagem + 1
+
+
+class MotorEscala:
+    """
+    Pré-computa as máscaras de elegibilidade de um conjunto de organistas.
+    Uma instância pode gerar vários períodos (cada chamada a gerar() recomeça
+    os contadores, como o algoritmo original).
+    """
+
+    def __init__(self, organistas: List[Dict], indisponibilidades: Iterable[Tuple[str, str]]):
+        self.organistas = organistas
+        self.nomes = [org["nome"] for org in organistas]
+        self.ids = [org["id"] for org in organistas]
+        self.total = len(organistas)
+
+        posicoes: Dict[str, int] = {}
+        self.mascara_mh = 0         # Domingo + Meia-hora
+        self.mascara_culto = 0      # Domingo + Culto
+        self.mascara_terca = 0      # Terça + Meia-hora + Culto
+        self.pode_mh = 0
+        self.pode_culto = 0
+        for i, org in enumerate(organistas):
+            bit = 1 << i
+            posicoes[org["id"]] = posicoes.get(org["id"], 0) | bit
+            dias = org["dias_permitidos"]
+            tipos = org["tipos"]
+            if "Meia-hora" in tipos:
+                self.pode_mh |= bit
+            if "Culto" in tipos:
+                self.pode_culto |= bit
+            if "Domingo" in dias:
+                if "Meia-hora" in tipos:
+                    self.mascara_mh |= bit
+                if "Culto" in tipos:
+                    self.mascara_culto |= bit
+            if "Terça" in dias and "Meia-hora" in tipos and "Culto" in tipos:
+                self.mascara_terca |= bit
+
+        # IDs repetidos compartilham contador no original: o motor não reproduz isso
+        self.ids_unicos = len(posicoes) == self.total
+
+        # data (YYYY-MM-DD) → máscara de organistas indisponíveis
+        self.indisponiveis: Dict[str, int] = {}
+        for org_id, data_str in indisponibilidades:
+            mascara = posicoes.get(org_id)
+            if mascara:
+                self.indisponiveis[data_str] = self.indisponiveis.get(data_str, 0) | mascara
+
+    def gerar(self, inicio, fim, com_logs: bool = False) -> Tuple[List[Dict], List[str]]:
+        """Escala de todos os domingos e terças em [inicio, fim] e log de decisões (se pedido)"""
+        inicio = _como_data(inicio)
+        fim = _como_data(fim)
+        logs: List[str] = []
+        escala: List[Dict] = []
+
+        justica_mh = _Justica(self.total)
+        justica_culto = _Justica(self.total)
+        justica_terca = _Justica(self.total)
+
+        # Primeiro domingo/terça do período; depois, passos de 7 dias intercalados
+        proximo = {
+            DOMINGO: inicio + timedelta(days=(DOMINGO - inicio.weekday()) % 7),
+            TERCA: inicio + timedelta(days=(TERCA - inicio.weekday()) % 7),
+        }
+        semana = timedelta(days=7)
+        while True:
+            dia_semana = min(proximo, key=proximo.get)
+            dia = proximo[dia_semana]
+            if dia > fim:
+                break
+            proximo[dia_semana] = dia + semana
+            data_str = dia.strftime('%Y-%m-%d')
+            indisponiveis = self.indisponiveis.get(data_str, 0)
+            if dia_semana == DOMINGO:
+                escala.append(self._domingo(data_str, indisponiveis, justica_mh, justica_culto,
+                                            logs if com_logs else None))
+            else:
+                escala.append(self._terca(data_str, indisponiveis, justica_terca,
+                                          logs if com_logs else None))
+
+        return escala, logs
+
+    def _domingo(self, data_str, indisponiveis, justica_mh, justica_culto, logs) -> Dict:
+        if logs is not None:
+            for i in _bits(self.mascara_mh & indisponiveis):
+                logs.append(f"{data_str}: {self.nomes[i]} indisponível (meia-hora)")
+            for i in _bits(self.mascara_culto & indisponiveis):
+                logs.append(f"{data_str}: {self.nomes[i]} indisponível (culto)")
+
+        meia_hora = culto = None
+        i_mh = justica_mh.escolher(self.mascara_mh & ~indisponiveis)
+        if i_mh is not None:
+            meia_hora = self.nomes[i_mh]
+            vezes = justica_mh.incrementar(i_mh)
+            if logs is not None:
+                logs.append(f"{data_str}: {meia_hora} → Meia-hora (tocou {vezes}x)")
+        elif logs is not None:
+            logs.append(f"{data_str}: ⚠️ NENHUM candidato para Meia-hora!")
+
+        i_culto = justica_culto.escolher(self.mascara_culto & ~indisponiveis)
+        if i_culto is not None:
+            culto = self.nomes[i_culto]
+            vezes = justica_culto.incrementar(i_culto)
+            if logs is not None:
+                logs.append(f"{data_str}: {culto} → Culto (tocou {vezes}x)")
+        elif logs is not None:
+            logs.append(f"{data_str}: ⚠️ NENHUM candidato para Culto!")
+
+        # RN05: sem meia-hora, quem está no culto cobre (se também for habilitada para meia-hora)
+        if not meia_hora and culto and i_culto is not None:
+            if self.pode_mh >> i_culto & 1:
+                meia_hora = culto
+                if logs is not None:
+                    logs.append(f"{data_str}: ℹ️ Culto cobre Meia-hora (RN05)")
+            elif logs is not None:
+                logs.append(f"{data_str}: ⚠️ Culto NÃO pode cobrir Meia-hora (não habilitado para esta fase)")
+
+        # RN06: sem culto, quem está na meia-hora cobre (se também for habilitada para culto)
+        if not culto and meia_hora and i_mh is not None:
+            if self.pode_culto >> i_mh & 1:
+                culto = meia_hora
+                if logs is not None:
+                    logs.append(f"{data_str}: ℹ️ Meia-hora cobre Culto (RN06)")
+            elif logs is not None:
+                logs.append(f"{data_str}: ⚠️ Meia-hora NÃO pode cobrir Culto (não habilitado para esta fase)")
+
+        return {"data": data_str, "dia_semana": "Sunday", "meia_hora": meia_hora, "culto": culto}
+
+    def _terca(self, data_str, indisponiveis, justica_terca, logs) -> Dict:
+        if logs is not None:
+            for i in _bits(self.mascara_terca & indisponiveis):
+                logs.append(f"{data_str}: {self.nomes[i]} indisponível (terça)")
+
+        i_escolhido = justica_terca.escolher(self.mascara_terca & ~indisponiveis)
+        if i_escolhido is None:
+            if logs is not None:
+                logs.append(f"{data_str}: ⚠️ NENHUM candidato para Terça!")
+            return {"data": data_str, "dia_semana": "Tuesday", "unica": None}
+
+        vezes = justica_terca.incrementar(i_escolhido)
+        if logs is not None:
+            logs.append(f"{data_str}: {self.nomes[i_escolhido]} → Terça (tocou {vezes}x)")
+        return {"data": data_str, "dia_semana": "Tuesday", "unica": self.nomes[i_escolhido]}
+
+
+def gerar_escala(organistas: List[Dict], indisponibilidades: Iterable[Tuple[str, str]],
+                 inicio, fim, com_logs: bool = True) -> Tuple[List[Dict], List[str]]:
+    """Atalho: monta o motor e gera o período"""
+    return MotorEscala(organistas, indisponibilidades).gerar(inicio, fim, com_logs=com_logs)
+
+
+def gerar_escala_comum(comum: Dict, inicio=None, fim=None, com_logs: bool = False) -> Tuple[List[Dict], List[str]]:
+    """Gera a escala de uma comum da estrutura hierárquica (período da config se não informado)"""
+    periodo = comum.get("config", {}).get("periodo") or comum.get("config", {}).get("bimestre") or {}
+    inicio = inicio or periodo.get("inicio")
+    fim = fim or periodo.get("fim")
+    if not inicio or not fim:
+        return [], []
+    indisponibilidades = [(i["id"], i["data"]) for i in comum.get("indisponibilidades", [])]
+    return gerar_escala(comum.get("organistas", []), indisponibilidades, inicio, fim, com_logs=com_logs)
+
+
+def gerar_escala_regional(regional: Dict, inicio, fim, com_logs: bool = False) -> Dict[str, Tuple[List[Dict], List[str]]]:
+    """Gera o mesmo período para todas as comuns de uma regional: {comum_id: (escala, logs)}"""
+    resultado = {}
+    for sub_regional in regional.get("sub_regionais", {}).values():
+        for comum_id, comum in sub_regional.get("comuns", {}).items():
+            resultado[comum_id] = gerar_escala_comum(comum, inicio, fim, com_logs=com_logs)
+    return resultado
+
+
+# ========== MODO ÓTIMO (fluxo de custo mínimo) ==========
+
+class TempoEsgotado(Exception):
+    """O solver ótimo excedeu o prazo; quem chamou usa o resultado guloso"""
+
+
+class _FluxoCustoMinimo:
+    """Caminhos mínimos sucessivos com potenciais (Dijkstra); custos iniciais não negativos"""
+
+    def __init__(self, nos: int):
+        self.adj: List[List[int]] = [[] for _ in range(nos)]
+        self.destino: List[int] = []
+        self.capacidade: List[int] = []
+        self.custo: List[int] = []
+
+    def arco(self, de: int, para: int, capacidade: int, custo: int) -> int:
+        indice = len(self.destino)
+        for origem, alvo, cap, c in ((de, para, capacidade, custo), (para, de, 0, -custo)):
+            self.adj[origem].append(len(self.destino))
+            self.destino.append(alvo)
+            self.capacidade.append(cap)
+            self.custo.append(c)
+        return indice
+
+    def resolver(self, s: int, t: int, limite_tempo: float) -> int:
+        import heapq
+        n = len(self.adj)
+        potencial = [0] * n
+        fluxo = 0
+        infinito = float('inf')
+        while True:
+            if time.perf_counter() > limite_tempo:
+                raise TempoEsgotado()
+            dist = [infinito] * n
+            anterior = [-1] * n
+            dist[s] = 0
+            fila = [(0, s)]
+            while fila:
+                d, u = heapq.heappop(fila)
+                if d > dist[u]:
+                    continue
+                for a in self.adj[u]:
+                    if self.capacidade[a] <= 0:
+                        continue
+                    v = self.destino[a]
+                    nd = d + self.custo[a] + potencial[u] - potencial[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        anterior[v] = a
+                        heapq.heappush(fila, (nd, v))
+            if dist[t] == infinito:
+                return fluxo
+            for v in range(n):
+                if dist[v] < infinito:
+                    potencial[v] += dist[v]
+            # Todos os arcos do grafo têm capacidade 1 no caminho s → t
+            v = t
+            while v != s:
+                a = anterior[v]
+                self.capacidade[a] -= 1
+                self.capacidade[a ^ 1] += 1
+                v = self.destino[a ^ 1]
+            fluxo += 1
+
+
+def gerar_escala_otima(motor: MotorEscala, inicio, fim, prazo_segundos: float = 2.0,
+                       com_logs: bool = False) -> Tuple[List[Dict], List[str]]:
+    """
+    Distribui todas as vagas do período (meia-hora, culto e terça juntas)
+    minimizando a variância do total de vagas por organista.
+
+    Modelo: fonte → vaga → (organista, data) → organista → sumidouro. O k-ésimo
+    arco organista → sumidouro custa 2k-1, então o custo total é Σ total², que
+    (com o número de vagas preenchidas fixo) minimiza a variância. Cada
+    organista toca no máximo uma vaga por data; tocar duas no mesmo domingo só
+    acontece por um arco de penalidade, quando não há outra forma de preencher.
+    As regras RN05/RN06 de cobertura são aplicadas depois, como no guloso.
+
+    Se o prazo estourar, devolve o resultado guloso (motor.gerar).
+    """
+    limite = time.perf_counter() + prazo_segundos
+    inicio_d, fim_d = _como_data(inicio), _como_data(fim)
+    base, _ = motor.gerar(inicio_d, fim_d, com_logs=False)
+
+    # Vagas: (posição na escala, campo, máscara de elegíveis)
+    vagas = []
+    for pos, dia in enumerate(base):
+        indisponiveis = motor.indisponiveis.get(dia["data"], 0)
+        if dia["dia_semana"] == "Sunday":
+            vagas.append((pos, "meia_hora", motor.mascara_mh & ~indisponiveis))
+            vagas.append((pos, "culto", motor.mascara_culto & ~indisponiveis))
+        else:
+            vagas.append((pos, "unica", motor.mascara_terca & ~indisponiveis))
+
+    try:
+        s, t = 0, 1
+        proximo_no = 2 + len(vagas)
+        no_organista = list(range(proximo_no, proximo_no + motor.total))
+        proximo_no += motor.total
+        no_organista_data: Dict[Tuple[int, int], int] = {}
+        arcos_vaga = []
+        for v, (pos, _, elegiveis) in enumerate(vagas):
+            for i in _bits(elegiveis):
+                if (i, pos) not in no_organista_data:
+                    no_organista_data[(i, pos)] = proximo_no
+                    proximo_no += 1
+                arcos_vaga.append((v, i, pos))
+
+        grafo = _FluxoCustoMinimo(proximo_no)
+        penalidade = 4 * (len(vagas) + 1) ** 2
+        for v in range(len(vagas)):
+            grafo.arco(s, 2 + v, 1, 0)
+        escolha: Dict[int, List[Tuple[int, int]]] = {}
+        for v, i, pos in arcos_vaga:
+            escolha.setdefault(v, []).append((grafo.arco(2 + v, no_organista_data[(i, pos)], 1, 0), i))
+        vagas_por_organista = [0] * motor.total
+        for (i, pos), no in no_organista_data.items():
+            grafo.arco(no, no_organista[i], 1, 0)
+            grafo.arco(no, no_organista[i], 1, penalidade)  # segunda vaga no mesmo dia
+            vagas_por_organista[i] += 2
+        for i in range(motor.total):
+            for k in range(1, vagas_por_organista[i] + 1):
+                grafo.arco(no_organista[i], t, 1, 2 * k - 1)
+
+        grafo.resolver(s, t, limite)
+    except TempoEsgotado:
+        escala, logs = motor.gerar(inicio_d, fim_d, com_logs=com_logs)
+        logs.append(f"⏱️ Modo ótimo excedeu {prazo_segundos:.1f}s: usando escala gulosa")
+        return escala, logs
+
+    escala = [dict(dia, meia_hora=None, culto=None) if dia["dia_semana"] == "Sunday"
+              else dict(dia, unica=None) for dia in base]
+    escolhidos: Dict[Tuple[int, str], int] = {}
+    for v, (pos, campo, _) in enumerate(vagas):
+        for arco, i in escolha.get(v, []):
+            if grafo.capacidade[arco] == 0:
+                escala[pos][campo] = motor.nomes[i]
+                escolhidos[(pos, campo)] = i
+                break
+
+    logs: List[str] = []
+    for pos, dia in enumerate(escala):
+        data_str = dia["data"]
+        if dia["dia_semana"] != "Sunday":
+            if com_logs:
+                logs.append(f"{data_str}: {dia['unica']} → Terça (ótimo)" if dia["unica"]
+                            else f"{data_str}: ⚠️ NENHUM candidato para Terça!")
+            continue
+        i_mh = escolhidos.get((pos, "meia_hora"))
+        i_culto = escolhidos.get((pos, "culto"))
+        if com_logs:
+            logs.append(f"{data_str}: {dia['meia_hora']} → Meia-hora (ótimo)" if dia["meia_hora"]
+                        else f"{data_str}: ⚠️ NENHUM candidato para Meia-hora!")
+            logs.append(f"{data_str}: {dia['culto']} → Culto (ótimo)" if dia["culto"]
+                        else f"{data_str}: ⚠️ NENHUM candidato para Culto!")
+        # RN05/RN06: mesma cobertura do guloso
+        if not dia["meia_hora"] and dia["culto"] and i_culto is not None and motor.pode_mh >> i_culto & 1:
+            dia["meia_hora"] = dia["culto"]
+            if com_logs:
+                logs.append(f"{data_str}: ℹ️ Culto cobre Meia-hora (RN05)")
+        if not dia["culto"] and dia["meia_hora"] and i_mh is not None and motor.pode_culto >> i_mh & 1:
+            dia["culto"] = dia["meia_hora"]
+            if com_logs:
+                logs.append(f"{data_str}: ℹ️ Meia-hora cobre Culto (RN06)")
+
+    if com_logs:
+        totais = [0] * motor.total
+        for i in escolhidos.values():
+            totais[i] += 1
+        logs.append("📊 Total por organista: " + ", ".join(
+            f"{motor.nomes[i]}={totais[i]}" for i in range(motor.total)))
+    return escala, logs
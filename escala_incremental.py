@@ -0,0 +1,152 @@
+"""
+Reprogramação incremental da escala
+Quando uma organista fica indisponível em uma data já escalada, recalcula só as
+vagas daquela data e, para manter os contadores equilibrados, no máximo uma
+troca posterior por vaga. Devolve um diff em vez de uma escala nova.
+"""
+
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Campo da escala → tipos que a organista precisa ter
+TIPOS_POR_CAMPO = {
+    "meia_hora": ("Meia-hora",),
+    "culto": ("Culto",),
+    "unica": ("Meia-hora", "Culto"),
+}
+
+DIA_PT = {
+    'Sunday': 'Domingo', 'Monday': 'Segunda', 'Tuesday': 'Terça', 'Wednesday': 'Quarta',
+    'Thursday': 'Quinta', 'Friday': 'Sexta', 'Saturday': 'Sábado',
+}
+DIAS_PT_POR_INDICE = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+
+
+def _dia_pt(dia: Dict) -> str:
+    nome = dia.get("dia_semana")
+    if nome in DIA_PT:
+        return DIA_PT[nome]
+    if nome in DIAS_PT_POR_INDICE:
+        return nome
+    return DIAS_PT_POR_INDICE[datetime.fromisoformat(dia["data"]).weekday()]
+
+
+class ReprogramadorEscala:
+    """
+    Índices sobre uma escala existente (não a altera):
+    data → dia, contagem por campo/organista e datas de cada organista por campo.
+    Montado uma vez; cada reprogramação custa proporcional às vagas afetadas.
+    """
+
+    def __init__(self, escala: List[Dict], organistas: List[Dict], indisponibilidades: Iterable[Tuple[str, str]]):
+        self.organistas = organistas
+        self.por_id = {org["id"]: org for org in organistas}
+        self.ordem = {org["nome"]: i for i, org in enumerate(organistas)}
+        self.indisponiveis = set(indisponibilidades)
+
+        # Estado atual (escala original + alterações já calculadas)
+        self.vagas: Dict[Tuple[str, str], Optional[str]] = {}
+        self.dias: Dict[str, Dict] = {}
+        self.contagem: Dict[str, Counter] = defaultdict(Counter)
+        self.datas_de: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for dia in sorted(escala, key=lambda d: d["data"]):
+            self.dias[dia["data"]] = dia
+            for campo in TIPOS_POR_CAMPO:
+                if campo in dia:
+                    nome = dia[campo]
+                    self.vagas[(dia["data"], campo)] = nome
+                    if nome:
+                        self.contagem[campo][nome] += 1
+                        self.datas_de[(campo, nome)].append(dia["data"])
+
+    # ========== ELEGIBILIDADE ==========
+
+    def _elegivel(self, org: Dict, data: str, campo: str) -> bool:
+        if (org["id"], data) in self.indisponiveis:
+            return False
+        if _dia_pt(self.dias[data]) not in org.get("dias_permitidos", []):
+            return False
+        tipos = org.get("tipos", [])
+        return all(t in tipos for t in TIPOS_POR_CAMPO[campo])
+
+    def _ocupada_no_dia(self, nome: str, data: str) -> bool:
+        return any(self.vagas.get((data, campo)) == nome for campo in TIPOS_POR_CAMPO)
+
+    def _substituta(self, data: str, campos: List[str], excluir: str) -> Optional[Dict]:
+        """Quem tocou menos nesses campos; prefere quem ainda não está escalada no dia"""
+        candidatas = [
+            org for org in self.organistas
+            if org["nome"] != excluir and all(self._elegivel(org, data, campo) for campo in campos)
+        ]
+        if not candidatas:
+            return None
+        return min(candidatas, key=lambda org: (
+            self._ocupada_no_dia(org["nome"], data),
+            sum(self.contagem[campo][org["nome"]] for campo in campos),
+            self.ordem[org["nome"]],
+        ))
+
+    # ========== ALTERAÇÕES ==========
+
+    def _atribuir(self, data: str, campo: str, nome: Optional[str], diff: List[Dict], motivo: str):
+        antes = self.vagas.get((data, campo))
+        if antes == nome:
+            return
+        if antes:
+            self.contagem[campo][antes] -= 1
+            datas = self.datas_de[(campo, antes)]
+            datas.remove(data)
+        if nome:
+            self.contagem[campo][nome] += 1
+            datas = self.datas_de[(campo, nome)]
+            datas.insert(bisect_right(datas, data), data)
+        self.vagas[(data, campo)] = nome
+        diff.append({"data": data, "campo": campo, "antes": antes, "depois": nome, "motivo": motivo})
+
+    def indisponibilidade(self, organista_id: str, data: str) -> List[Dict]:
+        """
+        Retira a organista das vagas da data, escolhe substitutas e, para cada
+        substituta, devolve à organista a próxima vaga da substituta no mesmo
+        campo (quando ela puder tocar), mantendo as contagens das duas.
+        """
+        org = self.por_id.get(organista_id)
+        if not org or data not in self.dias:
+            return []
+        self.indisponiveis.add((organista_id, data))
+        nome = org["nome"]
+        diff: List[Dict] = []
+
+        campos = [campo for campo in TIPOS_POR_CAMPO if self.vagas.get((data, campo)) == nome]
+        # Quem cobria o dia inteiro (meia-hora + culto) é substituída, se possível, por uma só pessoa
+        substituta_do_dia = self._substituta(data, campos, excluir=nome) if len(campos) > 1 else None
+
+        for campo in campos:
+            substituta = substituta_do_dia or self._substituta(data, [campo], excluir=nome)
+            if not substituta:
+                self._atribuir(data, campo, None, diff, "indisponível, sem substituta")
+                continue
+            self._atribuir(data, campo, substituta["nome"], diff, f"substitui {nome}")
+
+            # Compensação: primeira vaga futura da substituta que a organista possa assumir
+            futuras = self.datas_de[(campo, substituta["nome"])]
+            for data_futura in futuras[bisect_right(futuras, data):]:
+                if self._elegivel(org, data_futura, campo) and not self._ocupada_no_dia(nome, data_futura):
+                    self._atribuir(data_futura, campo, nome, diff, f"compensa troca com {substituta['nome']}")
+                    break
+
+        return diff
+
+
+def aplicar_diff(escala: List[Dict], diff: List[Dict]) -> List[Dict]:
+    """Aplica o diff na escala (in-place) e devolve os dias alterados"""
+    por_data = {dia["data"]: dia for dia in escala}
+    alterados = {}
+    for mudanca in diff:
+        dia = por_data.get(mudanca["data"])
+        if dia is None:
+            continue
+        dia[mudanca["campo"]] = mudanca["depois"]
+        alterados[dia["data"]] = dia
+    return list(alterados.values())
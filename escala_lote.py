@@ -0,0 +1,173 @@
+"""
+Geração de escala em lote para várias comuns (sub-regional ou regional)
+Distribui as comuns em um ProcessPoolExecutor e devolve os resultados
+conforme cada comum termina.
+
+Organistas cadastradas em mais de uma comum (mesmo id) ligam essas comuns em
+um grupo. Cada grupo é gerado em sequência dentro do mesmo processo: as datas
+já ocupadas por uma comum do grupo entram como indisponibilidade nas seguintes,
+então ninguém é escalada em duas comuns no mesmo dia.
+
+motor='bitset' usa o guloso de escala_engine; motor='otimo' usa o fluxo de
+custo mínimo (gerar_escala_otima), com o guloso como fallback por prazo.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from escala_engine import MotorEscala, gerar_escala_otima
+
+MOTORES = ('bitset', 'otimo')
+
+# Tamanho do pool compartilhado: fixo por processo, lido uma vez da configuração
+LOTE_WORKERS = max(1, int(os.environ.get('ESCALA_LOTE_WORKERS', str(os.cpu_count() or 1))))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    """Pool compartilhado do processo web; 'spawn' evita fork de um processo com threads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=LOTE_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def agrupar_por_organistas(comuns: Dict[str, Dict]) -> Tuple[List[List[str]], Dict[str, List[str]]]:
+    """
+    Union-find das comuns que compartilham organistas.
+    Retorna (grupos de comum_id, {organista_id: [comuns onde está cadastrada]}).
+    """
+    pai = {comum_id: comum_id for comum_id in comuns}
+
+    def raiz(c):
+        while pai[c] != c:
+            pai[c] = pai[pai[c]]
+            c = pai[c]
+        return c
+
+    onde: Dict[str, List[str]] = {}
+    for comum_id, comum in comuns.items():
+        for org in comum.get("organistas", []):
+            lista = onde.setdefault(org["id"], [])
+            if comum_id not in lista:
+                lista.append(comum_id)
+            if len(lista) > 1:
+                pai[raiz(comum_id)] = raiz(lista[0])
+
+    grupos: Dict[str, List[str]] = {}
+    for comum_id in comuns:
+        grupos.setdefault(raiz(comum_id), []).append(comum_id)
+    compartilhadas = {org_id: lista for org_id, lista in onde.items() if len(lista) > 1}
+    return list(grupos.values()), compartilhadas
+
+
+def _periodo(comum: Dict, inicio, fim):
+    periodo = comum.get("config", {}).get("periodo") or comum.get("config", {}).get("bimestre") or {}
+    return inicio or periodo.get("inicio"), fim or periodo.get("fim")
+
+
+def gerar_grupo(grupo: List[Tuple[str, Dict]], inicio=None, fim=None, com_logs: bool = True,
+                motor: str = 'bitset') -> List[Dict]:
+    """Gera as comuns de um grupo em sequência, bloqueando datas já ocupadas (executa no worker)"""
+    ocupadas: Set[Tuple[str, str]] = set()
+    resultados = []
+    for comum_id, comum in grupo:
+        t0 = time.perf_counter()
+        inicio_c, fim_c = _periodo(comum, inicio, fim)
+        if not inicio_c or not fim_c:
+            resultados.append({"comum_id": comum_id, "erro": "Período não configurado"})
+            continue
+
+        organistas = comum.get("organistas", [])
+        indisponibilidades = {(i["id"], i["data"]) for i in comum.get("indisponibilidades", [])}
+        bloqueadas = indisponibilidades | ocupadas
+        motor_escala = MotorEscala(organistas, bloqueadas)
+        if motor == 'otimo':
+            escala, logs = gerar_escala_otima(motor_escala, inicio_c, fim_c, com_logs=com_logs)
+        else:
+            escala, logs = motor_escala.gerar(inicio_c, fim_c, com_logs=com_logs)
+        if com_logs:
+            for org_id, data in sorted(ocupadas - indisponibilidades):
+                if any(org["id"] == org_id for org in organistas):
+                    logs.insert(0, f"{data}: {org_id} já escalada em outra comum do lote")
+
+        id_por_nome = {org["nome"]: org["id"] for org in organistas}
+        for dia in escala:
+            for campo in ("meia_hora", "culto", "unica"):
+                if dia.get(campo) in id_por_nome:
+                    ocupadas.add((id_por_nome[dia[campo]], dia["data"]))
+
+        resultados.append({
+            "comum_id": comum_id,
+            "escala": escala,
+            "logs": logs,
+            "duracao_ms": round((time.perf_counter() - t0) * 1000, 2),
+        })
+    return resultados
+
+
+def _erro_grupo(tarefa: List[Tuple[str, Dict]], erro: Exception) -> List[Dict]:
+    """Um evento de erro por comum do grupo que falhou (as demais comuns do lote seguem)"""
+    print(f"⚠️ [LOTE] Falha ao gerar o grupo {[comum_id for comum_id, _ in tarefa]}: {erro}")
+    return [{"comum_id": comum_id, "erro": f"Falha na geração: {erro}"} for comum_id, _ in tarefa]
+
+
+def gerar_lote(comuns: Dict[str, Dict], inicio=None, fim=None, com_logs: bool = True,
+               motor: str = 'bitset') -> Iterator[Dict]:
+    """
+    Gera todas as comuns e produz um evento por comum assim que ela fica pronta
+    ({"tipo": "comum", ...}), precedido de {"tipo": "inicio", ...} e seguido de
+    {"tipo": "resumo", ...} com a vazão em comuns/s. Exceção num grupo vira
+    {"tipo": "comum", "erro": ...} para cada comum dele.
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de escala desconhecido: {motor}")
+    t0 = time.perf_counter()
+    grupos, compartilhadas = agrupar_por_organistas(comuns)
+    yield {
+        "tipo": "inicio",
+        "comuns": len(comuns),
+        "grupos": len(grupos),
+        "organistas_compartilhadas": compartilhadas,
+        "motor": motor,
+    }
+
+    tarefas = [[(comum_id, comuns[comum_id]) for comum_id in grupo] for grupo in grupos]
+    geradas = 0
+    if LOTE_WORKERS <= 1 or len(tarefas) <= 1:
+        # Sem ganho em paralelizar: evita o custo de enviar os dados ao pool
+        for tarefa in tarefas:
+            try:
+                resultados = gerar_grupo(tarefa, inicio, fim, com_logs, motor)
+            except Exception as e:
+                resultados = _erro_grupo(tarefa, e)
+            for resultado in resultados:
+                geradas += 1
+                yield {"tipo": "comum", **resultado}
+    else:
+        pool = _pool()
+        futuros = {pool.submit(gerar_grupo, tarefa, inicio, fim, com_logs, motor): tarefa for tarefa in tarefas}
+        for futuro in as_completed(futuros):
+            try:
+                resultados = futuro.result()
+            except Exception as e:
+                resultados = _erro_grupo(futuros[futuro], e)
+            for resultado in resultados:
+                geradas += 1
+                yield {"tipo": "comum", **resultado}
+
+    duracao = time.perf_counter() - t0
+    yield {
+        "tipo": "resumo",
+        "comuns": geradas,
+        "segundos": round(duracao, 3),
+        "comuns_por_segundo": round(geradas / duracao, 1) if duracao > 0 else None,
+    }
@@ -0,0 +1,152 @@
+"""
+Estatísticas da escala
+Uma passada pela escala conta todas as vagas por organista. A escala guarda
+nomes (gerar_alocacao_* grava org['nome']) e dados antigos podem ter ids, então
+cada valor é resolvido para o id por um índice nome/id montado uma vez.
+
+O resultado fica em cache por (comum, versão da partição). Edições pontuais
+(editar_dia_escala, aprovar_troca, reprogramação) atualizam só as contagens
+das vagas alteradas em vez de recontar a escala.
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Campo da escala → contador em por_organista (a vaga 'unica' é a do dia de culto único, a terça)
+CAMPOS = {"meia_hora": "meia_hora", "culto": "culto", "unica": "terca"}
+
+DIA_PT = {
+    'Sunday': 'Domingo', 'Monday': 'Segunda', 'Tuesday': 'Terça', 'Wednesday': 'Quarta',
+    'Thursday': 'Quinta', 'Friday': 'Sexta', 'Saturday': 'Sábado',
+}
+DIAS_PT_POR_INDICE = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+
+
+def _dia_pt(dia: Dict) -> Optional[str]:
+    nome = dia.get("dia_semana")
+    if nome in DIA_PT:
+        return DIA_PT[nome]
+    if nome in DIAS_PT_POR_INDICE:
+        return nome
+    try:
+        return DIAS_PT_POR_INDICE[datetime.fromisoformat(dia["data"]).weekday()]
+    except (KeyError, TypeError, ValueError):
+        return nome
+
+
+def _normalizar(valor: str) -> str:
+    return " ".join(str(valor).split()).casefold()
+
+
+class IndiceOrganistas:
+    """Resolve o valor gravado numa vaga (nome ou id) para o id da organista"""
+
+    def __init__(self, organistas: List[Dict]):
+        self.por_id = {org["id"]: org for org in organistas}
+        self.por_chave: Dict[str, str] = {}
+        for org in organistas:
+            # Nomes repetidos ficam com a primeira organista (mesma ordem do gerador)
+            self.por_chave.setdefault(_normalizar(org.get("nome", "")), org["id"])
+
+    def resolver(self, valor) -> Optional[str]:
+        if not valor:
+            return None
+        if valor in self.por_id:
+            return valor
+        return self.por_chave.get(_normalizar(valor))
+
+
+class EstatisticasEscala:
+    """Contagens da escala montadas em uma passada e atualizáveis vaga a vaga"""
+
+    def __init__(self, escala: List[Dict], organistas: List[Dict]):
+        self.indice = IndiceOrganistas(organistas)
+        self.total_dias = len(escala)
+        self.por_dia_semana: Counter = Counter()
+        self.nao_resolvidos: Counter = Counter()
+        self.por_organista = {
+            org["id"]: {"nome": org["nome"], "meia_hora": 0, "culto": 0, "terca": 0, "total": 0}
+            for org in organistas
+        }
+        for dia in escala:
+            self.por_dia_semana[_dia_pt(dia)] += 1
+            for campo in CAMPOS:
+                self._contar(campo, dia.get(campo), 1)
+
+    def _contar(self, campo: str, valor, delta: int) -> None:
+        if not valor or campo not in CAMPOS:
+            return
+        org_id = self.indice.resolver(valor)
+        if org_id is None:
+            # Nome sem cadastro (organista removida/renomeada): contado à parte
+            self.nao_resolvidos[valor] += delta
+            if self.nao_resolvidos[valor] <= 0:
+                del self.nao_resolvidos[valor]
+            return
+        contagem = self.por_organista[org_id]
+        contagem[CAMPOS[campo]] += delta
+        contagem["total"] += delta
+
+    def atualizar(self, campo: str, antes, depois) -> None:
+        """Troca o ocupante de uma vaga"""
+        if antes != depois:
+            self._contar(campo, antes, -1)
+            self._contar(campo, depois, 1)
+
+    def como_dict(self) -> Dict:
+        return {
+            "total_dias": self.total_dias,
+            "domingos": self.por_dia_semana.get("Domingo", 0),
+            "tercas": self.por_dia_semana.get("Terça", 0),
+            "por_dia_semana": dict(self.por_dia_semana),
+            "por_organista": {org_id: dict(contagem) for org_id, contagem in self.por_organista.items()},
+            "nao_resolvidos": dict(self.nao_resolvidos),
+        }
+
+
+def calcular(escala: List[Dict], organistas: List[Dict]) -> Dict:
+    """Estatísticas sem cache"""
+    return EstatisticasEscala(escala, organistas).como_dict()
+
+
+# ========== CACHE POR (COMUM, VERSÃO) ==========
+
+_cache: Dict[str, Tuple[int, EstatisticasEscala]] = {}
+_cache_lock = threading.Lock()
+
+
+def estatisticas_comum(comum_id: str, versao: Optional[int], escala: List[Dict], organistas: List[Dict]) -> Dict:
+    """
+    Estatísticas da escala de uma comum na versão informada.
+    Sem versão (estrutura antiga) calcula sem cache.
+    """
+    if versao is None:
+        return calcular(escala, organistas)
+    with _cache_lock:
+        entrada = _cache.get(comum_id)
+        if entrada and entrada[0] == versao:
+            return entrada[1].como_dict()
+
+    stats = EstatisticasEscala(escala, organistas)
+    with _cache_lock:
+        _cache[comum_id] = (versao, stats)
+        return stats.como_dict()
+
+
+def registrar_alteracoes(comum_id: str, versao_base: Optional[int], versao_nova: int,
+                         alteracoes: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> None:
+    """
+    Aplica alterações (campo, antes, depois) feitas sobre a versão `versao_base`
+    e gravadas como `versao_nova`. Se o cache não estiver na versão base ou
+    outra escrita aconteceu no meio, descarta a entrada (recalcula na próxima leitura).
+    """
+    with _cache_lock:
+        entrada = _cache.pop(comum_id, None)
+        if not entrada or versao_base is None or entrada[0] != versao_base or versao_nova != versao_base + 1:
+            return
+        stats = entrada[1]
+        for campo, antes, depois in alteracoes:
+            stats.atualizar(campo, antes, depois)
+        _cache[comum_id] = (versao_nova, stats)
@@ -0,0 +1,194 @@
+"""
+Canal de eventos por comum (Server-Sent Events)
+As rotas que gravam a partição de uma comum publicam um evento pequeno
+({"tipo": "escala"|"rjm"|"trocas", "acao", "versao", ...}) e cada conexão
+SSE aberta para aquela comum recebe o evento numa fila própria.
+
+Entre os workers do gunicorn os eventos passam pelo LISTEN/NOTIFY do
+PostgreSQL: quem publica faz pg_notify e uma thread por processo escuta o
+canal e entrega às filas locais (inclusive as do próprio processo). Sem DSN,
+a entrega é só local (um único worker).
+
+Cada conexão SSE ocupa uma thread do gthread enquanto dura (no máximo
+`duracao_maxima` segundos; o EventSource reconecta sozinho, enviando
+Last-Event-ID). `max_conexoes` só recusa streams acima do limite: ele não
+devolve threads aos workers. Por isso em produção /eventos roda num gunicorn
+próprio (entrypoint.sh, nginx.conf) e o app calcula o limite a partir das
+threads do processo, deixando sempre algumas livres (_limite_conexoes_sse).
+"""
+
+import json
+import os
+import queue
+import re
+import select
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+CANAL_PG = 'rodizio_eventos'
+# Limite do payload do NOTIFY é 8000 bytes; eventos maiores perdem os detalhes
+TAMANHO_MAXIMO_PAYLOAD = 7000
+
+
+def formatar_sse(evento: Dict) -> str:
+    linhas = []
+    if evento.get("versao") is not None:
+        linhas.append(f"id: {evento['versao']}")
+    linhas.append(f"event: {evento.get('tipo', 'message')}")
+    linhas.append("data: " + json.dumps(evento, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(linhas) + "\n\n"
+
+
+class CanalEventos:
+    def __init__(self, dsn: Optional[str] = None, max_conexoes: int = 50, tamanho_fila: int = 100):
+        # SQLAlchemy aceita "postgresql+psycopg2://"; o psycopg2 só "postgresql://"
+        self.dsn = re.sub(r'^postgresql\+\w+://', 'postgresql://', dsn) if dsn else None
+        self.max_conexoes = max_conexoes
+        self.tamanho_fila = tamanho_fila
+        self._assinantes: Dict[str, List[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self._ouvinte = None
+        self._pid = None
+        self._conexao_notify = None
+        self._notify_lock = threading.Lock()
+
+    # ========== ASSINATURAS (conexões SSE deste processo) ==========
+
+    def assinar(self, comum_id: str) -> Optional[queue.Queue]:
+        """Fila de eventos da comum; None se o processo já está no limite de conexões"""
+        self._garantir_ouvinte()
+        with self._lock:
+            if sum(len(filas) for filas in self._assinantes.values()) >= self.max_conexoes:
+                return None
+            fila = queue.Queue(maxsize=self.tamanho_fila)
+            self._assinantes.setdefault(comum_id, []).append(fila)
+            return fila
+
+    def cancelar(self, comum_id: str, fila: queue.Queue) -> None:
+        with self._lock:
+            filas = self._assinantes.get(comum_id, [])
+            if fila in filas:
+                filas.remove(fila)
+            if not filas:
+                self._assinantes.pop(comum_id, None)
+
+    def conexoes(self) -> int:
+        with self._lock:
+            return sum(len(filas) for filas in self._assinantes.values())
+
+    def _entregar(self, comum_id: str, evento: Dict) -> None:
+        with self._lock:
+            filas = list(self._assinantes.get(comum_id, []))
+        for fila in filas:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                # Cliente lento: descarta o evento mais antigo (o próximo traz a versão atual)
+                try:
+                    fila.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    fila.put_nowait(evento)
+                except queue.Full:
+                    pass
+
+    # ========== PUBLICAÇÃO ==========
+
+    def publicar(self, comum_id: str, evento: Dict) -> None:
+        """Entrega o evento a todas as conexões da comum (em todos os workers, com PostgreSQL)"""
+        evento = {**evento, "comum_id": comum_id}
+        if not self.dsn:
+            self._entregar(comum_id, evento)
+            return
+        payload = json.dumps(evento, ensure_ascii=False, separators=(",", ":"), default=str)
+        if len(payload.encode("utf-8")) > TAMANHO_MAXIMO_PAYLOAD:
+            payload = json.dumps({k: evento[k] for k in ("tipo", "acao", "versao", "comum_id") if k in evento})
+        try:
+            self._notify(payload)
+        except Exception as e:
+            print(f"⚠️ [EVENTOS] NOTIFY falhou, entregando só neste worker: {e}")
+            self._entregar(comum_id, evento)
+
+    def _notify(self, payload: str) -> None:
+        import psycopg2
+        with self._notify_lock:
+            for tentativa in range(2):
+                if self._conexao_notify is None or self._conexao_notify.closed:
+                    self._conexao_notify = psycopg2.connect(self.dsn)
+                    self._conexao_notify.autocommit = True
+                try:
+                    with self._conexao_notify.cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (CANAL_PG, payload))
+                    return
+                except psycopg2.OperationalError:
+                    # Conexão caiu (reinício do banco): reconecta uma vez
+                    self._conexao_notify = None
+                    if tentativa:
+                        raise
+
+    # ========== LISTEN (uma thread por processo) ==========
+
+    def _garantir_ouvinte(self) -> None:
+        if not self.dsn:
+            return
+        # Depois de um fork (gunicorn) a thread do processo pai não existe no filho
+        if self._ouvinte is not None and self._pid == os.getpid() and self._ouvinte.is_alive():
+            return
+        with self._lock:
+            if self._ouvinte is not None and self._pid == os.getpid() and self._ouvinte.is_alive():
+                return
+            self._pid = os.getpid()
+            self._ouvinte = threading.Thread(target=self._ouvir, name='eventos-listen', daemon=True)
+            self._ouvinte.start()
+
+    def _ouvir(self) -> None:
+        import psycopg2
+        while True:
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL_PG}")
+                print(f"📡 [EVENTOS] Escutando {CANAL_PG} (pid {os.getpid()})")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notificacao = conn.notifies.pop(0)
+                        try:
+                            evento = json.loads(notificacao.payload)
+                        except ValueError:
+                            continue
+                        if evento.get("comum_id"):
+                            self._entregar(evento["comum_id"], evento)
+            except Exception as e:
+                print(f"⚠️ [EVENTOS] LISTEN interrompido ({e}); reconectando em 5s")
+                time.sleep(5)
+
+    # ========== STREAM SSE ==========
+
+    def stream(self, comum_id: str, fila: queue.Queue, versao_atual: Optional[int] = None,
+               ultimo_id: Optional[str] = None, duracao_maxima: float = 300,
+               intervalo_ping: float = 20) -> Iterator[str]:
+        """
+        Texto SSE da conexão. Se o cliente reconecta com uma versão anterior
+        (Last-Event-ID), recebe logo um evento 'sincronizar' com a versão atual.
+        """
+        try:
+            yield f"retry: 5000\n: conectado {comum_id}\n\n"
+            if versao_atual is not None and ultimo_id is not None and ultimo_id != str(versao_atual):
+                yield formatar_sse({"tipo": "sincronizar", "versao": versao_atual, "comum_id": comum_id})
+            fim = time.monotonic() + duracao_maxima
+            while time.monotonic() < fim:
+                try:
+                    evento = fila.get(timeout=min(intervalo_ping, max(0.0, fim - time.monotonic())))
+                except queue.Empty:
+                    # Comentário SSE: mantém a conexão viva em proxies
+                    yield ": ping\n\n"
+                    continue
+                yield formatar_sse(evento)
+        finally:
+            self.cancelar(comum_id, fila)
@@ -0,0 +1,4700 @@
+        // ==================== Dark Mode ====================
+        function toggleDarkMode() {
+            const body = document.body;
+            const isDark = body.classList.toggle('dark-mode');
+            
+            // Salvar preferência no localStorage
+            localStorage.setItem('darkMode', isDark ? 'enabled' : 'disabled');
+            
+            // Atualizar ícone e texto
+            const icon = document.getElementById('dark-mode-icon');
+            const text = document.getElementById('dark-mode-text');
+            
+            if (isDark) {
+                icon.textContent = '☀️';
+                text.textContent = 'Claro';
+            } else {
+                icon.textContent = '🌙';
+                text.textContent = 'Escuro';
+            }
+        }
+        
+        // Carregar preferência salva ao carregar a página
+        window.addEventListener('DOMContentLoaded', function() {
+            const darkMode = localStorage.getItem('darkMode');
+            
+            if (darkMode === 'enabled') {
+                document.body.classList.add('dark-mode');
+                document.getElementById('dark-mode-icon').textContent = '☀️';
+                document.getElementById('dark-mode-text').textContent = 'Claro';
+            }
+        });
+        
+        // ==================== Menu Mobile ====================
+        function toggleMobileMenu() {
+            const drawer = document.getElementById('mobileMenu');
+            const overlay = document.querySelector('.nav-mobile-overlay');
+            
+            drawer.classList.toggle('active');
+            overlay.classList.toggle('active');
+            
+            // Prevenir scroll do body quando menu está aberto
+            if (drawer.classList.contains('active')) {
+                document.body.style.overflow = 'hidden';
+            } else {
+                document.body.style.overflow = '';
+            }
+        }
+        
+        function closeMobileMenu() {
+            const drawer = document.getElementById('mobileMenu');
+            const overlay = document.querySelector('.nav-mobile-overlay');
+            
+            drawer.classList.remove('active');
+            overlay.classList.remove('active');
+            document.body.style.overflow = '';
+        }
+        
+        function toggleMobileSubmenu(submenuId) {
+            const submenu = document.getElementById(submenuId);
+            const arrowId = submenuId.replace('-submenu', '-arrow');
+            const arrow = document.getElementById(arrowId);
+            
+            submenu.classList.toggle('open');
+            if (arrow) {
+                arrow.classList.toggle('open');
+            }
+        }
+        
+        function showTabMobile(tabName) {
+            // Alias de compatibilidade para tabs antigas (mobile)
+            if (tabName === 'indisp') {
+                console.warn('↪️ Alias de tab (mobile): "indisp" → "indisponibilidades"');
+                tabName = 'indisponibilidades';
+            }
+            // Chama a função showTab existente
+            showTab(tabName);
+            
+            // Fecha o menu mobile
+            closeMobileMenu();
+            
+            // Atualiza item ativo no menu mobile
+            document.querySelectorAll('.nav-mobile-item').forEach(item => {
+                item.classList.remove('active');
+            });
+            
+            // Marca o item ativo
+            if (event && event.target) {
+                const target = event.target.closest('.nav-mobile-item, .nav-mobile-submenu-item');
+                if (target) target.classList.add('active');
+            }
+        }
+        
+        // ==================== Variáveis Globais ====================
+    // Dados da sessão: injetados pelo template em window.APP
+    const currentUserId = APP.user.id;
+    const isAdmin = APP.user.is_admin;
+    const userTipo = APP.user.tipo || 'organista';
+        // Compatibilidade
+        const isCoord = isAdmin;
+        let organistas = [];
+        let indisponibilidades = [];
+        
+        // Debug: Informações do usuário
+    console.log('👤 DEBUG USUÁRIO:');
+    console.log('  ID:', APP.user.id);
+    console.log('  Nome:', APP.user.nome);
+    console.log('  Tipo:', APP.user.tipo);
+    console.log('  Nível:', APP.user.nivel);
+    console.log('  Contexto ID:', APP.user.contexto_id);
+    console.log('  Is Admin:', isAdmin);
+    console.log('  Is Master:', APP.user.is_master);
+    console.log('  Is Encarregado Comum:', APP.user.is_encarregado_comum);
+    console.log('  Is Encarregado Sub:', APP.user.is_encarregado_sub);
+    console.log('  Is Organista:', APP.user.is_organista);
+        
+        
+        
+        // ==================== Gerenciamento de Contexto ====================
+        let contextoAtual = {
+            regional: null,
+            sub_regional: null,
+            comum: null,
+            nivel: APP.user.tipo || 'organista'
+        };
+        
+        // Carregar contexto atual do usuário
+        async function carregarContextoAtual() {
+            try {
+                const response = await fetch('/api/contexto/atual');
+                const data = await response.json();
+                
+                contextoAtual = {
+                    regional: data.regional,
+                    sub_regional: data.sub_regional,
+                    comum: data.comum,
+                    nivel: data.nivel
+                };
+                
+                // Atualizar título do header
+                document.querySelector('.header h1').textContent = `🎹 Rodízio de Organistas - ${data.comum.nome}`;
+                
+                // Atualizar título do card do dashboard
+                const dashboardTitle = document.getElementById('dashboardComumTitle');
+                if (dashboardTitle) {
+                    dashboardTitle.textContent = `🎹 Rodízio de Organistas - ${data.comum.nome}`;
+                }
+                
+                // Atualizar período
+                const config = data.comum && data.comum.config ? data.comum.config : {};
+                const periodo = (config && (config.periodo || config.bimestre)) || {};
+                const periodoInfoEl = document.getElementById('periodo-info');
+                if (periodo.inicio && periodo.fim) {
+                    const dataInicio = new Date(periodo.inicio + 'T00:00:00').toLocaleDateString('pt-BR');
+                    const dataFim = new Date(periodo.fim + 'T00:00:00').toLocaleDateString('pt-BR');
+                    periodoInfoEl.textContent = `Período: ${dataInicio} até ${dataFim}`;
+                    periodoInfoEl.style.display = '';
+                } else {
+                    // Fallback: se config não tem período, tentar derivar da escala publicada
+                    try {
+                        const escResp = await fetch('/escala/atual');
+                        const escData = await escResp.json();
+                        const esc = escData.escala || [];
+                        if (esc.length > 0) {
+                            const ord = [...esc].sort((a,b)=>compareISODateStrings(a.data,b.data));
+                            const inicio = new Date(ord[0].data + 'T00:00:00').toLocaleDateString('pt-BR');
+                            const fim = new Date(ord[ord.length-1].data + 'T00:00:00').toLocaleDateString('pt-BR');
+                            periodoInfoEl.textContent = `Período: ${inicio} até ${fim}`;
+                            periodoInfoEl.style.display = '';
+                        } else {
+                            periodoInfoEl.style.display = 'none';
+                        }
+                    } catch {
+                        periodoInfoEl.style.display = 'none';
+                    }
+                }
+                
+                // Se for master, mostrar seletor de contexto
+                if (data.nivel === 'master') {
+                    document.getElementById('contexto-selector').style.display = 'flex';
+                    await inicializarSeletorContexto();
+                } else {
+                    // Para outros níveis, esconder seletor
+                    document.getElementById('contexto-selector').style.display = 'none';
+                }
+                
+            } catch (error) {
+                console.error('Erro ao carregar contexto:', error);
+            }
+        }
+        
+        // Hierarquia completa (regional → sub-regionais → comuns) em uma única requisição.
+        // Compartilhada por todos os seletores; invalidar após criar/editar/remover itens.
+        let hierarquiaPromise = null;
+        
+        function obterHierarquia() {
+            if (!hierarquiaPromise) {
+                hierarquiaPromise = fetch('/api/hierarquia')
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                        }
+                        return response.json();
+                    })
+                    .catch(error => {
+                        hierarquiaPromise = null;
+                        throw error;
+                    });
+            }
+            return hierarquiaPromise;
+        }
+        
+        function invalidarHierarquia() {
+            hierarquiaPromise = null;
+        }
+        
+        async function obterSubRegionais(regionalId) {
+            const regional = (await obterHierarquia()).find(r => r.id === regionalId);
+            return regional ? regional.sub_regionais : [];
+        }
+        
+        async function obterComuns(regionalId, subRegionalId) {
+            const sub = (await obterSubRegionais(regionalId)).find(s => s.id === subRegionalId);
+            return sub ? sub.comuns : [];
+        }
+        
+        // Inicializar seletor de contexto (apenas para Master)
+        async function inicializarSeletorContexto() {
+            try {
+                // Carregar regionais
+                const regionais = await obterHierarquia();
+                
+                const selectRegional = document.getElementById('selectRegional');
+                selectRegional.innerHTML = '<option value="">Selecione Regional...</option>';
+                
+                regionais.forEach(regional => {
+                    const option = document.createElement('option');
+                    option.value = regional.id;
+                    option.textContent = regional.nome;
+                    if (contextoAtual.regional && regional.id === contextoAtual.regional.id) {
+                        option.selected = true;
+                    }
+                    selectRegional.appendChild(option);
+                });
+                
+                // Se já tem regional selecionada, carregar sub-regionais
+                if (contextoAtual.regional) {
+                    await carregarSubRegionais();
+                }
+            } catch (error) {
+                console.error('Erro ao inicializar seletor:', error);
+            }
+        }
+        
+        // Carregar sub-regionais quando seleciona uma regional
+        async function carregarSubRegionais() {
+            const regionalId = document.getElementById('selectRegional').value;
+            if (!regionalId) {
+                document.getElementById('selectSubRegional').innerHTML = '<option value="">Selecione Regional primeiro</option>';
+                document.getElementById('selectComum').innerHTML = '<option value="">Selecione...</option>';
+                return;
+            }
+            
+            try {
+                const subRegionais = await obterSubRegionais(regionalId);
+                
+                const selectSubRegional = document.getElementById('selectSubRegional');
+                selectSubRegional.innerHTML = '<option value="">Selecione Sub-Regional...</option>';
+                
+                subRegionais.forEach(sub => {
+                    const option = document.createElement('option');
+                    option.value = sub.id;
+                    option.textContent = sub.nome;
+                    if (contextoAtual.sub_regional && sub.id === contextoAtual.sub_regional.id) {
+                        option.selected = true;
+                    }
+                    selectSubRegional.appendChild(option);
+                });
+                
+                // Se já tem sub-regional selecionada, carregar comuns
+                if (contextoAtual.sub_regional) {
+                    await carregarComuns();
+                }
+            } catch (error) {
+                console.error('Erro ao carregar sub-regionais:', error);
+            }
+        }
+        
+        // Carregar comuns quando seleciona uma sub-regional
+        async function carregarComuns() {
+            const regionalId = document.getElementById('selectRegional').value;
+            const subRegionalId = document.getElementById('selectSubRegional').value;
+            
+            if (!regionalId || !subRegionalId) {
+                document.getElementById('selectComum').innerHTML = '<option value="">Selecione Sub-Regional primeiro</option>';
+                return;
+            }
+            
+            try {
+                const comuns = await obterComuns(regionalId, subRegionalId);
+                
+                const selectComum = document.getElementById('selectComum');
+                selectComum.innerHTML = '<option value="">Selecione Comum...</option>';
+                
+                comuns.forEach(comum => {
+                    const option = document.createElement('option');
+                    option.value = comum.id;
+                    option.textContent = comum.nome;
+                    if (contextoAtual.comum && comum.id === contextoAtual.comum.id) {
+                        option.selected = true;
+                    }
+                    selectComum.appendChild(option);
+                });
+            } catch (error) {
+                console.error('Erro ao carregar comuns:', error);
+            }
+        }
+        
+        // Selecionar novo contexto
+        async function selecionarContexto() {
+            const regionalId = document.getElementById('selectRegional').value;
+            const subRegionalId = document.getElementById('selectSubRegional').value;
+            const comumId = document.getElementById('selectComum').value;
+            
+            if (!regionalId || !subRegionalId || !comumId) {
+                return;
+            }
+            
+            try {
+                const response = await fetch('/api/contexto/selecionar', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        regional_id: regionalId,
+                        sub_regional_id: subRegionalId,
+                        comum_id: comumId
+                    })
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    console.log('✅ Contexto alterado com sucesso para:', data.contexto.comum_nome);
+                    
+                    // Mostrar mensagem e recarregar página
+                    showNotification(`Contexto alterado para: ${data.contexto.comum_nome}. Recarregando...`, 'success');
+                    
+                    // Recarregar página após 800ms para garantir que o backend salvou o contexto
+                    console.log('🔄 Recarregando página em 800ms...');
+                    setTimeout(() => {
+                        console.log('🔄 Executando reload agora...');
+                        window.location.reload(true); // true força reload do servidor
+                    }, 800);
+                } else {
+                    showNotification('Erro ao alterar contexto', 'error');
+                }
+            } catch (error) {
+                console.error('Erro ao selecionar contexto:', error);
+                showNotification('Erro ao selecionar contexto', 'error');
+            }
+        }
+        
+        // ==================== Navegação entre tabs ====================
+        
+        // Controlar dropdowns
+        function toggleDropdown(menuId) {
+            event.stopPropagation();
+            
+            const menu = document.getElementById(menuId);
+            const toggle = event.currentTarget;
+            
+            // Fechar todos os outros dropdowns
+            document.querySelectorAll('.nav-dropdown-menu').forEach(m => {
+                if (m.id !== menuId) {
+                    m.classList.remove('show');
+                }
+            });
+            
+            document.querySelectorAll('.nav-dropdown-toggle').forEach(t => {
+                if (t !== toggle) {
+                    t.classList.remove('open');
+                }
+            });
+            
+            // Toggle do menu atual
+            menu.classList.toggle('show');
+            toggle.classList.toggle('open');
+        }
+        
+        // Fechar dropdowns ao clicar fora
+        document.addEventListener('click', function(e) {
+            if (!e.target.closest('.nav-dropdown')) {
+                document.querySelectorAll('.nav-dropdown-menu').forEach(menu => {
+                    menu.classList.remove('show');
+                });
+                document.querySelectorAll('.nav-dropdown-toggle').forEach(toggle => {
+                    toggle.classList.remove('open');
+                });
+            }
+        });
+        
+    async function showTab(tabName) {
+            // Alias de compatibilidade para tabs antigas (desktop)
+            if (tabName === 'indisp') {
+                console.warn('↪️ Alias de tab: "indisp" → "indisponibilidades"');
+                tabName = 'indisponibilidades';
+            }
+            document.querySelectorAll('.tab-panel').forEach(panel => {
+                panel.classList.remove('active');
+            });
+            document.querySelectorAll('.nav-tab').forEach(tab => {
+                tab.classList.remove('active');
+            });
+            document.querySelectorAll('.nav-dropdown-toggle').forEach(toggle => {
+                toggle.classList.remove('active');
+            });
+            document.querySelectorAll('.nav-dropdown-item').forEach(item => {
+                item.classList.remove('active');
+            });
+            
+            // Ativar a tab
+            const targetTab = document.getElementById(tabName);
+            if (!targetTab) {
+                console.error('❌ Aba não encontrada:', tabName);
+                return;
+            }
+            targetTab.classList.add('active');
+            
+            // Ativar o item do menu que foi clicado
+            if (event && event.target) {
+                if (event.target.classList.contains('nav-dropdown-item')) {
+                    event.target.classList.add('active');
+                    // Ativar também o dropdown toggle pai
+                    const dropdown = event.target.closest('.nav-dropdown');
+                    if (dropdown) {
+                        dropdown.querySelector('.nav-dropdown-toggle').classList.add('active');
+                    }
+                } else if (event.target.classList.contains('nav-tab')) {
+                    event.target.classList.add('active');
+                }
+            }
+            
+            // Fechar dropdown após selecionar
+            document.querySelectorAll('.nav-dropdown-menu').forEach(menu => {
+                menu.classList.remove('show');
+            });
+            document.querySelectorAll('.nav-dropdown-toggle').forEach(toggle => {
+                toggle.classList.remove('open');
+            });
+            
+            // Carregar dados específicos de cada aba
+            if (tabName === 'indisponibilidades') {
+                loadIndisponibilidades();
+            } else if (tabName === 'admin-indisp') {
+                loadAdminIndisp();
+            } else if (tabName === 'organistas') {
+                loadOrganistas();
+                carregarComunsParaOrganista();
+                carregarDiasDoComum();
+            } else if (tabName === 'rjm') {
+                loadEscalaRJM();
+            } else if (tabName === 'escala') {
+                await loadEscalaAtual();
+            } else if (tabName === 'hierarquia') {
+                carregarHierarquia();
+            } else if (tabName === 'usuarios') {
+                carregarUsuarios();
+                carregarConfigComum();
+            } else if (tabName === 'trocas') {
+                atualizarSlotAlvoVisibilidade();
+                await carregarDatasTroca();
+                await popularAlvosTroca();
+                await loadTrocas();
+            }
+        }
+        
+        // Trocar Senha
+        function trocarSenha() {
+            window.location.href = '/trocar-senha';
+        }
+        
+        // Logout
+        function logout() {
+            if (confirm('Deseja realmente sair?')) {
+                window.location.href = '/logout';
+            }
+        }
+        
+        // Mostrar notificação
+        function showNotification(message, type = 'info') {
+            const notification = document.createElement('div');
+            notification.className = `notification ${type}`;
+            notification.textContent = message;
+            document.body.appendChild(notification);
+            
+            setTimeout(() => {
+                notification.style.animation = 'slideIn 0.3s ease-out reverse';
+                setTimeout(() => {
+                    notification.remove();
+                }, 300);
+            }, 3000);
+        }
+
+        // Utilitários de data (evitar parsing UTC de 'YYYY-MM-DD')
+        function parseISODateLocal(isoDate) {
+            // Espera 'YYYY-MM-DD'; retorna Date no horário local sem deslocamento
+            if (!isoDate || typeof isoDate !== 'string') return null;
+            const parts = isoDate.split('-');
+            if (parts.length !== 3) return new Date(isoDate);
+            const y = Number(parts[0]);
+            const m = Number(parts[1]);
+            const d = Number(parts[2]);
+            return new Date(y, m - 1, d, 0, 0, 0, 0);
+        }
+        function toISODateLocal(d) {
+            // Converte Date -> 'YYYY-MM-DD' no calendário local
+            const y = d.getFullYear();
+            const m = String(d.getMonth() + 1).padStart(2, '0');
+            const da = String(d.getDate()).padStart(2, '0');
+            return `${y}-${m}-${da}`;
+        }
+        function compareISODateStrings(a, b) {
+            return parseISODateLocal(a) - parseISODateLocal(b);
+        }
+        
+        // Carregar organistas
+        async function loadOrganistas() {
+            try {
+                const response = await fetch('/organistas');
+                organistas = await response.json();
+                
+                // Atualizar tabela
+                const tbody = document.getElementById('tbodyOrganistas');
+                tbody.innerHTML = '';
+                
+                if (!isCoord) {
+                    tbody.innerHTML = '<tr><td colspan="6" style="text-align: center; color: #666;">Apenas coordenador pode gerenciar organistas.</td></tr>';
+                    return;
+                }
+                
+                organistas.forEach(org => {
+                    const tr = document.createElement('tr');
+                    const emailDisplay = org.email ? org.email : '<span style="color: #999;">-</span>';
+                    const telefoneDisplay = org.telefone ? org.telefone : '<span style="color: #999;">-</span>';
+                    
+                    tr.innerHTML = `
+                        <td>${org.nome}</td>
+                        <td>${emailDisplay}</td>
+                        <td>${telefoneDisplay}</td>
+                        <td>${org.tipos.join(', ')}</td>
+                        <td>${org.dias_permitidos.join(', ')}</td>
+                        <td>
+                            <button class="btn" style="background: #3b82f6; color: white; margin-right: 5px;" onclick="editarOrganista('${org.id}')">✏️ Editar</button>
+                            <button class="btn btn-danger" onclick="deleteOrganista('${org.id}')">🗑️ Remover</button>
+                        </td>
+                    `;
+                    tbody.appendChild(tr);
+                });
+                
+                // Atualizar dashboard
+                document.getElementById('statusOrganistas').textContent = 
+                    `✅ ${organistas.length} organista(s) cadastrado(s)`;
+                    
+                // Atualizar contador de indisponibilidades
+                loadIndispCount();
+            } catch (error) {
+                console.error('Erro ao carregar organistas:', error);
+            }
+        }
+        
+        // Carregar contagem de indisponibilidades
+        async function loadIndispCount() {
+            try {
+                const response = await fetch('/indisponibilidades');
+                const indisp = await response.json();
+                document.getElementById('statusIndisponibilidades').textContent = 
+                    `✅ ${indisp.length} indisponibilidade(s) marcada(s)`;
+            } catch (error) {
+                console.error('Erro ao carregar indisponibilidades:', error);
+            }
+        }
+        
+        // Renderizar escala atual no dashboard
+        async function renderEscalaAtual() {
+            try {
+                const response = await fetch('/escala/atual');
+                const data = await response.json();
+                console.log('Dados recebidos da API:', data);
+                const escala = data.escala || [];
+                console.log('Escala extraída:', escala);
+                
+                const container = document.getElementById('escalaAtual');
+                
+                if (!escala || escala.length === 0) {
+                    container.innerHTML = '<div class="no-escala">Nenhuma escala cadastrada ainda</div>';
+                    document.getElementById('statusEscala').textContent = '⚠️ Nenhuma escala cadastrada';
+                    return;
+                }
+                
+                // Pegar data atual para comparação
+                const hoje = new Date();
+                hoje.setHours(0, 0, 0, 0);
+                
+                // Filtrar e ordenar: pegar próximos 20 eventos a partir de hoje
+                const proximasEscalas = escala
+                    .filter(item => {
+                        const dataEscala = parseISODateLocal(item.data);
+                        return dataEscala >= hoje;
+                    })
+                    .sort((a, b) => compareISODateStrings(a.data, b.data))
+                    .slice(0, 20);
+                
+                if (proximasEscalas.length === 0) {
+                    container.innerHTML = '<div class="no-escala">Todas as escalas já passaram</div>';
+                    document.getElementById('statusEscala').textContent = '✅ Todas as escalas já passaram';
+                    return;
+                }
+                
+                // Renderizar as próximas escalas
+                container.innerHTML = proximasEscalas.map(item => {
+                    const data = parseISODateLocal(item.data);
+                    const dataEscala = parseISODateLocal(item.data);
+                    const passado = dataEscala < hoje;
+                    
+                    const dia = data.getDate();
+                    const nomeMes = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
+                                    'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'][data.getMonth()];
+                    const ano = data.getFullYear();
+                    
+                    // Mapear corretamente todos os dias da semana
+                    const diasSemanaMap = {
+                        'Sunday': 'Domingo',
+                        'Monday': 'Segunda',
+                        'Tuesday': 'Terça',
+                        'Wednesday': 'Quarta',
+                        'Thursday': 'Quinta',
+                        'Friday': 'Sexta',
+                        'Saturday': 'Sábado'
+                    };
+                    const diaSemana = diasSemanaMap[item.dia_semana] || item.dia_semana;
+                    
+                    // Map day of week to CSS class
+                    const tipoDiaMap = {
+                        'Sunday': 'domingo',
+                        'Monday': 'segunda',
+                        'Tuesday': 'terca',
+                        'Wednesday': 'quarta',
+                        'Thursday': 'quinta',
+                        'Friday': 'sexta',
+                        'Saturday': 'sabado'
+                    };
+                    const tipoDia = tipoDiaMap[item.dia_semana] || '';
+                    const emoji = diaSemana === 'Domingo' ? '🙏' : '📖';
+                    
+                    const isTrocaMeia = item._proveniencia && item._proveniencia.meia_hora === 'troca';
+                    const isTrocaCulto = item._proveniencia && item._proveniencia.culto === 'troca';
+                    const badgeTroca = '<span class="info-badge" style="background:#fde68a;color:#a16207;margin-left:8px;">Troca</span>';
+                    return `
+                        <div class="escala-item ${tipoDia} ${passado ? 'passado' : ''}">
+                            <div class="escala-date-box">
+                                <div class="escala-dia-numero">${dia}</div>
+                                <div class="escala-dia-semana">${emoji} ${diaSemana}</div>
+                                <div class="escala-mes-ano">${nomeMes} ${ano}</div>
+                            </div>
+                            
+                            <div class="escala-divider"></div>
+                            
+                            <div class="escala-servicos">
+                                <div class="escala-servico">
+                                    <div class="escala-servico-icon">⏰</div>
+                                    <div class="escala-servico-text">
+                                        <div class="escala-tipo">Meia-hora</div>
+                                        <div class="escala-organista ${!item.meia_hora ? 'escala-vazio' : ''}">
+                                            ${item.meia_hora || 'Não definido'} ${isTrocaMeia ? badgeTroca : ''}
+                                        </div>
+                                    </div>
+                                </div>
+                                <div class="escala-servico">
+                                    <div class="escala-servico-icon">🎹</div>
+                                    <div class="escala-servico-text">
+                                        <div class="escala-tipo">Culto</div>
+                                        <div class="escala-organista ${!item.culto ? 'escala-vazio' : ''}">
+                                            ${item.culto || 'Não definido'} ${isTrocaCulto ? badgeTroca : ''}
+                                        </div>
+                                    </div>
+                                </div>
+                            </div>
+                        </div>
+                    `;
+                }).join('');
+                
+                document.getElementById('statusEscala').textContent = 
+                    `✅ ${escala.length} escala(s) cadastrada(s)`;
+                    
+            } catch (error) {
+                console.error('Erro ao renderizar escala atual:', error);
+                document.getElementById('escalaAtual').innerHTML = 
+                    '<div class="no-escala">Erro ao carregar escala</div>';
+            }
+        }
+        
+        // Renderizar apenas os dias do organista logado
+        async function renderMeusDias() {
+            if (isAdmin) return; // Admin não precisa desta função
+            
+            try {
+                const response = await fetch('/escala/atual');
+                const data = await response.json();
+                const escala = data.escala || [];
+                // Carregar RJM atual
+                let escalaRJM = [];
+                try {
+                    const rjmResp = await fetch('/rjm/atual');
+                    const rjmData = await rjmResp.json();
+                    escalaRJM = rjmData.escala_rjm || [];
+                } catch (e) { console.warn('Não foi possível carregar RJM para Meus Dias'); }
+                // Carregar trocas para considerar "aceitas" como pré-visualização nos meus dias
+                let trocas = [];
+                try {
+                    const trocasResp = await fetch('/trocas');
+                    trocas = await trocasResp.json();
+                } catch (e) { console.warn('Não foi possível carregar trocas para Meus Dias'); }
+                const acceptedCultoForMe = (trocas || []).filter(t => (t.status === 'aceita' || t.status === 'aprovada') && t.tipo === 'culto' && t.alvo_id === currentUserId);
+                const acceptedRjmForMe = (trocas || []).filter(t => (t.status === 'aceita' || t.status === 'aprovada') && t.tipo === 'rjm' && t.alvo_id === currentUserId);
+                const trocasByData = {};
+                acceptedCultoForMe.forEach(t => {
+                    trocasByData[t.data] = trocasByData[t.data] || {};
+                    if (t.slot === 'meia_hora') trocasByData[t.data].meia_hora = true;
+                    if (t.slot === 'culto') trocasByData[t.data].culto = true;
+                });
+                // Mapa RJM por data (minhas e trocas aceitas)
+                const rjmByData = {};
+                escalaRJM.forEach(i => {
+                    rjmByData[i.data] = rjmByData[i.data] || { my: false, troca: false };
+                    if (i.organista === APP.user.nome) rjmByData[i.data].my = true;
+                });
+                acceptedRjmForMe.forEach(t => {
+                    rjmByData[t.data] = rjmByData[t.data] || { my: false, troca: false };
+                    rjmByData[t.data].troca = true;
+                });
+                
+                const container = document.getElementById('meusDias');
+                
+                if ((!escala || escala.length === 0) && (!escalaRJM || escalaRJM.length === 0)) {
+                    container.innerHTML = '<div class="no-escala">Nenhuma escala cadastrada ainda</div>';
+                    return;
+                }
+                
+                // Pegar data atual para comparação
+                const hoje = new Date();
+                hoje.setHours(0, 0, 0, 0);
+                
+                // Pegar o nome do usuário atual
+                const nomeUsuario = APP.user.nome;
+                
+                // Filtrar apenas os dias onde o usuário está escalado
+                let meusDias = escala
+                    .filter(item => {
+                        const dataEscala = parseISODateLocal(item.data);
+                        if (dataEscala < hoje) return false; // futuros/apenas hoje
+                        const acceptedSlots = trocasByData[item.data] || {};
+                        const assignedMeia = item.meia_hora === nomeUsuario || !!acceptedSlots.meia_hora;
+                        const assignedCulto = item.culto === nomeUsuario || !!acceptedSlots.culto;
+                        const hasRjm = rjmByData[item.data] && (rjmByData[item.data].my || rjmByData[item.data].troca);
+                        return assignedMeia || assignedCulto || hasRjm;
+                    })
+                    .map(item => {
+                        // Enriquecer com flags de troca por slot
+                        const acceptedSlots = trocasByData[item.data] || {};
+                        const rjmFlags = rjmByData[item.data] || { my: false, troca: false };
+                        return {
+                            ...item,
+                            _troca_meia: !!acceptedSlots.meia_hora && item.meia_hora !== nomeUsuario,
+                            _troca_culto: !!acceptedSlots.culto && item.culto !== nomeUsuario,
+                            _rjm_assigned: rjmFlags.my || rjmFlags.troca,
+                            _troca_rjm: rjmFlags.troca && !rjmFlags.my
+                        };
+                    })
+                    .sort((a, b) => compareISODateStrings(a.data, b.data));
+
+                // Incluir datas RJM não presentes na escala principal
+                const datasJaListadas = new Set(meusDias.map(i => i.data));
+                escalaRJM.forEach(i => {
+                    const dataItem = parseISODateLocal(i.data);
+                    if (dataItem < hoje) return;
+                    const rjmFlags = rjmByData[i.data] || { my: false, troca: false };
+                    if ((rjmFlags.my || rjmFlags.troca) && !datasJaListadas.has(i.data)) {
+                        meusDias.push({
+                            data: i.data,
+                            dia_semana: 'Sunday',
+                            meia_hora: null,
+                            culto: null,
+                            _troca_meia: false,
+                            _troca_culto: false,
+                            _rjm_assigned: true,
+                            _troca_rjm: rjmFlags.troca && !rjmFlags.my
+                        });
+                        datasJaListadas.add(i.data);
+                    }
+                });
+                meusDias.sort((a, b) => compareISODateStrings(a.data, b.data));
+                
+                if (meusDias.length === 0) {
+                    container.innerHTML = '<div class="no-escala">Você não está escalado(a) em nenhuma data próxima</div>';
+                    return;
+                }
+                
+                // Renderizar os dias do organista
+                container.innerHTML = meusDias.map(item => {
+                    const data = parseISODateLocal(item.data);
+                    const dia = data.getDate();
+                    const nomeMes = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
+                                    'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'][data.getMonth()];
+                    const ano = data.getFullYear();
+                    
+                    // Calcular o dia da semana pela data (evita inconsistência armazenada)
+                    const diasSemanaMap = {
+                        'Sunday': 'Domingo',
+                        'Monday': 'Segunda',
+                        'Tuesday': 'Terça',
+                        'Wednesday': 'Quarta',
+                        'Thursday': 'Quinta',
+                        'Friday': 'Sexta',
+                        'Saturday': 'Sábado'
+                    };
+                    const diasIngles = ['Sunday','Monday','Tuesday','Wednesday','Thursday','Friday','Saturday'];
+                    const englishDay = diasIngles[data.getDay()];
+                    const diaSemana = diasSemanaMap[englishDay] || englishDay;
+                    
+                    // Map day of week to CSS class
+                    const tipoDiaMap = {
+                        'Sunday': 'domingo',
+                        'Monday': 'segunda',
+                        'Tuesday': 'terca',
+                        'Wednesday': 'quarta',
+                        'Thursday': 'quinta',
+                        'Friday': 'sexta',
+                        'Saturday': 'sabado'
+                    };
+                    const tipoDia = tipoDiaMap[englishDay] || '';
+                    const emoji = diaSemana === 'Domingo' ? '🙏' : '📖';
+                    
+                    // Verificar em qual serviço o organista está
+                    const isMeiaHora = item.meia_hora === nomeUsuario || item._troca_meia;
+                    const isCulto = item.culto === nomeUsuario || item._troca_culto;
+                    const isRJM = !!item._rjm_assigned;
+                    
+                    // Preparar lista de serviços para passar para a função
+                    const servicos = [];
+                    if (isMeiaHora) servicos.push('meia_hora');
+                    if (isCulto) servicos.push('culto');
+                    if (isRJM) servicos.push('rjm');
+                    const servicosStr = JSON.stringify(servicos).replace(/"/g, '&quot;');
+                    
+                    return `
+                        <div class="escala-item ${tipoDia}">
+                            <div class="escala-date-box">
+                                <div class="escala-dia-numero">${dia}</div>
+                                <div class="escala-dia-semana">${emoji} ${diaSemana}</div>
+                                <div class="escala-mes-ano">${nomeMes} ${ano}</div>
+                            </div>
+                            
+                            <div class="escala-divider"></div>
+                            
+                            <div class="escala-servicos">
+                                ${isMeiaHora ? `
+                                <div class="escala-servico" style="background: rgba(16, 185, 129, 0.15); border-left-color: #10b981; border-left-width: 4px;">
+                                    <div class="escala-servico-icon">⏰</div>
+                                    <div class="escala-servico-text">
+                                        <div class="escala-tipo">Meia-hora</div>
+                                        <div class="escala-organista" style="color: #10b981; font-weight: bold;">✓ Você ${item._troca_meia ? '<span class="info-badge" style="background:#fde68a;color:#a16207;margin-left:8px;">Troca</span>' : ''}</div>
+                                    </div>
+                                </div>
+                                ` : ''}
+                                ${isRJM ? `
+                                <div class="escala-servico" style="background: rgba(59, 130, 246, 0.15); border-left-color: #3b82f6; border-left-width: 4px;">
+                                    <div class="escala-servico-icon">👧</div>
+                                    <div class="escala-servico-text">
+                                        <div class="escala-tipo">RJM</div>
+                                        <div class="escala-organista" style="color: #2563eb; font-weight: bold;">✓ Você ${item._troca_rjm ? '<span class="info-badge" style="background:#fde68a;color:#a16207;margin-left:8px;">Troca</span>' : ''}</div>
+                                    </div>
+                                </div>
+                                ` : ''}
+                                
+                                ${isCulto ? `
+                                <div class="escala-servico" style="background: rgba(16, 185, 129, 0.15); border-left-color: #10b981; border-left-width: 4px;">
+                                    <div class="escala-servico-icon">🎹</div>
+                                    <div class="escala-servico-text">
+                                        <div class="escala-tipo">Culto</div>
+                                        <div class="escala-organista" style="color: #10b981; font-weight: bold;">✓ Você ${item._troca_culto ? '<span class="info-badge" style="background:#fde68a;color:#a16207;margin-left:8px;">Troca</span>' : ''}</div>
+                                    </div>
+                                </div>
+                                ` : ''}
+                                
+                <button onclick="adicionarAgenda('${item.data}', '${englishDay}', ${servicosStr})" 
+                                        class="btn-adicionar-agenda"
+                                        style="margin-top: 10px; width: 100%; padding: 8px; background: #3b82f6; color: white; border: none; border-radius: 6px; cursor: pointer; font-size: 0.9em; display: flex; align-items: center; justify-content: center; gap: 6px;">
+                                    📅 Adicionar à Agenda
+                                </button>
+                            </div>
+                        </div>
+                    `;
+                }).join('');
+                    
+            } catch (error) {
+                console.error('Erro ao renderizar meus dias:', error);
+                document.getElementById('meusDias').innerHTML = 
+                    '<div class="no-escala">Erro ao carregar seus dias</div>';
+            }
+        }
+        // Carregar lista de comuns para seletor de organistas
+        async function carregarComunsParaOrganista() {
+            console.log('🔄 carregarComunsParaOrganista() chamada');
+            
+            const selectComum = document.getElementById('orgComumId');
+            console.log('  📋 selectComum encontrado:', selectComum !== null);
+            
+            if (!selectComum) {
+                console.log('⚠️ Campo orgComumId não encontrado - usuário não é Master ou Encarregado');
+                return;
+            }
+            
+            // Se for encarregado de comum, carregar apenas sua comum
+            const hiddenComumId = document.getElementById('orgComumIdHidden');
+            console.log('  📋 hiddenComumId encontrado:', hiddenComumId !== null);
+            console.log('  📋 hiddenComumId.value:', hiddenComumId ? hiddenComumId.value : 'N/A');
+            
+            if (hiddenComumId && hiddenComumId.value) {
+                console.log('👤 Usuário é Encarregado de Comum, carregando contexto específico...');
+                await carregarComumDoEncarregado(hiddenComumId.value);
+                return;
+            }
+            
+            console.log('🔄 Iniciando carregamento de comuns (Master)...');
+            selectComum.innerHTML = '<option value="">⏳ Carregando comuns...</option>';
+            selectComum.disabled = true;
+            
+            try {
+                const regionais = await obterHierarquia();
+                console.log('✅ Regionais carregadas:', regionais.length, regionais);
+                
+                if (!Array.isArray(regionais) || regionais.length === 0) {
+                    selectComum.innerHTML = '<option value="">❌ Nenhuma regional encontrada</option>';
+                    console.warn('⚠️ Array de regionais vazio ou inválido');
+                    return;
+                }
+                
+                selectComum.innerHTML = '<option value="">Selecione o comum...</option>';
+                let totalComuns = 0;
+                
+                for (const regional of regionais) {
+                    console.log(`📍 Processando regional: ${regional.nome} (${regional.id})`);
+                    
+                    try {
+                        const subRegionais = regional.sub_regionais;
+                        console.log(`  ✅ Sub-regionais: ${subRegionais.length}`, subRegionais);
+                        
+                        for (const sub of subRegionais) {
+                            console.log(`    📍 Processando sub-regional: ${sub.nome} (${sub.id})`);
+                            
+                            try {
+                                const comuns = sub.comuns;
+                                console.log(`      ✅ Comuns: ${comuns.length}`, comuns);
+                                
+                                for (const comum of comuns) {
+                                    const option = document.createElement('option');
+                                    option.value = comum.id;
+                                    option.textContent = `${regional.nome} › ${sub.nome} › ${comum.nome}`;
+                                    selectComum.appendChild(option);
+                                    totalComuns++;
+                                    console.log(`        ✅ Adicionado: ${comum.nome} (ID: ${comum.id})`);
+                                }
+                            } catch (error) {
+                                console.error(`      ❌ Erro ao carregar comuns de ${sub.nome}:`, error);
+                            }
+                        }
+                    } catch (error) {
+                        console.error(`  ❌ Erro ao carregar sub-regionais de ${regional.nome}:`, error);
+                    }
+                }
+                
+                console.log(`🎉 Total de comuns carregados: ${totalComuns}`);
+                
+                if (totalComuns === 0) {
+                    selectComum.innerHTML = '<option value="">❌ Nenhum comum encontrado</option>';
+                    console.warn('⚠️ Nenhum comum foi carregado. Verifique se existem comuns cadastrados.');
+                } else {
+                    selectComum.disabled = false;
+                    console.log(`✅ Seletor habilitado com ${totalComuns} comuns`);
+                }
+                
+            } catch (error) {
+                console.error('❌ ERRO CRÍTICO ao carregar comuns:', error);
+                selectComum.innerHTML = '<option value="">❌ Erro ao carregar - veja console</option>';
+                selectComum.disabled = false;
+            }
+        }
+        
+        // Carregar comum específica para encarregado
+        async function carregarComumDoEncarregado(comumId) {
+            const selectComum = document.getElementById('orgComumId');
+            selectComum.innerHTML = '<option value="">⏳ Carregando sua comum...</option>';
+            selectComum.disabled = true;
+            
+            try {
+                console.log(`🔍 Encarregado de Comum detectado`);
+                console.log(`🔑 contexto_id: "${comumId}"`);
+                console.log(`📡 Buscando dados da comum...`);
+                
+                // Buscar na hierarquia do escopo do usuário para encontrar a comum
+                const regionais = await obterHierarquia();
+                console.log(`✅ Regionais recebidas:`, regionais);
+                
+                let comumEncontrada = null;
+                let hierarquia = null;
+                
+                // Buscar a comum na hierarquia
+                for (const regional of regionais) {
+                    console.log(`🔎 Procurando em regional: ${regional.nome} (${regional.id})`);
+                    
+                    const subRegionais = regional.sub_regionais;
+                    console.log(`  ✅ Sub-regionais:`, subRegionais);
+                    
+                    for (const sub of subRegionais) {
+                        console.log(`  🔎 Procurando em sub-regional: ${sub.nome} (${sub.id})`);
+                        
+                        const comuns = sub.comuns;
+                        console.log(`    ✅ Comuns encontradas:`, comuns);
+                        
+                        // Comparar IDs
+                        console.log(`    🔍 Procurando comum com ID: "${comumId}"`);
+                        const comum = comuns.find(c => {
+                            console.log(`      🔸 Comparando: "${c.id}" === "${comumId}" = ${c.id === comumId}`);
+                            return c.id === comumId;
+                        });
+                        
+                        if (comum) {
+                            console.log(`    🎯 COMUM ENCONTRADA!`, comum);
+                            comumEncontrada = comum;
+                            hierarquia = {
+                                regional: regional.nome,
+                                subRegional: sub.nome
+                            };
+                            break;
+                        }
+                    }
+                    if (comumEncontrada) break;
+                }
+                
+                if (comumEncontrada && hierarquia) {
+                    const textoCompleto = `${hierarquia.regional} › ${hierarquia.subRegional} › ${comumEncontrada.nome}`;
+                    selectComum.innerHTML = `<option value="${comumId}" selected>${textoCompleto}</option>`;
+                    selectComum.disabled = true; // Mantém desabilitado para encarregados
+                    console.log(`✅ Select preenchido com: "${textoCompleto}"`);
+                    console.log(`🎉 Comum carregada com sucesso!`);
+                    
+                    // Carregar dias da comum automaticamente
+                    await carregarDiasDoComum();
+                } else {
+                    console.error(`❌ Comum "${comumId}" NÃO ENCONTRADA na hierarquia!`);
+                    console.warn(`💡 Possíveis causas:`);
+                    console.warn(`   1. ID errado no user.contexto_id`);
+                    console.warn(`   2. Comum não cadastrada no banco`);
+                    console.warn(`   3. Problema na estrutura hierárquica`);
+                    
+                    // Mesmo assim, usar o ID para permitir cadastro
+                    selectComum.innerHTML = `<option value="${comumId}" selected>Sua Comum (${comumId})</option>`;
+                    selectComum.disabled = true;
+                }
+                
+            } catch (error) {
+                console.error('❌ ERRO CRÍTICO ao carregar comum do encarregado:');
+                console.error(error);
+                selectComum.innerHTML = `<option value="${comumId}" selected>Sua Comum (${comumId})</option>`;
+                selectComum.disabled = true;
+                showAlert('alertOrganista', `Aviso: Não foi possível carregar o nome completo da sua comum. O sistema usará automaticamente a comum "${comumId}". Entre em contato com o administrador se o problema persistir.`, 'warning');
+            }
+        }
+        
+        // Carregar dias do comum selecionado e atualizar contexto para Master
+        async function carregarDiasDoComum() {
+            // Se for Master, também atualizar o contexto do dashboard
+            if (userTipo === 'master') {
+                const selectComum = document.getElementById('orgComumId');
+                if (selectComum && selectComum.value) {
+                    console.log('🔄 Master: atualizando contexto do dashboard para comum:', selectComum.value);
+                    await atualizarContextoMaster(selectComum.value);
+                }
+            }
+            
+            // Continuar com carregamento normal dos dias
+            await carregarDiasDoComumInterno();
+        }
+        
+        // Atualizar contexto do Master no backend
+        async function atualizarContextoMaster(comumId) {
+            try {
+                // Buscar informações completas da comum
+                const db = await obterHierarquia();
+                
+                let regional_id, sub_regional_id;
+                for (const regional of db) {
+                    for (const subRegional of regional.sub_regionais || []) {
+                        const comum = (subRegional.comuns || []).find(c => c.id === comumId);
+                        if (comum) {
+                            regional_id = regional.id;
+                            sub_regional_id = subRegional.id;
+                            break;
+                        }
+                    }
+                    if (regional_id) break;
+                }
+                
+                if (regional_id && sub_regional_id) {
+                    // Atualizar contexto no backend
+                    const response = await fetch('/api/contexto/selecionar', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ regional_id, sub_regional_id, comum_id: comumId })
+                    });
+                    
+                    if (response.ok) {
+                        console.log('✅ Contexto atualizado no backend');
+                        // Recarregar organistas e escala
+                        await loadOrganistas();
+                        await loadEscalaAtual();
+                    }
+                }
+            } catch (error) {
+                console.error('❌ Erro ao atualizar contexto:', error);
+            }
+        }
+        
+        // Carregar dias do comum selecionado (lógica interna)
+        async function carregarDiasDoComumInterno() {
+            const selectComum = document.getElementById('orgComumId');
+            const hiddenComumId = document.getElementById('orgComumIdHidden');
+            const selectDias = document.getElementById('orgDias');
+            
+            // Pegar comum_id: primeiro do hidden (encarregado), depois do select (master), depois do contexto
+            let comumId = null;
+            if (hiddenComumId && hiddenComumId.value) {
+                comumId = hiddenComumId.value;
+                console.log('🔑 carregarDiasDoComum: usando comum_id do hidden:', comumId);
+            } else if (selectComum && selectComum.value) {
+                comumId = selectComum.value;
+                console.log('🔑 carregarDiasDoComum: usando comum_id do select:', comumId);
+            } else if (contextoAtual.comum && contextoAtual.comum.id) {
+                comumId = contextoAtual.comum.id;
+                console.log('🔑 carregarDiasDoComum: usando comum_id do contexto:', comumId);
+            }
+            
+            if (!comumId) {
+                console.warn('⚠️ carregarDiasDoComum: Nenhum comum_id disponível');
+                selectDias.innerHTML = '<option value="">Selecione o comum primeiro</option>';
+                return;
+            }
+            
+            try {
+                console.log(`📡 Buscando config da comum: /api/comuns/${comumId}/config`);
+                const response = await fetch(`/api/comuns/${comumId}/config`);
+                
+                if (!response.ok) {
+                    console.error(`❌ Erro HTTP ${response.status} ao buscar config da comum ${comumId}`);
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                
+                const config = await response.json();
+                console.log(`✅ Config recebida da comum ${comumId}:`, config);
+                console.log(`  📅 Dias de culto:`, config.dias_culto);
+                
+                selectDias.innerHTML = '';
+                
+                if (config.dias_culto && config.dias_culto.length > 0) {
+                    console.log(`✅ Carregando ${config.dias_culto.length} dias da config`);
+                    config.dias_culto.forEach(dia => {
+                        const option = document.createElement('option');
+                        option.value = dia;
+                        option.textContent = dia;
+                        selectDias.appendChild(option);
+                        console.log(`  ➕ Adicionado dia: ${dia}`);
+                    });
+                } else {
+                    console.warn(`⚠️ Config sem dias_culto, usando fallback`);
+                    // Fallback para dias padrão
+                    ['Domingo', 'Terça'].forEach(dia => {
+                        const option = document.createElement('option');
+                        option.value = dia;
+                        option.textContent = dia;
+                        selectDias.appendChild(option);
+                    });
+                }
+            } catch (error) {
+                console.error('Erro ao carregar dias do comum:', error);
+                // Fallback para dias padrão
+                selectDias.innerHTML = '';
+                ['Domingo', 'Terça'].forEach(dia => {
+                    const option = document.createElement('option');
+                    option.value = dia;
+                    option.textContent = dia;
+                    selectDias.appendChild(option);
+                });
+            }
+        }
+        
+        // Adicionar organista
+        async function addOrganista(event) {
+            event.preventDefault();
+            
+            const selectComum = document.getElementById('orgComumId');
+            const hiddenComumId = document.getElementById('orgComumIdHidden');
+            
+            // Pegar comum_id do select (Master) ou do hidden (Encarregado)
+            let comumId = null;
+            if (hiddenComumId && hiddenComumId.value) {
+                comumId = hiddenComumId.value;
+                console.log('🔑 Usando comum_id do encarregado:', comumId);
+            } else if (selectComum) {
+                comumId = selectComum.value;
+                console.log('🔑 Usando comum_id selecionado:', comumId);
+            }
+            
+            const payload = {
+                id: document.getElementById('orgId').value,
+                nome: document.getElementById('orgNome').value,
+                email: document.getElementById('orgEmail').value || '',
+                telefone: document.getElementById('orgTelefone').value || '',
+                tipos: Array.from(document.getElementById('orgTipos').selectedOptions).map(o => o.value),
+                dias_permitidos: Array.from(document.getElementById('orgDias').selectedOptions).map(o => o.value),
+                regras_especiais: {}
+            };
+            
+            // Adicionar comum_id ao payload
+            if (selectComum || hiddenComumId) {
+                if (!comumId) {
+                    showAlert('alertOrganista', 'Selecione o comum onde a organista atuará', 'error');
+                    return;
+                }
+                payload.comum_id = comumId;
+            }
+            
+            try {
+                const response = await fetch('/organistas', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify(payload)
+                });
+                
+                const result = await response.json();
+                
+                if (response.ok) {
+                    showAlert('alertOrganista', 'Organista adicionado com sucesso!', 'success');
+                    document.getElementById('formOrganista').reset();
+                    loadOrganistas();
+                } else {
+                    showAlert('alertOrganista', result.error, 'error');
+                }
+            } catch (error) {
+                showAlert('alertOrganista', 'Erro ao adicionar organista.', 'error');
+            }
+        }
+        
+        // Remover organista
+        // Editar organista
+        function editarOrganista(id) {
+            const organista = organistas.find(o => o.id === id);
+            if (!organista) {
+                alert('Organista não encontrado!');
+                return;
+            }
+            
+            // Preencher formulário
+            document.getElementById('editOrgId').value = organista.id;
+            document.getElementById('editOrgNome').value = organista.nome;
+            document.getElementById('editOrgEmail').value = organista.email || '';
+            document.getElementById('editOrgTelefone').value = organista.telefone || '';
+            
+            // Selecionar tipos
+            const selectTipos = document.getElementById('editOrgTipos');
+            Array.from(selectTipos.options).forEach(option => {
+                option.selected = organista.tipos.includes(option.value);
+            });
+            
+            // Selecionar dias
+            const selectDias = document.getElementById('editOrgDias');
+            Array.from(selectDias.options).forEach(option => {
+                option.selected = organista.dias_permitidos.includes(option.value);
+            });
+            
+            // Abrir modal
+            document.getElementById('modalEditarOrganista').classList.add('active');
+        }
+        
+        function fecharModalEditar() {
+            document.getElementById('modalEditarOrganista').classList.remove('active');
+            document.getElementById('formEditarOrganista').reset();
+        }
+        
+        async function salvarEdicaoOrganista(event) {
+            event.preventDefault();
+            
+            const id = document.getElementById('editOrgId').value;
+            const nome = document.getElementById('editOrgNome').value;
+            
+            const selectTipos = document.getElementById('editOrgTipos');
+            const tipos = Array.from(selectTipos.selectedOptions).map(opt => opt.value);
+            
+            const selectDias = document.getElementById('editOrgDias');
+            const dias_permitidos = Array.from(selectDias.selectedOptions).map(opt => opt.value);
+            
+            if (tipos.length === 0) {
+                alert('⚠️ Selecione pelo menos um tipo!');
+                return;
+            }
+            
+            if (dias_permitidos.length === 0) {
+                alert('⚠️ Selecione pelo menos um dia permitido!');
+                return;
+            }
+            
+            const email = document.getElementById('editOrgEmail').value || '';
+            const telefone = document.getElementById('editOrgTelefone').value || '';
+            
+            try {
+                const response = await fetch(`/organistas/${id}`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({
+                        nome,
+                        email,
+                        telefone,
+                        tipos,
+                        dias_permitidos
+                    })
+                });
+                
+                if (response.ok) {
+                    alert('✅ Organista atualizada com sucesso!');
+                    fecharModalEditar();
+                    await loadOrganistas();
+                } else {
+                    const error = await response.json();
+                    alert(`❌ Erro: ${error.error || 'Falha ao atualizar'}`);
+                }
+            } catch (error) {
+                console.error('Erro ao atualizar organista:', error);
+                alert('❌ Erro ao atualizar organista.');
+            }
+        }
+        
+        async function deleteOrganista(id) {
+            if (!confirm('Deseja realmente remover este organista?')) return;
+            
+            try {
+                const response = await fetch(`/organistas/${id}`, {method: 'DELETE'});
+                const result = await response.json();
+                
+                if (response.ok) {
+                    loadOrganistas();
+                } else {
+                    alert(result.error);
+                }
+            } catch (error) {
+                alert('Erro ao remover organista.');
+            }
+        }
+        
+        // Carregar indisponibilidades
+        async function loadIndisponibilidades() {
+            if (isCoord) {
+                document.getElementById('calendarioIndisp').innerHTML = 
+                    '<div style="background: #dbeafe; padding: 20px; border-radius: 10px; border-left: 4px solid #3b82f6;">' +
+                    '<h3 style="color: #1e40af; margin-bottom: 10px;">ℹ️ Coordenador</h3>' +
+                    '<p style="color: #1e3a8a;">Coordenadores visualizam todas as indisponibilidades na página de geração de escala. Para ver/editar indisponibilidades de uma organista específica, entre com a conta dela.</p>' +
+                    '</div>';
+                document.getElementById('chipsDatas').innerHTML = '';
+                return;
+            }
+            
+            try {
+                // Garantir contexto e obter config atual da comum
+                try { await carregarContextoAtual(); } catch(e) { console.warn('Falha ao carregar contexto', e); }
+                try {
+                    if (contextoAtual && contextoAtual.comum && contextoAtual.comum.id) {
+                        const cfgResp = await fetch(`/api/comuns/${contextoAtual.comum.id}/config`);
+                        if (cfgResp.ok) {
+                            const cfgJson = await cfgResp.json();
+                            contextoAtual.comum = contextoAtual.comum || {};
+                            contextoAtual.comum.config = cfgJson;
+                        }
+                    }
+                } catch(e) { console.warn('Falha ao buscar config da comum', e); }
+                const response = await fetch('/indisponibilidades');
+                indisponibilidades = await response.json();
+                
+                renderCalendar();
+            } catch (error) {
+                console.error('Erro ao carregar indisponibilidades:', error);
+            }
+        }
+        
+        // Renderizar calendário simplificado
+        function renderCalendar() {
+            // Determinar período a partir do contexto atual (preferencial) ou do cfg renderizado no servidor
+            const cfgPeriodo = (contextoAtual && contextoAtual.comum && contextoAtual.comum.config && (contextoAtual.comum.config.periodo || contextoAtual.comum.config.bimestre)) || null;
+            const inicioStr = (cfgPeriodo && cfgPeriodo.inicio) ? cfgPeriodo.inicio : APP.bimestre.inicio;
+            const fimStr = (cfgPeriodo && cfgPeriodo.fim) ? cfgPeriodo.fim : APP.bimestre.fim;
+
+            console.log('📅 [CALENDAR] Renderizando calendário de indisponibilidades');
+            console.log('  Período configurado:', inicioStr, 'até', fimStr);
+            console.log('  Fonte da config:', cfgPeriodo ? 'contextoAtual.comum.config' : 'cfg server-side');
+
+            // Parse local-safe (evita drift de timezone do Date ISO)
+            const toLocalDate = (iso) => {
+                const [y, m, d] = (iso || '').split('-').map(Number);
+                return new Date(y, (m || 1) - 1, d || 1, 0, 0, 0, 0);
+            };
+            const inicio = toLocalDate(inicioStr);
+            const fim = toLocalDate(fimStr);
+            
+            console.log('  Datas parseadas: inicio =', inicio.toISOString().split('T')[0], ', fim =', fim.toISOString().split('T')[0]);
+            
+            const calendar = document.getElementById('calendarioIndisp');
+            
+            const mesesNome = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
+                              'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'];
+            
+            const diasSemana = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado'];
+            
+            // Agrupar datas por mês (apenas domingos e terças DENTRO DO PERÍODO)
+            const datasOrganizadas = {};
+            let current = new Date(inicio);
+            
+            console.log('  Iniciando iteração de datas...');
+            let iteracoes = 0;
+            while (current <= fim) {
+                iteracoes++;
+                if (iteracoes > 365) {
+                    console.error('⚠️ Loop infinito detectado! Abortando.');
+                    break;
+                }
+                
+                const dayOfWeek = current.getDay();
+                
+                // Apenas domingos (0) e terças (2)
+                if (dayOfWeek === 0 || dayOfWeek === 2) {
+                    const mesAno = `${current.getFullYear()}-${current.getMonth()}`;
+                    
+                    if (!datasOrganizadas[mesAno]) {
+                        datasOrganizadas[mesAno] = {
+                            mes: mesesNome[current.getMonth()],
+                            ano: current.getFullYear(),
+                            datas: []
+                        };
+                        console.log(`    Criando mês: ${mesesNome[current.getMonth()]}/${current.getFullYear()}`);
+                    }
+                    
+                    datasOrganizadas[mesAno].datas.push({
+                        data: new Date(current),
+                        dateStr: current.toISOString().split('T')[0],
+                        dia: current.getDate(),
+                        diaSemana: diasSemana[dayOfWeek]
+                    });
+                }
+                
+                current.setDate(current.getDate() + 1);
+            }
+            
+            console.log(`  Total de iterações: ${iteracoes}, meses criados: ${Object.keys(datasOrganizadas).length}`);
+            
+            console.log(`  Total de iterações: ${iteracoes}, meses criados: ${Object.keys(datasOrganizadas).length}`);
+            
+            // Renderizar por mês em ordem cronológica
+            let html = '<div style="margin-bottom: 20px;"><p style="color: #666; font-size: 0.95rem; margin-bottom: 20px;">📅 Clique nas datas abaixo para marcar/desmarcar sua indisponibilidade:</p>';
+            
+            // Ordenar os meses cronologicamente
+            const mesesOrdenados = Object.keys(datasOrganizadas).sort((a, b) => {
+                const [anoA, mesA] = a.split('-').map(Number);
+                const [anoB, mesB] = b.split('-').map(Number);
+                if (anoA !== anoB) return anoA - anoB;
+                return mesA - mesB;
+            });
+            
+            mesesOrdenados.forEach(mesAno => {
+                const mesData = datasOrganizadas[mesAno];
+                
+                html += `
+                    <div style="background: #f8fafc; padding: 20px; border-radius: 10px; margin-bottom: 20px; border: 2px solid #e2e8f0;">
+                        <h3 style="color: #1e293b; font-size: 1.5rem; margin-bottom: 15px; border-bottom: 2px solid #3b82f6; padding-bottom: 10px;">
+                            ${mesData.mes} / ${mesData.ano}
+                        </h3>
+                        
+                        <div style="display: grid; grid-template-columns: repeat(auto-fill, minmax(200px, 1fr)); gap: 12px;">
+                `;
+                
+                mesData.datas.forEach(item => {
+                    const isSelected = indisponibilidades.some(i => i.data === item.dateStr);
+                    
+                    html += `
+                        <div onclick="toggleDate('${item.dateStr}')" 
+                            style="padding: 15px; border-radius: 8px; cursor: pointer; text-align: center;
+                            background: ${isSelected ? '#ef4444' : '#10b981'}; 
+                            color: white; 
+                            font-weight: 500; 
+                            transition: all 0.2s;
+                            box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+                            <div style="font-size: 0.85rem; opacity: 0.9; margin-bottom: 5px;">
+                                ${item.diaSemana}
+                            </div>
+                            <div style="font-size: 1.5rem; font-weight: bold;">
+                                ${String(item.dia).padStart(2, '0')}
+                            </div>
+                            <div style="font-size: 0.75rem; margin-top: 5px; opacity: 0.9;">
+                                ${isSelected ? '✓ Indisponível' : 'Disponível'}
+                            </div>
+                        </div>
+                    `;
+                });
+                
+                html += `
+                        </div>
+                    </div>
+                `;
+            });
+            
+            html += '</div>';
+            
+            calendar.innerHTML = html;
+            updateChips();
+        }
+        
+        // Toggle data
+        async function toggleDate(dateStr) {
+            // Não permitir marcação fora do período configurado (UX)
+            const cfgPeriodo = (contextoAtual && contextoAtual.comum && contextoAtual.comum.config && (contextoAtual.comum.config.periodo || contextoAtual.comum.config.bimestre)) || null;
+            const inicioStr = (cfgPeriodo && cfgPeriodo.inicio) ? cfgPeriodo.inicio : APP.bimestre.inicio;
+            const fimStr = (cfgPeriodo && cfgPeriodo.fim) ? cfgPeriodo.fim : APP.bimestre.fim;
+            const toLocalDate = (iso) => { const [y, m, d] = (iso || '').split('-').map(Number); return new Date(y, (m||1)-1, d||1); };
+            const inPeriodo = (ds) => {
+                const dt = toLocalDate(ds);
+                const di = toLocalDate(inicioStr);
+                const df = toLocalDate(fimStr);
+                return dt >= di && dt <= df;
+            };
+            if (!inPeriodo(dateStr)) {
+                alert('Data fora do período configurado.');
+                return;
+            }
+            const exists = indisponibilidades.some(i => i.data === dateStr);
+            
+            if (exists) {
+                // Remover
+                try {
+                    const response = await fetch(`/indisponibilidades/${currentUserId}/${dateStr}`, {method: 'DELETE'});
+                    if (response.ok) {
+                        indisponibilidades = indisponibilidades.filter(i => i.data !== dateStr);
+                        renderCalendar();
+                    } else {
+                        const error = await response.json();
+                        alert(error.error || 'Erro ao remover indisponibilidade.');
+                    }
+                } catch (error) {
+                    alert('Erro ao remover indisponibilidade.');
+                }
+            } else {
+                // Adicionar
+                const payload = {
+                    data: dateStr,
+                    motivo: 'Indisponível'
+                };
+                
+                try {
+                    const response = await fetch('/indisponibilidades', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify(payload)
+                    });
+                    if (response.ok) {
+                        indisponibilidades.push({...payload, id: currentUserId});
+                        renderCalendar();
+                    } else {
+                        const error = await response.json();
+                        alert(error.error || 'Erro ao adicionar indisponibilidade.');
+                    }
+                } catch (error) {
+                    alert('Erro ao adicionar indisponibilidade.');
+                }
+            }
+        }
+        
+        // Atualizar chips (rodapé com datas marcadas)
+        function updateChips() {
+            const chips = document.getElementById('chipsDatas');
+            
+            if (indisponibilidades.length === 0) {
+                chips.innerHTML = '<p style="color: #666;">Nenhuma indisponibilidade marcada.</p>';
+                return;
+            }
+            
+            // Obter período configurado para filtrar indisponibilidades antigas
+            const cfgPeriodo = (contextoAtual && contextoAtual.comum && contextoAtual.comum.config && (contextoAtual.comum.config.periodo || contextoAtual.comum.config.bimestre)) || null;
+            const inicioStr = (cfgPeriodo && cfgPeriodo.inicio) ? cfgPeriodo.inicio : APP.bimestre.inicio;
+            const fimStr = (cfgPeriodo && cfgPeriodo.fim) ? cfgPeriodo.fim : APP.bimestre.fim;
+            
+            const toLocalDate = (iso) => {
+                const [y, m, d] = (iso || '').split('-').map(Number);
+                return new Date(y, (m || 1) - 1, d || 1, 0, 0, 0, 0);
+            };
+            const inicio = toLocalDate(inicioStr);
+            const fim = toLocalDate(fimStr);
+            
+            // Filtrar apenas indisponibilidades dentro do período configurado E que sejam domingo/terça
+            const indispFiltradas = indisponibilidades.filter(i => {
+                const dataIndisp = toLocalDate(i.data);
+                const dayOfWeek = dataIndisp.getDay();
+                // Apenas domingos (0) e terças (2) dentro do período
+                return dataIndisp >= inicio && dataIndisp <= fim && (dayOfWeek === 0 || dayOfWeek === 2);
+            });
+            
+            if (indispFiltradas.length === 0) {
+                chips.innerHTML = '<p style="color: #666;">Nenhuma indisponibilidade marcada no período atual.</p>';
+                return;
+            }
+            
+            let html = '<h3>Datas marcadas como indisponíveis:</h3><div style="margin-top: 10px;">';
+            indispFiltradas.forEach(i => {
+                const date = new Date(i.data + 'T00:00:00');
+                html += `<span class="info-badge" style="background: #fee2e2; color: #991b1b;">
+                    ${date.toLocaleDateString('pt-BR')}
+                </span>`;
+            });
+            html += '</div>';
+            chips.innerHTML = html;
+        }
+        
+        // Carregar todas indisponibilidades (Admin)
+        async function loadAdminIndisp() {
+            if (!isAdmin) return;
+            
+            try {
+                const response = await fetch('/admin/indisponibilidades/todas');
+                const data = await response.json();
+                
+                const container = document.getElementById('adminIndispList');
+                container.innerHTML = '';
+                
+                if (Object.keys(data).length === 0) {
+                    container.innerHTML = '<p style="color: #666; text-align: center;">Nenhuma indisponibilidade cadastrada ainda.</p>';
+                    return;
+                }
+                
+                for (const [orgId, info] of Object.entries(data)) {
+                    const card = document.createElement('div');
+                    card.className = 'card';
+                    card.style.background = '#EDE9FE';
+                    card.style.marginBottom = '15px';
+                    
+                    let html = `<h3 style="color: #312E81; margin-bottom: 10px;">👤 ${info.nome}</h3>`;
+                    
+                    if (info.indisponibilidades.length === 0) {
+                        html += '<p style="color: #666;">Nenhuma indisponibilidade marcada.</p>';
+                    } else {
+                        html += '<div style="display: flex; flex-wrap: wrap; gap: 10px;">';
+                        info.indisponibilidades.forEach(indisp => {
+                            const dataBR = indisp.data.split('-').reverse().join('/');
+                            html += `
+                                <div style="background: #fee2e2; color: #991b1b; padding: 8px 15px; border-radius: 5px; display: flex; align-items: center; gap: 10px;">
+                                    <span>${dataBR}</span>
+                                    <button onclick="deleteIndispAdmin('${orgId}', '${indisp.data}')" 
+                                            style="background: #ef4444; color: white; border: none; border-radius: 3px; padding: 3px 8px; cursor: pointer;">
+                                        ✕
+                                    </button>
+                                </div>
+                            `;
+                        });
+                        html += '</div>';
+                    }
+                    
+                    card.innerHTML = html;
+                    container.appendChild(card);
+                }
+            } catch (error) {
+                console.error('Erro ao carregar indisponibilidades:', error);
+            }
+        }
+        
+        // Deletar indisponibilidade (Admin)
+        async function deleteIndispAdmin(orgId, data) {
+            if (!confirm(`Remover indisponibilidade de ${data.split('-').reverse().join('/')}?`)) return;
+            
+            try {
+                const response = await fetch(`/indisponibilidades/${orgId}/${data}`, {method: 'DELETE'});
+                if (response.ok) {
+                    loadAdminIndisp();
+                } else {
+                    alert('Erro ao remover indisponibilidade.');
+                }
+            } catch (error) {
+                alert('Erro ao remover indisponibilidade.');
+            }
+        }
+        
+        // Salvar configurações (Admin)
+        async function saveConfig(event) {
+            event.preventDefault();
+            
+            const payload = {
+                bimestre: {
+                    inicio: document.getElementById('configInicio').value,
+                    fim: document.getElementById('configFim').value
+                },
+                fechamento_publicacao_dias: parseInt(document.getElementById('configFechamento').value)
+            };
+            
+            try {
+                const response = await fetch('/admin/config', {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify(payload)
+                });
+                
+                if (response.ok) {
+                    showAlert('alertConfig', '✅ Configurações salvas com sucesso! Atualizando...', 'success');
+                    // Aguardar 1 segundo e recarregar a página para atualizar todas as datas
+                    setTimeout(() => {
+                        window.location.reload();
+                    }, 1000);
+                } else {
+                    showAlert('alertConfig', 'Erro ao salvar configurações.', 'error');
+                }
+            } catch (error) {
+                showAlert('alertConfig', 'Erro ao salvar configurações.', 'error');
+            }
+        }
+        
+        // Mostrar alerta
+        function showAlert(id, message, type) {
+            const alert = document.getElementById(id);
+            alert.className = `alert alert-${type}`;
+            alert.textContent = message;
+            alert.classList.remove('hidden');
+            
+            setTimeout(() => {
+                alert.classList.add('hidden');
+            }, 5000);
+        }
+        
+        // ========== EVENTOS EM TEMPO REAL (SSE) ==========
+        // Alterações gravadas por outros usuários da comum chegam por /eventos e
+        // recarregam só a parte afetada (as rotas respondem 304 quando nada mudou).
+        const recargasAgendadas = {};
+        function agendarRecarga(chave, ...fns) {
+            clearTimeout(recargasAgendadas[chave]);
+            recargasAgendadas[chave] = setTimeout(() => {
+                fns.forEach(fn => { if (typeof fn === 'function') fn(); });
+            }, 300);
+        }
+
+        function recarregarEscala() {
+            agendarRecarga('escala', isAdmin ? renderEscalaAtual : renderMeusDias, loadEscalaAtual);
+        }
+
+        function recarregarRJM() {
+            agendarRecarga('rjm', loadEscalaRJM, isAdmin ? null : renderMeusDias);
+        }
+
+        function recarregarTrocas() {
+            agendarRecarga('trocas', loadTrocas, loadTrocasResumoDashboard, isAdmin ? null : renderMeusDias);
+        }
+
+        function iniciarEventos() {
+            if (!window.EventSource) return;
+            const fonte = new EventSource('/eventos');
+            // 503 (servidor sem thread livre para streams) fecha o EventSource: tenta de novo mais tarde
+            fonte.onerror = () => {
+                if (fonte.readyState === EventSource.CLOSED) setTimeout(iniciarEventos, 60000);
+            };
+            fonte.addEventListener('escala', recarregarEscala);
+            fonte.addEventListener('rjm', recarregarRJM);
+            fonte.addEventListener('trocas', (e) => {
+                recarregarTrocas();
+                const evento = JSON.parse(e.data || '{}');
+                if (evento.afeta === 'escala') recarregarEscala();
+                if (evento.afeta === 'rjm') recarregarRJM();
+            });
+            // Reconexão depois de perder eventos: atualiza tudo
+            fonte.addEventListener('sincronizar', () => {
+                recarregarEscala();
+                recarregarRJM();
+                recarregarTrocas();
+            });
+        }
+
+        // Inicialização
+        window.onload = async function() {
+            // Carregar contexto primeiro
+            await carregarContextoAtual();
+            
+            loadOrganistas();
+            
+            // Carregar dashboard apropriado
+            if (isAdmin) {
+                await renderEscalaAtual();
+            } else {
+                await renderMeusDias();
+            }
+
+            // Sempre carregar a escala completa no card "Culto Oficial"
+            try { await loadEscalaAtual(); } catch (e) { console.warn('Falha ao carregar escala inicial', e); }
+
+            iniciarEventos();
+            
+            // Carregar filtro de organistas para admin
+            if (isAdmin) {
+                fetch('/organistas').then(r => r.json()).then(orgs => {
+                    const select = document.getElementById('filterOrganista');
+                    orgs.forEach(org => {
+                        const option = document.createElement('option');
+                        option.value = org.id;
+                        option.textContent = org.nome;
+                        select.appendChild(option);
+                    });
+                });
+            }
+        };
+
+        // ============================================
+        // FUNÇÕES PARA ESCALA (FASE 2)
+        // ============================================
+        
+        async function criarEscalaVazia() {
+            try {
+                // Garantir que temos a lista de organistas
+                try {
+                    const response = await fetch('/organistas');
+                    organistas = await response.json();
+                    console.log('Organistas carregadas:', organistas.length);
+                } catch (error) {
+                    console.error('Erro ao carregar organistas:', error);
+                    throw new Error('Não foi possível carregar a lista de organistas');
+                }
+                
+                // Buscar configuração ESPECÍFICA DA COMUM (dias de culto e período)
+                await carregarContextoAtual();
+                let config;
+                try {
+                    if (!contextoAtual?.comum?.id) {
+                        throw new Error('Comum não identificada no contexto atual.');
+                    }
+                    console.log(`📡 Buscando config da comum: /api/comuns/${contextoAtual.comum.id}/config`);
+                    const configResp = await fetch(`/api/comuns/${contextoAtual.comum.id}/config`);
+                    if (!configResp.ok) {
+                        throw new Error(`Falha ao obter config da comum (${configResp.status})`);
+                    }
+                    config = await configResp.json();
+                } catch (e) {
+                    console.warn('⚠️ Falha ao obter config da comum, fazendo fallback para /admin/config:', e?.message || e);
+                    const configResponse = await fetch('/admin/config');
+                    if (!configResponse.ok) throw new Error('Não foi possível obter configurações');
+                    config = await configResponse.json();
+                }
+                
+                console.log('📅 Config recebida:', config);
+                
+                // Suportar tanto 'periodo' (nova estrutura) quanto 'bimestre' (antiga)
+                const periodoConfig = config.periodo || config.bimestre;
+                
+                if (!periodoConfig || !periodoConfig.inicio || !periodoConfig.fim) {
+                    throw new Error('Período não configurado. Configure o período da comum primeiro nas Configurações.');
+                }
+                
+                const inicio = new Date(periodoConfig.inicio + 'T00:00:00');
+                const fim = new Date(periodoConfig.fim + 'T00:00:00');
+                
+                // Mapear dias da semana em português para números
+                const diasSemanaMap = {
+                    'Domingo': 0,
+                    'Segunda': 1,
+                    'Terça': 2,
+                    'Quarta': 3,
+                    'Quinta': 4,
+                    'Sexta': 5,
+                    'Sábado': 6
+                };
+                
+                // Mapear números para nomes em inglês (necessário para compatibilidade com renderização)
+                const diasSemanaIngles = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
+                
+                // Pegar dias de culto da config (ou usar padrão)
+                const diasCulto = Array.isArray(config.dias_culto) ? config.dias_culto : [];
+                if (diasCulto.length === 0) {
+                    console.warn('⚠️ dias_culto não configurado para a comum. Usando fallback [Domingo, Terça].');
+                    diasCulto.push('Domingo', 'Terça');
+                }
+                const diasCultoNumeros = diasCulto.map(dia => diasSemanaMap[dia]).filter(n => n !== undefined);
+                
+                console.log('📅 Dias de culto configurados:', diasCulto);
+                console.log('📅 Números dos dias:', diasCultoNumeros);
+                console.log('📅 Período:', periodoConfig.inicio, 'até', periodoConfig.fim);
+                
+                // Criar escala vazia com os dias de culto configurados
+                const escala = [];
+                let current = new Date(inicio);
+                
+                while (current <= fim) {
+                    const dayOfWeek = current.getDay();
+                    
+                    // Verificar se é um dia de culto
+                    if (diasCultoNumeros.includes(dayOfWeek)) {
+                        escala.push({
+                            data: toISODateLocal(current),
+                            dia_semana: diasSemanaIngles[dayOfWeek],  // CORRIGIDO: usar nome em inglês
+                            meia_hora: null,
+                            culto: null
+                        });
+                    }
+                    
+                    current.setDate(current.getDate() + 1);
+                }
+                
+                console.log(`✅ Escala criada com ${escala.length} dias`);
+                
+                // Publicar escala vazia
+                const response = await fetch('/escala/publicar', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ escala: escala })
+                });
+
+                if (!response.ok) {
+                    const error = await response.json();
+                    throw new Error(error.erro || 'Erro ao criar escala');
+                }
+
+                showAlertEscala('✅ Escala criada! Agora preencha manualmente os organistas.', 'success');
+                await loadEscalaAtual();
+            } catch (error) {
+                showAlertEscala('Erro: ' + error.message, 'error');
+            }
+        }
+
+        async function loadEscalaAtual() {
+            try {
+                // Carregar organistas
+                try {
+                    const orgResponse = await fetch('/organistas');
+                    organistas = await orgResponse.json();
+                    console.log('Organistas carregadas para escala:', organistas.length);
+                } catch (error) {
+                    console.error('Erro ao carregar organistas:', error);
+                }
+                
+                // Carregar indisponibilidades
+                try {
+                    const indispResponse = await fetch('/indisponibilidades');
+                    indisponibilidades = await indispResponse.json();
+                    console.log('Indisponibilidades carregadas:', indisponibilidades.length);
+                } catch (error) {
+                    console.error('Erro ao carregar indisponibilidades:', error);
+                }
+                
+                const response = await fetch('/escala/atual');
+                
+                if (!response.ok) {
+                    const error = await response.json();
+                    throw new Error(error.erro || error.error || 'Erro ao carregar escala');
+                }
+
+                const data = await response.json();
+                
+                if (data.escala && data.escala.length > 0) {
+                    renderEscala(data.escala);
+                    renderEstatisticas(data.estatisticas);
+                    showAlertEscala('Escala atual carregada.', 'success');
+                } else {
+                    showAlertEscala('Nenhuma escala publicada ainda.', 'info');
+                    document.getElementById('escalaContainer').innerHTML = `
+                        <div style="text-align: center; padding: 40px; color: #999;">
+                            <p>Nenhuma escala publicada ainda.</p>
+                            ${isAdmin ? '<p style="font-size: 0.9em; margin-top: 10px;">Clique em "Criar Nova Escala" acima para começar.</p>' : ''}
+                        </div>
+                    `;
+                }
+            } catch (error) {
+                showAlertEscala('Erro: ' + error.message, 'error');
+            }
+        }
+
+        // Deletar Escala Atual
+        async function deletarEscalaAtual() {
+            try {
+                // Buscar escala atual para mostrar informações
+                const response = await fetch('/escala/atual');
+                const data = await response.json();
+                
+                if (!data.escala || data.escala.length === 0) {
+                    alert('⚠️ Não há escala cadastrada para deletar.');
+                    return;
+                }
+                
+                const escala = data.escala;
+                
+                // Contar informações
+                const totalDatas = escala.length;
+                const organistasUnicos = [...new Set(escala.flatMap(item => [
+                    item.meia_hora?.nome,
+                    item.culto?.nome
+                ].filter(Boolean)))];
+                
+                // Agrupar por mês
+                const datas = escala.map(item => parseISODateLocal(item.data));
+                const dataInicio = new Date(Math.min(...datas));
+                const dataFim = new Date(Math.max(...datas));
+                
+                const mesesNome = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'];
+                const mesInicio = mesesNome[dataInicio.getMonth()];
+                const mesFim = mesesNome[dataFim.getMonth()];
+                const anoInicio = dataInicio.getFullYear();
+                const anoFim = dataFim.getFullYear();
+                
+                const periodoTexto = anoInicio === anoFim 
+                    ? `${mesInicio} a ${mesFim}/${anoInicio}`
+                    : `${mesInicio}/${anoInicio} a ${mesFim}/${anoFim}`;
+                
+                // Montar mensagem
+                let mensagem = `🗑️ DELETAR ESCALA DE CULTO OFICIAL\n\n`;
+                mensagem += `📊 Informações da Escala:\n`;
+                mensagem += `📅 Período: ${periodoTexto}\n`;
+                mensagem += `📆 Total de datas: ${totalDatas}\n`;
+                mensagem += `👥 Organistas envolvidos: ${organistasUnicos.length}\n\n`;
+                
+                if (organistasUnicos.length > 0) {
+                    mensagem += `Organistas:\n`;
+                    organistasUnicos.slice(0, 8).forEach(org => {
+                        mensagem += `  • ${org}\n`;
+                    });
+                    if (organistasUnicos.length > 8) {
+                        mensagem += `  ... e mais ${organistasUnicos.length - 8} organista(s)\n`;
+                    }
+                    mensagem += `\n`;
+                }
+                
+                mensagem += `⚠️ ATENÇÃO: Esta ação NÃO pode ser desfeita!\n\n`;
+                mensagem += `Todos os dados desta escala serão PERMANENTEMENTE removidos.\n\n`;
+                mensagem += `Deseja realmente deletar esta escala?`;
+                
+                if (!confirm(mensagem)) {
+                    return;
+                }
+                
+                // Confirmar novamente
+                const confirmacao = confirm('⚠️ ÚLTIMA CONFIRMAÇÃO\n\nTem CERTEZA ABSOLUTA que deseja deletar?\n\nEsta escala será PERDIDA PERMANENTEMENTE!');
+                if (!confirmacao) {
+                    return;
+                }
+                
+                // Prosseguir com a exclusão
+                showAlertEscala('Deletando escala...', 'info');
+                
+                const deleteResponse = await fetch('/escala/delete', {
+                    method: 'DELETE',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    }
+                });
+                
+                const result = await deleteResponse.json();
+                
+                if (result.success) {
+                    showAlertEscala('✅ Escala deletada com sucesso!', 'success');
+                    
+                    // Limpar visualização
+                    document.getElementById('escalaContainer').innerHTML = `
+                        <div style="text-align: center; padding: 40px; color: #999;">
+                            <p>✅ Escala deletada com sucesso.</p>
+                            <p style="font-size: 0.9em; margin-top: 10px;">Clique em "Criar Nova Escala" para gerar uma nova.</p>
+                        </div>
+                    `;
+                    
+                    // Limpar estatísticas se existirem
+                    const statsContainer = document.getElementById('estatisticasContainer');
+                    if (statsContainer) {
+                        statsContainer.innerHTML = '';
+                    }
+                    
+                } else {
+                    showAlertEscala('❌ Erro ao deletar: ' + (result.error || 'Erro desconhecido'), 'error');
+                }
+                
+            } catch (error) {
+                console.error('Erro ao deletar escala:', error);
+                showAlertEscala('❌ Erro ao deletar escala: ' + error.message, 'error');
+            }
+        }
+
+        function renderEscala(escala) {
+            const container = document.getElementById('escalaContainer');
+            
+            if (!escala || escala.length === 0) {
+                container.innerHTML = `
+                    <div style="text-align: center; padding: 40px; color: #999;">
+                        <p>Nenhuma escala gerada ainda.</p>
+                        ${isAdmin ? '<p style="font-size: 0.9em; margin-top: 10px;">Clique em "Gerar Escala Automaticamente" acima.</p>' : ''}
+                    </div>
+                `;
+                return;
+            }
+
+            // Agrupar por mês
+            const escalaPorMes = {};
+            const mesesNome = {
+                1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
+                5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
+                9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+            };
+            
+            const diasSemana = {
+                'Sunday': 'Domingo',
+                'Tuesday': 'Terça-feira',
+                'Monday': 'Segunda',
+                'Wednesday': 'Quarta',
+                'Thursday': 'Quinta',
+                'Friday': 'Sexta',
+                'Saturday': 'Sábado'
+            };
+
+            console.log('📊 DEBUG: Primeiros 3 itens da escala:', escala.slice(0, 3));
+
+            escala.forEach(item => {
+                const date = parseISODateLocal(item.data);
+                const mesAno = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
+                
+                if (!escalaPorMes[mesAno]) {
+                    escalaPorMes[mesAno] = {
+                        nome: `${mesesNome[date.getMonth() + 1]} de ${date.getFullYear()}`,
+                        itens: []
+                    };
+                }
+                escalaPorMes[mesAno].itens.push(item);
+            });
+
+            // Atualizar informação do período
+            const infoEscala = document.getElementById('infoEscala');
+            const primeiraData = formatDateBR(escala[0].data);
+            const ultimaData = formatDateBR(escala[escala.length - 1].data);
+            infoEscala.innerHTML = `
+                <p><strong>📅 Período:</strong> ${primeiraData} a ${ultimaData}</p>
+                <p><strong>📊 Total de alocações:</strong> ${escala.length} (${Object.keys(escalaPorMes).length} ${Object.keys(escalaPorMes).length === 1 ? 'mês' : 'meses'})</p>
+            `;
+
+            // Renderizar cada mês separadamente
+            let html = '';
+            const mesesOrdenados = Object.keys(escalaPorMes).sort();
+            
+            mesesOrdenados.forEach((mesAno, index) => {
+                const mes = escalaPorMes[mesAno];
+                
+                html += `
+                    <div style="margin-bottom: 30px;">
+                        <h3 style="background: linear-gradient(135deg, #A78BFA 0%, #6D28D9 100%); color: white; padding: 12px 20px; border-radius: 8px; margin-bottom: 15px;">
+                            📅 ${mes.nome}
+                        </h3>
+                        
+                        <div style="overflow-x: auto;">
+                            <table style="width: 100%; border-collapse: collapse; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+                                <thead>
+                                    <tr style="background: #8B5CF6; color: white;">
+                                        <th style="padding: 12px; text-align: left;">Data</th>
+                                        <th style="padding: 12px; text-align: left;">Dia</th>
+                                        <th style="padding: 12px; text-align: center; border-left: 2px solid rgba(255,255,255,0.3);">
+                                            🎹 Meia-hora
+                                        </th>
+                                        <th style="padding: 12px; text-align: center; border-left: 2px solid rgba(255,255,255,0.3);">
+                                            🎵 Culto
+                                        </th>
+                                    </tr>
+                                </thead>
+                                <tbody>
+                `;
+                
+                mes.itens.forEach(item => {
+                    html += `
+                        <tr style="border-bottom: 1px solid #e5e7eb; background: white;" onmouseover="this.style.background='#f9fafb'" onmouseout="this.style.background='white'">
+                            <td style="padding: 12px; font-weight: 500;">${formatDateBR(item.data)}</td>
+                            <td style="padding: 12px;">${diasSemana[item.dia_semana] || item.dia_semana}</td>
+                    `;
+                    
+                    if (item.dia_semana === 'Sunday') {
+                        // DOMINGO: Duas fases separadas (Meia-hora e Culto)
+                        const meiaHora = item.meia_hora || '—';
+                        const culto = item.culto || '—';
+                        
+                        html += `
+                            <td style="padding: 12px; background: #f0fdf4;">
+                                <div style="display: flex; flex-direction: column;">
+                                    <strong style="color: #10b981; font-size: 0.75em; margin-bottom: 4px;">MEIA-HORA</strong>
+                                    ${isAdmin ? 
+                                        createOrganistaSelectHTML(item.data, 'meia_hora', meiaHora) : 
+                                        `<span>${meiaHora}</span>`
+                                    }
+                                </div>
+                            </td>
+                            <td style="padding: 12px; background: #eff6ff;">
+                                <div style="display: flex; flex-direction: column;">
+                                    <strong style="color: #3b82f6; font-size: 0.75em; margin-bottom: 4px;">CULTO</strong>
+                                    ${isAdmin ? 
+                                        createOrganistaSelectHTML(item.data, 'culto', culto) : 
+                                        `<span>${culto}</span>`
+                                    }
+                                </div>
+                            </td>
+                        `;
+                    } else {
+                        // TERÇA-FEIRA: Duas fases (podem ser pessoas diferentes)
+                        // Para compatibilidade: se tiver 'unica', usar para ambas; senão usar campos separados
+                        const meiaHora = item.meia_hora || item.unica || '—';
+                        const culto = item.culto || item.unica || '—';
+                        
+                        html += `
+                            <td style="padding: 12px; background: #fef3c7;">
+                                <div style="display: flex; flex-direction: column;">
+                                    <strong style="color: #d97706; font-size: 0.75em; margin-bottom: 4px;">MEIA-HORA</strong>
+                                    ${isAdmin ? 
+                                        createOrganistaSelectHTML(item.data, 'meia_hora', meiaHora) : 
+                                        `<span>${meiaHora}</span>`
+                                    }
+                                </div>
+                            </td>
+                            <td style="padding: 12px; background: #fef3c7;">
+                                <div style="display: flex; flex-direction: column;">
+                                    <strong style="color: #d97706; font-size: 0.75em; margin-bottom: 4px;">CULTO</strong>
+                                    ${isAdmin ? 
+                                        createOrganistaSelectHTML(item.data, 'culto', culto) : 
+                                        `<span>${culto}</span>`
+                                    }
+                                </div>
+                            </td>
+                        `;
+                    }
+                    
+                    html += '</tr>';
+                });
+                
+                html += `
+                                </tbody>
+                            </table>
+                        </div>
+                    </div>
+                `;
+            });
+            
+            container.innerHTML = html;
+        }
+
+        function createOrganistaSelectHTML(data, tipo, valorAtual) {
+            const selectId = `select_${data}_${tipo}`;
+            let html = `<select id="${selectId}" class="form-control" style="width: 100%; padding: 8px; border: 1px solid #d1d5db; border-radius: 5px; font-size: 14px;">`;
+            html += `<option value="">-- Selecione --</option>`;
+            
+            let opcoesDisponiveis = 0;
+            
+            organistas.forEach(org => {
+                const selected = org.nome === valorAtual ? 'selected' : '';
+                
+                // Verificar se está indisponível nesta data
+                const indisponivelNaData = indisponibilidades.some(
+                    ind => ind.id === org.id && ind.data === data
+                );
+                
+                // Verificar se tem a fase habilitada
+                let temFaseHabilitada = true;
+                if (tipo === 'meia_hora') {
+                    temFaseHabilitada = org.tipos && org.tipos.includes('Meia-hora');
+                } else if (tipo === 'culto') {
+                    temFaseHabilitada = org.tipos && org.tipos.includes('Culto');
+                } else if (tipo === 'unica') {
+                    // Para terça precisa ter ambas as fases
+                    temFaseHabilitada = org.tipos && 
+                        org.tipos.includes('Meia-hora') && 
+                        org.tipos.includes('Culto');
+                }
+                
+                // Se não está indisponível E tem fase habilitada, conta como disponível
+                if (!indisponivelNaData && temFaseHabilitada) {
+                    opcoesDisponiveis++;
+                }
+                
+                const disabled = indisponivelNaData || !temFaseHabilitada ? 'disabled' : '';
+                const style = indisponivelNaData ? 'color: #999; text-decoration: line-through;' : 
+                             !temFaseHabilitada ? 'color: #dc2626; font-style: italic;' : '';
+                const suffix = indisponivelNaData ? ' (indisponível)' : 
+                              !temFaseHabilitada ? ' (não habilitado)' : '';
+                
+                html += `<option value="${org.nome}" ${selected} ${disabled} style="${style}">${org.nome}${suffix}</option>`;
+            });
+            
+            html += '</select>';
+            
+            // Debug: log se há poucas opções
+            if (opcoesDisponiveis <= 1) {
+                console.log(`⚠️ Dropdown ${tipo} na data ${data}: apenas ${opcoesDisponiveis} opção(ões) disponível(is)`);
+            }
+            
+            return html;
+        }
+
+        async function salvarTodasAlteracoes() {
+            try {
+                showAlertEscala('Salvando todas as alterações...', 'info');
+                
+                // Buscar escala atual do backend
+                const response = await fetch('/escala/atual');
+                const data = await response.json();
+                const escalaAtual = data.escala;
+                
+                if (!escalaAtual || escalaAtual.length === 0) {
+                    showAlertEscala('⚠️ Nenhuma escala para salvar.', 'warning');
+                    return;
+                }
+                
+                let alteracoes = 0;
+                let erros = 0;
+                
+                // Para cada item da escala, ler os valores dos dropdowns e atualizar
+                for (const item of escalaAtual) {
+                    const selectMeiaHora = document.getElementById(`select_${item.data}_meia_hora`);
+                    const selectCulto = document.getElementById(`select_${item.data}_culto`);
+                    
+                    if (selectMeiaHora && selectCulto) {
+                        const meiaHoraAtual = selectMeiaHora.value || null;
+                        const cultoAtual = selectCulto.value || null;
+                        
+                        // Verificar se houve mudança
+                        const meiaHoraOriginal = item.meia_hora || item.unica || null;
+                        const cultoOriginal = item.culto || item.unica || null;
+                        
+                        if (meiaHoraAtual !== meiaHoraOriginal || cultoAtual !== cultoOriginal) {
+                            try {
+                                const saveResponse = await fetch(`/escala/editar/${item.data}`, {
+                                    method: 'PUT',
+                                    headers: {
+                                        'Content-Type': 'application/json'
+                                    },
+                                    body: JSON.stringify({
+                                        alocacao: {
+                                            meia_hora: meiaHoraAtual,
+                                            culto: cultoAtual
+                                        }
+                                    })
+                                });
+                                
+                                if (saveResponse.ok) {
+                                    alteracoes++;
+                                } else {
+                                    erros++;
+                                }
+                            } catch (error) {
+                                console.error(`Erro ao salvar ${item.data}:`, error);
+                                erros++;
+                            }
+                        }
+                    }
+                }
+                
+                if (alteracoes > 0) {
+                    showAlertEscala(`✅ ${alteracoes} alteração(ões) salva(s) com sucesso!${erros > 0 ? ` (${erros} erro(s))` : ''}`, 'success');
+                    await loadEscalaAtual();
+                    await renderEscalaAtual(); // Atualizar dashboard
+                } else {
+                    showAlertEscala('ℹ️ Nenhuma alteração detectada.', 'info');
+                }
+            } catch (error) {
+                showAlertEscala('❌ Erro ao salvar alterações: ' + error.message, 'error');
+            }
+        }
+
+        async function salvarEdicao(dataIso) {
+            try {
+                const selectMeiaHora = document.getElementById(`select_${dataIso}_meia_hora`);
+                const selectCulto = document.getElementById(`select_${dataIso}_culto`);
+
+                const alocacao = {};
+                
+                if (selectMeiaHora && selectCulto) {
+                    // Domingo OU Terça (ambos agora usam meia_hora e culto)
+                    alocacao.meia_hora = selectMeiaHora.value || null;
+                    alocacao.culto = selectCulto.value || null;
+                }
+
+                const response = await fetch(`/escala/editar/${dataIso}`, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ alocacao })
+                });
+
+                if (!response.ok) {
+                    const error = await response.json();
+                    throw new Error(error.erro || 'Erro ao salvar edição');
+                }
+
+                showAlertEscala('✅ Alocação atualizada com sucesso!', 'success');
+                await loadEscalaAtual();
+            } catch (error) {
+                showAlertEscala('Erro: ' + error.message, 'error');
+            }
+        }
+
+        function renderLogs(logs) {
+            const logsDiv = document.getElementById('logsGeracao');
+            const logsContent = document.getElementById('logsContent');
+            
+            if (!logs || logs.length === 0) {
+                logsDiv.style.display = 'none';
+                return;
+            }
+
+            logsDiv.style.display = 'block';
+            logsContent.innerHTML = logs.map(log => {
+                const emoji = log.includes('✅') ? '' : 
+                             log.includes('⚠️') ? '' : 
+                             log.includes('❌') ? '' : '📝';
+                return `<div style="margin-bottom: 5px;">${emoji} ${log}</div>`;
+            }).join('');
+        }
+
+        function renderEstatisticas(stats) {
+            const statsDiv = document.getElementById('statsEscala');
+            
+            if (!stats) {
+                statsDiv.innerHTML = '<p style="color: #666;">Gere uma escala para ver as estatísticas.</p>';
+                return;
+            }
+
+            let html = '<div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px;">';
+            
+            Object.entries(stats).forEach(([nome, contagem]) => {
+                html += `
+                    <div style="background: linear-gradient(135deg, #A78BFA 0%, #6D28D9 100%); color: white; padding: 15px; border-radius: 8px;">
+                        <div style="font-size: 0.9em; opacity: 0.9;">${contagem.nome || nome}</div>
+                        <div style="font-size: 2em; font-weight: bold; margin-top: 5px;">${contagem.total}</div>
+                        <div style="font-size: 0.85em; opacity: 0.8; margin-top: 5px;">
+                            ${contagem.meia_hora || 0} Meia-hora • ${contagem.culto || 0} Culto • ${contagem.terca || 0} Terça
+                        </div>
+                    </div>
+                `;
+            });
+            
+            html += '</div>';
+            statsDiv.innerHTML = html;
+        }
+
+        function showAlertEscala(message, type) {
+            const alert = document.getElementById('alertEscala');
+            alert.textContent = message;
+            alert.className = `alert alert-${type}`;
+            alert.classList.remove('hidden');
+            
+            setTimeout(() => {
+                alert.classList.add('hidden');
+            }, 5000);
+        }
+
+        function formatDateBR(dateString) {
+            const date = parseISODateLocal(dateString);
+            const day = String(date.getDate()).padStart(2, '0');
+            const month = String(date.getMonth() + 1).padStart(2, '0');
+            const year = date.getFullYear();
+            return `${day}/${month}/${year}`;
+        }
+
+        // Adicionar evento à agenda (iCalendar)
+        function adicionarAgenda(data, diaSemana, servicos) {
+            try {
+                // Parse da data
+                const dataEvento = parseISODateLocal(data);
+                
+                // Definir horários baseado no dia da semana e serviço
+                let eventos = [];
+                const nomeDia = diaSemana === 'Sunday' ? 'Domingo' : 'Terça-feira';
+                
+                servicos.forEach(servico => {
+                    let horaInicio, horaFim, titulo;
+                    
+                    if (servico === 'meia_hora') {
+                        if (diaSemana === 'Sunday') {
+                            horaInicio = '18:00';
+                            horaFim = '18:30';
+                        } else {
+                            horaInicio = '19:00';
+                            horaFim = '19:30';
+                        }
+                        titulo = `Meia-hora - ${nomeDia}`;
+                    } else if (servico === 'culto') {
+                        if (diaSemana === 'Sunday') {
+                            horaInicio = '18:30';
+                            horaFim = '20:00';
+                        } else {
+                            horaInicio = '19:30';
+                            horaFim = '21:00';
+                        }
+                        titulo = `Culto - ${nomeDia}`;
+                    } else if (servico === 'rjm') {
+                        // RJM ocorre aos domingos 10:00 - 11:30
+                        horaInicio = '10:00';
+                        horaFim = '11:30';
+                        titulo = 'RJM - Domingo';
+                    }
+                    
+                    eventos.push({ titulo, horaInicio, horaFim });
+                });
+                
+                // Gerar arquivo iCalendar
+                const comumNome = contextoAtual.comum?.nome || 'Nossa Comum';
+                let icsContent = 'BEGIN:VCALENDAR\r\n';
+                icsContent += 'VERSION:2.0\r\n';
+                icsContent += `PRODID:-//Rodízio de Organistas - ${comumNome}//PT\r\n`;
+                icsContent += 'CALSCALE:GREGORIAN\r\n';
+                icsContent += 'METHOD:PUBLISH\r\n';
+                
+                eventos.forEach(evento => {
+                    // Formatar data e hora para iCalendar (formato: YYYYMMDDTHHmmss)
+                    const ano = dataEvento.getFullYear();
+                    const mes = String(dataEvento.getMonth() + 1).padStart(2, '0');
+                    const dia = String(dataEvento.getDate()).padStart(2, '0');
+                    const [horaI, minI] = evento.horaInicio.split(':');
+                    const [horaF, minF] = evento.horaFim.split(':');
+                    
+                    const dtStart = `${ano}${mes}${dia}T${horaI}${minI}00`;
+                    const dtEnd = `${ano}${mes}${dia}T${horaF}${minF}00`;
+                    const dtStamp = new Date().toISOString().replace(/[-:]/g, '').split('.')[0] + 'Z';
+                    const uid = `${dtStart}-${Math.random().toString(36).substr(2, 9)}@rodizio-organistas`;
+                    
+                    icsContent += 'BEGIN:VEVENT\r\n';
+                    icsContent += `UID:${uid}\r\n`;
+                    icsContent += `DTSTAMP:${dtStamp}\r\n`;
+                    icsContent += `DTSTART:${dtStart}\r\n`;
+                    icsContent += `DTEND:${dtEnd}\r\n`;
+                    icsContent += `SUMMARY:${evento.titulo} - Rodízio de Organistas\r\n`;
+                    icsContent += `DESCRIPTION:Rodízio de Organistas - ${comumNome}\\n${evento.titulo}\r\n`;
+                    icsContent += `LOCATION:Igreja ${comumNome}\r\n`;
+                    icsContent += `STATUS:CONFIRMED\r\n`;
+                    icsContent += 'BEGIN:VALARM\r\n';
+                    icsContent += 'TRIGGER:-PT1H\r\n';
+                    icsContent += 'ACTION:DISPLAY\r\n';
+                    icsContent += `DESCRIPTION:Lembrete: ${evento.titulo} em 1 hora\r\n`;
+                    icsContent += 'END:VALARM\r\n';
+                    icsContent += 'END:VEVENT\r\n';
+                });
+                
+                icsContent += 'END:VCALENDAR\r\n';
+                
+                // Criar blob e fazer download
+                const blob = new Blob([icsContent], { type: 'text/calendar;charset=utf-8' });
+                const link = document.createElement('a');
+                link.href = URL.createObjectURL(blob);
+                link.download = `rodizio-organista-${dataEvento.getDate()}-${dataEvento.getMonth()+1}-${dataEvento.getFullYear()}.ics`;
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+                URL.revokeObjectURL(link.href);
+                
+            } catch (error) {
+                console.error('Erro ao criar evento:', error);
+                alert('❌ Erro ao criar evento para a agenda.');
+            }
+        }
+
+        function exportarPDF() {
+            // Abre o PDF em nova aba com timestamp para evitar cache
+            const timestamp = new Date().getTime();
+            window.open('/escala/pdf?t=' + timestamp, '_blank');
+        }
+
+        // Compartilhar escala no WhatsApp
+        async function compartilharWhatsApp() {
+            try {
+                const response = await fetch('/escala/atual');
+                const data = await response.json();
+                const escala = data.escala || [];
+                
+                if (!escala || escala.length === 0) {
+                    alert('⚠️ Nenhuma escala cadastrada para compartilhar.');
+                    return;
+                }
+                
+                // Construir mensagem
+                const comumNome = contextoAtual.comum?.nome || 'Nossa Comum';
+                let mensagem = `*ESCALA DE ORGANISTAS - ${comumNome.toUpperCase()}*\n`;
+                mensagem += `Período: ${APP.bimestre.inicio_br} até ${APP.bimestre.fim_br}\n\n`;
+                
+                // Agrupar por mês
+                const meses = {};
+                escala.forEach(item => {
+                    const data = new Date(item.data);
+                    const mes = data.toLocaleString('pt-BR', { month: 'long', year: 'numeric' });
+                    const mesCapitalizado = mes.charAt(0).toUpperCase() + mes.slice(1);
+                    
+                    if (!meses[mesCapitalizado]) {
+                        meses[mesCapitalizado] = [];
+                    }
+                    meses[mesCapitalizado].push(item);
+                });
+                
+                // Formatar mensagem por mês
+                Object.keys(meses).sort().forEach(mes => {
+                    mensagem += `*${mes}*\n`;
+                    mensagem += `${'─'.repeat(30)}\n`;
+                    
+                    meses[mes].forEach(item => {
+                        const data = new Date(item.data);
+                        const dia = data.getDate().toString().padStart(2, '0');
+                        
+                        // Mapear corretamente todos os dias da semana
+                        const diasSemanaMap = {
+                            'Sunday': 'Domingo',
+                            'Monday': 'Segunda',
+                            'Tuesday': 'Terça',
+                            'Wednesday': 'Quarta',
+                            'Thursday': 'Quinta',
+                            'Friday': 'Sexta',
+                            'Saturday': 'Sábado'
+                        };
+                        const diaSemana = diasSemanaMap[item.dia_semana] || item.dia_semana;
+                        
+                        mensagem += `\n*${dia} - ${diaSemana}*\n`;
+                        mensagem += `Meia-hora: ${item.meia_hora || 'Não definido'}\n`;
+                        mensagem += `Culto: ${item.culto || 'Não definido'}\n`;
+                    });
+                    
+                    mensagem += `\n`;
+                });
+                
+                mensagem += `\n_Gerado pelo Sistema de Rodízio_`;
+                
+                // Codificar mensagem para URL
+                const mensagemCodificada = encodeURIComponent(mensagem);
+                
+                // Abrir WhatsApp
+                const urlWhatsApp = `https://wa.me/?text=${mensagemCodificada}`;
+                window.open(urlWhatsApp, '_blank');
+                
+            } catch (error) {
+                console.error('Erro ao compartilhar no WhatsApp:', error);
+                alert('❌ Erro ao gerar mensagem para o WhatsApp.');
+            }
+        }
+
+        // Inicializar dados ao carregar a página
+        async function initializeApp() {
+            try {
+                console.log('🚀 Inicializando aplicação...');
+                
+                // Carregar contexto atual
+                await carregarContextoAtual();
+                
+                // Carregar organistas primeiro
+                await loadOrganistas();
+                
+                // Carregar indisponibilidades
+                if (typeof loadIndisponibilidades === 'function') {
+                    loadIndisponibilidades();
+                }
+                
+                // Carregar escala do dashboard
+                if (document.getElementById('escalaAtual')) {
+                    await loadEscalaAtual();
+                }
+                
+                // Carregar "Meus Dias" para organistas
+                if (document.getElementById('meusDias')) {
+                    await renderMeusDias();
+                }
+                // Carregar Resumo de Trocas no dashboard (organistas)
+                if (document.getElementById('trocasResumo')) {
+                    await loadTrocasResumoDashboard();
+                }
+                
+                // Carregar configurações
+                if (typeof loadConfig === 'function') {
+                    loadConfig();
+                }
+                
+                // Carregar seletores de contexto para Master
+                if (typeof carregarSeletoresContexto === 'function') {
+                    await carregarSeletoresContexto();
+                }
+                
+                console.log('✅ Aplicação inicializada com sucesso!');
+            } catch (error) {
+                console.error('❌ Erro ao inicializar:', error);
+            }
+        }
+
+    // ========== FUNÇÕES RJM ==========
+        
+        async function criarEscalaRJM() {
+            if (!confirm('Criar nova escala RJM vazia? Isso irá substituir a escala existente.')) {
+                return;
+            }
+            
+            try {
+                const response = await fetch('/rjm/criar-vazia', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'}
+                });
+                
+                if (response.ok) {
+                    alert('✅ Escala RJM vazia criada com sucesso!');
+                    await loadEscalaRJM();
+                } else {
+                    const error = await response.json();
+                    alert(`❌ Erro: ${error.error || 'Falha ao criar escala'}`);
+                }
+            } catch (error) {
+                console.error('Erro ao criar escala RJM:', error);
+                alert('❌ Erro ao criar escala RJM.');
+            }
+        }
+        
+        // Deletar Escala RJM
+        async function deletarEscalaRJM() {
+            try {
+                // Buscar escala RJM atual para mostrar informações
+                const response = await fetch('/rjm/atual');
+                const data = await response.json();
+                
+                if (!data.escala_rjm || data.escala_rjm.length === 0) {
+                    alert('⚠️ Não há escala RJM cadastrada para deletar.');
+                    return;
+                }
+                
+                const escalaRJM = data.escala_rjm;
+                
+                // Contar informações
+                const totalDatas = escalaRJM.length;
+                const organistasUnicos = [...new Set(escalaRJM
+                    .map(item => item.organista?.nome)
+                    .filter(Boolean))];
+                
+                // Agrupar por mês
+                const datas = escalaRJM.map(item => parseISODateLocal(item.data));
+                const dataInicio = new Date(Math.min(...datas));
+                const dataFim = new Date(Math.max(...datas));
+                
+                const mesesNome = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'];
+                const mesInicio = mesesNome[dataInicio.getMonth()];
+                const mesFim = mesesNome[dataFim.getMonth()];
+                const anoInicio = dataInicio.getFullYear();
+                const anoFim = dataFim.getFullYear();
+                
+                const periodoTexto = anoInicio === anoFim 
+                    ? `${mesInicio} a ${mesFim}/${anoInicio}`
+                    : `${mesInicio}/${anoInicio} a ${mesFim}/${anoFim}`;
+                
+                // Montar mensagem
+                let mensagem = `🗑️ DELETAR ESCALA RJM\n\n`;
+                mensagem += `📊 Informações da Escala:\n`;
+                mensagem += `📅 Período: ${periodoTexto}\n`;
+                mensagem += `📆 Total de datas: ${totalDatas}\n`;
+                mensagem += `👥 Organistas envolvidos: ${organistasUnicos.length}\n\n`;
+                
+                if (organistasUnicos.length > 0) {
+                    mensagem += `Organistas:\n`;
+                    organistasUnicos.slice(0, 8).forEach(org => {
+                        mensagem += `  • ${org}\n`;
+                    });
+                    if (organistasUnicos.length > 8) {
+                        mensagem += `  ... e mais ${organistasUnicos.length - 8} organista(s)\n`;
+                    }
+                    mensagem += `\n`;
+                }
+                
+                mensagem += `⚠️ ATENÇÃO: Esta ação NÃO pode ser desfeita!\n\n`;
+                mensagem += `Todos os dados desta escala RJM serão PERMANENTEMENTE removidos.\n\n`;
+                mensagem += `Deseja realmente deletar esta escala?`;
+                
+                if (!confirm(mensagem)) {
+                    return;
+                }
+                
+                // Confirmar novamente
+                const confirmacao = confirm('⚠️ ÚLTIMA CONFIRMAÇÃO\n\nTem CERTEZA ABSOLUTA que deseja deletar?\n\nEsta escala RJM será PERDIDA PERMANENTEMENTE!');
+                if (!confirmacao) {
+                    return;
+                }
+                
+                // Prosseguir com a exclusão
+                const deleteResponse = await fetch('/rjm/delete', {
+                    method: 'DELETE',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    }
+                });
+                
+                const result = await deleteResponse.json();
+                
+                if (result.success) {
+                    alert('✅ Escala RJM deletada com sucesso!');
+                    
+                    // Limpar visualização
+                    document.getElementById('escalaRJMContainer').innerHTML = `
+                        <div style="text-align: center; padding: 40px; color: #999;">
+                            <p>✅ Escala RJM deletada com sucesso.</p>
+                            <p style="font-size: 0.9em; margin-top: 10px;">Clique em "Criar Escala RJM Vazia" para gerar uma nova.</p>
+                        </div>
+                    `;
+                    
+                    // Limpar estatísticas
+                    const statsContainer = document.getElementById('statsEscalaRJM');
+                    if (statsContainer) {
+                        statsContainer.innerHTML = '<p style="color: #666;">Gere uma escala para ver as estatísticas.</p>';
+                    }
+                    
+                } else {
+                    alert('❌ Erro ao deletar: ' + (result.error || 'Erro desconhecido'));
+                }
+                
+            } catch (error) {
+                console.error('Erro ao deletar escala RJM:', error);
+                alert('❌ Erro ao deletar escala RJM: ' + error.message);
+            }
+        }
+        
+        async function loadEscalaRJM() {
+            try {
+                const response = await fetch('/rjm/atual');
+                const data = await response.json();
+                const escalaRJM = data.escala_rjm || [];
+                
+                if (!escalaRJM || escalaRJM.length === 0) {
+                    document.getElementById('escalaRJMContainer').innerHTML = `
+                        <div style="text-align: center; padding: 40px; color: #999;">
+                            <p>Nenhuma escala RJM publicada ainda.</p>
+                            ${isAdmin ? '<p style="font-size: 0.9em; margin-top: 10px;">Clique em "Criar Escala RJM Vazia" acima para começar.</p>' : ''}
+                        </div>
+                    `;
+                    return;
+                }
+                
+                // Renderizar tabela RJM
+                let html = '<table class="escala-table"><thead><tr>';
+                html += '<th style="width: 120px;">Data</th>';
+                html += '<th style="width: 100px;">Dia</th>';
+                html += '<th>Organista (10:00 - 11:30)</th>';
+                html += '</tr></thead><tbody>';
+                
+                escalaRJM.forEach(item => {
+                    const data = parseISODateLocal(item.data);
+                    const dataFormatada = data.toLocaleDateString('pt-BR');
+                    const diaSemana = 'Domingo';
+                    
+                    html += '<tr>';
+                    html += `<td><strong>${dataFormatada}</strong></td>`;
+                    html += `<td><span class="badge badge-green">${diaSemana}</span></td>`;
+                    
+                    if (isAdmin) {
+                        html += '<td>';
+                        html += `<select class="organista-select" data-escala-id="${item.id}" data-tipo="organista" onchange="marcarAlteradoRJM(this)">`;
+                        html += '<option value="">Selecione...</option>';
+                        
+                        organistas.forEach(org => {
+                            const indisponivelNaData = indisponibilidades.some(ind => 
+                                ind.id === org.id && ind.data === item.data
+                            );
+                            
+                            const temPermissaoRJM = org.tipos && org.tipos.includes('RJM');
+                            const selected = item.organista === org.nome ? 'selected' : '';
+                            
+                            if (indisponivelNaData) {
+                                html += `<option value="${org.nome}" ${selected} style="text-decoration: line-through; color: red;">~~${org.nome}~~</option>`;
+                            } else if (!temPermissaoRJM) {
+                                html += `<option value="${org.nome}" ${selected} style="font-style: italic; color: red;">${org.nome} (sem permissão RJM)</option>`;
+                            } else {
+                                html += `<option value="${org.nome}" ${selected}>${org.nome}</option>`;
+                            }
+                        });
+                        
+                        html += '</select></td>';
+                    } else {
+                        html += `<td>${item.organista || '-'}</td>`;
+                    }
+                    
+                    html += '</tr>';
+                });
+                
+                html += '</tbody></table>';
+                document.getElementById('escalaRJMContainer').innerHTML = html;
+                
+                // Atualizar info
+                if (escalaRJM.length > 0) {
+                    const primeiraData = formatDateBR(escalaRJM[0].data);
+                    const ultimaData = formatDateBR(escalaRJM[escalaRJM.length - 1].data);
+                    document.getElementById('infoEscalaRJM').innerHTML = `
+                        <p><strong>📅 Período:</strong> ${primeiraData} a ${ultimaData}</p>
+                        <p><strong>📊 Total de domingos RJM:</strong> ${escalaRJM.length}</p>
+                    `;
+                }
+                
+                // Estatísticas
+                renderStatsRJM(escalaRJM);
+                
+            } catch (error) {
+                console.error('Erro ao carregar escala RJM:', error);
+                document.getElementById('escalaRJMContainer').innerHTML = 
+                    '<div style="color: red; padding: 20px;">Erro ao carregar escala RJM</div>';
+            }
+        }
+        
+        function marcarAlteradoRJM(select) {
+            select.style.border = '2px solid #f59e0b';
+            select.style.background = '#fffbeb';
+        }
+        
+        async function salvarTodasAlteracoesRJM() {
+            const selects = document.querySelectorAll('#escalaRJMContainer select');
+            const alteracoes = [];
+            
+            selects.forEach(select => {
+                alteracoes.push({
+                    id: select.dataset.escalaId,
+                    organista: select.value
+                });
+            });
+            
+            if (alteracoes.length === 0) {
+                alert('Nenhuma alteração para salvar.');
+                return;
+            }
+            
+            try {
+                const response = await fetch('/rjm/atualizar-multiplos', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({alteracoes})
+                });
+                
+                if (response.ok) {
+                    alert('✅ Todas as alterações foram salvas com sucesso!');
+                    await loadEscalaRJM();
+                } else {
+                    const error = await response.json();
+                    alert(`❌ Erro: ${error.error || 'Falha ao salvar'}`);
+                }
+            } catch (error) {
+                console.error('Erro ao salvar alterações RJM:', error);
+                alert('❌ Erro ao salvar alterações.');
+            }
+        }
+        
+        function renderStatsRJM(escalaRJM) {
+            const statsDiv = document.getElementById('statsEscalaRJM');
+            
+            if (!escalaRJM || escalaRJM.length === 0) {
+                statsDiv.innerHTML = '<p style="color: #666;">Gere uma escala para ver as estatísticas.</p>';
+                return;
+            }
+            
+            const contador = {};
+            escalaRJM.forEach(item => {
+                if (item.organista) {
+                    contador[item.organista] = (contador[item.organista] || 0) + 1;
+                }
+            });
+            
+            let html = '<div style="display: grid; grid-template-columns: repeat(auto-fill, minmax(200px, 1fr)); gap: 15px;">';
+            Object.entries(contador).sort((a, b) => b[1] - a[1]).forEach(([nome, total]) => {
+                html += `
+                    <div style="background: #f0fdf4; padding: 15px; border-radius: 8px; border-left: 4px solid #10b981;">
+                        <div style="font-size: 0.9em; color: #666; margin-bottom: 5px;">👤 ${nome}</div>
+                        <div style="font-size: 1.5em; font-weight: bold; color: #10b981;">${total}</div>
+                        <div style="font-size: 0.8em; color: #666;">domingos RJM</div>
+                    </div>
+                `;
+            });
+            html += '</div>';
+            statsDiv.innerHTML = html;
+        }
+        
+        function exportarPDFRJM() {
+            const timestamp = new Date().getTime();
+            window.open('/rjm/pdf?t=' + timestamp, '_blank');
+        }
+        
+        async function compartilharWhatsAppRJM() {
+            try {
+                const response = await fetch('/rjm/atual');
+                const data = await response.json();
+                const escalaRJM = data.escala_rjm || [];
+                
+                if (!escalaRJM || escalaRJM.length === 0) {
+                    alert('⚠️ Nenhuma escala RJM cadastrada para compartilhar.');
+                    return;
+                }
+                
+                const comumNome = contextoAtual.comum?.nome || 'Nossa Comum';
+                let mensagem = `*ESCALA RJM - ${comumNome.toUpperCase()}*\n`;
+                mensagem += `Reunião de Jovens e Menores\n`;
+                mensagem += `Horário: Domingos 10:00 - 11:30\n\n`;
+                
+                // Agrupar por mês
+                const meses = {};
+                escalaRJM.forEach(item => {
+                    const data = new Date(item.data);
+                    const mesAno = data.toLocaleDateString('pt-BR', {month: 'long', year: 'numeric'});
+                    if (!meses[mesAno]) {
+                        meses[mesAno] = [];
+                    }
+                    meses[mesAno].push(item);
+                });
+                
+                Object.keys(meses).forEach(mesAno => {
+                    mensagem += `*${mesAno.charAt(0).toUpperCase() + mesAno.slice(1)}*\n`;
+                    mensagem += `──────────────\n`;
+                    
+                    meses[mesAno].forEach(item => {
+                        const data = parseISODateLocal(item.data);
+                        const dia = data.getDate().toString().padStart(2, '0');
+                        const mes = (data.getMonth() + 1).toString().padStart(2, '0');
+                        
+                        mensagem += `${dia}/${mes} - Domingo\n`;
+                        mensagem += `   Organista: ${item.organista || 'A definir'}\n\n`;
+                    });
+                    
+                    mensagem += `\n`;
+                });
+                
+                const mensagemCodificada = encodeURIComponent(mensagem);
+                const urlWhatsApp = `https://wa.me/?text=${mensagemCodificada}`;
+                window.open(urlWhatsApp, '_blank');
+                
+            } catch (error) {
+                console.error('Erro ao compartilhar no WhatsApp:', error);
+                alert('❌ Erro ao gerar mensagem para o WhatsApp.');
+            }
+        }
+
+        // ========== DASHBOARD: Resumo de Trocas ==========
+        async function loadTrocasResumoDashboard() {
+            const container = document.getElementById('trocasResumo');
+            if (!container) return;
+            try {
+                container.innerHTML = '<div style="color:#666;">Carregando...</div>';
+                const resp = await fetch('/trocas');
+                const trocas = await resp.json();
+                // Classificações
+                const minhasPendentes = trocas.filter(t => t.solicitante_id === currentUserId && t.status === 'pendente');
+                const recebidasPendentes = trocas.filter(t => t.solicitante_id !== currentUserId && t.status === 'pendente' && (t.alvo_id === currentUserId || !t.alvo_id));
+                const aguardandoAprovacao = trocas.filter(t => t.status === 'aceita' && (t.solicitante_id === currentUserId || t.alvo_id === currentUserId));
+
+                let html = '';
+                // Badges resumo
+                html += '<div style="display:flex; flex-wrap:wrap; gap:10px; margin-bottom:10px;">';
+                html += badgeResumo('📤 Minhas pendentes', minhasPendentes.length, '#1d4ed8');
+                html += badgeResumo('📥 Recebidas pendentes', recebidasPendentes.length, '#d97706');
+                html += badgeResumo('⏳ Aguardando aprovação', aguardandoAprovacao.length, '#0f766e');
+                html += '</div>';
+
+                // Seções com ações rápidas (top 3 de cada)
+                const quick = [];
+                recebidasPendentes.slice(0, 3).forEach(t => quick.push(renderTrocaLinha(t)));
+                aguardandoAprovacao.slice(0, 3).forEach(t => quick.push(renderTrocaLinha(t)));
+                minhasPendentes.slice(0, 3).forEach(t => quick.push(renderTrocaLinha(t)));
+
+                if (quick.length === 0) {
+                    html += '<div style="color:#555;">Sem ações pendentes no momento. ✨</div>';
+                } else {
+                    html += '<div style="display:grid; gap:8px;">' + quick.join('') + '</div>';
+                }
+
+                container.innerHTML = html;
+            } catch (e) {
+                console.error('Erro ao carregar resumo de trocas:', e);
+                container.innerHTML = '<div style="color:red;">Erro ao carregar trocas</div>';
+            }
+        }
+
+        function badgeResumo(titulo, valor, cor) {
+            return `<div style="background:${cor}15; border:1px solid ${cor}; color:${cor}; padding:8px 12px; border-radius:8px; font-weight:600;">${titulo}: ${valor}</div>`;
+        }
+
+        function renderTrocaLinha(t) {
+            const slotLabel = t.tipo === 'rjm' ? 'RJM' : (t.slot === 'meia_hora' ? 'Meia-hora' : 'Culto');
+            const alvo = t.alvo_nome || '(Aberta)';
+            const quando = formatDateBR(t.data);
+            const acoes = [];
+            const isSolic = t.solicitante_id === currentUserId;
+            const isAlvo = t.alvo_id === currentUserId || (!t.alvo_id && !isSolic);
+            if (t.status === 'pendente') {
+                if (isSolic) acoes.push(`<button class="btn btn-danger" onclick="cancelarTroca('${t.id}')">Cancelar</button>`);
+                if (isAlvo) {
+                    acoes.push(`<button class="btn btn-success" onclick="aceitarTroca('${t.id}')">Aceitar</button>`);
+                    acoes.push(`<button class="btn" style="background:#ef4444;color:#fff" onclick="recusarTroca('${t.id}')">Recusar</button>`);
+                }
+            } else if (t.status === 'aceita') {
+                if (isSolic) acoes.push(`<span style="color:#666;">Aguardando aprovação do admin</span>`);
+            }
+            const verBtn = "<button class=\"btn\" onclick=\"showTab('trocas')\">Ver</button>";
+            return `
+                <div style="display:flex;justify-content:space-between;align-items:center;gap:10px; border:1px solid #e5e7eb; border-radius:8px; padding:8px 12px; background:#fff;">
+                    <div><strong>${quando}</strong> • ${t.tipo.toUpperCase()} • ${slotLabel}<br><span style="font-size:.9em;color:#555;">${isSolic ? 'Para' : 'De'}: ${isSolic ? alvo : t.solicitante_nome}</span></div>
+                    <div style="display:flex;gap:8px;">${acoes.join(' ') || verBtn}</div>
+                </div>
+            `;
+        }
+        // ========== FUNÇÕES TROCAS ==========
+        function showAlertTrocas(message, type) {
+            const alert = document.getElementById('alertTrocas');
+            alert.textContent = message;
+            alert.className = `alert alert-${type}`;
+            alert.classList.remove('hidden');
+            setTimeout(() => alert.classList.add('hidden'), 4000);
+        }
+
+        function atualizarSlotAlvoVisibilidade() {
+            const tipo = document.getElementById('trocaTipo').value;
+            const slotGroup = document.getElementById('trocaSlotGroup');
+            const slotSel = document.getElementById('trocaSlot');
+            if (tipo === 'rjm') {
+                slotGroup.style.display = 'none';
+                slotSel.value = 'unica';
+            } else {
+                slotGroup.style.display = 'block';
+                if (slotSel.value === 'unica') slotSel.value = 'meia_hora';
+            }
+        }
+
+        async function carregarDatasTroca() {
+            try {
+                const tipo = document.getElementById('trocaTipo').value;
+                const sel = document.getElementById('trocaData');
+                sel.innerHTML = '<option value="">Carregando...</option>';
+
+                if (tipo === 'culto') {
+                    const resp = await fetch('/escala/atual');
+                    const data = await resp.json();
+                    const escala = data.escala || [];
+                    const minhasDatas = [];
+                    escala.forEach(item => {
+                        if (item.meia_hora === APP.user.nome || item.culto === APP.user.nome || item.unica === APP.user.nome) {
+                            minhasDatas.push({ data: item.data, slots: {
+                                meia_hora: item.meia_hora === APP.user.nome,
+                                culto: item.culto === APP.user.nome
+                            }});
+                        }
+                    });
+                    if (minhasDatas.length === 0) {
+                        sel.innerHTML = '<option value="">Você não está escalado em nenhuma data</option>';
+                        return;
+                    }
+                    sel.innerHTML = '';
+                    minhasDatas.forEach(d => {
+                        const opt = document.createElement('option');
+                        opt.value = d.data;
+                        const slotsTxt = [d.slots.meia_hora ? 'Meia-hora' : null, d.slots.culto ? 'Culto' : null].filter(Boolean).join(' & ');
+                        opt.textContent = `${formatDateBR(d.data)} (${slotsTxt})`;
+                        sel.appendChild(opt);
+                    });
+
+                    // Ajustar slot default conforme seleção
+                    const slotSel = document.getElementById('trocaSlot');
+                    const primeira = minhasDatas[0];
+                    if (primeira) {
+                        if (primeira.slots.meia_hora && !primeira.slots.culto) slotSel.value = 'meia_hora';
+                        else if (!primeira.slots.meia_hora && primeira.slots.culto) slotSel.value = 'culto';
+                    }
+                } else {
+                    const resp = await fetch('/rjm/atual');
+                    const data = await resp.json();
+                    const escalaRJM = data.escala_rjm || [];
+                    const minhasDatas = escalaRJM.filter(i => i.organista === APP.user.nome);
+                    if (minhasDatas.length === 0) {
+                        sel.innerHTML = '<option value="">Você não está escalado em nenhuma data</option>';
+                        return;
+                    }
+                    sel.innerHTML = '';
+                    minhasDatas.forEach(i => {
+                        const opt = document.createElement('option');
+                        opt.value = i.data;
+                        opt.textContent = `${formatDateBR(i.data)} (RJM)`;
+                        sel.appendChild(opt);
+                    });
+                }
+            } catch (e) {
+                console.error('Erro ao carregar datas para trocas:', e);
+                document.getElementById('trocaData').innerHTML = '<option value="">Erro ao carregar</option>';
+            }
+        }
+
+        async function popularAlvosTroca() {
+            try {
+                const tipo = document.getElementById('trocaTipo').value;
+                const dataSel = document.getElementById('trocaData').value;
+                const slot = document.getElementById('trocaSlot').value;
+                const sel = document.getElementById('trocaAlvo');
+                sel.innerHTML = '<option value="">Aberta (qualquer organista)</option>';
+
+                if (!organistas || organistas.length === 0) {
+                    try {
+                        const resp = await fetch('/organistas');
+                        organistas = await resp.json();
+                    } catch {}
+                }
+
+                organistas.forEach(org => {
+                    if (org.id === currentUserId) return; // não listar a si mesmo
+                    // checar tipos por slot/tipo
+                    let habilitado = false;
+                    if (tipo === 'culto') {
+                        if (slot === 'meia_hora') habilitado = org.tipos.includes('Meia-hora');
+                        if (slot === 'culto') habilitado = org.tipos.includes('Culto');
+                    } else {
+                        habilitado = org.tipos.includes('RJM');
+                    }
+                    if (!habilitado) return;
+
+                    // se tiver data selecionada, evitar quem está indisponível
+                    const indisponivel = dataSel && indisponibilidades.some(i => i.id === org.id && i.data === dataSel);
+                    const opt = document.createElement('option');
+                    opt.value = org.id;
+                    opt.textContent = org.nome + (indisponivel ? ' (indisponível)' : '');
+                    opt.disabled = !!indisponivel;
+                    sel.appendChild(opt);
+                });
+            } catch (e) {
+                console.error('Erro ao popular alvos:', e);
+            }
+        }
+
+        async function criarSolicitacaoTroca(event) {
+            event.preventDefault();
+            const tipo = document.getElementById('trocaTipo').value;
+            const data = document.getElementById('trocaData').value;
+            let slot = document.getElementById('trocaSlot').value;
+            const alvo_id = document.getElementById('trocaAlvo').value;
+            const motivo = document.getElementById('trocaMotivo').value.trim();
+
+            if (!data) { showAlertTrocas('Selecione a data', 'error'); return; }
+            if (tipo === 'rjm') slot = 'unica';
+
+            try {
+                const resp = await fetch('/trocas', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({ tipo, data, slot, alvo_id: alvo_id || undefined, motivo })
+                });
+                const result = await resp.json();
+                if (!resp.ok) throw new Error(result.error || 'Falha ao criar solicitação');
+                showAlertTrocas('✅ Solicitação criada!', 'success');
+                document.getElementById('formTroca').reset();
+                atualizarSlotAlvoVisibilidade();
+                await carregarDatasTroca();
+                await popularAlvosTroca();
+                await loadTrocas();
+            } catch (e) {
+                console.error(e);
+                showAlertTrocas('❌ ' + e.message, 'error');
+            }
+        }
+
+        function badgeStatus(status) {
+            const map = {
+                pendente: '#f59e0b',
+                aceita: '#3b82f6',
+                aprovada: '#10b981',
+                recusada: '#ef4444',
+                cancelada: '#6b7280'
+            };
+            const cor = map[status] || '#6b7280';
+            return `<span style="background:${cor}22;color:${cor};padding:3px 8px;border-radius:12px;font-size:.85em;">${status}</span>`;
+        }
+
+        function renderListaTrocas(containerId, trocas) {
+            const c = document.getElementById(containerId);
+            if (!trocas || trocas.length === 0) {
+                c.innerHTML = '<p style="color:#666;">Nenhuma solicitação.</p>';
+                return;
+            }
+            let html = '<div style="display:grid; gap:10px;">';
+            trocas.sort((a,b)=>a.data.localeCompare(b.data)).forEach(t => {
+                const alvo = t.alvo_nome || '(Aberta)';
+                const slotLabel = t.tipo === 'rjm' ? 'RJM' : (t.slot === 'meia_hora' ? 'Meia-hora' : 'Culto');
+                html += `<div class="card" style="padding:12px;">`+
+                    `<div style="display:flex;justify-content:space-between;align-items:center;gap:10px;flex-wrap:wrap;">`+
+                    `<div>`+
+                    `<div><strong>${formatDateBR(t.data)}</strong> • ${t.tipo.toUpperCase()} • ${slotLabel}</div>`+
+                    `<div style="font-size:.9em;color:#555;">De: ${t.solicitante_nome} → Para: ${alvo}</div>`+
+                    `</div>`+
+                    `<div style="display:flex;align-items:center;gap:8px;">${badgeStatus(t.status)} ${renderAcoesTroca(t)}</div>`+
+                    `</div>`+
+                    `${t.motivo ? `<div style="margin-top:8px;font-size:.9em;color:#444;">📝 ${t.motivo}</div>` : ''}`+
+                    `</div>`;
+            });
+            html += '</div>';
+            c.innerHTML = html;
+        }
+
+        function renderAcoesTroca(t) {
+            const isSolic = t.solicitante_id === currentUserId;
+            const isAlvo = t.alvo_id === currentUserId;
+            const buttons = [];
+            if (t.status === 'pendente') {
+                if (isSolic || isAdmin) buttons.push(`<button class="btn btn-danger" onclick="cancelarTroca('${t.id}')">Cancelar</button>`);
+                if (!isSolic && (isAlvo || !t.alvo_id)) {
+                    buttons.push(`<button class="btn btn-success" onclick="aceitarTroca('${t.id}')">Aceitar</button>`);
+                    buttons.push(`<button class="btn" style="background:#ef4444;color:#fff" onclick="recusarTroca('${t.id}')">Recusar</button>`);
+                }
+                if (isAdmin && !isSolic && !isAlvo) {
+                    buttons.push(`<button class="btn" style="background:#ef4444;color:#fff" onclick="recusarTroca('${t.id}')">Recusar</button>`);
+                }
+            } else if (t.status === 'aceita') {
+                if (isAdmin) {
+                    buttons.push(`<button class="btn btn-success" onclick="aprovarTroca('${t.id}')">Aprovar</button>`);
+                    buttons.push(`<button class="btn" style="background:#ef4444;color:#fff" onclick="reprovarTroca('${t.id}')">Não aprovar</button>`);
+                }
+                if (isSolic || isAdmin) buttons.push(`<button class="btn btn-danger" onclick="cancelarTroca('${t.id}')">Cancelar</button>`);
+            }
+            return buttons.join(' ');
+        }
+
+        async function loadTrocas() {
+            try {
+                const resp = await fetch('/trocas');
+                const trocas = await resp.json();
+                const minhas = trocas.filter(t => t.solicitante_id === currentUserId);
+                const recebidas = trocas.filter(t => t.solicitante_id !== currentUserId && (t.alvo_id === currentUserId || !t.alvo_id));
+                renderListaTrocas('trocasMinhasList', minhas);
+                renderListaTrocas('trocasRecebidasList', recebidas);
+                if (isAdmin) renderListaTrocas('trocasTodasList', trocas);
+            } catch (e) {
+                console.error('Erro ao carregar trocas:', e);
+                ['trocasMinhasList','trocasRecebidasList','trocasTodasList'].forEach(id => { const el = document.getElementById(id); if (el) el.innerHTML = '<p style="color:red;">Erro ao carregar</p>'; });
+            }
+        }
+
+        async function aceitarTroca(id) {
+            if (!confirm('Aceitar esta solicitação?')) return;
+            const resp = await fetch(`/trocas/${id}/aceitar`, { method: 'POST' });
+            const data = await resp.json();
+            if (resp.ok) {
+                await loadTrocas();
+                try { await renderMeusDias(); } catch {}
+                try { await loadTrocasResumoDashboard(); } catch {}
+            } else { alert(data.error || 'Falha ao aceitar'); }
+        }
+        async function recusarTroca(id) {
+            if (!confirm('Recusar esta solicitação?')) return;
+            const resp = await fetch(`/trocas/${id}/recusar`, { method: 'POST' });
+            const data = await resp.json();
+            if (resp.ok) {
+                await loadTrocas();
+                try { await loadTrocasResumoDashboard(); } catch {}
+            } else { alert(data.error || 'Falha ao recusar'); }
+        }
+        async function cancelarTroca(id) {
+            if (!confirm('Cancelar esta solicitação?')) return;
+            const resp = await fetch(`/trocas/${id}/cancelar`, { method: 'POST' });
+            const data = await resp.json();
+            if (resp.ok) {
+                await loadTrocas();
+                try { await renderMeusDias(); } catch {}
+                try { await loadTrocasResumoDashboard(); } catch {}
+            } else { alert(data.error || 'Falha ao cancelar'); }
+        }
+        async function aprovarTroca(id) {
+            if (!confirm('Aprovar e aplicar a troca na escala?')) return;
+            const resp = await fetch(`/trocas/${id}/aprovar`, { method: 'POST' });
+            const data = await resp.json();
+            if (resp.ok) {
+                await loadTrocas();
+                // Atualizar escalas para refletir mudanças
+                try { await loadEscalaAtual(); } catch {}
+                try { await loadEscalaRJM(); } catch {}
+                showNotification('✅ Troca aprovada e aplicada!', 'success');
+            } else {
+                alert(data.error || 'Falha ao aprovar');
+            }
+        }
+
+        async function reprovarTroca(id) {
+            if (!confirm('Reprovar esta troca? Ela será marcada como recusada e não será aplicada.')) return;
+            const resp = await fetch(`/trocas/${id}/reprovar`, { method: 'POST' });
+            const data = await resp.json();
+            if (resp.ok) {
+                await loadTrocas();
+                showNotification('ℹ️ Troca reprovada (não aplicada).', 'info');
+            } else {
+                alert(data.error || 'Falha ao reprovar');
+            }
+        }
+        
+        // ==================== Gerenciamento de Hierarquia ====================
+        
+        let regionalSelecionada = null;
+        let subRegionalSelecionada = null;
+        
+        // Carregar hierarquia completa
+        async function carregarHierarquia() {
+            if (contextoAtual.nivel !== 'master') return;
+            
+            try {
+                const regionais = await obterHierarquia();
+                
+                const container = document.getElementById('listaRegionais');
+                container.innerHTML = '';
+                
+                if (regionais.length === 0) {
+                    container.innerHTML = '<p style="color: #999;">Nenhuma regional cadastrada</p>';
+                    return;
+                }
+                
+                // Se não há regional selecionada, selecionar a primeira automaticamente
+                if (!regionalSelecionada && regionais.length > 0) {
+                    regionalSelecionada = regionais[0].id;
+                }
+                
+                regionais.forEach(regional => {
+                    const card = document.createElement('div');
+                    card.style.cssText = 'background: #f3f4f6; padding: 15px; border-radius: 8px; display: flex; justify-content: space-between; align-items: center; cursor: pointer;';
+                    card.onclick = () => selecionarRegional(regional.id);
+                    
+                    if (regionalSelecionada === regional.id) {
+                        card.style.background = '#dbeafe';
+                        card.style.borderLeft = '4px solid #3b82f6';
+                    }
+                    
+                    card.innerHTML = `
+                        <div>
+                            <strong style="font-size: 1.1em;">🏙️ ${regional.nome}</strong>
+                            <div style="font-size: 0.9em; color: #666;">ID: ${regional.id}</div>
+                        </div>
+                        <div style="display: flex; gap: 5px;">
+                            <button class="btn" style="padding: 5px 10px; background: #3b82f6; color: white;" onclick="event.stopPropagation(); editarRegional('${regional.id}', '${regional.nome}')">✏️</button>
+                            <button class="btn" style="padding: 5px 10px; background: #ef4444; color: white;" onclick="event.stopPropagation(); deletarRegional('${regional.id}')">🗑️</button>
+                        </div>
+                    `;
+                    
+                    container.appendChild(card);
+                });
+                
+                // Se há regional selecionada, carregar suas sub-regionais
+                if (regionalSelecionada) {
+                    await carregarSubRegionaisHierarquia(regionalSelecionada);
+                }
+                
+            } catch (error) {
+                console.error('Erro ao carregar hierarquia:', error);
+                showNotification('Erro ao carregar hierarquia', 'error');
+            }
+        }
+        
+        // Selecionar regional
+        async function selecionarRegional(regionalId) {
+            regionalSelecionada = regionalId;
+            subRegionalSelecionada = null;
+            await carregarHierarquia();
+            await carregarSubRegionaisHierarquia(regionalId);
+            
+            const container = document.getElementById('listaComuns');
+            container.innerHTML = '<p style="color: #999;">Selecione uma Sub-Regional</p>';
+        }
+        
+        // Carregar sub-regionais
+        async function carregarSubRegionaisHierarquia(regionalId) {
+            try {
+                const subRegionais = await obterSubRegionais(regionalId);
+                
+                const container = document.getElementById('listaSubRegionais');
+                container.innerHTML = '';
+                
+                if (subRegionais.length === 0) {
+                    container.innerHTML = '<p style="color: #999;">Nenhuma sub-regional nesta regional</p>';
+                    const comunsContainer = document.getElementById('listaComuns');
+                    comunsContainer.innerHTML = '<p style="color: #999;">Nenhuma sub-regional disponível</p>';
+                    return;
+                }
+                
+                // Se não há sub-regional selecionada, selecionar a primeira automaticamente
+                if (!subRegionalSelecionada && subRegionais.length > 0) {
+                    subRegionalSelecionada = subRegionais[0].id;
+                }
+                
+                subRegionais.forEach(sub => {
+                    const card = document.createElement('div');
+                    card.style.cssText = 'background: #f3f4f6; padding: 15px; border-radius: 8px; display: flex; justify-content: space-between; align-items: center; cursor: pointer;';
+                    card.onclick = () => selecionarSubRegional(sub.id);
+                    
+                    if (subRegionalSelecionada === sub.id) {
+                        card.style.background = '#dbeafe';
+                        card.style.borderLeft = '4px solid #3b82f6';
+                    }
+                    
+                    card.innerHTML = `
+                        <div>
+                            <strong style="font-size: 1.1em;">📍 ${sub.nome}</strong>
+                            <div style="font-size: 0.9em; color: #666;">ID: ${sub.id}</div>
+                        </div>
+                        <div style="display: flex; gap: 5px;">
+                            <button class="btn" style="padding: 5px 10px; background: #3b82f6; color: white;" onclick="event.stopPropagation(); editarSubRegional('${regionalId}', '${sub.id}', '${sub.nome}')">✏️</button>
+                            <button class="btn" style="padding: 5px 10px; background: #ef4444; color: white;" onclick="event.stopPropagation(); deletarSubRegional('${regionalId}', '${sub.id}')">🗑️</button>
+                        </div>
+                    `;
+                    
+                    container.appendChild(card);
+                });
+                
+                // Se há sub-regional selecionada, carregar suas comuns
+                if (subRegionalSelecionada) {
+                    await carregarComunsHierarquia(regionalId, subRegionalSelecionada);
+                }
+                
+            } catch (error) {
+                console.error('Erro ao carregar sub-regionais:', error);
+            }
+        }
+        
+        // Selecionar sub-regional
+        async function selecionarSubRegional(subId) {
+            subRegionalSelecionada = subId;
+            await carregarSubRegionaisHierarquia(regionalSelecionada);
+            await carregarComunsHierarquia(regionalSelecionada, subId);
+        }
+        
+        // Carregar comuns
+        async function carregarComunsHierarquia(regionalId, subId) {
+            try {
+                const comuns = await obterComuns(regionalId, subId);
+                
+                const container = document.getElementById('listaComuns');
+                container.innerHTML = '';
+                
+                if (comuns.length === 0) {
+                    container.innerHTML = '<p style="color: #999;">Nenhum comum nesta sub-regional</p>';
+                    return;
+                }
+                
+                comuns.forEach(comum => {
+                    const card = document.createElement('div');
+                    card.style.cssText = 'background: #f3f4f6; padding: 15px; border-radius: 8px; margin-bottom: 10px;';
+                    
+                    // Montar informações de configuração
+                    let configInfo = '';
+                    if (comum.config) {
+                        const diasCulto = comum.config.dias_culto || [];
+                        const horarios = comum.config.horarios || {};
+                        
+                        if (diasCulto.length > 0) {
+                            configInfo += '<div style="margin-top: 10px; padding: 10px; background: white; border-radius: 6px; border-left: 3px solid #3b82f6;">';
+                            configInfo += '<div style="font-size: 0.85em; color: #666; margin-bottom: 8px;"><strong>📅 Dias e Horários Configurados:</strong></div>';
+                            configInfo += '<div style="display: flex; flex-wrap: wrap; gap: 8px;">';
+                            
+                            diasCulto.forEach(dia => {
+                                const horasDia = horarios[dia] || [];
+                                const horariosTexto = horasDia.length > 0 ? horasDia.join(', ') : 'não definidos';
+                                
+                                // Escolher cor por dia
+                                let corDia = '#6b7280';
+                                if (dia === 'Domingo') corDia = '#dc2626';
+                                else if (dia === 'Segunda') corDia = '#2563eb';
+                                else if (dia === 'Terça') corDia = '#059669';
+                                else if (dia === 'Quarta') corDia = '#ea580c';
+                                else if (dia === 'Quinta') corDia = '#7c3aed';
+                                else if (dia === 'Sexta') corDia = '#0891b2';
+                                else if (dia === 'Sábado') corDia = '#ca8a04';
+                                
+                                configInfo += `
+                                    <div style="background: ${corDia}15; border: 1px solid ${corDia}; padding: 6px 10px; border-radius: 6px; font-size: 0.85em;">
+                                        <strong style="color: ${corDia};">${dia}</strong><br>
+                                        <span style="color: #666; font-size: 0.9em;">⏰ ${horariosTexto}</span>
+                                    </div>
+                                `;
+                            });
+                            
+                            configInfo += '</div>';
+                            
+                            // Fechamento
+                            const fechamento = comum.config.fechamento_publicacao_dias || 7;
+                            configInfo += `<div style="margin-top: 8px; font-size: 0.8em; color: #666;">⏱️ Fechamento: ${fechamento} dias antes</div>`;
+                            configInfo += '</div>';
+                        }
+                    }
+                    
+                    card.innerHTML = `
+                        <div style="display: flex; justify-content: space-between; align-items: flex-start;">
+                            <div style="flex: 1;">
+                                <strong style="font-size: 1.1em; display: flex; align-items: center; gap: 6px;"><img src="/static/casa.png" alt="Casa" style="width: 18px; height: 18px;"> ${comum.nome}</strong>
+                                <div style="font-size: 0.9em; color: #666;">ID: ${comum.id}</div>
+                                ${configInfo}
+                            </div>
+                            <div style="display: flex; gap: 5px; flex-shrink: 0;">
+                                <button class="btn" style="padding: 5px 10px; background: #3b82f6; color: white;" onclick="abrirModalEditarComum('${regionalId}', '${subId}', '${comum.id}')">✏️</button>
+                                <button class="btn" style="padding: 5px 10px; background: #ef4444; color: white;" onclick="deletarComum('${regionalId}', '${subId}', '${comum.id}')">🗑️</button>
+                            </div>
+                        </div>
+                    `;
+                    
+                    container.appendChild(card);
+                });
+                
+            } catch (error) {
+                console.error('Erro ao carregar comuns:', error);
+            }
+        }
+        
+        // Modais
+        function mostrarModalNovaRegional() {
+            document.getElementById('modalNovaRegional').style.display = 'flex';
+        }
+        
+        function fecharModalNovaRegional() {
+            document.getElementById('modalNovaRegional').style.display = 'none';
+            document.getElementById('novaRegionalId').value = '';
+            document.getElementById('novaRegionalNome').value = '';
+        }
+        
+        async function mostrarModalNovaSubRegional() {
+            // Carregar regionais no select
+            const regionais = await obterHierarquia();
+            
+            const select = document.getElementById('novaSubRegionalPai');
+            select.innerHTML = '<option value="">Selecione...</option>';
+            regionais.forEach(r => {
+                const option = document.createElement('option');
+                option.value = r.id;
+                option.textContent = r.nome;
+                if (regionalSelecionada === r.id) option.selected = true;
+                select.appendChild(option);
+            });
+            
+            document.getElementById('modalNovaSubRegional').style.display = 'flex';
+        }
+        
+        function fecharModalNovaSubRegional() {
+            document.getElementById('modalNovaSubRegional').style.display = 'none';
+            document.getElementById('novaSubRegionalId').value = '';
+            document.getElementById('novaSubRegionalNome').value = '';
+        }
+        
+        async function mostrarModalNovoComum() {
+            // Carregar regionais
+            const regionais = await obterHierarquia();
+            
+            const select = document.getElementById('novoComumRegional');
+            select.innerHTML = '<option value="">Selecione...</option>';
+            regionais.forEach(r => {
+                const option = document.createElement('option');
+                option.value = r.id;
+                option.textContent = r.nome;
+                if (regionalSelecionada === r.id) option.selected = true;
+                select.appendChild(option);
+            });
+            
+            // Se há regional selecionada, carregar sub-regionais
+            if (regionalSelecionada) {
+                await carregarSubRegionaisModal();
+            }
+            
+            document.getElementById('modalNovoComum').style.display = 'flex';
+        }
+        
+        function fecharModalNovoComum() {
+            document.getElementById('modalNovoComum').style.display = 'none';
+            document.getElementById('novoComumId').value = '';
+            document.getElementById('novoComumNome').value = '';
+        }
+        
+        async function carregarSubRegionaisModal() {
+            const regionalId = document.getElementById('novoComumRegional').value;
+            if (!regionalId) {
+                document.getElementById('novoComumSubRegional').innerHTML = '<option value="">Selecione Regional primeiro...</option>';
+                return;
+            }
+            
+            const subs = await obterSubRegionais(regionalId);
+            
+            const select = document.getElementById('novoComumSubRegional');
+            select.innerHTML = '<option value="">Selecione...</option>';
+            subs.forEach(s => {
+                const option = document.createElement('option');
+                option.value = s.id;
+                option.textContent = s.nome;
+                if (subRegionalSelecionada === s.id) option.selected = true;
+                select.appendChild(option);
+            });
+        }
+        
+        // CRUD Regional
+        async function criarRegional(event) {
+            event.preventDefault();
+            
+            const id = document.getElementById('novaRegionalId').value;
+            const nome = document.getElementById('novaRegionalNome').value;
+            
+            try {
+                const response = await fetch('/api/regionais', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({id, nome})
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification(`Regional "${nome}" criada com sucesso!`, 'success');
+                    fecharModalNovaRegional();
+                    await carregarHierarquia();
+                } else {
+                    showNotification(data.error || 'Erro ao criar regional', 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao criar regional', 'error');
+            }
+        }
+        
+        async function editarRegional(id, nomeAtual) {
+            const novoNome = prompt('Novo nome para a regional:', nomeAtual);
+            if (!novoNome || novoNome === nomeAtual) return;
+            
+            try {
+                const response = await fetch(`/api/regionais/${id}`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({nome: novoNome})
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification('Regional atualizada!', 'success');
+                    await carregarHierarquia();
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao editar regional', 'error');
+            }
+        }
+        
+        async function deletarRegional(id) {
+            if (!confirm('Tem certeza que deseja deletar esta regional? Ela deve estar vazia.')) return;
+            
+            try {
+                const response = await fetch(`/api/regionais/${id}`, {
+                    method: 'DELETE'
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification('Regional deletada!', 'success');
+                    if (regionalSelecionada === id) {
+                        regionalSelecionada = null;
+                        subRegionalSelecionada = null;
+                    }
+                    await carregarHierarquia();
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao deletar regional', 'error');
+            }
+        }
+        
+        // CRUD Sub-Regional
+        async function criarSubRegional(event) {
+            event.preventDefault();
+            
+            const regionalId = document.getElementById('novaSubRegionalPai').value;
+            const id = document.getElementById('novaSubRegionalId').value;
+            const nome = document.getElementById('novaSubRegionalNome').value;
+            
+            try {
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais`, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({id, nome})
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification(`Sub-Regional "${nome}" criada!`, 'success');
+                    fecharModalNovaSubRegional();
+                    regionalSelecionada = regionalId;
+                    await carregarHierarquia();
+                    await carregarSubRegionaisHierarquia(regionalId);
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao criar sub-regional', 'error');
+            }
+        }
+        
+        async function editarSubRegional(regionalId, subId, nomeAtual) {
+            const novoNome = prompt('Novo nome para a sub-regional:', nomeAtual);
+            if (!novoNome || novoNome === nomeAtual) return;
+            
+            try {
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({nome: novoNome})
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification('Sub-Regional atualizada!', 'success');
+                    await carregarSubRegionaisHierarquia(regionalId);
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao editar sub-regional', 'error');
+            }
+        }
+        
+        async function deletarSubRegional(regionalId, subId) {
+            if (!confirm('Tem certeza? A sub-regional deve estar vazia.')) return;
+            
+            try {
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}`, {
+                    method: 'DELETE'
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification('Sub-Regional deletada!', 'success');
+                    if (subRegionalSelecionada === subId) {
+                        subRegionalSelecionada = null;
+                    }
+                    await carregarSubRegionaisHierarquia(regionalId);
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao deletar sub-regional', 'error');
+            }
+        }
+        
+        // Toggle horários no modal de comum
+        function toggleModalHorarios(containerLabel) {
+            const checkbox = containerLabel.querySelector('input[type="checkbox"]');
+            const horariosContainer = containerLabel.querySelector('.modal-horarios-container');
+            const inputHorarios = containerLabel.querySelector('.modal-horarios-input');
+            const parentCard = containerLabel.closest('.dia-horario-config label');
+            
+            if (checkbox.checked) {
+                horariosContainer.style.display = 'block';
+                parentCard.style.borderColor = '#3b82f6';
+                parentCard.style.background = '#eff6ff';
+                inputHorarios.required = true;
+                setTimeout(() => inputHorarios.focus(), 100);
+            } else {
+                horariosContainer.style.display = 'none';
+                parentCard.style.borderColor = '#e5e7eb';
+                parentCard.style.background = 'white';
+                inputHorarios.required = false;
+                inputHorarios.value = '';
+            }
+        }
+        
+        // CRUD Comum
+        async function criarComum(event) {
+            event.preventDefault();
+            
+            const regionalId = document.getElementById('novoComumRegional').value;
+            const subId = document.getElementById('novoComumSubRegional').value;
+            const id = document.getElementById('novoComumId').value;
+            const nome = document.getElementById('novoComumNome').value;
+            const fechamentoDias = parseInt(document.getElementById('novoComumFechamentoDias').value);
+            
+            // Coletar dias e horários
+            const checkboxes = document.querySelectorAll('input[name="modal_dias_culto"]:checked');
+            const dias_culto = [];
+            const horarios = {};
+            
+            let erro = false;
+            checkboxes.forEach(cb => {
+                const dia = cb.value;
+                dias_culto.push(dia);
+                
+                const inputHorarios = document.querySelector(`.modal-horarios-input[data-dia="${dia}"]`);
+                const horariosTexto = inputHorarios.value.trim();
+                
+                if (!horariosTexto) {
+                    showNotification(`Digite os horários para ${dia}`, 'error');
+                    erro = true;
+                    return;
+                }
+                
+                // Parse horários (separados por vírgula)
+                const horariosArray = horariosTexto.split(',')
+                    .map(h => h.trim())
+                    .filter(h => h)
+                    .sort();
+                
+                if (horariosArray.length === 0) {
+                    showNotification(`Digite pelo menos um horário para ${dia}`, 'error');
+                    erro = true;
+                    return;
+                }
+                
+                // Validar formato HH:MM
+                const formatoValido = horariosArray.every(h => /^\d{2}:\d{2}$/.test(h));
+                if (!formatoValido) {
+                    showNotification(`Formato inválido em ${dia}. Use HH:MM (ex: 09:00)`, 'error');
+                    erro = true;
+                    return;
+                }
+                
+                horarios[dia] = horariosArray;
+            });
+            
+            if (erro) return;
+            
+            if (dias_culto.length === 0) {
+                showNotification('Selecione pelo menos um dia de culto', 'error');
+                return;
+            }
+            
+            try {
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}/comuns`, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({
+                        id, 
+                        nome,
+                        config: {
+                            dias_culto,
+                            horarios,
+                            fechamento_publicacao_dias: fechamentoDias
+                        }
+                    })
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification(`✅ Comum "${nome}" criado com sucesso!`, 'success');
+                    fecharModalNovoComum();
+                    regionalSelecionada = regionalId;
+                    subRegionalSelecionada = subId;
+                    await carregarHierarquia();
+                    await carregarSubRegionaisHierarquia(regionalId);
+                    await carregarComunsHierarquia(regionalId, subId);
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao criar comum', 'error');
+            }
+        }
+        
+        // Abrir modal de editar comum
+        async function abrirModalEditarComum(regionalId, subId, comumId) {
+            try {
+                // Buscar dados do comum
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}/comuns/${comumId}`);
+                const comum = await response.json();
+                
+                // Buscar organistas do comum
+                const orgResponse = await fetch(`/organistas?comum_id=${comumId}`);
+                const organistas = await orgResponse.json();
+                
+                // Buscar escalas do comum
+                let escalasCount = 0;
+                try {
+                    const escalaResponse = await fetch('/escala/atual');
+                    const escalaData = await escalaResponse.json();
+                    if (escalaData.escala && Array.isArray(escalaData.escala)) {
+                        escalasCount = escalaData.escala.length;
+                    }
+                } catch (e) {
+                    console.log('Não foi possível verificar escalas');
+                }
+                
+                // Mostrar informações
+                const infoBox = document.getElementById('editComumInfoBox');
+                infoBox.style.display = 'block';
+                
+                document.getElementById('editComumOrganistasCount').textContent = organistas.length;
+                document.getElementById('editComumEscalasCount').textContent = escalasCount;
+                
+                // Mostrar lista de organistas se houver
+                const orgLista = document.getElementById('editComumOrganistasLista');
+                if (organistas.length > 0) {
+                    orgLista.style.display = 'block';
+                    let listaHtml = '<strong>Organistas cadastrados:</strong><br>';
+                    organistas.slice(0, 10).forEach(org => {
+                        listaHtml += `• ${org.nome}<br>`;
+                    });
+                    if (organistas.length > 10) {
+                        listaHtml += `<em>... e mais ${organistas.length - 10} organista(s)</em>`;
+                    }
+                    orgLista.innerHTML = listaHtml;
+                } else {
+                    orgLista.style.display = 'none';
+                }
+                
+                // Preencher campos básicos
+                document.getElementById('editComumRegionalId').value = regionalId;
+                document.getElementById('editComumSubRegionalId').value = subId;
+                document.getElementById('editComumId').value = comumId;
+                document.getElementById('editComumNome').value = comum.nome;
+                
+                // Preencher fechamento
+                const fechamento = comum.config?.fechamento_publicacao_dias || 7;
+                document.getElementById('editComumFechamentoDias').value = fechamento;
+                
+                // Montar dias e horários
+                const diasCulto = comum.config?.dias_culto || [];
+                const horarios = comum.config?.horarios || {};
+                
+                const container = document.getElementById('editDiasHorariosContainer');
+                container.innerHTML = '';
+                
+                const todosDias = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado'];
+                const coresDias = {
+                    'Domingo': '#dc2626',
+                    'Segunda': '#2563eb',
+                    'Terça': '#059669',
+                    'Quarta': '#ea580c',
+                    'Quinta': '#7c3aed',
+                    'Sexta': '#0891b2',
+                    'Sábado': '#ca8a04'
+                };
+                
+                todosDias.forEach(dia => {
+                    const checked = diasCulto.includes(dia);
+                    const horasDia = horarios[dia] || [];
+                    const horariosTexto = horasDia.join(', ');
+                    const cor = coresDias[dia];
+                    
+                    const diaHtml = `
+                        <div class="dia-horario-config">
+                            <label style="display: flex; flex-direction: column; gap: 8px; padding: 12px; background: ${checked ? cor + '15' : 'white'}; border: 2px solid ${checked ? cor : '#e5e7eb'}; border-radius: 8px; cursor: pointer; transition: all 0.2s;">
+                                <div style="display: flex; align-items: center; gap: 10px;">
+                                    <input type="checkbox" name="edit_dias_culto" value="${dia}" ${checked ? 'checked' : ''} onchange="toggleModalHorariosEdit(this.parentElement.parentElement.parentElement)" style="width: 18px; height: 18px;">
+                                    <strong style="font-size: 1.05em; color: ${cor};">${dia === 'Domingo' ? '☀️' : '📅'} ${dia}${dia !== 'Domingo' && dia !== 'Sábado' ? '-feira' : ''}</strong>
+                                </div>
+                                <div class="modal-horarios-container" style="display: ${checked ? 'block' : 'none'}; padding-left: 28px;">
+                                    <label style="display: block; font-size: 0.85em; color: #666; margin-bottom: 4px;">⏰ Horários:</label>
+                                    <input type="text" class="modal-horarios-input" data-dia="${dia}" value="${horariosTexto}" placeholder="Ex: 09:00, 18:00" style="width: 100%; padding: 8px; border: 1px solid #d1d5db; border-radius: 4px; font-size: 0.95em;" ${checked ? 'required' : ''}>
+                                </div>
+                            </label>
+                        </div>
+                    `;
+                    
+                    container.insertAdjacentHTML('beforeend', diaHtml);
+                });
+                
+                // Mostrar modal
+                document.getElementById('modalEditarComum').style.display = 'flex';
+                
+            } catch (error) {
+                console.error('Erro ao carregar dados do comum:', error);
+                showNotification('Erro ao carregar dados do comum', 'error');
+            }
+        }
+        
+        function fecharModalEditarComum() {
+            document.getElementById('modalEditarComum').style.display = 'none';
+        }
+        
+        function toggleModalHorariosEdit(containerLabel) {
+            const checkbox = containerLabel.querySelector('input[type="checkbox"]');
+            const horariosContainer = containerLabel.querySelector('.modal-horarios-container');
+            const inputHorarios = containerLabel.querySelector('.modal-horarios-input');
+            const parentCard = containerLabel.closest('.dia-horario-config label');
+            const dia = checkbox.value;
+            
+            // Cores por dia
+            const coresDias = {
+                'Domingo': '#dc2626',
+                'Segunda': '#2563eb',
+                'Terça': '#059669',
+                'Quarta': '#ea580c',
+                'Quinta': '#7c3aed',
+                'Sexta': '#0891b2',
+                'Sábado': '#ca8a04'
+            };
+            const cor = coresDias[dia];
+            
+            if (checkbox.checked) {
+                horariosContainer.style.display = 'block';
+                parentCard.style.borderColor = cor;
+                parentCard.style.background = cor + '15';
+                inputHorarios.required = true;
+                setTimeout(() => inputHorarios.focus(), 100);
+            } else {
+                horariosContainer.style.display = 'none';
+                parentCard.style.borderColor = '#e5e7eb';
+                parentCard.style.background = 'white';
+                inputHorarios.required = false;
+                inputHorarios.value = '';
+            }
+        }
+        
+        async function salvarEdicaoComum(event) {
+            event.preventDefault();
+            
+            const regionalId = document.getElementById('editComumRegionalId').value;
+            const subId = document.getElementById('editComumSubRegionalId').value;
+            const comumId = document.getElementById('editComumId').value;
+            const nome = document.getElementById('editComumNome').value;
+            const fechamentoDias = parseInt(document.getElementById('editComumFechamentoDias').value);
+            
+            // Coletar dias e horários
+            const checkboxes = document.querySelectorAll('input[name="edit_dias_culto"]:checked');
+            const dias_culto = [];
+            const horarios = {};
+            
+            let erro = false;
+            checkboxes.forEach(cb => {
+                const dia = cb.value;
+                dias_culto.push(dia);
+                
+                const inputHorarios = document.querySelector(`.modal-horarios-input[data-dia="${dia}"]`);
+                const horariosTexto = inputHorarios.value.trim();
+                
+                if (!horariosTexto) {
+                    showNotification(`Digite os horários para ${dia}`, 'error');
+                    erro = true;
+                    return;
+                }
+                
+                // Parse horários
+                const horariosArray = horariosTexto.split(',')
+                    .map(h => h.trim())
+                    .filter(h => h)
+                    .sort();
+                
+                if (horariosArray.length === 0) {
+                    showNotification(`Digite pelo menos um horário para ${dia}`, 'error');
+                    erro = true;
+                    return;
+                }
+                
+                // Validar formato HH:MM
+                const formatoValido = horariosArray.every(h => /^\d{2}:\d{2}$/.test(h));
+                if (!formatoValido) {
+                    showNotification(`Formato inválido em ${dia}. Use HH:MM`, 'error');
+                    erro = true;
+                    return;
+                }
+                
+                horarios[dia] = horariosArray;
+            });
+            
+            if (erro) return;
+            
+            if (dias_culto.length === 0) {
+                showNotification('Selecione pelo menos um dia de culto', 'error');
+                return;
+            }
+            
+            try {
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}/comuns/${comumId}`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({
+                        nome,
+                        config: {
+                            dias_culto,
+                            horarios,
+                            fechamento_publicacao_dias: fechamentoDias
+                        }
+                    })
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification('✅ Comum atualizado com sucesso!', 'success');
+                    fecharModalEditarComum();
+                    await carregarComunsHierarquia(regionalId, subId);
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao atualizar comum', 'error');
+            }
+        }
+        
+        async function deletarComum(regionalId, subId, comumId) {
+            try {
+                // Primeiro, buscar informações do comum
+                const infoResponse = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}/comuns/${comumId}`);
+                const comumInfo = await infoResponse.json();
+                
+                // Buscar organistas do comum
+                const orgResponse = await fetch(`/organistas?comum_id=${comumId}`);
+                const organistas = await orgResponse.json();
+                
+                // Buscar escalas do comum
+                let escalasCount = 0;
+                try {
+                    const escalaResponse = await fetch('/escala/atual');
+                    const escalaData = await escalaResponse.json();
+                    if (escalaData.escala && Array.isArray(escalaData.escala)) {
+                        escalasCount = escalaData.escala.length;
+                    }
+                } catch (e) {
+                    console.log('Não foi possível verificar escalas');
+                }
+                
+                // Montar mensagem com informações
+                let mensagem = `🏠 Comum: ${comumInfo.nome}\n`;
+                mensagem += `📋 ID: ${comumId}\n\n`;
+                mensagem += `📊 Dados Cadastrados:\n`;
+                mensagem += `👥 Organistas: ${organistas.length}\n`;
+                mensagem += `📅 Escalas: ${escalasCount}\n\n`;
+                
+                if (organistas.length > 0 || escalasCount > 0) {
+                    mensagem += `⚠️ ATENÇÃO: Este comum possui dados cadastrados!\n\n`;
+                    
+                    if (organistas.length > 0) {
+                        mensagem += `Organistas cadastrados:\n`;
+                        organistas.slice(0, 5).forEach(org => {
+                            mensagem += `  • ${org.nome}\n`;
+                        });
+                        if (organistas.length > 5) {
+                            mensagem += `  ... e mais ${organistas.length - 5} organista(s)\n`;
+                        }
+                        mensagem += `\n`;
+                    }
+                    
+                    mensagem += `❌ Não é possível deletar este comum.\n`;
+                    mensagem += `Por favor, remova primeiro:\n`;
+                    mensagem += `1. Todas as escalas (Rodízios > Carregar/Deletar Escala)\n`;
+                    mensagem += `2. Todos os organistas (Encarregado Local > Organistas)\n`;
+                    
+                    alert(mensagem);
+                    return;
+                }
+                
+                // Se chegou aqui, o comum está vazio
+                mensagem += `✅ Este comum está vazio e pode ser deletado.\n\n`;
+                mensagem += `Deseja realmente deletar o comum "${comumInfo.nome}"?`;
+                
+                if (!confirm(mensagem)) return;
+                
+                // Prosseguir com a exclusão
+                const response = await fetch(`/api/regionais/${regionalId}/sub-regionais/${subId}/comuns/${comumId}`, {
+                    method: 'DELETE'
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    invalidarHierarquia();
+                    showNotification('✅ Comum deletado com sucesso!', 'success');
+                    await carregarComunsHierarquia(regionalId, subId);
+                } else {
+                    showNotification(data.error || 'Erro ao deletar comum', 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('❌ Erro ao processar solicitação', 'error');
+            }
+        }
+        
+        // ==================== Gerenciamento de Usuários ====================
+        
+        async function carregarUsuarios() {
+            if (contextoAtual.nivel !== 'master') return;
+            
+            try {
+                const response = await fetch('/api/usuarios');
+                const usuarios = await response.json();
+                
+                const container = document.getElementById('listaUsuarios');
+                
+                if (usuarios.length === 0) {
+                    container.innerHTML = '<p style="color: #999;">Nenhum usuário cadastrado</p>';
+                    return;
+                }
+                
+                // Criar tabela
+                let html = `
+                    <table style="width: 100%; border-collapse: collapse;">
+                        <thead>
+                            <tr style="background: #f3f4f6; text-align: left;">
+                                <th style="padding: 12px; border: 1px solid #ddd;">ID</th>
+                                <th style="padding: 12px; border: 1px solid #ddd;">Nome</th>
+                                <th style="padding: 12px; border: 1px solid #ddd;">Tipo</th>
+                                <th style="padding: 12px; border: 1px solid #ddd;">Contexto</th>
+                                <th style="padding: 12px; border: 1px solid #ddd;">Email</th>
+                                <th style="padding: 12px; border: 1px solid #ddd;">Status</th>
+                                <th style="padding: 12px; border: 1px solid #ddd;">Ações</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                `;
+                
+                usuarios.forEach(user => {
+                    const tipoLabel = {
+                        'master': '🔐 Master',
+                        'admin_regional': '🏙️ Admin Regional',
+                        'encarregado_sub_regional': '📍 Enc. Sub-Regional',
+                        'encarregado_comum': '🏠 Enc. Comum'
+                    }[user.tipo] || user.tipo;
+                    
+                    const statusBadge = user.ativo 
+                        ? '<span style="background: #10b981; color: white; padding: 4px 8px; border-radius: 4px; font-size: 0.85em;">Ativo</span>'
+                        : '<span style="background: #6b7280; color: white; padding: 4px 8px; border-radius: 4px; font-size: 0.85em;">Inativo</span>';
+                    
+                    html += `
+                        <tr style="border-bottom: 1px solid #ddd;">
+                            <td style="padding: 12px;">${user.id}</td>
+                            <td style="padding: 12px;"><strong>${user.nome}</strong></td>
+                            <td style="padding: 12px;">${tipoLabel}</td>
+                            <td style="padding: 12px;">${user.contexto_id || '-'}</td>
+                            <td style="padding: 12px;">${user.email || '-'}</td>
+                            <td style="padding: 12px;">${statusBadge}</td>
+                            <td style="padding: 12px;">
+                                <button class="btn" style="padding: 5px 10px; background: #3b82f6; color: white;" 
+                                    onclick="editarUsuario('${user.id}')">✏️</button>
+                                ${user.id !== 'admin_master' ? `
+                                    <button class="btn" style="padding: 5px 10px; background: #ef4444; color: white;" 
+                                        onclick="deletarUsuario('${user.id}')">🗑️</button>
+                                ` : ''}
+                            </td>
+                        </tr>
+                    `;
+                });
+                
+                html += '</tbody></table>';
+                container.innerHTML = html;
+                
+            } catch (error) {
+                console.error('Erro ao carregar usuários:', error);
+                showNotification('Erro ao carregar usuários', 'error');
+            }
+        }
+        
+        function mostrarModalNovoUsuario() {
+            document.getElementById('modalNovoUsuario').style.display = 'flex';
+        }
+        
+        function fecharModalNovoUsuario() {
+            document.getElementById('modalNovoUsuario').style.display = 'none';
+            document.getElementById('novoUsuarioId').value = '';
+            document.getElementById('novoUsuarioNome').value = '';
+            document.getElementById('novoUsuarioTipo').value = '';
+            document.getElementById('novoUsuarioContexto').innerHTML = '<option value="">Selecione o tipo primeiro...</option>';
+            document.getElementById('novoUsuarioEmail').value = '';
+            document.getElementById('novoUsuarioTelefone').value = '';
+            document.getElementById('novoUsuarioSenha').value = '';
+            document.getElementById('divContextoUsuario').style.display = 'none';
+        }
+        
+        async function atualizarContextoUsuario() {
+            const tipo = document.getElementById('novoUsuarioTipo').value;
+            const divContexto = document.getElementById('divContextoUsuario');
+            const selectContexto = document.getElementById('novoUsuarioContexto');
+            
+            if (tipo === 'master') {
+                divContexto.style.display = 'none';
+                selectContexto.innerHTML = '<option value="">Não requer contexto</option>';
+                return;
+            }
+            
+            divContexto.style.display = 'block';
+            selectContexto.innerHTML = '<option value="">Carregando...</option>';
+            
+            try {
+                if (tipo === 'admin_regional') {
+                    // Carregar regionais
+                    const regionais = await obterHierarquia();
+                    
+                    selectContexto.innerHTML = '<option value="">Selecione Regional...</option>';
+                    regionais.forEach(r => {
+                        const option = document.createElement('option');
+                        option.value = r.id;
+                        option.textContent = r.nome;
+                        selectContexto.appendChild(option);
+                    });
+                    
+                } else if (tipo === 'encarregado_sub_regional') {
+                    // Carregar sub-regionais de todas regionais
+                    const regionais = await obterHierarquia();
+                    
+                    selectContexto.innerHTML = '<option value="">Selecione Sub-Regional...</option>';
+                    
+                    for (const regional of regionais) {
+                        regional.sub_regionais.forEach(sub => {
+                            const option = document.createElement('option');
+                            option.value = sub.id;
+                            option.textContent = `${regional.nome} › ${sub.nome}`;
+                            selectContexto.appendChild(option);
+                        });
+                    }
+                    
+                } else if (tipo === 'encarregado_comum') {
+                    // Carregar todos comuns
+                    const regionais = await obterHierarquia();
+                    
+                    selectContexto.innerHTML = '<option value="">Selecione Comum...</option>';
+                    
+                    for (const regional of regionais) {
+                        for (const sub of regional.sub_regionais) {
+                            sub.comuns.forEach(comum => {
+                                const option = document.createElement('option');
+                                option.value = comum.id;
+                                option.textContent = `${regional.nome} › ${sub.nome} › ${comum.nome}`;
+                                selectContexto.appendChild(option);
+                            });
+                        }
+                    }
+                }
+            } catch (error) {
+                console.error('Erro ao carregar contextos:', error);
+                selectContexto.innerHTML = '<option value="">Erro ao carregar</option>';
+            }
+        }
+        
+        async function criarUsuario(event) {
+            event.preventDefault();
+            
+            const id = document.getElementById('novoUsuarioId').value;
+            const nome = document.getElementById('novoUsuarioNome').value;
+            const tipo = document.getElementById('novoUsuarioTipo').value;
+            const contexto_id = document.getElementById('novoUsuarioContexto').value;
+            const email = document.getElementById('novoUsuarioEmail').value;
+            const telefone = document.getElementById('novoUsuarioTelefone').value;
+            const senha = document.getElementById('novoUsuarioSenha').value;
+            
+            try {
+                const response = await fetch('/api/usuarios', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({
+                        id,
+                        nome,
+                        tipo,
+                        contexto_id,
+                        email,
+                        telefone,
+                        senha: senha || 'senha123'
+                    })
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    showNotification(`Usuário "${nome}" criado com sucesso! Login: ${id} / Senha: ${senha || 'senha123'}`, 'success');
+                    fecharModalNovoUsuario();
+                    await carregarUsuarios();
+                } else {
+                    showNotification(data.error || 'Erro ao criar usuário', 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao criar usuário', 'error');
+            }
+        }
+        
+        async function editarUsuario(userId) {
+            const novoNome = prompt('Novo nome para o usuário:');
+            if (!novoNome) return;
+            
+            try {
+                const response = await fetch(`/api/usuarios/${userId}`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({nome: novoNome})
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    showNotification('Usuário atualizado!', 'success');
+                    await carregarUsuarios();
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao editar usuário', 'error');
+            }
+        }
+        
+        async function deletarUsuario(userId) {
+            if (!confirm(`Tem certeza que deseja deletar o usuário "${userId}"?`)) return;
+            
+            try {
+                const response = await fetch(`/api/usuarios/${userId}`, {
+                    method: 'DELETE'
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    showNotification('Usuário deletado!', 'success');
+                    await carregarUsuarios();
+                } else {
+                    showNotification(data.error, 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao deletar usuário', 'error');
+            }
+        }
+        
+        // Toggle exibição de horários quando marca/desmarca dia
+        function toggleHorarios(checkbox) {
+            const container = checkbox.closest('.dia-horario-group').querySelector('.horarios-container');
+            if (checkbox.checked) {
+                container.style.display = 'block';
+                // Se não tem horário, adicionar um padrão
+                const dia = checkbox.value;
+                const horariosDiv = document.getElementById(`horarios${dia}`);
+                if (horariosDiv.children.length === 0) {
+                    adicionarHorario(dia, '09:00'); // Horário padrão
+                }
+            } else {
+                container.style.display = 'none';
+            }
+        }
+        
+        // Adicionar campo de horário para um dia específico
+        function adicionarHorario(dia, valorInicial = '') {
+            const container = document.getElementById(`horarios${dia}`);
+            
+            const horarioItem = document.createElement('div');
+            horarioItem.className = 'horario-item';
+            horarioItem.style.cssText = 'display: flex; align-items: center; gap: 5px; background: white; padding: 5px 10px; border-radius: 4px; border: 1px solid #cbd5e1;';
+            
+            const input = document.createElement('input');
+            input.type = 'time';
+            input.className = 'horario-input';
+            input.dataset.dia = dia;
+            input.value = valorInicial;
+            input.required = true;
+            input.style.cssText = 'border: none; padding: 2px; font-size: 14px;';
+            
+            const btnRemover = document.createElement('button');
+            btnRemover.type = 'button';
+            btnRemover.textContent = '✕';
+            btnRemover.style.cssText = 'background: #ef4444; color: white; border: none; border-radius: 3px; width: 22px; height: 22px; cursor: pointer; font-size: 12px; padding: 0;';
+            btnRemover.onclick = () => {
+                horarioItem.remove();
+            };
+            
+            horarioItem.appendChild(input);
+            horarioItem.appendChild(btnRemover);
+            container.appendChild(horarioItem);
+        }
+        
+        // Remover horário específico
+        function removerHorario(button) {
+            button.closest('.horario-item').remove();
+        }
+        
+        // Configuração do Comum
+        async function carregarConfigComum() {
+            if (!contextoAtual.comum) return;
+            
+            try {
+                const response = await fetch(`/api/comuns/${contextoAtual.comum.id}/config`);
+                const config = await response.json();
+                
+                // Configurar checkboxes de dias e seus horários
+                const checkboxes = document.querySelectorAll('input[name="dias_culto"]');
+                checkboxes.forEach(cb => {
+                    const dia = cb.value;
+                    const estaMarcado = config.dias_culto && config.dias_culto.includes(dia);
+                    cb.checked = estaMarcado;
+                    
+                    // Mostrar/ocultar container de horários
+                    const container = cb.closest('.dia-horario-group').querySelector('.horarios-container');
+                    container.style.display = estaMarcado ? 'block' : 'none';
+                    
+                    // Limpar horários existentes
+                    const horariosDiv = document.getElementById(`horarios${dia}`);
+                    horariosDiv.innerHTML = '';
+                    
+                    // Carregar horários salvos
+                    if (estaMarcado && config.horarios && config.horarios[dia]) {
+                        config.horarios[dia].forEach(horario => {
+                            adicionarHorario(dia, horario);
+                        });
+                    } else if (estaMarcado) {
+                        // Se está marcado mas não tem horário, adicionar padrão
+                        adicionarHorario(dia, '09:00');
+                    }
+                });
+                
+                // Configurar período
+                if (config.periodo) {
+                    document.getElementById('configComumInicio').value = config.periodo.inicio;
+                    document.getElementById('configComumFim').value = config.periodo.fim;
+                }
+                
+                // Configurar fechamento de publicação
+                if (config.fechamento_publicacao_dias) {
+                    document.getElementById('configFechamentoDias').value = config.fechamento_publicacao_dias;
+                }
+            } catch (error) {
+                console.error('Erro ao carregar config do comum:', error);
+            }
+        }
+        
+        async function salvarConfigComum(event) {
+            event.preventDefault();
+            
+            if (!contextoAtual.comum) {
+                showNotification('Nenhum comum selecionado', 'error');
+                return;
+            }
+            
+            // Coletar dias marcados
+            const checkboxes = document.querySelectorAll('input[name="dias_culto"]:checked');
+            const dias_culto = Array.from(checkboxes).map(cb => cb.value);
+            
+            if (dias_culto.length === 0) {
+                showNotification('Selecione pelo menos um dia de culto', 'error');
+                return;
+            }
+            
+            // Coletar horários de cada dia
+            const horarios = {};
+            for (const dia of dias_culto) {
+                const inputsHorarios = document.querySelectorAll(`.horario-input[data-dia="${dia}"]`);
+                const horariosArray = Array.from(inputsHorarios).map(input => input.value).filter(h => h);
+                
+                if (horariosArray.length === 0) {
+                    showNotification(`Adicione pelo menos um horário para ${dia}`, 'error');
+                    return;
+                }
+                
+                // Ordenar horários
+                horariosArray.sort();
+                horarios[dia] = horariosArray;
+            }
+            
+            const inicio = document.getElementById('configComumInicio').value;
+            const fim = document.getElementById('configComumFim').value;
+            const fechamentoDias = parseInt(document.getElementById('configFechamentoDias').value);
+            
+            try {
+                const response = await fetch(`/api/comuns/${contextoAtual.comum.id}/config`, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({
+                        dias_culto,
+                        horarios,
+                        periodo: {
+                            inicio,
+                            fim
+                        },
+                        fechamento_publicacao_dias: fechamentoDias
+                    })
+                });
+                
+                const data = await response.json();
+                
+                if (data.success) {
+                    showNotification('✅ Configurações salvas com sucesso!', 'success');
+                    // Recarregar config para confirmar
+                    await carregarConfigComum();
+                } else {
+                    showNotification(data.error || 'Erro ao salvar', 'error');
+                }
+            } catch (error) {
+                console.error('Erro:', error);
+                showNotification('Erro ao salvar configurações', 'error');
+            }
+        }
+
+        // Executar inicialização quando página carregar
+        if (document.readyState === 'loading') {
+            document.addEventListener('DOMContentLoaded', initializeApp);
+        } else {
+            initializeApp();
+        }
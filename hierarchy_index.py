@@ -0,0 +1,64 @@
+"""
+Índice da hierarquia regional → sub-regional → comum
+Construído uma vez por versão do documento e usado pelos helpers de escopo
+para evitar varrer todas as comuns a cada chamada.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+# (regional_id, sub_regional_id, comum_id)
+Caminho = Tuple[str, str, str]
+
+
+class HierarchyIndex:
+    """
+    Guarda apenas caminhos (chaves), nunca os objetos da comum: quem consulta
+    resolve o caminho no próprio documento da requisição, que pode ser uma
+    cópia diferente da usada para montar o índice.
+    """
+
+    def __init__(self, db: Dict):
+        self.ordem: List[Caminho] = []
+        self.por_chave: Dict[str, Caminho] = {}
+        self.por_id_interno: Dict[str, Caminho] = {}
+        self.por_sub_regional: Dict[str, List[Caminho]] = {}
+        self.por_regional: Dict[str, List[Caminho]] = {}
+        self.organistas: Dict[str, Caminho] = {}
+
+        for regional_id, regional in db.get('regionais', {}).items():
+            self.por_regional.setdefault(regional_id, [])
+            for sub_regional_id, sub_regional in regional.get('sub_regionais', {}).items():
+                self.por_sub_regional.setdefault(sub_regional_id, [])
+                for comum_id, comum in sub_regional.get('comuns', {}).items():
+                    caminho = (regional_id, sub_regional_id, comum_id)
+                    self.ordem.append(caminho)
+                    self.por_chave.setdefault(comum_id, caminho)
+                    if comum.get('id'):
+                        self.por_id_interno.setdefault(comum['id'], caminho)
+                    self.por_sub_regional[sub_regional_id].append(caminho)
+                    self.por_regional[regional_id].append(caminho)
+                    for organista in comum.get('organistas', []):
+                        if organista.get('id'):
+                            self.organistas.setdefault(organista['id'], caminho)
+
+    def comum(self, comum_id: str) -> Optional[Caminho]:
+        """Caminho da comum pela chave do dicionário ou pelo ID interno"""
+        return self.por_chave.get(comum_id) or self.por_id_interno.get(comum_id)
+
+    def organista(self, organista_id: str) -> Optional[Caminho]:
+        """Caminho da comum onde a organista está cadastrada"""
+        return self.organistas.get(organista_id)
+
+    def primeira_comum(self) -> Optional[Caminho]:
+        return self.ordem[0] if self.ordem else None
+
+
+def resolver_caminho(db: Dict, caminho: Caminho) -> Optional[Tuple[Dict, Dict, Dict]]:
+    """Retorna (regional, sub_regional, comum) do documento para um caminho do índice"""
+    regional_id, sub_regional_id, comum_id = caminho
+    try:
+        regional = db['regionais'][regional_id]
+        sub_regional = regional['sub_regionais'][sub_regional_id]
+        return regional, sub_regional, sub_regional['comuns'][comum_id]
+    except (KeyError, TypeError):
+        return None
@@ -0,0 +1,216 @@
+"""
+Fila local de jobs (exportações e geração de escala fora das threads de requisição)
+Os jobs ficam numa tabela SQLite (sem broker externo) e são executados por um
+pool de threads próprio de cada processo do gunicorn. O "claim" é um UPDATE
+condicional, então cada job roda uma única vez mesmo com vários processos.
+O resultado vai para um arquivo em disco, servido pela rota de download.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Um handler recebe os parâmetros do job e devolve (conteúdo, mimetype, nome do arquivo).
+# O conteúdo pode ser bytes ou um iterável de blocos (bytes/str, str vira UTF-8), gravado
+# no arquivo conforme é produzido: exportações grandes não ficam inteiras na memória.
+Conteudo = Union[bytes, Iterable[Union[bytes, str]]]
+Handler = Callable[[Dict], Tuple[Conteudo, str, str]]
+
+STATUS_PENDENTE = 'pendente'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    criado_por TEXT,
+    criado_em TEXT NOT NULL,
+    iniciado_em TEXT,
+    concluido_em TEXT,
+    erro TEXT,
+    arquivo TEXT,
+    mimetype TEXT,
+    nome_arquivo TEXT,
+    tamanho INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_criado ON jobs(status, criado_em);
+CREATE INDEX IF NOT EXISTS idx_jobs_criado_por ON jobs(criado_por, criado_em);
+"""
+
+
+class FilaDeJobs:
+    def __init__(self, base_dir: str = "data/jobs", max_workers: int = 2,
+                 retencao: timedelta = timedelta(hours=24), tempo_maximo: timedelta = timedelta(minutes=30)):
+        self.base_dir = base_dir
+        self.db_path = os.path.join(base_dir, 'jobs.db')
+        self.retencao = retencao
+        self.tempo_maximo = tempo_maximo
+        self._handlers: Dict[str, Handler] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._iniciado = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL;")
+        return conn
+
+    def _garantir_schema(self) -> None:
+        with self._init_lock:
+            if self._iniciado:
+                return
+            os.makedirs(self.base_dir, exist_ok=True)
+            with self._connect() as conn:
+                conn.executescript(SCHEMA)
+            self._iniciado = True
+        self.recuperar()
+
+    def registrar(self, tipo: str, handler: Handler) -> None:
+        self._handlers[tipo] = handler
+
+    # ========== API PÚBLICA ==========
+
+    def enfileirar(self, tipo: str, params: Dict, criado_por: Optional[str] = None) -> Dict:
+        """Grava o job como pendente e agenda a execução; retorna o job"""
+        if tipo not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: {tipo}")
+        self._garantir_schema()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs(id, tipo, status, params, criado_por, criado_em) VALUES (?,?,?,?,?,?)",
+                (job_id, tipo, STATUS_PENDENTE, json.dumps(params, ensure_ascii=False), criado_por,
+                 datetime.utcnow().isoformat())
+            )
+        self._executor.submit(self._executar, job_id)
+        self.limpar()
+        return self.obter(job_id)
+
+    def obter(self, job_id: str) -> Optional[Dict]:
+        self._garantir_schema()
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def listar(self, criado_por: str, limite: int = 20) -> List[Dict]:
+        self._garantir_schema()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, tipo, status, criado_em, concluido_em, erro, nome_arquivo, tamanho "
+                "FROM jobs WHERE criado_por = ? ORDER BY criado_em DESC LIMIT ?",
+                (criado_por, limite)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def recuperar(self) -> None:
+        """
+        Reagenda jobs pendentes e os que ficaram 'executando' além do tempo
+        máximo (processo reiniciado no meio da execução).
+        """
+        limite = (datetime.utcnow() - self.tempo_maximo).isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, iniciado_em = NULL WHERE status = ? AND iniciado_em < ?",
+                (STATUS_PENDENTE, STATUS_EXECUTANDO, limite)
+            )
+            pendentes = [r[0] for r in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY criado_em", (STATUS_PENDENTE,)
+            ).fetchall()]
+        for job_id in pendentes:
+            self._executor.submit(self._executar, job_id)
+
+    def limpar(self) -> int:
+        """Remove jobs (e arquivos) concluídos há mais tempo que a retenção"""
+        limite = (datetime.utcnow() - self.retencao).isoformat()
+        with self._connect() as conn:
+            antigos = conn.execute(
+                "SELECT id, arquivo FROM jobs WHERE status IN (?, ?) AND concluido_em < ?",
+                (STATUS_CONCLUIDO, STATUS_ERRO, limite)
+            ).fetchall()
+            for row in antigos:
+                if row['arquivo']:
+                    try:
+                        os.remove(row['arquivo'])
+                    except FileNotFoundError:
+                        pass
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row['id'],) for row in antigos])
+        return len(antigos)
+
+    # ========== EXECUÇÃO ==========
+
+    def _reivindicar(self, job_id: str) -> Optional[sqlite3.Row]:
+        """Passa o job de pendente para executando; None se outro worker já pegou"""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, iniciado_em = ? WHERE id = ? AND status = ?",
+                (STATUS_EXECUTANDO, datetime.utcnow().isoformat(), job_id, STATUS_PENDENTE)
+            )
+            if cur.rowcount != 1:
+                return None
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    @staticmethod
+    def _gravar_resultado(arquivo: str, conteudo: Conteudo) -> int:
+        """Grava bytes ou blocos em um .tmp e troca pelo arquivo final; retorna o tamanho"""
+        temporario = arquivo + '.tmp'
+        tamanho = 0
+        try:
+            with open(temporario, 'wb') as f:
+                for bloco in ((conteudo,) if isinstance(conteudo, (bytes, bytearray)) else conteudo):
+                    if isinstance(bloco, str):
+                        bloco = bloco.encode('utf-8')
+                    f.write(bloco)
+                    tamanho += len(bloco)
+            os.replace(temporario, arquivo)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except FileNotFoundError:
+                pass
+            raise
+        finally:
+            if hasattr(conteudo, 'close'):
+                conteudo.close()
+        return tamanho
+
+    def _executar(self, job_id: str) -> None:
+        job = self._reivindicar(job_id)
+        if job is None:
+            return
+        inicio = datetime.utcnow()
+        try:
+            conteudo, mimetype, nome_arquivo = self._handlers[job['tipo']](json.loads(job['params']))
+            arquivo = os.path.join(self.base_dir, f"{job_id}.bin")
+            tamanho = self._gravar_resultado(arquivo, conteudo)
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, concluido_em = ?, arquivo = ?, mimetype = ?, "
+                    "nome_arquivo = ?, tamanho = ? WHERE id = ?",
+                    (STATUS_CONCLUIDO, datetime.utcnow().isoformat(), arquivo, mimetype,
+                     nome_arquivo, tamanho, job_id)
+                )
+            ms = (datetime.utcnow() - inicio).total_seconds() * 1000
+            print(f"✅ [JOB] {job['tipo']} {job_id} concluído em {ms:.0f}ms ({tamanho} bytes)")
+        except Exception as e:
+            traceback.print_exc()
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, concluido_em = ?, erro = ? WHERE id = ?",
+                    (STATUS_ERRO, datetime.utcnow().isoformat(), str(e), job_id)
+                )
+            print(f"❌ [JOB] {job['tipo']} {job_id} falhou: {e}")
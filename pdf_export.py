@@ -0,0 +1,291 @@
+"""
+Exportação da escala e da escala RJM em PDF
+Os PDFs são renderizados uma vez por (comum, versão da partição, layout) e
+ficam em cache: em memória (LRU por processo) e em disco, compartilhado
+entre os workers do gunicorn. Como o reportlab roda com invariant=1, o mesmo
+conteúdo gera sempre os mesmos bytes, então a chave serve de ETag.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+MESES_PT = {
+    1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
+    5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
+    9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+}
+
+DIAS_SEMANA = {
+    'Sunday': 'Domingo', 'Tuesday': 'Terça', 'Monday': 'Segunda', 'Wednesday': 'Quarta',
+    'Thursday': 'Quinta', 'Friday': 'Sexta', 'Saturday': 'Sábado'
+}
+
+# ========== ESTILOS (montados uma vez por processo) ==========
+
+_estilos: Optional[Dict] = None
+_estilos_lock = threading.Lock()
+
+
+def _obter_estilos() -> Dict:
+    global _estilos
+    with _estilos_lock:
+        if _estilos is None:
+            styles = getSampleStyleSheet()
+            _estilos = {
+                'normal': styles['Normal'],
+                'heading2': styles['Heading2'],
+                'escala_titulo': ParagraphStyle(
+                    'CustomTitle', parent=styles['Heading1'], fontSize=16,
+                    textColor=colors.HexColor('#667eea'), spaceAfter=20,
+                    alignment=TA_CENTER, fontName='Helvetica-Bold'
+                ),
+                'escala_mes': ParagraphStyle(
+                    'MesTitle', parent=styles['Heading2'], fontSize=14,
+                    textColor=colors.HexColor('#667eea'), spaceAfter=10,
+                    fontName='Helvetica-Bold'
+                ),
+                'rjm_titulo': ParagraphStyle(
+                    'CustomTitle', parent=styles['Heading1'], fontSize=18,
+                    textColor=colors.HexColor('#1e40af'), spaceAfter=30,
+                    alignment=TA_CENTER
+                ),
+            }
+        return _estilos
+
+
+ESTILO_TABELA_ESCALA = TableStyle([
+    # Cabeçalho
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#808080')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('TOPPADDING', (0, 0), (-1, 0), 12),
+
+    # Corpo
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (0, 1), (1, -1), 'CENTER'),
+    ('ALIGN', (2, 1), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('LEFTPADDING', (0, 1), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 1), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+
+    # Grades
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+    # Linhas alternadas
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
+])
+
+ESTILO_TABELA_RJM = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f59e0b')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def _por_mes(itens: List[Dict]) -> List[Tuple[datetime, List[Dict]]]:
+    """Agrupa itens {data: 'YYYY-MM-DD'} por mês, em ordem"""
+    meses = defaultdict(list)
+    for item in itens:
+        data = datetime.strptime(item["data"][:10], '%Y-%m-%d')
+        meses[(data.year, data.month)].append(item)
+    return [(datetime(ano, mes, 1), meses[(ano, mes)]) for ano, mes in sorted(meses)]
+
+
+# ========== RENDERIZAÇÃO ==========
+
+def renderizar_escala(escala: List[Dict], comum_nome: str) -> bytes:
+    """PDF da escala (paisagem, uma tabela por mês)"""
+    estilos = _obter_estilos()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
+                            rightMargin=1*cm, leftMargin=1*cm,
+                            topMargin=1*cm, bottomMargin=1*cm, invariant=1)
+
+    elements = [
+        Paragraph(f"Rodízio de Organistas - {comum_nome}", estilos['escala_titulo']),
+        Spacer(1, 0.5*cm),
+    ]
+    for mes, itens in _por_mes(escala):
+        elements.append(Paragraph(f"{MESES_PT[mes.month]}/{mes.year}", estilos['escala_mes']))
+        elements.append(Spacer(1, 0.3*cm))
+
+        data_table = [['Data', 'Dia', 'Meia-hora', 'Culto']]
+        for item in itens:
+            data_br = datetime.strptime(item["data"], '%Y-%m-%d').strftime('%d/%m')
+            dia = DIAS_SEMANA.get(item["dia_semana"], item["dia_semana"])
+            if item["dia_semana"] == "Sunday":
+                # DOMINGO: Duas fases separadas (Meia-hora e Culto)
+                meia_hora = item.get("meia_hora", "—")
+                culto = item.get("culto", "—")
+            else:
+                # Demais dias: tenta 'meia_hora'/'culto' primeiro, senão usa 'unica'
+                meia_hora = item.get("meia_hora") or item.get("unica", "—")
+                culto = item.get("culto") or item.get("unica", "—")
+            data_table.append([data_br, dia, meia_hora, culto])
+
+        table = Table(data_table, colWidths=[3*cm, 3.5*cm, 7*cm, 7*cm])
+        table.setStyle(ESTILO_TABELA_ESCALA)
+        elements.append(table)
+        elements.append(Spacer(1, 0.8*cm))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def renderizar_rjm(escala_rjm: List[Dict], comum_nome: str) -> bytes:
+    """PDF da escala RJM (retrato, uma tabela por mês)"""
+    estilos = _obter_estilos()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, invariant=1)
+
+    elements = [
+        Paragraph("Escala RJM - Reunião de Jovens e Menores", estilos['rjm_titulo']),
+        Paragraph(f"{comum_nome} - Domingos 10:00", estilos['normal']),
+        Spacer(1, 20),
+    ]
+    for mes, itens in _por_mes(escala_rjm):
+        elements.append(Paragraph(f"<b>{MESES_PT[mes.month].upper()} {mes.year}</b>", estilos['heading2']))
+        elements.append(Spacer(1, 10))
+
+        table_data = [['Data', 'Dia', 'Organista']]
+        for item in itens:
+            data = datetime.fromisoformat(item["data"])
+            table_data.append([data.strftime("%d/%m/%Y"), "Domingo", item.get("organista", "-")])
+
+        table = Table(table_data, colWidths=[3*cm, 3*cm, 8*cm])
+        table.setStyle(ESTILO_TABELA_RJM)
+        elements.append(table)
+        elements.append(Spacer(1, 20))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+LAYOUTS: Dict[str, Callable[[List[Dict], str], bytes]] = {
+    'escala': renderizar_escala,
+    'rjm': renderizar_rjm,
+}
+
+
+# ========== CACHE ==========
+
+class CachePDF:
+    """
+    Cache de PDFs por (comum_id, versão, layout).
+    Memória: LRU limitado a `max_itens`. Disco: um arquivo por (comum, layout),
+    substituído quando a versão muda. Requisições simultâneas da mesma chave
+    esperam uma única renderização.
+    """
+
+    def __init__(self, base_dir: str, max_itens: int = 64):
+        self.base_dir = base_dir
+        self.max_itens = max_itens
+        self._memoria: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._locks_chave: Dict[Tuple, threading.Lock] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf')
+        self.renderizacoes = 0
+
+    @staticmethod
+    def etag(comum_id: str, versao, layout: str) -> str:
+        return f"{layout}-{quote(str(comum_id), safe='')}-{versao}"
+
+    def _path(self, comum_id: str, layout: str) -> str:
+        return os.path.join(self.base_dir, f"{quote(str(comum_id), safe='')}.{layout}.pdf")
+
+    def _ler_disco(self, chave: Tuple) -> Optional[bytes]:
+        comum_id, versao, layout = chave
+        path = self._path(comum_id, layout)
+        try:
+            with open(path, 'rb') as f:
+                conteudo = f.read()
+        except FileNotFoundError:
+            return None
+        # Versão gravada em um cabeçalho de uma linha antes do PDF
+        cabecalho, _, pdf = conteudo.partition(b'\n')
+        return pdf if cabecalho.decode('ascii', 'ignore') == str(versao) else None
+
+    def _gravar_disco(self, chave: Tuple, pdf: bytes) -> None:
+        comum_id, versao, layout = chave
+        try:
+            os.makedirs(self.base_dir, exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(dir=self.base_dir, suffix='.pdf')
+            with os.fdopen(temp_fd, 'wb') as f:
+                f.write(str(versao).encode('ascii') + b'\n' + pdf)
+            os.replace(temp_path, self._path(comum_id, layout))
+        except OSError as e:
+            print(f"⚠️ [PDF] Não foi possível gravar cache em disco: {e}")
+
+    def _guardar(self, chave: Tuple, pdf: bytes) -> None:
+        with self._lock:
+            self._memoria[chave] = pdf
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_itens:
+                self._memoria.popitem(last=False)
+
+    def obter(self, comum_id: str, versao, layout: str, itens: List[Dict], comum_nome: str) -> bytes:
+        """PDF da chave; renderiza (uma vez) se não estiver em memória nem em disco"""
+        chave = (comum_id, versao, layout)
+        with self._lock:
+            pdf = self._memoria.get(chave)
+            if pdf is not None:
+                self._memoria.move_to_end(chave)
+                return pdf
+            lock_chave = self._locks_chave.setdefault(chave, threading.Lock())
+
+        with lock_chave:
+            with self._lock:
+                pdf = self._memoria.get(chave)
+            if pdf is None:
+                pdf = self._ler_disco(chave)
+                if pdf is None:
+                    inicio = datetime.now()
+                    pdf = LAYOUTS[layout](itens, comum_nome)
+                    self.renderizacoes += 1
+                    ms = (datetime.now() - inicio).total_seconds() * 1000
+                    print(f"📄 [PDF] {layout} de {comum_id} v{versao} renderizado em {ms:.0f}ms ({len(pdf)} bytes)")
+                    self._gravar_disco(chave, pdf)
+                self._guardar(chave, pdf)
+        with self._lock:
+            self._locks_chave.pop(chave, None)
+        return pdf
+
+    def pre_renderizar(self, comum_id: str, versao, layout: str, itens: List[Dict], comum_nome: str) -> None:
+        """Renderiza em segundo plano (chamado ao publicar/alterar a escala)"""
+        if not itens:
+            return
+
+        def tarefa():
+            try:
+                self.obter(comum_id, versao, layout, itens, comum_nome)
+            except Exception as e:
+                print(f"⚠️ [PDF] Pré-renderização de {layout}/{comum_id} falhou: {e}")
+
+        self._executor.submit(tarefa)
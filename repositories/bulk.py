@@ -0,0 +1,83 @@
+"""
+Escrita em lote para os repositories
+INSERT multi-linha (VALUES (...), (...), ...) com RETURNING, em blocos
+"""
+
+import logging
+import time
+from typing import List, Dict, Sequence
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 500 linhas x ~7 colunas fica bem abaixo do limite de parâmetros do PostgreSQL (65535)
+TAMANHO_LOTE = 500
+
+
+class LinhasInseridas(list):
+    """Linhas criadas por inserir_em_lote, com a duração da escrita e a vazão (linhas/s)"""
+    duracao: float = 0.0
+    linhas_por_segundo: float = 0.0
+
+
+def reservar_ids(session, tabela: str, quantidade: int, coluna: str = "id") -> List[int]:
+    """
+    Reserva `quantidade` valores da sequência de uma coluna SERIAL (um round trip),
+    para o id ir no próprio INSERT e servir de chave em inserir_em_lote
+    """
+    if quantidade <= 0:
+        return []
+    result = session.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:tabela, :coluna)) FROM generate_series(1, :quantidade)"),
+        {"tabela": tabela, "coluna": coluna, "quantidade": quantidade}
+    )
+    return [row[0] for row in result]
+
+
+def inserir_em_lote(session, tabela: str, colunas: Sequence[str], linhas: List[Dict],
+                    tamanho_lote: int = TAMANHO_LOTE, chave: str = "id") -> LinhasInseridas:
+    """
+    Insere `linhas` em `tabela` com um INSERT ... VALUES multi-linha por bloco
+    e retorna as linhas criadas (RETURNING *) na ordem de entrada.
+
+    O PostgreSQL não garante a ordem das linhas do RETURNING, então cada linha
+    de entrada precisa trazer a coluna `chave` (gerada pelo chamador, ex.: uuid
+    ou reservar_ids) e o resultado é reordenado por ela. A duração e as
+    linhas/s ficam no resultado e num log INFO de repositories.bulk.
+
+    `tabela` e `colunas` são nomes fixos do código, nunca entrada do usuário.
+    """
+    if not linhas:
+        return LinhasInseridas()
+
+    inicio = time.perf_counter()
+    criadas = {}
+    lista_colunas = ", ".join(colunas)
+
+    for offset in range(0, len(linhas), tamanho_lote):
+        bloco = linhas[offset:offset + tamanho_lote]
+        valores = []
+        params = {}
+        for i, linha in enumerate(bloco):
+            valores.append("(" + ", ".join(f":{col}_{i}" for col in colunas) + ")")
+            for col in colunas:
+                params[f"{col}_{i}"] = linha.get(col)
+
+        result = session.execute(
+            text(f"""
+                INSERT INTO {tabela} ({lista_colunas})
+                VALUES {", ".join(valores)}
+                RETURNING *
+            """),
+            params
+        )
+        for row in result:
+            criada = dict(row._mapping)
+            criadas[str(criada[chave])] = criada
+
+    resultado = LinhasInseridas(criadas[str(linha[chave])] for linha in linhas)
+    resultado.duracao = time.perf_counter() - inicio
+    resultado.linhas_por_segundo = len(resultado) / resultado.duracao if resultado.duracao > 0 else 0.0
+    logger.info("%s: %d linhas em %.1fms (%.0f linhas/s)", tabela, len(resultado),
+                resultado.duracao * 1000, resultado.linhas_por_segundo)
+    return resultado
@@ -6,6 +6,7 @@ Gerencia regionais, sub-regionais e comuns
 from typing import List, Dict, Optional
 from database import get_db_session
 from sqlalchemy import text
+from .bulk import inserir_em_lote, reservar_ids
 import uuid
 
 
@@ -45,7 +46,6 @@ class ComumRepository:
                 """),
                 {"id": regional_id, "nome": nome}
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update_regional(self, regional_id: str, nome: str) -> Optional[Dict]:
@@ -60,7 +60,6 @@ class ComumRepository:
                 """),
                 {"id": regional_id, "nome": nome}
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -109,7 +108,6 @@ class ComumRepository:
                 """),
                 {"id": sub_regional_id, "regional_id": regional_id, "nome": nome}
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update_sub_regional(self, sub_regional_id: str, nome: str) -> Optional[Dict]:
@@ -124,7 +122,6 @@ class ComumRepository:
                 """),
                 {"id": sub_regional_id, "nome": nome}
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -199,7 +196,6 @@ class ComumRepository:
                 """),
                 {"id": comum_id, "sub_regional_id": sub_regional_id, "nome": nome}
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update_comum(self, comum_id: str, nome: str) -> Optional[Dict]:
@@ -214,10 +210,83 @@ class ComumRepository:
                 """),
                 {"id": comum_id, "nome": nome}
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
+    # ========== HIERARQUIA COMPLETA ==========
+    
+    def get_hierarquia(self, regional_id: str = None, sub_regional_id: str = None,
+                       comum_id: str = None, profundidade: int = 3) -> List[Dict]:
+        """
+        Árvore regional → sub-regionais → comuns em uma única consulta.
+        
+        profundidade: 1 = só regionais, 2 = até sub-regionais, 3 = até comuns.
+        Os filtros restringem a árvore ao escopo informado (ex.: regional do admin).
+        """
+        profundidade = max(1, min(3, int(profundidade)))
+        colunas = ["r.id AS regional_id", "r.nome AS regional_nome"]
+        joins = []
+        filtros = []
+        params = {}
+        
+        if profundidade >= 2 or sub_regional_id or comum_id:
+            colunas += ["sr.id AS sub_regional_id", "sr.nome AS sub_regional_nome"]
+            joins.append("LEFT JOIN sub_regionais sr ON sr.regional_id = r.id")
+        if profundidade >= 3 or comum_id:
+            colunas += ["c.id AS comum_id", "c.nome AS comum_nome"]
+            joins.append("LEFT JOIN comuns c ON c.sub_regional_id = sr.id")
+        
+        if regional_id:
+            filtros.append("r.id = :regional_id")
+            params["regional_id"] = regional_id
+        if sub_regional_id:
+            filtros.append("sr.id = :sub_regional_id")
+            params["sub_regional_id"] = sub_regional_id
+        if comum_id:
+            filtros.append("c.id = :comum_id")
+            params["comum_id"] = comum_id
+        
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        ordem = ["r.nome"] + (["sr.nome"] if len(joins) >= 1 else []) + (["c.nome"] if len(joins) >= 2 else [])
+        
+        with get_db_session() as session:
+            result = session.execute(
+                text(f"""
+                    SELECT {', '.join(colunas)}
+                    FROM regionais r
+                    {' '.join(joins)}
+                    {where}
+                    ORDER BY {', '.join(ordem)}
+                """),
+                params
+            )
+            rows = [row._mapping for row in result]
+        
+        # Aninhar no servidor: linhas já vêm ordenadas por regional/sub/comum
+        regionais = {}
+        subs = {}
+        for row in rows:
+            regional = regionais.get(row["regional_id"])
+            if regional is None:
+                regional = {"id": row["regional_id"], "nome": row["regional_nome"]}
+                if profundidade >= 2:
+                    regional["sub_regionais"] = []
+                regionais[row["regional_id"]] = regional
+            if profundidade < 2 or not row.get("sub_regional_id"):
+                continue
+            
+            sub = subs.get(row["sub_regional_id"])
+            if sub is None:
+                sub = {"id": row["sub_regional_id"], "nome": row["sub_regional_nome"]}
+                if profundidade >= 3:
+                    sub["comuns"] = []
+                subs[row["sub_regional_id"]] = sub
+                regional["sub_regionais"].append(sub)
+            if profundidade >= 3 and row.get("comum_id"):
+                sub["comuns"].append({"id": row["comum_id"], "nome": row["comum_nome"]})
+        
+        return list(regionais.values())
+    
     # ========== CONFIGURAÇÕES DE COMUM ==========
     
     def get_config(self, comum_id: str) -> Optional[Dict]:
@@ -282,8 +351,6 @@ class ComumRepository:
                         "fechamento_dias": config.get("fechamento_dias", 3)
                     }
                 )
-            
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     # ========== HORÁRIOS ==========
@@ -316,7 +383,6 @@ class ComumRepository:
                     "horario": horario
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def remove_horario(self, horario_id: int) -> bool:
@@ -326,7 +392,6 @@ class ComumRepository:
                 text("DELETE FROM comum_horarios WHERE id = :id RETURNING id"),
                 {"id": horario_id}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def update_horarios(self, comum_id: str, horarios: List[Dict]) -> List[Dict]:
@@ -338,22 +403,21 @@ class ComumRepository:
                 {"comum_id": comum_id}
             )
             
-            # Adicionar novos
-            created = []
-            for h in horarios:
-                result = session.execute(
-                    text("""
-                        INSERT INTO comum_horarios (comum_id, dia_semana, horario, ativo)
-                        VALUES (:comum_id, :dia_semana, :horario, true)
-                        RETURNING *
-                    """),
-                    {
-                        "comum_id": comum_id,
-                        "dia_semana": h["dia_semana"],
-                        "horario": h["horario"]
-                    }
-                )
-                created.append(dict(result.fetchone()._mapping))
-            
-            session.commit()
-            return created
+            # Adicionar novos em um único INSERT multi-linha (ids reservados antes,
+            # para devolver os horários na ordem recebida)
+            ids = reservar_ids(session, "comum_horarios", len(horarios))
+            linhas = [
+                {
+                    "id": id_,
+                    "comum_id": comum_id,
+                    "dia_semana": h["dia_semana"],
+                    "horario": h["horario"],
+                    "ativo": True
+                }
+                for id_, h in zip(ids, horarios)
+            ]
+            return inserir_em_lote(
+                session, "comum_horarios",
+                ("id", "comum_id", "dia_semana", "horario", "ativo"),
+                linhas
+            )
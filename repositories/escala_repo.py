@@ -7,9 +7,22 @@ from typing import List, Dict, Optional
 from datetime import datetime, date
 from database import get_db_session
 from sqlalchemy import text
+from .bulk import inserir_em_lote
 import uuid
 
 
+def _intervalo_mes(mes: str):
+    """
+    'YYYY-MM' → (primeiro dia do mês, primeiro dia do mês seguinte).
+    Usado como intervalo semiaberto [inicio, fim) nas consultas por mês, que assim
+    podem usar os índices em (comum_id, data)/(organista_id, data).
+    """
+    ano, mes_num = (int(p) for p in mes.split('-')[:2])
+    inicio = date(ano, mes_num, 1)
+    fim = date(ano + 1, 1, 1) if mes_num == 12 else date(ano, mes_num + 1, 1)
+    return inicio, fim
+
+
 class EscalaRepository:
     """Repository para gerenciar escalas"""
     
@@ -40,6 +53,7 @@ class EscalaRepository:
         Buscar escalas de uma comum em um mês específico
         mes no formato: YYYY-MM
         """
+        inicio, fim = _intervalo_mes(mes)
         with get_db_session() as session:
             result = session.execute(
                 text("""
@@ -47,10 +61,10 @@ class EscalaRepository:
                     FROM escala e
                     LEFT JOIN organistas o ON e.organista_id = o.id
                     WHERE e.comum_id = :comum_id 
-                      AND TO_CHAR(e.data, 'YYYY-MM') = :mes
+                      AND e.data >= :inicio AND e.data < :fim
                     ORDER BY e.data, e.horario
                 """),
-                {"comum_id": comum_id, "mes": mes}
+                {"comum_id": comum_id, "inicio": inicio, "fim": fim}
             )
             return [dict(row._mapping) for row in result]
     
@@ -76,6 +90,7 @@ class EscalaRepository:
     
     def get_by_organista_mes(self, organista_id: str, mes: str) -> List[Dict]:
         """Buscar escalas de um organista em um mês"""
+        inicio, fim = _intervalo_mes(mes)
         with get_db_session() as session:
             result = session.execute(
                 text("""
@@ -83,10 +98,10 @@ class EscalaRepository:
                     FROM escala e
                     JOIN comuns c ON e.comum_id = c.id
                     WHERE e.organista_id = :organista_id 
-                      AND TO_CHAR(e.data, 'YYYY-MM') = :mes
+                      AND e.data >= :inicio AND e.data < :fim
                     ORDER BY e.data, e.horario
                 """),
-                {"organista_id": organista_id, "mes": mes}
+                {"organista_id": organista_id, "inicio": inicio, "fim": fim}
             )
             return [dict(row._mapping) for row in result]
     
@@ -114,41 +129,29 @@ class EscalaRepository:
                     "observacao": data.get("observacao")
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def create_batch(self, escalas: List[Dict]) -> List[Dict]:
-        """Criar múltiplas escalas de uma vez"""
-        created = []
+        """Criar múltiplas escalas de uma vez (INSERT multi-linha, um round trip por bloco)"""
+        linhas = [
+            {
+                "id": data.get('id') or str(uuid.uuid4()),
+                "comum_id": data["comum_id"],
+                "data": data["data"],
+                "horario": data.get("horario"),
+                "organista_id": data.get("organista_id"),
+                "tipo": data.get("tipo", "normal"),
+                "observacao": data.get("observacao")
+            }
+            for data in escalas
+        ]
         
         with get_db_session() as session:
-            for data in escalas:
-                escala_id = data.get('id') or str(uuid.uuid4())
-                
-                result = session.execute(
-                    text("""
-                        INSERT INTO escala (
-                            id, comum_id, data, horario, organista_id, tipo, observacao
-                        ) VALUES (
-                            :id, :comum_id, :data, :horario, :organista_id, :tipo, :observacao
-                        )
-                        RETURNING *
-                    """),
-                    {
-                        "id": escala_id,
-                        "comum_id": data["comum_id"],
-                        "data": data["data"],
-                        "horario": data.get("horario"),
-                        "organista_id": data.get("organista_id"),
-                        "tipo": data.get("tipo", "normal"),
-                        "observacao": data.get("observacao")
-                    }
-                )
-                created.append(dict(result.fetchone()._mapping))
-            
-            session.commit()
-        
-        return created
+            return inserir_em_lote(
+                session, "escala",
+                ("id", "comum_id", "data", "horario", "organista_id", "tipo", "observacao"),
+                linhas
+            )
     
     def update(self, escala_id: str, data: Dict) -> Optional[Dict]:
         """Atualizar escala"""
@@ -187,7 +190,6 @@ class EscalaRepository:
                 """),
                 params
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -198,28 +200,28 @@ class EscalaRepository:
                 text("DELETE FROM escala WHERE id = :id RETURNING id"),
                 {"id": escala_id}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def delete_by_comum_mes(self, comum_id: str, mes: str) -> int:
         """Deletar todas escalas de uma comum em um mês"""
+        inicio, fim = _intervalo_mes(mes)
         with get_db_session() as session:
             result = session.execute(
                 text("""
                     DELETE FROM escala 
                     WHERE comum_id = :comum_id 
-                      AND TO_CHAR(data, 'YYYY-MM') = :mes
+                      AND data >= :inicio AND data < :fim
                     RETURNING id
                 """),
-                {"comum_id": comum_id, "mes": mes}
+                {"comum_id": comum_id, "inicio": inicio, "fim": fim}
             )
-            session.commit()
             return len(result.fetchall())
     
     # ========== RJM (Reunião de Jovens e Menores) ==========
     
     def get_rjm_by_comum_mes(self, comum_id: str, mes: str) -> List[Dict]:
         """Buscar escalas RJM de uma comum em um mês"""
+        inicio, fim = _intervalo_mes(mes)
         with get_db_session() as session:
             result = session.execute(
                 text("""
@@ -227,10 +229,10 @@ class EscalaRepository:
                     FROM escala_rjm r
                     LEFT JOIN organistas o ON r.organista_id = o.id
                     WHERE r.comum_id = :comum_id 
-                      AND TO_CHAR(r.data, 'YYYY-MM') = :mes
+                      AND r.data >= :inicio AND r.data < :fim
                     ORDER BY r.data, r.horario
                 """),
-                {"comum_id": comum_id, "mes": mes}
+                {"comum_id": comum_id, "inicio": inicio, "fim": fim}
             )
             return [dict(row._mapping) for row in result]
     
@@ -257,7 +259,6 @@ class EscalaRepository:
                     "observacao": data.get("observacao")
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update_rjm(self, rjm_id: str, data: Dict) -> Optional[Dict]:
@@ -294,7 +295,6 @@ class EscalaRepository:
                 """),
                 params
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -305,7 +305,6 @@ class EscalaRepository:
                 text("DELETE FROM escala_rjm WHERE id = :id RETURNING id"),
                 {"id": rjm_id}
             )
-            session.commit()
             return result.fetchone() is not None
     
     # ========== Publicação ==========
@@ -368,8 +367,6 @@ class EscalaRepository:
                         "publicado_por": publicado_por
                     }
                 )
-            
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def despublicar(self, comum_id: str, mes: str) -> bool:
@@ -385,7 +382,6 @@ class EscalaRepository:
                 """),
                 {"comum_id": comum_id, "mes": mes}
             )
-            session.commit()
             return result.fetchone() is not None
     
     # ========== Estatísticas ==========
@@ -394,6 +390,7 @@ class EscalaRepository:
         """Contar quantas escalas um organista tem"""
         with get_db_session() as session:
             if mes:
+                inicio, fim = _intervalo_mes(mes)
                 result = session.execute(
                     text("""
                         SELECT COUNT(*) as total,
@@ -401,9 +398,9 @@ class EscalaRepository:
                                COUNT(CASE WHEN tipo = 'especial' THEN 1 END) as especiais
                         FROM escala
                         WHERE organista_id = :organista_id 
-                          AND TO_CHAR(data, 'YYYY-MM') = :mes
+                          AND data >= :inicio AND data < :fim
                     """),
-                    {"organista_id": organista_id, "mes": mes}
+                    {"organista_id": organista_id, "inicio": inicio, "fim": fim}
                 )
             else:
                 result = session.execute(
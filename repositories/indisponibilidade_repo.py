@@ -56,6 +56,50 @@ class IndisponibilidadeRepository:
             )
             return [dict(row._mapping) for row in result]
     
+    def get_by_comum_agrupado(self, comum_id: str, mes_inicio: str = None,
+                              mes_fim: str = None) -> Dict[str, Dict]:
+        """
+        Todas indisponibilidades dos organistas ativos de uma comum em uma única
+        consulta, já agrupadas por organista no banco.
+        
+        mes_inicio/mes_fim (YYYY-MM, inclusivos) limitam o intervalo de meses.
+        Retorna {organista_id: {"nome": ..., "indisponibilidades": [...]}},
+        ordenado por nome; organistas sem indisponibilidade não aparecem.
+        """
+        filtros = ["o.comum_id = :comum_id", "o.ativo = true"]
+        params = {"comum_id": comum_id}
+        if mes_inicio:
+            filtros.append("i.mes >= :mes_inicio")
+            params["mes_inicio"] = mes_inicio
+        if mes_fim:
+            filtros.append("i.mes <= :mes_fim")
+            params["mes_fim"] = mes_fim
+        
+        with get_db_session() as session:
+            result = session.execute(
+                text(f"""
+                    SELECT o.id AS organista_id,
+                           o.nome AS organista_nome,
+                           json_agg(
+                               json_build_object('id', i.id, 'mes', i.mes, 'motivo', i.motivo)
+                               ORDER BY i.mes DESC
+                           ) AS indisponibilidades
+                    FROM indisponibilidades i
+                    JOIN organistas o ON i.organista_id = o.id
+                    WHERE {' AND '.join(filtros)}
+                    GROUP BY o.id, o.nome
+                    ORDER BY o.nome
+                """),
+                params
+            )
+            return {
+                row.organista_id: {
+                    "nome": row.organista_nome,
+                    "indisponibilidades": row.indisponibilidades
+                }
+                for row in result
+            }
+    
     def create(self, data: Dict) -> Dict:
         """Criar nova indisponibilidade"""
         indisp_id = data.get('id') or str(uuid.uuid4())
@@ -77,7 +121,6 @@ class IndisponibilidadeRepository:
                     "motivo": data.get("motivo")
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update(self, indisp_id: str, data: Dict) -> Optional[Dict]:
@@ -108,7 +151,6 @@ class IndisponibilidadeRepository:
                 """),
                 params
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -119,7 +161,6 @@ class IndisponibilidadeRepository:
                 text("DELETE FROM indisponibilidades WHERE id = :id RETURNING id"),
                 {"id": indisp_id}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def delete_by_organista_mes(self, organista_id: str, mes: str) -> bool:
@@ -133,7 +174,6 @@ class IndisponibilidadeRepository:
                 """),
                 {"organista_id": organista_id, "mes": mes}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def is_organista_disponivel(self, organista_id: str, mes: str) -> bool:
@@ -7,6 +7,7 @@ from typing import List, Dict, Optional
 from datetime import datetime
 from database import get_db_session
 from sqlalchemy import text
+import re
 import uuid
 
 
@@ -34,6 +35,27 @@ class OrganistaRepository:
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
+    def versao_comum(self, comum_id: str) -> str:
+        """
+        Carimbo da lista de organistas de uma comum (ETag / ?since).
+        Inclui as inativas: desativar, editar ou mover uma organista muda o carimbo.
+        É um hash de (id, updated_at) de todas as linhas, não MAX(updated_at):
+        updated_at vem de NOW() (início da transação), então uma transação que
+        começou antes e confirmou depois não moveria o máximo.
+        """
+        with get_db_session() as session:
+            row = session.execute(
+                text("""
+                    SELECT COUNT(*) AS total,
+                           md5(COALESCE(string_agg(id || ':' || COALESCE(updated_at::text, ''), ','
+                                                   ORDER BY id), '')) AS digest
+                    FROM organistas
+                    WHERE comum_id = :comum_id
+                """),
+                {"comum_id": comum_id}
+            ).fetchone()
+            return f"{row.total}-{row.digest[:16]}"
+
     def get_by_comum(self, comum_id: str) -> List[Dict]:
         """Buscar todos organistas de uma comum"""
         with get_db_session() as session:
@@ -108,7 +130,6 @@ class OrganistaRepository:
                     "tipo_id": data.get("tipo_id", 1)  # 1 = Titular por padrão
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update(self, organista_id: str, data: Dict) -> Optional[Dict]:
@@ -149,7 +170,6 @@ class OrganistaRepository:
                 """),
                 params
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -165,7 +185,6 @@ class OrganistaRepository:
                 """),
                 {"id": organista_id}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def get_tipos(self) -> List[Dict]:
@@ -217,8 +236,6 @@ class OrganistaRepository:
                     """),
                     {"organista_id": organista_id, "dia_semana": dia}
                 )
-            
-            session.commit()
     
     def get_regras_especiais(self, organista_id: str) -> List[Dict]:
         """Buscar regras especiais do organista"""
@@ -250,44 +267,54 @@ class OrganistaRepository:
                     "descricao": descricao
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
-    def search(self, termo: str, comum_id: str = None) -> List[Dict]:
-        """Buscar organistas por nome ou telefone"""
-        search_term = f"%{termo}%"
+    def search(self, termo: str, comum_id: str = None, limite: int = 50) -> List[Dict]:
+        """
+        Buscar organistas por nome ou telefone, com relevância.
+        Nome comparado sem acentos e sem caixa (f_unaccent + pg_trgm: "conceicao" acha
+        "Conceição"); telefone comparado só pelos dígitos. Os dois predicados usam os
+        índices GIN de trigramas. Ordem: nome que começa com o termo, depois similaridade.
+        """
+        termo = (termo or "").strip()
+        if not termo:
+            return []
+        digitos = re.sub(r"\D", "", termo)  # só dígitos: nada a escapar no LIKE
+        # % e _ digitados são literais no LIKE (barra invertida é o escape padrão do PostgreSQL)
+        termo_like = re.sub(r"([\\%_])", r"\\\1", termo)
+        params = {"termo": termo, "termo_like": termo_like, "digitos": digitos, "limite": limite}
+        
+        filtro_comum = ""
+        if comum_id:
+            filtro_comum = "AND o.comum_id = :comum_id"
+            params["comum_id"] = comum_id
         
         with get_db_session() as session:
-            if comum_id:
-                result = session.execute(
-                    text("""
-                        SELECT o.*, ot.nome as tipo_nome
-                        FROM organistas o
-                        LEFT JOIN organista_tipos ot ON o.tipo_id = ot.id
-                        WHERE o.comum_id = :comum_id 
-                          AND o.ativo = true
-                          AND (o.nome ILIKE :termo OR o.telefone ILIKE :termo)
-                        ORDER BY o.nome
-                    """),
-                    {"comum_id": comum_id, "termo": search_term}
-                )
-            else:
-                result = session.execute(
-                    text("""
-                        SELECT o.*, ot.nome as tipo_nome,
-                               c.nome as comum_nome,
-                               sr.nome as sub_regional_nome,
-                               r.nome as regional_nome
-                        FROM organistas o
-                        LEFT JOIN organista_tipos ot ON o.tipo_id = ot.id
-                        JOIN comuns c ON o.comum_id = c.id
-                        JOIN sub_regionais sr ON c.sub_regional_id = sr.id
-                        JOIN regionais r ON sr.regional_id = r.id
-                        WHERE o.ativo = true
-                          AND (o.nome ILIKE :termo OR o.telefone ILIKE :termo)
-                        ORDER BY r.nome, sr.nome, c.nome, o.nome
-                    """),
-                    {"termo": search_term}
-                )
+            result = session.execute(
+                text(f"""
+                    WITH q AS (SELECT f_unaccent(lower(:termo)) AS termo,
+                                      f_unaccent(lower(:termo_like)) AS termo_like)
+                    SELECT o.*, ot.nome as tipo_nome,
+                           c.nome as comum_nome,
+                           sr.nome as sub_regional_nome,
+                           r.nome as regional_nome,
+                           (f_unaccent(lower(o.nome)) LIKE q.termo_like || '%') AS prefixo,
+                           word_similarity(q.termo, f_unaccent(lower(o.nome))) AS relevancia
+                    FROM organistas o
+                    CROSS JOIN q
+                    LEFT JOIN organista_tipos ot ON o.tipo_id = ot.id
+                    JOIN comuns c ON o.comum_id = c.id
+                    JOIN sub_regionais sr ON c.sub_regional_id = sr.id
+                    JOIN regionais r ON sr.regional_id = r.id
+                    WHERE o.ativo = true {filtro_comum}
+                      AND (f_unaccent(lower(o.nome)) LIKE '%' || q.termo_like || '%'
+                           OR q.termo <% f_unaccent(lower(o.nome))
+                           OR (length(:digitos) >= 3
+                               AND regexp_replace(o.telefone, '\\D', '', 'g') LIKE '%' || :digitos || '%'))
+                    ORDER BY prefixo DESC, relevancia DESC, o.nome
+                    LIMIT :limite
+                """),
+                params
+            )
             
             return [dict(row._mapping) for row in result]
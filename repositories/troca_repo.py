@@ -7,6 +7,7 @@ from typing import List, Dict, Optional
 from datetime import datetime
 from database import get_db_session
 from sqlalchemy import text
+from .escala_repo import _intervalo_mes
 import uuid
 
 
@@ -129,7 +130,6 @@ class TrocaRepository:
                     "motivo": data.get("motivo")
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def aprovar(self, troca_id: str, aprovado_por: str, observacao: str = None) -> Optional[Dict]:
@@ -173,8 +173,6 @@ class TrocaRepository:
                     "observacao": observacao
                 }
             )
-            
-            session.commit()
             return troca
     
     def rejeitar(self, troca_id: str, rejeitado_por: str, motivo: str = None) -> Optional[Dict]:
@@ -217,8 +215,6 @@ class TrocaRepository:
                     "observacao": motivo
                 }
             )
-            
-            session.commit()
             return troca
     
     def cancelar(self, troca_id: str, cancelado_por: str, motivo: str = None) -> Optional[Dict]:
@@ -255,8 +251,6 @@ class TrocaRepository:
                     "observacao": motivo
                 }
             )
-            
-            session.commit()
             return troca
     
     def get_historico(self, troca_id: str) -> List[Dict]:
@@ -294,8 +288,9 @@ class TrocaRepository:
                 params["comum_id"] = comum_id
             
             if mes:
-                query += " AND TO_CHAR(e.data, 'YYYY-MM') = :mes"
-                params["mes"] = mes
+                # Intervalo semiaberto no lugar de TO_CHAR: usa idx_escala_comum_data
+                query += " AND e.data >= :inicio AND e.data < :fim"
+                params["inicio"], params["fim"] = _intervalo_mes(mes)
             
             result = session.execute(text(query), params)
             row = result.fetchone()
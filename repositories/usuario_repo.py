@@ -35,6 +35,27 @@ class UsuarioRepository:
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
+    def get_identidade(self, user_id: str) -> Optional[Dict]:
+        """
+        Identidade para o login (usuário do sistema ou organista) em uma consulta.
+        Usuário do sistema tem precedência se o mesmo id existir nas duas tabelas.
+        """
+        with get_db_session() as session:
+            result = session.execute(
+                text("""
+                    SELECT id, nome, tipo, nivel, contexto_id, 'usuario' AS origem
+                    FROM usuarios WHERE id = :id AND ativo = true
+                    UNION ALL
+                    SELECT id, nome, 'organista', 'comum', comum_id, 'organista'
+                    FROM organistas WHERE id = :id AND ativo = true
+                    ORDER BY origem DESC
+                    LIMIT 1
+                """),
+                {"id": user_id}
+            )
+            row = result.fetchone()
+            return dict(row._mapping) if row else None
+
     def get_by_username(self, username: str) -> Optional[Dict]:
         """Buscar usuário por username (para login)"""
         with get_db_session() as session:
@@ -125,7 +146,6 @@ class UsuarioRepository:
                     "contexto_id": data.get("contexto_id")
                 }
             )
-            session.commit()
             return dict(result.fetchone()._mapping)
     
     def update(self, usuario_id: str, data: Dict) -> Optional[Dict]:
@@ -165,7 +185,6 @@ class UsuarioRepository:
                 """),
                 params
             )
-            session.commit()
             row = result.fetchone()
             return dict(row._mapping) if row else None
     
@@ -182,7 +201,6 @@ class UsuarioRepository:
                 """),
                 {"id": usuario_id, "password_hash": password_hash}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def delete(self, usuario_id: str) -> bool:
@@ -197,7 +215,6 @@ class UsuarioRepository:
                 """),
                 {"id": usuario_id}
             )
-            session.commit()
             return result.fetchone() is not None
     
     def username_exists(self, username: str, exclude_id: str = None) -> bool:
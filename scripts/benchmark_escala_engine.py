@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Valida e mede o motor de escala com bitsets (escala_engine)
+
+1. Equivalência: para cenários aleatórios, gerar_escala_automatica com
+   motor='bitset' deve produzir a mesma escala e o mesmo log que motor='legado'.
+2. Desempenho: um ano inteiro para todas as comuns de uma regional sintética.
+3. Modo ótimo: variância do total por organista (guloso × fluxo de custo mínimo).
+
+Uso:
+    python scripts/benchmark_escala_engine.py [--cenarios 200] [--comuns 60] [--organistas 25]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import gerar_escala_automatica
+from escala_engine import MotorEscala, gerar_escala_otima, gerar_escala_regional
+
+DIAS = ["Domingo", "Terça", "Quinta", "Sábado"]
+TIPOS = ["Meia-hora", "Culto", "RJM"]
+
+
+def organistas_aleatorias(rng, quantidade, prefixo="org"):
+    organistas = []
+    for i in range(quantidade):
+        organistas.append({
+            "id": f"{prefixo}{i}",
+            "nome": f"Organista {prefixo}{i}",
+            "tipos": rng.sample(TIPOS, rng.randint(1, len(TIPOS))),
+            "dias_permitidos": rng.sample(DIAS, rng.randint(1, len(DIAS))),
+        })
+    return organistas
+
+
+def indisponibilidades_aleatorias(rng, organistas, inicio, dias, densidade):
+    return [
+        {"id": org["id"], "data": (inicio + timedelta(days=d)).isoformat()}
+        for org in organistas
+        for d in range(dias)
+        if rng.random() < densidade
+    ]
+
+
+def validar_equivalencia(cenarios):
+    rng = random.Random(42)
+    for n in range(cenarios):
+        inicio = date(2025, 1, 1) + timedelta(days=rng.randint(0, 365))
+        dias = rng.randint(1, 120)
+        organistas = organistas_aleatorias(rng, rng.randint(0, 15))
+        db = {
+            "config": {"bimestre": {"inicio": inicio.isoformat(),
+                                    "fim": (inicio + timedelta(days=dias)).isoformat()}},
+            "organistas": organistas,
+            "indisponibilidades": indisponibilidades_aleatorias(rng, organistas, inicio, dias, rng.random() * 0.5),
+        }
+        legado = gerar_escala_automatica(db, motor='legado')
+        bitset = gerar_escala_automatica(db, motor='bitset')
+        if legado != bitset:
+            print(f"❌ Cenário {n} divergiu")
+            for a, b in zip(legado[0], bitset[0]):
+                if a != b:
+                    print(f"   legado: {a}\n   bitset: {b}")
+                    break
+            return False
+    print(f"✅ {cenarios} cenários: escala e log idênticos ao algoritmo original")
+    return True
+
+
+def medir_regional(comuns, organistas_por_comum):
+    rng = random.Random(7)
+    inicio, fim = date(2025, 1, 1), date(2025, 12, 31)
+    regional = {"sub_regionais": {"sub": {"comuns": {}}}}
+    for c in range(comuns):
+        organistas = organistas_aleatorias(rng, organistas_por_comum, prefixo=f"c{c}_")
+        regional["sub_regionais"]["sub"]["comuns"][f"comum_{c}"] = {
+            "organistas": organistas,
+            "indisponibilidades": indisponibilidades_aleatorias(rng, organistas, inicio, 365, 0.05),
+        }
+
+    for com_logs in (False, True):
+        t0 = time.perf_counter()
+        resultado = gerar_escala_regional(regional, inicio, fim, com_logs=com_logs)
+        duracao = (time.perf_counter() - t0) * 1000
+        vagas = sum(len(escala) for escala, _ in resultado.values())
+        print(f"📊 Regional com {comuns} comuns × {organistas_por_comum} organistas, 1 ano "
+              f"({'com' if com_logs else 'sem'} log): {vagas} dias em {duracao:.1f}ms")
+
+
+def totais_por_organista(escala, organistas):
+    totais = {org["nome"]: 0 for org in organistas}
+    for dia in escala:
+        for campo in ("meia_hora", "culto", "unica"):
+            if dia.get(campo):
+                totais[dia[campo]] += 1
+    return list(totais.values())
+
+
+def medir_otimo(organistas_por_comum):
+    rng = random.Random(11)
+    inicio, fim = date(2025, 1, 1), date(2025, 12, 31)
+    organistas = organistas_aleatorias(rng, organistas_por_comum)
+    indisponibilidades = [(i["id"], i["data"]) for i in
+                          indisponibilidades_aleatorias(rng, organistas, inicio, 365, 0.1)]
+    motor = MotorEscala(organistas, indisponibilidades)
+
+    guloso, _ = motor.gerar(inicio, fim)
+    t0 = time.perf_counter()
+    otimo, _ = gerar_escala_otima(motor, inicio, fim, prazo_segundos=10)
+    duracao = (time.perf_counter() - t0) * 1000
+    print(f"📊 Modo ótimo, 1 comum × {organistas_por_comum} organistas, 1 ano: {duracao:.1f}ms")
+    print(f"   variância guloso={statistics.pvariance(totais_por_organista(guloso, organistas)):.2f} "
+          f"ótimo={statistics.pvariance(totais_por_organista(otimo, organistas)):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cenarios', type=int, default=200)
+    parser.add_argument('--comuns', type=int, default=60)
+    parser.add_argument('--organistas', type=int, default=25)
+    args = parser.parse_args()
+
+    if not validar_equivalencia(args.cenarios):
+        sys.exit(1)
+    medir_regional(args.comuns, args.organistas)
+    medir_otimo(args.organistas)
+
+
+if __name__ == "__main__":
+    main()
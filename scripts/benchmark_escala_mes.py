@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos filtros por mês da tabela escala
+Compara TO_CHAR(data, 'YYYY-MM') = :mes com o intervalo semiaberto
+data >= :inicio AND data < :fim usado pelo EscalaRepository.
+
+Cria uma tabela TEMPORÁRIA com a mesma estrutura/índices de escala,
+popula com dados sintéticos e mostra plano + tempo de cada consulta.
+Nada é gravado nas tabelas reais.
+
+Uso:
+    python scripts/benchmark_escala_mes.py [--linhas 1000000] [--comuns 200] [--organistas 4000]
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+MES = '2025-06'
+INICIO, FIM = date(2025, 6, 1), date(2025, 7, 1)
+
+CONSULTAS = [
+    (
+        "get_by_comum_mes",
+        """SELECT e.* FROM bench_escala e
+           WHERE e.comum_id = %(comum_id)s AND TO_CHAR(e.data, 'YYYY-MM') = %(mes)s
+           ORDER BY e.data, e.horario""",
+        """SELECT e.* FROM bench_escala e
+           WHERE e.comum_id = %(comum_id)s AND e.data >= %(inicio)s AND e.data < %(fim)s
+           ORDER BY e.data, e.horario""",
+    ),
+    (
+        "contagem comum/mês",
+        """SELECT COUNT(*) FROM bench_escala
+           WHERE comum_id = %(comum_id)s AND TO_CHAR(data, 'YYYY-MM') = %(mes)s""",
+        """SELECT COUNT(*) FROM bench_escala
+           WHERE comum_id = %(comum_id)s AND data >= %(inicio)s AND data < %(fim)s""",
+    ),
+    (
+        "get_estatisticas_organista",
+        """SELECT COUNT(*) AS total,
+                  COUNT(CASE WHEN tipo = 'normal' THEN 1 END) AS normais,
+                  COUNT(CASE WHEN tipo = 'especial' THEN 1 END) AS especiais
+           FROM bench_escala
+           WHERE organista_id = %(organista_id)s AND TO_CHAR(data, 'YYYY-MM') = %(mes)s""",
+        """SELECT COUNT(*) AS total,
+                  COUNT(CASE WHEN tipo = 'normal' THEN 1 END) AS normais,
+                  COUNT(CASE WHEN tipo = 'especial' THEN 1 END) AS especiais
+           FROM bench_escala
+           WHERE organista_id = %(organista_id)s AND data >= %(inicio)s AND data < %(fim)s""",
+    ),
+]
+
+
+def criar_tabela(cur, linhas, comuns, organistas):
+    """Tabela temporária com a mesma forma e índices de escala (sem FKs)"""
+    cur.execute("""
+        CREATE TEMP TABLE bench_escala (
+            id VARCHAR(50) PRIMARY KEY,
+            comum_id VARCHAR(50) NOT NULL,
+            data DATE NOT NULL,
+            horario TIME,
+            organista_id VARCHAR(50),
+            tipo VARCHAR(20) DEFAULT 'normal',
+            observacao TEXT
+        )
+    """)
+    print(f"⏳ Populando {linhas:,} linhas ({comuns} comuns, {organistas} organistas)...")
+    # ~5 anos de datas; organista fixo por comum para manter a distribuição realista
+    cur.execute("""
+        INSERT INTO bench_escala (id, comum_id, data, horario, organista_id, tipo)
+        SELECT 'e' || g,
+               'comum_' || (g %% %(comuns)s),
+               DATE '2022-01-01' + (g / %(comuns)s) %% 1826,
+               CASE WHEN g %% 2 = 0 THEN TIME '09:00' ELSE TIME '19:30' END,
+               'org_' || ((g %% %(comuns)s) * (%(organistas)s / %(comuns)s) + (g / %(comuns)s) %% (%(organistas)s / %(comuns)s)),
+               CASE WHEN g %% 10 = 0 THEN 'especial' ELSE 'normal' END
+        FROM generate_series(1, %(linhas)s) AS g
+    """, {"linhas": linhas, "comuns": comuns, "organistas": organistas})
+
+    # Mesmos índices de database/schema_v2_normalized.sql
+    cur.execute("CREATE INDEX ON bench_escala(comum_id, data)")
+    cur.execute("CREATE INDEX ON bench_escala(comum_id, data, horario)")
+    cur.execute("CREATE INDEX ON bench_escala(organista_id, data) INCLUDE (tipo)")
+    # VACUUM atualiza o visibility map (necessário para Index Only Scan)
+    cur.execute("VACUUM ANALYZE bench_escala")
+
+
+def nos_do_plano(plano):
+    """Tipos de nó do plano (com o índice usado), em pré-ordem"""
+    nome = plano["Node Type"]
+    if plano.get("Index Name"):
+        nome += f" ({plano['Index Name']})"
+    nos = [nome]
+    for filho in plano.get("Plans", []):
+        nos.extend(nos_do_plano(filho))
+    return nos
+
+
+def explicar(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    resultado = cur.fetchone()[0]
+    resultado = resultado[0] if isinstance(resultado, list) else json.loads(resultado)[0]
+    plano = resultado["Plan"]
+    return {
+        "tempo_ms": resultado["Execution Time"],
+        "linhas": plano.get("Actual Rows"),
+        "nos": nos_do_plano(plano),
+        "blocos": plano.get("Shared Hit Blocks", 0) + plano.get("Shared Read Blocks", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--comuns', type=int, default=200)
+    parser.add_argument('--organistas', type=int, default=4000)
+    args = parser.parse_args()
+
+    if not DATABASE_URL:
+        print("❌ DATABASE_URL não configurada")
+        sys.exit(1)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True  # VACUUM não roda dentro de transação
+    try:
+        with conn.cursor() as cur:
+            criar_tabela(cur, args.linhas, args.comuns, args.organistas)
+            params = {
+                "comum_id": "comum_7", "organista_id": f"org_{7 * (args.organistas // args.comuns)}",
+                "mes": MES, "inicio": INICIO, "fim": FIM,
+            }
+
+            print("\n" + "=" * 60)
+            for nome, sql_antigo, sql_novo in CONSULTAS:
+                antigo = explicar(cur, sql_antigo, params)
+                novo = explicar(cur, sql_novo, params)
+                ganho = antigo["tempo_ms"] / novo["tempo_ms"] if novo["tempo_ms"] else float('inf')
+                print(f"📊 {nome}")
+                print(f"   TO_CHAR : {antigo['tempo_ms']:8.2f}ms  blocos={antigo['blocos']:<6} {' → '.join(antigo['nos'])}")
+                print(f"   intervalo: {novo['tempo_ms']:8.2f}ms  blocos={novo['blocos']:<6} {' → '.join(novo['nos'])}")
+                print(f"   ✅ {ganho:.1f}x mais rápido")
+                if not any('Index' in no for no in novo['nos']):
+                    print("   ⚠️  Plano novo não usa índice")
+            print("=" * 60)
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS bench_escala")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
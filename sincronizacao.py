@@ -0,0 +1,74 @@
+"""
+Sincronização incremental das listas que o SPA consulta após cada ação
+(/escala/atual, /rjm/atual, /trocas, /organistas)
+
+Cada lista tem uma versão por comum (a versão da partição no document store,
+ou um carimbo do PostgreSQL para organistas). A versão gera um ETag forte:
+se o cliente já tem a versão atual, a resposta é 304 sem montar o payload.
+
+Com `?since=<versão>` a resposta traz só os itens alterados e as chaves
+removidas desde aquela versão. Para isso cada processo guarda, para as versões
+recentes de cada lista, um digest por item (data do dia, id da troca/organista).
+Versão fora do histórico (outro worker, reinício, muito antiga) → lista completa
+com "delta": false, e o cliente substitui o que tem.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+Escopo = Tuple[Hashable, ...]
+
+
+def etag_versao(*partes) -> str:
+    """ETag forte a partir de (recurso, comum, versão, variante...)"""
+    return hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()[:32]
+
+
+def digest_item(item) -> str:
+    return hashlib.blake2b(
+        json.dumps(item, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"), digest_size=8
+    ).hexdigest()
+
+
+class HistoricoVersoes:
+    """Digests por item das últimas `max_versoes` versões de cada lista (LRU de escopos)"""
+
+    def __init__(self, max_versoes: int = 16, max_escopos: int = 2000):
+        self.max_versoes = max_versoes
+        self.max_escopos = max_escopos
+        self._escopos: "OrderedDict[Escopo, OrderedDict[str, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def registrar(self, escopo: Escopo, versao: str, itens: List[Dict], chave: Callable[[Dict], str]) -> None:
+        """Guarda os digests da versão (calculados uma vez por versão)"""
+        with self._lock:
+            versoes = self._escopos.get(escopo)
+            if versoes is not None and versao in versoes:
+                self._escopos.move_to_end(escopo)
+                return
+        digests = {str(chave(item)): digest_item(item) for item in itens}
+        with self._lock:
+            versoes = self._escopos.setdefault(escopo, OrderedDict())
+            versoes[versao] = digests
+            while len(versoes) > self.max_versoes:
+                versoes.popitem(last=False)
+            self._escopos.move_to_end(escopo)
+            while len(self._escopos) > self.max_escopos:
+                self._escopos.popitem(last=False)
+
+    def delta(self, escopo: Escopo, desde: str, versao: str) -> Optional[Tuple[set, List[str]]]:
+        """
+        (chaves alteradas ou novas, chaves removidas) entre `desde` e `versao`;
+        None se alguma das duas versões não está no histórico.
+        """
+        with self._lock:
+            versoes = self._escopos.get(escopo) or {}
+            antes, depois = versoes.get(desde), versoes.get(versao)
+        if antes is None or depois is None:
+            return None
+        alteradas = {k for k, d in depois.items() if antes.get(k) != d}
+        removidas = sorted(k for k in antes if k not in depois)
+        return alteradas, removidas
@@ -59,7 +59,20 @@ def test_comum_repository():
                 # Listar comuns
                 comuns = repo.get_comuns_by_sub_regional(sub_regionais[0]['id'])
                 print(f"  ✅ Comuns: {len(comuns)}")
-        
+
+        # Hierarquia em uma consulta deve bater com as consultas por nível
+        hierarquia = repo.get_hierarquia()
+        assert [r['id'] for r in hierarquia] == [r['id'] for r in regionais]
+        for regional in hierarquia:
+            subs = repo.get_sub_regionais_by_regional(regional['id'])
+            assert [s['id'] for s in regional['sub_regionais']] == [s['id'] for s in subs]
+            for sub in regional['sub_regionais']:
+                comuns_sub = repo.get_comuns_by_sub_regional(sub['id'])
+                assert [c['id'] for c in sub['comuns']] == [c['id'] for c in comuns_sub]
+        rasa = repo.get_hierarquia(profundidade=1)
+        assert all('sub_regionais' not in r for r in rasa)
+        print(f"  ✅ Hierarquia em uma consulta: {len(hierarquia)} regionais")
+
         return True
     except Exception as e:
         print(f"  ❌ Erro: {e}")
@@ -155,6 +168,52 @@ def test_escala_repository():
         return False
 
 
+def test_escrita_em_lote():
+    """Testar escrita em lote (create_batch numa comum real, em um mês de teste removido ao final)"""
+    print("\n🔍 Testando escrita em lote...")
+    try:
+        from datetime import date, timedelta
+        from database import get_db_session
+        from repositories.bulk import reservar_ids
+
+        repo_comum = ComumRepository()
+        repo = EscalaRepository()
+
+        regionais = repo_comum.get_all_regionais()
+        comuns = repo_comum.get_all_comuns_by_regional(regionais[0]['id']) if regionais else []
+        if not comuns:
+            print("  ⚠️  Sem comuns no banco")
+            return True
+
+        comum_id = comuns[0]['id']
+        mes_teste = '2099-01'
+        linhas = [
+            {"comum_id": comum_id, "data": (date(2099, 1, 1) + timedelta(days=i % 31)).isoformat(),
+             "horario": f"{8 + i // 31:02d}:00", "tipo": "normal", "observacao": f"lote-{i}"}
+            for i in range(620)  # mais de um bloco de TAMANHO_LOTE
+        ]
+        try:
+            criadas = repo.create_batch(linhas)
+            assert [c['observacao'] for c in criadas] == [l['observacao'] for l in linhas], "ordem de entrada"
+            print(f"  ✅ create_batch: {len(criadas)} linhas, {criadas.linhas_por_segundo:.0f} linhas/s")
+        finally:
+            removidas = repo.delete_by_comum_mes(comum_id, mes_teste)
+            print(f"  ✅ {removidas} linhas de teste removidas")
+
+        # Só consome valores da sequência: não altera os horários existentes
+        with get_db_session() as session:
+            ids = reservar_ids(session, "comum_horarios", 3)
+        assert len(ids) == 3 and ids == sorted(ids), "ids reservados"
+        print(f"  ✅ reservar_ids(comum_horarios): {ids}")
+
+        return True
+    except Exception as e:
+        print(f"  ❌ Erro: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def test_indisponibilidade_repository():
     """Testar IndisponibilidadeRepository"""
     print("\n🔍 Testando IndisponibilidadeRepository...")
@@ -186,6 +245,12 @@ def test_indisponibilidade_repository():
             ind = indisps[0]
             print(f"     Exemplo: {ind.get('organista_nome', 'N/A')} - {ind.get('motivo', 'Sem motivo')}")
         
+        # Agrupado por organista no banco deve bater com a consulta por mês
+        agrupado = repo.get_by_comum_agrupado(comum_id, mes_atual, mes_atual)
+        ids_agrupados = {i['id'] for o in agrupado.values() for i in o['indisponibilidades']}
+        assert ids_agrupados <= {i['id'] for i in indisps}
+        print(f"  ✅ Agrupado por organista: {len(agrupado)} organistas")
+        
         return True
     except Exception as e:
         print(f"  ❌ Erro: {e}")
@@ -267,6 +332,7 @@ def main():
         ("ComumRepository", test_comum_repository),
         ("OrganistaRepository", test_organista_repository),
         ("EscalaRepository", test_escala_repository),
+        ("Escrita em lote", test_escrita_em_lote),
         ("IndisponibilidadeRepository", test_indisponibilidade_repository),
         ("UsuarioRepository", test_usuario_repository),
         ("TrocaRepository", test_troca_repository),